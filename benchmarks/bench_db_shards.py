@@ -0,0 +1,113 @@
+"""
+Card-store sharding benchmark (DB_SHARDS).
+
+Runs a mixed workload against a throwaway store split into K files: reviewer
+threads loop over their users doing what a review tap does — read the due
+queue, write one rating — while importer threads bulk-insert large batches
+(save_cards) for their own users. With one file every rating waits behind
+whichever import transaction holds SQLite's single write lock; with K files
+only the users sharing a file with an importer wait.
+
+Reports review throughput and rating-write latency per shard count.
+
+    python -m benchmarks.bench_db_shards                       # K = 1, 4, 16
+    python -m benchmarks.bench_db_shards --shards 1 8 --seconds 10 --importers 2
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import database.database as db
+
+REVIEW_DUE = '2099-01-01 00:00:00'
+
+
+def _seed(users: int, cards: int) -> dict[int, int]:
+    decks = {}
+    for uid in range(1, users + 1):
+        db.create_user(uid, None, f"bench{uid}")
+        decks[uid] = db.create_deck_db(uid, 'Bench')
+        db.save_cards([{'front': f"q{i}", 'back': f"a{i}"} for i in range(cards)], 'basic', decks[uid], uid)
+    return decks
+
+
+def _reviewer(uids: list[int], stop: threading.Event, latencies: list[float]) -> None:
+    i = 0
+    while not stop.is_set():
+        uid = uids[i % len(uids)]
+        i += 1
+        due = db.get_due_cards(uid)
+        if not due:
+            continue
+        card = due[0]
+        t0 = time.perf_counter()
+        db.update_card_srs(card['card_id'], REVIEW_DUE, 3.0, 5.0, 1, 0, 'review', 3, user_id=uid)
+        latencies.append(time.perf_counter() - t0)
+
+
+def _importer(uid: int, deck_id: int, batch: int, stop: threading.Event, imported: list[int]) -> None:
+    cards = [{'front': f"imported front {i}", 'back': f"imported back {i} " * 4} for i in range(batch)]
+    while not stop.is_set():
+        imported.append(db.save_cards(cards, 'basic', deck_id, uid))
+
+
+def run(shards: int, users: int, cards: int, reviewers: int, importers: int, batch: int, seconds: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        db.DB_SHARDS = shards
+        db.init_db()
+        decks = _seed(users + importers, cards)
+
+        stop = threading.Event()
+        latencies: list[list[float]] = [[] for _ in range(reviewers)]
+        imported: list[int] = []
+        review_users = list(range(1, users + 1))
+        threads = [
+            threading.Thread(target=_reviewer, args=(review_users[r::reviewers], stop, latencies[r]))
+            for r in range(reviewers)
+        ] + [
+            threading.Thread(target=_importer, args=(uid, decks[uid], batch, stop, imported))
+            for uid in range(users + 1, users + importers + 1)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    samples = sorted(x for per in latencies for x in per)
+    return {
+        'shards': shards,
+        'reviews_per_s': round(len(samples) / seconds, 1),
+        'imported_per_s': round(sum(imported) / seconds, 1),
+        'write_p50_ms': round(statistics.median(samples) * 1000, 2) if samples else None,
+        'write_p99_ms': round(samples[int(len(samples) * 0.99)] * 1000, 2) if samples else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--users', type=int, default=64, help="reviewing users")
+    parser.add_argument('--cards', type=int, default=200, help="seed cards per user")
+    parser.add_argument('--reviewers', type=int, default=8, help="reviewer threads")
+    parser.add_argument('--importers', type=int, default=1, help="bulk-importer threads")
+    parser.add_argument('--batch', type=int, default=5_000, help="cards per import transaction")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'shards':>7} {'reviews/s':>10} {'imported/s':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for k in args.shards:
+        r = run(k, args.users, args.cards, args.reviewers, args.importers, args.batch, args.seconds)
+        print(f"{r['shards']:>7} {r['reviews_per_s']:>10.1f} {r['imported_per_s']:>11.1f} "
+              f"{r['write_p50_ms']:>8} {r['write_p99_ms']:>8}")
+
+
+if __name__ == '__main__':
+    main()
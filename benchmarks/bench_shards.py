@@ -0,0 +1,160 @@
+"""
+Sharded-deployment scaling harness.
+
+Spins up the real front receiver and N shard worker processes
+(utils.sharding), each running a PTB Application against the in-process Bot API
+stand-in, then fires synthetic updates from many users at the front over HTTP
+and reports end-to-end throughput per worker count.
+
+Each update's handler does CPU-bound work representative of the bot — computing
+next intervals for all four ratings (utils.srs.schedule_all_ratings) --work
+times — so throughput is bound by the worker's core, which is what sharding
+spreads. Scaling is only near-linear with at least N + 1 free cores (the front
+and the load generator need one); on fewer cores the numbers flatten.
+
+    python -m benchmarks.bench_shards                        # 1, 2, 4 workers
+    python -m benchmarks.bench_shards --workers 1 8 --updates 20000 --work 50
+"""
+
+import argparse
+import asyncio
+import functools
+import multiprocessing as mp
+import os
+import queue
+import socket
+import time
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, ContextTypes, MessageHandler, filters
+
+from benchmarks.bench_updates import SECRET, _Connection, free_port
+from benchmarks.fake_api import FAKE_TOKEN, FakeBotRequest, make_update
+from utils.sharding import ShardPool, front_main
+from utils.srs import schedule_all_ratings
+from utils.update_processor import PerUserUpdateProcessor
+
+_CARD = {
+    'state': 'review', 'step': 0, 'stability': 12.0, 'difficulty': 5.0,
+    'reps': 6, 'lapses': 1, 'scheduled_days': 10, 'due_date': '',
+}
+
+
+def bench_app(events, work: int, index: int, shards: int) -> Application:
+    """Shard app factory: one CPU-bound handler that reports each update it finishes."""
+    request = FakeBotRequest()
+
+    async def ready(_app: Application) -> None:
+        events.put(('ready', index))
+
+    app = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .request(request)
+        .updater(None)
+        .concurrent_updates(PerUserUpdateProcessor())
+        .post_init(ready)
+        .build()
+    )
+
+    async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        for _ in range(work):
+            schedule_all_ratings(_CARD)
+        events.put(('done', index))
+
+    app.add_handler(MessageHandler(filters.TEXT, on_message))
+    return app
+
+
+def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.05)
+    raise TimeoutError(f"front receiver did not start on port {port}")
+
+
+async def _fire(port: int, updates: list[dict], concurrency: int) -> None:
+    pool: asyncio.Queue[_Connection] = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(_Connection('127.0.0.1', port, '/telegram'))
+
+    async def deliver(u: dict) -> None:
+        conn = await pool.get()
+        try:
+            status = await conn.post_json(u)
+            assert status == 200, f"front answered {status}"
+        finally:
+            pool.put_nowait(conn)
+
+    await asyncio.gather(*(deliver(u) for u in updates))
+    while not pool.empty():
+        await pool.get_nowait().close()
+
+
+def run(workers: int, n: int, users: int, work: int, concurrency: int) -> dict:
+    ctx = mp.get_context('spawn')
+    events = ctx.Queue()
+    shards = ShardPool(workers, functools.partial(bench_app, events, work))
+    shards.start()
+    port = free_port()
+    front = ctx.Process(target=front_main, args=(shards.inboxes, '127.0.0.1', port, 'telegram', SECRET), daemon=True)
+    front.start()
+
+    try:
+        ready = 0
+        while ready < workers:
+            kind, _ = events.get(timeout=60)
+            ready += kind == 'ready'
+        _wait_for_port(port)
+
+        updates = [make_update(i + 1, 1000 + i % users) for i in range(n)]
+        start = time.perf_counter()
+        asyncio.run(_fire(port, updates, concurrency))
+        per_shard = [0] * workers
+        done = 0
+        while done < n:
+            try:
+                kind, index = events.get(timeout=60)
+            except queue.Empty:
+                raise TimeoutError(f"only {done}/{n} updates handled")
+            if kind == 'done':
+                done += 1
+                per_shard[index] += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        front.terminate()
+        shards.stop()
+
+    return {
+        'workers': workers,
+        'updates': n,
+        'seconds': round(elapsed, 3),
+        'updates_per_s': round(n / elapsed, 1),
+        'per_shard': per_shard,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--updates', type=int, default=5_000)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--work', type=int, default=20, help="schedule_all_ratings calls per update")
+    parser.add_argument('--concurrency', type=int, default=40, help="parallel POSTs to the front")
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'workers':>8} {'updates':>8} {'seconds':>8} {'upd/s':>9} {'speedup':>8}  per shard")
+    base = None
+    for w in args.workers:
+        r = run(w, args.updates, args.users, args.work, args.concurrency)
+        base = base or r['updates_per_s']
+        print(f"{r['workers']:>8} {r['updates']:>8} {r['seconds']:>8.2f} {r['updates_per_s']:>9.1f} "
+              f"{r['updates_per_s'] / base:>7.2f}x  {r['per_shard']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Update-ingestion benchmark: webhook vs long polling.
+
+Runs a real PTB Application against the in-process Bot API stand-in
+(benchmarks.fake_api) and delivers N synthetic message updates, arriving at
+--rate per second, through either
+  - polling: updates appear on the fake getUpdates endpoint, which answers
+    after a simulated network round trip (--rtt-ms), or
+  - webhook: updates are POSTed to PTB's embedded webhook server over real
+    HTTP after half a round trip (Telegram → bot is one-way),
+then reports throughput and per-update latency (arrival → handler).
+
+    python -m benchmarks.bench_updates                          # 2000 updates @ 500/s, 50 ms RTT
+    python -m benchmarks.bench_updates --rate 0 --rtt-ms 0      # burst, no network: raw ingestion cost
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import time
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, ContextTypes, MessageHandler, filters
+
+from benchmarks.fake_api import FAKE_TOKEN, FakeBotRequest, make_update
+
+SECRET = 'bench-secret'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def build_app(request: FakeBotRequest, expected: int) -> tuple[Application, dict, asyncio.Event]:
+    """Application whose only handler timestamps each update it sees."""
+    app = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .request(request)
+        .get_updates_request(request)
+        .build()
+    )
+    handled: dict[int, float] = {}
+    done = asyncio.Event()
+
+    async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        handled[update.update_id] = time.perf_counter()
+        if len(handled) >= expected:
+            done.set()
+
+    app.add_handler(MessageHandler(filters.TEXT, on_message))
+    return app, handled, done
+
+
+def _updates(n: int, users: int) -> list[dict]:
+    return [make_update(i + 1, 1000 + i % users) for i in range(n)]
+
+
+async def _paced(updates: list[dict], rate: float):
+    """Yield updates on schedule (rate 0 = all at once) with their arrival time."""
+    start = time.perf_counter()
+    for i, u in enumerate(updates):
+        if rate:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield u, time.perf_counter()
+
+
+def _report(mode: str, sent: dict[int, float], handled: dict[int, float], elapsed: float) -> dict:
+    latencies = sorted((handled[i] - sent[i]) * 1000 for i in handled)
+    return {
+        'mode': mode,
+        'updates': len(handled),
+        'seconds': round(elapsed, 3),
+        'updates_per_s': round(len(handled) / elapsed, 1),
+        'latency_ms_p50': round(statistics.median(latencies), 2),
+        'latency_ms_p99': round(latencies[max(0, int(len(latencies) * 0.99) - 1)], 2),
+    }
+
+
+async def run_polling(n: int, users: int = 100, rate: float = 500, rtt: float = 0.05) -> dict:
+    request = FakeBotRequest(rtt=rtt)
+    app, handled, done = build_app(request, n)
+    sent: dict[int, float] = {}
+
+    async with app:
+        await app.start()
+        await app.updater.start_polling(poll_interval=0)
+        start = time.perf_counter()
+        async for u, arrived in _paced(_updates(n, users), rate):
+            sent[u['update_id']] = arrived
+            request.updates.put_nowait(u)
+        await done.wait()
+        elapsed = time.perf_counter() - start
+        await app.updater.stop()
+        await app.stop()
+    return _report('polling', sent, handled, elapsed)
+
+
+class _Connection:
+    """Minimal keep-alive HTTP/1.1 client — a full client library would be the bottleneck here."""
+
+    def __init__(self, host: str, port: int, path: str) -> None:
+        self.host, self.port, self.path = host, port, path
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def post_json(self, payload: dict) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode()
+        self.writer.write(
+            f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n\r\n".encode() + body
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        if length:
+            await self.reader.readexactly(length)
+        return status
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def post_updates(
+    port: int,
+    updates: list[dict],
+    sent: dict[int, float],
+    rate: float,
+    rtt: float,
+    concurrency: int,
+) -> None:
+    """Deliver every update to the webhook like Telegram: at most `concurrency` connections."""
+    pool: asyncio.Queue[_Connection] = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(_Connection('127.0.0.1', port, '/telegram'))
+
+    async def deliver(u: dict) -> None:
+        await asyncio.sleep(rtt / 2)
+        conn = await pool.get()
+        try:
+            status = await conn.post_json(u)
+            assert status == 200, f"webhook answered {status}"
+        finally:
+            pool.put_nowait(conn)
+
+    tasks = []
+    async for u, arrived in _paced(updates, rate):
+        sent[u['update_id']] = arrived
+        tasks.append(asyncio.create_task(deliver(u)))
+    await asyncio.gather(*tasks)
+    while not pool.empty():
+        await pool.get_nowait().close()
+
+
+async def run_webhook(
+    n: int,
+    users: int = 100,
+    rate: float = 500,
+    rtt: float = 0.05,
+    concurrency: int = 40,
+) -> dict:
+    request = FakeBotRequest()
+    app, handled, done = build_app(request, n)
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/telegram"
+    sent: dict[int, float] = {}
+
+    async with app:
+        await app.start()
+        await app.updater.start_webhook(
+            listen='127.0.0.1', port=port, url_path='telegram',
+            webhook_url=url, secret_token=SECRET, max_connections=concurrency,
+        )
+        start = time.perf_counter()
+        # The client gets its own thread and loop so it doesn't compete with the
+        # server for the bot's event loop — closer to Telegram being a remote peer
+        await asyncio.to_thread(asyncio.run, post_updates(port, _updates(n, users), sent, rate, rtt, concurrency))
+        await done.wait()
+        elapsed = time.perf_counter() - start
+        await app.updater.stop()
+        await app.stop()
+    return _report('webhook', sent, handled, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=500, help="arrivals per second (0 = burst)")
+    parser.add_argument('--rtt-ms', type=float, default=50, help="simulated Bot API round trip")
+    parser.add_argument('--concurrency', type=int, default=40, help="webhook max_connections")
+    parser.add_argument('--mode', choices=['both', 'polling', 'webhook'], default='both')
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    results = []
+    if args.mode in ('both', 'polling'):
+        results.append(asyncio.run(run_polling(args.updates, args.users, args.rate, rtt)))
+    if args.mode in ('both', 'webhook'):
+        results.append(asyncio.run(run_webhook(args.updates, args.users, args.rate, rtt, args.concurrency)))
+
+    print(f"{'mode':>8} {'updates':>8} {'seconds':>8} {'upd/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['mode']:>8} {r['updates']:>8} {r['seconds']:>8.2f} {r['updates_per_s']:>9.1f} "
+              f"{r['latency_ms_p50']:>8.2f} {r['latency_ms_p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
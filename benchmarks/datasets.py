@@ -0,0 +1,105 @@
+"""
+Seeded benchmark datasets: users × decks × cards at a few fixed scales.
+
+seed(scale, seed) fills the current database (db.DB_PATH / backend) with the
+same collection every time for a given (scale, seed): card states follow a
+typical mature collection (mostly review, some new, a few in (re)learning),
+SRS fields are drawn to match the state, and due dates are spread from a month
+overdue to a few months ahead — so roughly a third of the cards are due.
+Due dates are relative to the moment of seeding, so "due now" counts are
+reproducible too.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import database.database as db
+
+FIRST_USER_ID = 1000
+
+
+@dataclass(frozen=True)
+class Scale:
+    name: str
+    users: int
+    decks: int          # per user
+    cards: int          # per deck
+
+    @property
+    def total_cards(self) -> int:
+        return self.users * self.decks * self.cards
+
+
+SCALES = {
+    s.name: s for s in (
+        Scale('tiny', users=3, decks=2, cards=20),
+        Scale('small', users=20, decks=3, cards=100),
+        Scale('medium', users=100, decks=4, cards=500),
+        Scale('large', users=200, decks=5, cards=2000),
+    )
+}
+
+STATES = ('new', 'learning', 'review', 'relearning')
+STATE_WEIGHTS = (0.15, 0.05, 0.75, 0.05)
+
+
+@dataclass
+class Dataset:
+    scale: Scale
+    seed: int
+    user_ids: list[int]
+    decks: dict[int, list[int]]     # user_id -> deck ids
+
+
+def _card_row(rng: random.Random, now: datetime, i: int, deck_id: int, user_id: int) -> tuple:
+    state = rng.choices(STATES, STATE_WEIGHTS)[0]
+    if state == 'new':
+        stability, reps, lapses, interval = 0.0, 0, 0, 0
+        due = now - timedelta(days=rng.uniform(0, 30))
+    elif state in ('learning', 'relearning'):
+        stability = rng.uniform(0.1, 2.0)
+        reps, lapses, interval = rng.randint(1, 3), int(state == 'relearning') + rng.randint(0, 2), 0
+        due = now + timedelta(minutes=rng.uniform(-120, 60))
+    else:
+        interval = rng.randint(1, 120)
+        stability = interval * rng.uniform(0.8, 1.2)
+        reps, lapses = rng.randint(2, 30), rng.randint(0, 4)
+        due = now + timedelta(days=rng.uniform(-30, interval))
+    front = f"word {user_id}-{deck_id}-{i}"
+    back = f"meaning of word {i} " * rng.randint(1, 4)
+    return (
+        front, back.strip(), deck_id, user_id, state,
+        due.strftime('%Y-%m-%d %H:%M:%S'), round(stability, 3), round(rng.uniform(2.0, 8.0), 3),
+        interval, reps, lapses,
+    )
+
+
+def seed(scale: Scale | str, seed: int = 1) -> Dataset:
+    """Create scale's users, decks and cards in the current database."""
+    if isinstance(scale, str):
+        scale = SCALES[scale]
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    dataset = Dataset(scale, seed, [], {})
+
+    for u in range(scale.users):
+        user_id = FIRST_USER_ID + u
+        db.create_user(user_id, None, f"bench{user_id}")
+        deck_ids = [db.create_deck_db(user_id, f"Deck {d + 1}") for d in range(scale.decks)]
+        with db.get_db(user_id) as conn:
+            for deck_id in deck_ids:
+                rows = [_card_row(rng, now, i, deck_id, user_id) for i in range(scale.cards)]
+                conn.executemany("INSERT INTO notes (front, back, deck_id, user_id) VALUES (?, ?, ?, ?)",
+                                 (row[:4] for row in rows))
+                note_ids = [r['note_id'] for r in conn.execute(
+                    "SELECT note_id FROM notes WHERE deck_id = ? ORDER BY note_id", (deck_id,)
+                )]
+                conn.executemany(
+                    "INSERT INTO cards (note_id, deck_id, user_id, state, due_date, stability, difficulty, "
+                    "scheduled_days, reps, lapses) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((note_id, *row[2:]) for note_id, row in zip(note_ids, rows)),
+                )
+        dataset.user_ids.append(user_id)
+        dataset.decks[user_id] = deck_ids
+    return dataset
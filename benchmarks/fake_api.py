@@ -0,0 +1,141 @@
+"""
+In-process stand-in for the Telegram Bot API.
+
+FakeBotRequest plugs into Bot(request=..., get_updates_request=...) and answers
+the handful of methods the bot needs without touching the network:
+getMe, setWebhook/deleteWebhook, getUpdates (served from an in-memory queue,
+long-poll style) and every send/edit call (recorded, answered with a stub).
+
+make_update() / make_callback_update() build the JSON Telegram would POST for
+a text message or a button tap, so the same payloads can be fed through
+getUpdates or a webhook.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_ID = 1
+FAKE_TOKEN = f"{BOT_ID}:fake-token-for-local-tests"
+
+
+def make_update(update_id: int, user_id: int, text: str = "hi") -> dict[str, Any]:
+    """A private-chat text message update, as Telegram would send it."""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private', 'first_name': f"user{user_id}"},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+        'text': text,
+    }
+    if text.startswith('/'):
+        # Telegram marks the leading /command so CommandHandler recognises it
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def make_callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> dict[str, Any]:
+    """An inline-button tap on one of the bot's messages in a private chat."""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'chat_instance': str(user_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': f"user{user_id}"},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Retain'},
+                'text': '...',
+            },
+        },
+    }
+
+
+class FakeBotRequest(BaseRequest):
+    def __init__(self, poll_timeout: float = 0.05, rtt: float = 0.0) -> None:
+        self.poll_timeout = poll_timeout
+        self.rtt = rtt          # simulated network round trip added to every call
+        self.updates: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+        self._message_id = 0
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def push_updates(self, updates: list[dict[str, Any]]) -> None:
+        for u in updates:
+            self.updates.put_nowait(u)
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ) -> tuple[int, bytes]:
+        await asyncio.sleep(self.rtt / 2)    # request leg
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        handler = getattr(self, f"_{api_method}", None)
+        result = await handler(params) if handler else self._default(api_method, params)
+        await asyncio.sleep(self.rtt / 2)    # response leg
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    # ── Methods ──────────────────────────────────────────────
+
+    async def _getMe(self, params: dict) -> dict:
+        return {
+            'id': BOT_ID, 'is_bot': True, 'first_name': 'Retain', 'username': 'retain_test_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False,
+            'supports_inline_queries': False,
+        }
+
+    async def _getUpdates(self, params: dict) -> list[dict]:
+        offset = params.get('offset') or 0
+        limit = params.get('limit') or 100
+        batch: list[dict] = []
+        try:
+            first = await asyncio.wait_for(self.updates.get(), self.poll_timeout)
+        except asyncio.TimeoutError:
+            return batch
+        batch.append(first)
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return [u for u in batch if u['update_id'] >= offset]
+
+    async def _setWebhook(self, params: dict) -> bool:
+        self.calls.append(('setWebhook', params))
+        return True
+
+    async def _deleteWebhook(self, params: dict) -> bool:
+        self.calls.append(('deleteWebhook', params))
+        return True
+
+    def _default(self, api_method: str, params: dict) -> Any:
+        self.calls.append((api_method, params))
+        if api_method.startswith(('send', 'edit')):
+            self._message_id += 1
+            chat_id = params.get('chat_id', 0)
+            return {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
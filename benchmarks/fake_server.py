@@ -0,0 +1,326 @@
+"""
+Local Telegram Bot API stand-in over real HTTP.
+
+Where benchmarks.fake_api plugs into PTB in-process, FakeTelegramServer is a
+tornado server on 127.0.0.1 that an unmodified bot process talks to through
+TELEGRAM_API_URL (config.py). It implements what this bot uses:
+
+  getMe, getUpdates (long poll with offset/limit/timeout), set/deleteWebhook,
+  sendMessage, sendPhoto, sendDocument, editMessageText, editMessageCaption,
+  editMessageReplyMarkup, deleteMessage, answerCallbackQuery
+
+and keeps every private chat's messages, so a simulated user can read the
+current screen and tap its buttons (benchmarks/load.py). It answers like
+Telegram where the bot's error handling depends on it: editing a missing
+message or editing to identical content is a 400 with Telegram's wording, and
+with flood_rate set each chat gets a token bucket and over-budget sends get a
+429 with retry_after.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from typing import Any
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+from benchmarks.fake_api import BOT_ID, FAKE_TOKEN, make_callback_update, make_update
+from utils.rate_limit import TokenBucket
+
+_BOT_USER = {'id': BOT_ID, 'is_bot': True, 'first_name': 'Retain'}
+_INT_PARAMS = {'chat_id', 'message_id', 'offset', 'limit', 'timeout'}
+_RENDERING = ('sendMessage', 'sendPhoto', 'sendDocument', 'editMessageText', 'editMessageCaption',
+              'editMessageReplyMarkup')
+
+
+class ApiError(Exception):
+    def __init__(self, code: int, description: str, retry_after: int | None = None) -> None:
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.retry_after = retry_after
+
+
+class Chat:
+    """One private chat as the user sees it: the bot's messages by id."""
+
+    def __init__(self, chat_id: int) -> None:
+        self.chat_id = chat_id
+        self.messages: dict[int, dict[str, Any]] = {}
+        self.renders = 0                          # bumps on every send / edit into this chat
+        self._changed = asyncio.Event()
+
+    def render(self, message: dict[str, Any]) -> None:
+        self.messages[message['message_id']] = message
+        self.renders += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_render(self, after: int, timeout: float) -> bool:
+        """Wait until renders > after. False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.renders <= after:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def screen(self) -> dict[str, Any] | None:
+        """The newest message — what the user is looking at."""
+        return self.messages[max(self.messages)] if self.messages else None
+
+    def buttons(self) -> list[str]:
+        screen = self.screen() or {}
+        markup = screen.get('reply_markup') or {}
+        return [
+            button['callback_data']
+            for row in markup.get('inline_keyboard', [])
+            for button in row
+            if 'callback_data' in button
+        ]
+
+    def text(self) -> str:
+        screen = self.screen() or {}
+        return screen.get('text') or screen.get('caption') or ''
+
+
+class FakeTelegramServer:
+    def __init__(self, token: str = FAKE_TOKEN, flood_rate: float = 0.0, flood_burst: int = 3) -> None:
+        self.token = token
+        self.flood_rate = flood_rate
+        self.flood_burst = flood_burst
+        self.chats: dict[int, Chat] = {}
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.polls = 0
+        self._pending: list[dict[str, Any]] = []
+        self._arrived = asyncio.Event()
+        self._update_id = 0
+        self._message_id = 0
+        self._file_id = 0
+        self._buckets: dict[int, TokenBucket] = {}
+        self._server: tornado.httpserver.HTTPServer | None = None
+        self._closing = False
+        self.port = 0
+
+    # ── Lifecycle ────────────────────────────────────────────
+
+    def start(self, port: int = 0, listen: str = '127.0.0.1') -> int:
+        """Listen (port 0 = any free port) on the running loop. Returns the port."""
+        app = tornado.web.Application(
+            [(r"/(?:file/)?bot([^/]+)/(\w+)", _ApiHandler, {'server': self})],
+            log_function=lambda handler: None,
+        )
+        self._server = tornado.httpserver.HTTPServer(app)
+        [sock] = tornado.netutil.bind_sockets(port, address=listen)
+        self._server.add_sockets([sock])
+        self.port = sock.getsockname()[1]
+        return self.port
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def stop(self) -> None:
+        """Stop listening, release parked long polls and close open connections."""
+        self._closing = True
+        self._arrived.set()
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+    # ── User side ────────────────────────────────────────────
+
+    def chat(self, chat_id: int) -> Chat:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = Chat(chat_id)
+        return chat
+
+    def _push(self, update: dict[str, Any]) -> None:
+        self._pending.append(update)
+        self._arrived.set()
+
+    def send_text(self, user_id: int, text: str) -> None:
+        """The user types a message (or /command)."""
+        self._update_id += 1
+        self._push(make_update(self._update_id, user_id, text))
+
+    def tap(self, user_id: int, data: str) -> None:
+        """The user taps an inline button on their current screen."""
+        self._update_id += 1
+        screen = self.chat(user_id).screen()
+        update = make_callback_update(self._update_id, user_id, data, screen['message_id'] if screen else 1)
+        if screen:
+            update['callback_query']['message'] = screen
+        self._push(update)
+
+    # ── Bot side ─────────────────────────────────────────────
+
+    async def call(self, method: str, params: dict[str, Any]) -> Any:
+        self.calls[method] += 1
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            return True                           # setMyCommands & co.
+        if method in _RENDERING and self.flood_rate:
+            self._check_flood(params['chat_id'])
+        return await handler(params)
+
+    def _check_flood(self, chat_id: int) -> None:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.flood_rate, self.flood_burst)
+        wait = bucket.try_acquire()
+        if wait:
+            retry_after = max(1, math.ceil(wait))
+            raise ApiError(429, f"Too Many Requests: retry after {retry_after}", retry_after)
+
+    def _message(self, chat_id: int, **fields: Any) -> dict[str, Any]:
+        self._message_id += 1
+        message = {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f"user{chat_id}"},
+            'from': _BOT_USER,
+        }
+        message.update({k: v for k, v in fields.items() if v is not None})
+        self.chat(chat_id).render(message)
+        return message
+
+    def _existing(self, params: dict[str, Any]) -> dict[str, Any]:
+        message = self.chat(params['chat_id']).messages.get(params['message_id'])
+        if message is None:
+            raise ApiError(400, "Bad Request: message to edit not found")
+        return message
+
+    def _edit(self, params: dict[str, Any], **fields: Any) -> dict[str, Any]:
+        message = self._existing(params)
+        fields['reply_markup'] = params.get('reply_markup')
+        if all(message.get(k) == v for k, v in fields.items()):
+            raise ApiError(400, "Bad Request: message is not modified: specified new message content and "
+                                "reply markup are exactly the same as a current content and reply markup of the message")
+        edited = dict(message, edit_date=int(time.time()))
+        for k, v in fields.items():
+            if v is None:
+                edited.pop(k, None)
+            else:
+                edited[k] = v
+        self.chat(params['chat_id']).render(edited)
+        return edited
+
+    def _file(self, value: Any, kind: str) -> str:
+        if isinstance(value, str) and not value.startswith('attach://'):
+            return value                          # re-sent file_id
+        self._file_id += 1
+        return f"{kind}-{self._file_id}"
+
+    async def _api_getMe(self, params: dict) -> dict:
+        return dict(_BOT_USER, username='retain_test_bot', can_join_groups=False,
+                    can_read_all_group_messages=False, supports_inline_queries=False)
+
+    async def _api_getUpdates(self, params: dict) -> list[dict]:
+        self.polls += 1
+        offset = params.get('offset') or 0
+        self._pending = [u for u in self._pending if u['update_id'] >= offset]
+        if not self._pending and params.get('timeout') and not self._closing:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), params['timeout'])
+            except asyncio.TimeoutError:
+                pass
+        return self._pending[:params.get('limit') or 100]
+
+    async def _api_setWebhook(self, params: dict) -> bool:
+        return True
+
+    async def _api_deleteWebhook(self, params: dict) -> bool:
+        return True
+
+    async def _api_answerCallbackQuery(self, params: dict) -> bool:
+        return True
+
+    async def _api_sendMessage(self, params: dict) -> dict:
+        return self._message(params['chat_id'], text=params['text'], reply_markup=params.get('reply_markup'))
+
+    async def _api_sendPhoto(self, params: dict) -> dict:
+        file_id = self._file(params.get('photo'), 'photo')
+        photo = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 640, 'height': 480}]
+        return self._message(params['chat_id'], photo=photo, caption=params.get('caption'),
+                             reply_markup=params.get('reply_markup'))
+
+    async def _api_sendDocument(self, params: dict) -> dict:
+        file_id = self._file(params.get('document'), 'document')
+        document = {'file_id': file_id, 'file_unique_id': file_id, 'file_name': params.get('filename', 'file')}
+        return self._message(params['chat_id'], document=document, caption=params.get('caption'),
+                             reply_markup=params.get('reply_markup'))
+
+    async def _api_editMessageText(self, params: dict) -> dict:
+        return self._edit(params, text=params['text'])
+
+    async def _api_editMessageCaption(self, params: dict) -> dict:
+        return self._edit(params, caption=params.get('caption'))
+
+    async def _api_editMessageReplyMarkup(self, params: dict) -> dict:
+        return self._edit(params)
+
+    async def _api_deleteMessage(self, params: dict) -> bool:
+        messages = self.chat(params['chat_id']).messages
+        if messages.pop(params['message_id'], None) is None:
+            raise ApiError(400, "Bad Request: message to delete not found")
+        return True
+
+
+def _decode(name: str, raw: str) -> Any:
+    if name in _INT_PARAMS:
+        return int(raw)
+    if raw[:1] in '{[':
+        return json.loads(raw)                    # reply_markup, entities, ...
+    return raw
+
+
+class _ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, server: FakeTelegramServer) -> None:
+        self.server = server
+
+    def _params(self) -> dict[str, Any]:
+        params: dict[str, Any] = {}
+        if self.request.headers.get('Content-Type', '').startswith('application/json') and self.request.body:
+            params.update(json.loads(self.request.body))
+        for name, values in {**self.request.query_arguments, **self.request.body_arguments}.items():
+            params[name] = _decode(name, values[-1].decode())
+        for name, files in self.request.files.items():
+            params.setdefault(name, f"attach://{name}")
+            params.setdefault('filename', files[0].filename)
+        return params
+
+    async def _respond(self, token: str, method: str) -> None:
+        if token != self.server.token:
+            self.set_status(401)
+            self.finish({'ok': False, 'error_code': 401, 'description': 'Unauthorized'})
+            return
+        try:
+            result = await self.server.call(method, self._params())
+        except ApiError as e:
+            self.server.errors[f"{method}:{e.code}"] += 1
+            body: dict[str, Any] = {'ok': False, 'error_code': e.code, 'description': e.description}
+            if e.retry_after is not None:
+                body['parameters'] = {'retry_after': e.retry_after}
+            self.set_status(e.code)
+            self.finish(body)
+            return
+        self.finish({'ok': True, 'result': result})
+
+    async def post(self, token: str, method: str) -> None:
+        await self._respond(token, method)
+
+    async def get(self, token: str, method: str) -> None:
+        await self._respond(token, method)
@@ -0,0 +1,374 @@
+"""
+End-to-end load generator: simulated users against the real bot.
+
+Starts benchmarks.fake_server (a local Bot API over HTTP), seeds a throwaway
+database (benchmarks.datasets), runs the bot against both — `python bot.py`
+in a subprocess by default, or the same Application in this process with
+--in-process — and lets --users simulated users loose for --seconds. Each
+user starts with /start, then loops over scripted sessions picked by --mix:
+
+  review   Review → (All decks) → [Show answer → rate] × up to --cards-per-session
+  add      New Card → "front | back" → (deck) → Save
+  manage   My Decks → open a deck → (next page) → back to the menu
+
+reading the buttons off the bot's last message like a person would, pausing
+for an exponentially distributed --think-ms between taps. Step latency is the
+time from the update reaching getUpdates until the chat shows something to tap
+again, i.e. what the user waits for. The bot's outbound dispatcher and its
+per-chat rate limits are in the loop, exactly as in production.
+
+Prints JSON: per-step p50/p95/p99 in ms, error counts (no reply within
+--timeout, "Something went wrong" replies, Bot API 4xx) and per-method call
+counts.
+
+    python -m benchmarks.load --users 50 --seconds 60
+    python -m benchmarks.load --users 200 --think-ms 500 --mix review=1 --flood-rate 1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from typing import Any
+
+import database.database as db
+import utils.callbacks as cb
+from benchmarks.datasets import FIRST_USER_ID, Scale, seed
+from benchmarks.fake_api import FAKE_TOKEN
+from benchmarks.fake_server import FakeTelegramServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ERROR_REPLY = 'Something went wrong'
+RATINGS = (1, 2, 3, 4)
+RATING_WEIGHTS = (0.1, 0.15, 0.6, 0.15)
+
+_DECK = re.compile(cb.pattern(cb.DECK, r'\d+'))
+_DECK_OPEN = re.compile(cb.pattern(cb.DECK_OPEN, r'\d+'))
+_DECK_PAGE = re.compile(cb.pattern(cb.DECK_PAGE, r'\d+', r'\d+'))
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.sessions: Counter[str] = Counter()
+
+    def report(self) -> dict[str, Any]:
+        steps = {}
+        for name, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            steps[name] = {
+                'n': len(ordered),
+                'p50_ms': round(statistics.median(ordered) * 1000, 1),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 1),
+                'p99_ms': round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000, 1),
+                'max_ms': round(ordered[-1] * 1000, 1),
+            }
+        return {'steps': steps, 'errors': dict(self.errors), 'sessions': dict(self.sessions)}
+
+
+class SimulatedUser:
+    def __init__(
+        self,
+        server: FakeTelegramServer,
+        user_id: int,
+        recorder: Recorder,
+        rng: random.Random,
+        think: float,
+        timeout: float,
+        cards_per_session: int,
+    ) -> None:
+        self.server = server
+        self.user_id = user_id
+        self.chat = server.chat(user_id)
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think
+        self.timeout = timeout
+        self.cards_per_session = cards_per_session
+        self._cards = 0
+
+    # ── Primitives ───────────────────────────────────────────
+
+    async def pause(self) -> None:
+        if self.think:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think))
+
+    async def _step(self, name: str, send: Callable[[], None], actionable: bool) -> bool:
+        """Send, then wait for the reply. With actionable, wait through interim
+        button-less messages ("12 cards to review") until there is something to tap."""
+        seen = self.chat.renders
+        deadline = time.monotonic() + self.timeout
+        t0 = time.perf_counter()
+        send()
+        while True:
+            if not await self.chat.wait_render(seen, deadline - time.monotonic()):
+                self.recorder.errors[f"{name}:timeout"] += 1
+                return False
+            seen = self.chat.renders
+            if ERROR_REPLY in self.chat.text():
+                self.recorder.errors[f"{name}:error_reply"] += 1
+                return False
+            if not actionable or self.chat.buttons():
+                break
+        self.recorder.latencies[name].append(time.perf_counter() - t0)
+        return True
+
+    async def tap(self, name: str, data: str, actionable: bool = True) -> bool:
+        await self.pause()
+        return await self._step(name, lambda: self.server.tap(self.user_id, data), actionable)
+
+    async def say(self, name: str, text: str, actionable: bool = True) -> bool:
+        await self.pause()
+        return await self._step(name, lambda: self.server.send_text(self.user_id, text), actionable)
+
+    def buttons(self, pattern: re.Pattern | None = None) -> list[str]:
+        found = self.chat.buttons()
+        return [b for b in found if pattern.match(b)] if pattern else found
+
+    def button(self, prefix: str, *args: int) -> str | None:
+        """The on-screen button for prefix (+ leading args), plain or packed (utils.callbacks.pack)."""
+        for data in self.chat.buttons():
+            if data.startswith(cb.PACKED):
+                packed_prefix, packed_args, _ = cb.unpack(data)
+                if packed_prefix == prefix and packed_args[:len(args)] == list(args):
+                    return data
+            elif data == cb.make(prefix, *args):
+                return data
+        return None
+
+    async def home(self) -> bool:
+        if 'review' in self.buttons():
+            return True
+        if 'main_menu' in self.buttons():
+            return await self.tap('menu', 'main_menu')
+        return await self.say('start', '/start')
+
+    # ── Sessions ─────────────────────────────────────────────
+
+    async def review(self) -> None:
+        if not await self.tap('review.open', 'review'):
+            return
+        all_decks = self.button(cb.REVIEW_DECK_ALL)
+        if all_decks and not await self.tap('review.pick_deck', all_decks):
+            return
+        for _ in range(self.cards_per_session):
+            show = self.button(cb.SHOW_ANSWER)
+            if not show:
+                return                            # nothing due, or the session finished
+            if not await self.tap('review.show_answer', show):
+                return
+            rating = self.rng.choices(RATINGS, RATING_WEIGHTS)[0]
+            rate = self.button(cb.RATE, rating)
+            if not rate or not await self.tap('review.rate', rate):
+                return
+        if 'cancel_review' in self.buttons():
+            await self.tap('review.stop', 'cancel_review')
+
+    async def add(self) -> None:
+        if not await self.tap('add.open', 'add_card', actionable=False):
+            return
+        self._cards += 1
+        if not await self.say('add.content', f"load {self.user_id} {self._cards} | answer {self._cards}"):
+            return
+        decks = self.buttons(_DECK)
+        if decks and not await self.tap('add.deck', self.rng.choice(decks)):
+            return
+        if 'save_card' in self.buttons():
+            await self.tap('add.save', 'save_card')
+
+    async def manage(self) -> None:
+        if not await self.tap('manage.decks', 'my_decks'):
+            return
+        decks = self.buttons(_DECK_OPEN)
+        if not decks or not await self.tap('manage.open', self.rng.choice(decks)):
+            return
+        pages = self.buttons(_DECK_PAGE)
+        if pages:
+            await self.tap('manage.page', pages[-1])
+
+    async def run(self, mix: dict[str, float], until: float) -> None:
+        names, weights = list(mix), list(mix.values())
+        await self.say('start', '/start')
+        while time.monotonic() < until:
+            if not await self.home():
+                await asyncio.sleep(self.timeout)      # stuck: let the bot catch up
+                continue
+            session = self.rng.choices(names, weights)[0]
+            await getattr(self, session)()
+            self.recorder.sessions[session] += 1
+
+
+# ── Bot under test ───────────────────────────────────────────
+
+class SubprocessBot:
+    """`python bot.py` with its API, token and database pointed at the load setup."""
+
+    def __init__(self, api_url: str, db_path: str) -> None:
+        env = dict(
+            os.environ,
+            TELEGRAM_BOT_TOKEN=FAKE_TOKEN, TELEGRAM_API_URL=api_url, DB_PATH=db_path,
+            REMINDER_INTERVAL='0', WEBHOOK_URL='', SHARDS='1',
+        )
+        self.proc = subprocess.Popen([sys.executable, 'bot.py'], cwd=ROOT, env=env)
+
+    async def stop(self) -> None:
+        self.proc.send_signal(signal.SIGINT)       # run_polling shuts down cleanly on SIGINT
+        try:
+            await asyncio.to_thread(self.proc.wait, 30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+class InProcessBot:
+    """bot.build_application() polling the fake server from this event loop."""
+
+    def __init__(self, api_url: str, db_path: str) -> None:
+        import bot
+
+        self._bot = bot
+        self._saved = (bot.TG_BOT_TOKEN, bot.TELEGRAM_API_URL, bot.DB_PATH, bot.REMINDER_INTERVAL)
+        bot.TG_BOT_TOKEN, bot.TELEGRAM_API_URL, bot.DB_PATH, bot.REMINDER_INTERVAL = FAKE_TOKEN, api_url, db_path, 0
+        self.app = bot.build_application()
+
+    async def start(self) -> None:
+        await self.app.initialize()
+        await self.app.post_init(self.app)
+        await self.app.start()
+        await self.app.updater.start_polling(poll_interval=0, timeout=1)
+
+    async def stop(self) -> None:
+        await self.app.updater.stop()
+        await self.app.stop()
+        await self.app.post_shutdown(self.app)
+        await self.app.shutdown()
+        bot = self._bot
+        bot.TG_BOT_TOKEN, bot.TELEGRAM_API_URL, bot.DB_PATH, bot.REMINDER_INTERVAL = self._saved
+        from utils.telegram_helpers import set_dispatcher
+        set_dispatcher(None)
+
+
+async def _wait_polling(server: FakeTelegramServer, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not server.polls:
+        if time.monotonic() > deadline:
+            raise RuntimeError("bot never polled the fake Bot API")
+        await asyncio.sleep(0.05)
+
+
+async def run_load(
+    users: int = 20,
+    seconds: float = 30.0,
+    think: float = 1.0,
+    mix: dict[str, float] | None = None,
+    in_process: bool = False,
+    decks: int = 3,
+    cards: int = 100,
+    cards_per_session: int = 10,
+    timeout: float = 10.0,
+    flood_rate: float = 0.0,
+    seed_value: int = 1,
+) -> dict[str, Any]:
+    mix = mix or {'review': 6, 'add': 3, 'manage': 1}
+    server = FakeTelegramServer(flood_rate=flood_rate)
+    server.start()
+    recorder = Recorder()
+    saved = (db.DB_PATH, db.DB_SHARDS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'load.db')
+        db.DB_PATH, db.DB_SHARDS = db_path, 1
+        db.init_db()
+        seed(Scale('load', users, decks, cards), seed_value)
+        db.set_backend(None)                      # the bot opens the file itself
+
+        bot = InProcessBot(server.url, db_path) if in_process else SubprocessBot(server.url, db_path)
+        try:
+            if in_process:
+                await bot.start()
+            await _wait_polling(server, timeout=30)
+
+            rng = random.Random(seed_value)
+            until = time.monotonic() + seconds
+            simulated = [
+                SimulatedUser(server, FIRST_USER_ID + i, recorder, random.Random(rng.random()),
+                              think, timeout, cards_per_session)
+                for i in range(users)
+            ]
+            started = time.perf_counter()
+            await asyncio.gather(*(u.run(mix, until) for u in simulated))
+            elapsed = time.perf_counter() - started
+        finally:
+            await bot.stop()
+            await server.stop()
+            db.set_backend(None)
+            db.DB_PATH, db.DB_SHARDS = saved
+
+    report = recorder.report()
+    steps = sum(s['n'] for s in report['steps'].values())
+    return {
+        'meta': {
+            'users': users, 'seconds': round(elapsed, 1), 'think_ms': think * 1000, 'mix': mix,
+            'mode': 'in-process' if in_process else 'subprocess', 'flood_rate': flood_rate,
+            'dataset': {'decks': decks, 'cards': cards}, 'seed': seed_value,
+        },
+        'steps_per_s': round(steps / elapsed, 1) if elapsed else 0.0,
+        **report,
+        'api_errors': dict(server.errors),
+        'api_calls': dict(server.calls),
+    }
+
+
+def _parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('review', 'add', 'manage'):
+            raise argparse.ArgumentTypeError(f"unknown session {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent simulated users')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--think-ms', type=float, default=1000, help='mean pause between taps')
+    parser.add_argument('--mix', type=_parse_mix, default='review=6,add=3,manage=1')
+    parser.add_argument('--in-process', action='store_true', help='run the bot in this process')
+    parser.add_argument('--decks', type=int, default=3, help='seeded decks per user')
+    parser.add_argument('--cards', type=int, default=100, help='seeded cards per deck')
+    parser.add_argument('--cards-per-session', type=int, default=10)
+    parser.add_argument('--timeout', type=float, default=10, help='seconds to wait for a reply')
+    parser.add_argument('--flood-rate', type=float, default=0, help='per-chat msgs/s before 429 (0 = off)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    result = asyncio.run(run_load(
+        args.users, args.seconds, args.think_ms / 1000, args.mix, args.in_process, args.decks, args.cards,
+        args.cards_per_session, args.timeout, args.flood_rate, args.seed,
+    ))
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+"""
+Benchmark suite: database, scheduler, persistence and handler round trips.
+
+Seeds a throwaway database with a benchmarks.datasets scale, runs every
+registered benchmark (or the ones named with --only) and prints one JSON
+document — per benchmark the sample count and median / p95 / p99 / mean / min
+latency in microseconds plus ops per second, under metadata (git commit,
+Python, SQLite, scale, seed) — so two commits can be compared:
+
+    python -m benchmarks.suite --scale small --out base.json
+    git checkout feature && python -m benchmarks.suite --scale small --compare base.json
+
+--compare prints the median change per benchmark and exits 1 when any median
+got slower than --threshold (default 15%).
+
+Handler round trips run the real bot.py Application (build_application) against
+benchmarks.fake_api.FakeBotRequest, feeding updates to process_update. The
+outbound dispatcher is bypassed so the numbers are handler + database + PTB
+cost, not rate-limit waits. --rtt-ms adds a simulated network round trip to
+every Bot API call, which shows how many round trips a tap waits for in series.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from itertools import count
+from typing import Any
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler
+
+import database.database as db
+import utils.callbacks as cb
+from benchmarks.datasets import SCALES, Dataset, seed
+from benchmarks.fake_api import FAKE_TOKEN, FakeBotRequest, make_callback_update, make_update
+from database.persistence import SQLitePersistence
+from utils.router import DIGITS, CallbackRouter, Route, iter_routes
+from utils.srs import GOOD, schedule, schedule_all_ratings
+
+BenchFn = Callable[['Context', int], list[float]]
+
+BENCHMARKS: dict[str, BenchFn] = {}
+
+
+def benchmark(name: str) -> Callable[[BenchFn], BenchFn]:
+    """Register fn(ctx, n) -> n per-operation timings in seconds."""
+    def register(fn: BenchFn) -> BenchFn:
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Shared state for one run: the dataset, a seeded RNG and a lazily built bot."""
+
+    def __init__(self, dataset: Dataset, seed: int, rtt: float = 0.0) -> None:
+        self.dataset = dataset
+        self.rtt = rtt
+        self.rng = random.Random(seed)
+        self.loop = asyncio.new_event_loop()
+        self._users = count()
+        self._bot: BotHarness | None = None
+
+    def next_user(self) -> int:
+        users = self.dataset.user_ids
+        return users[next(self._users) % len(users)]
+
+    def bot(self) -> 'BotHarness':
+        if self._bot is None:
+            self._bot = BotHarness(self.loop, self.rtt)
+        return self._bot
+
+    def close(self) -> None:
+        if self._bot is not None:
+            self._bot.close()
+        self.loop.close()
+
+
+def _timed(op: Callable[[], Any], n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        op()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ── Database ─────────────────────────────────────────────────
+
+@benchmark('db.get_due_cards')
+def bench_due_cards(ctx: Context, n: int) -> list[float]:
+    return _timed(lambda: db.get_due_cards(ctx.next_user()), n)
+
+
+@benchmark('db.get_due_cards[deck]')
+def bench_due_cards_deck(ctx: Context, n: int) -> list[float]:
+    def op() -> None:
+        user_id = ctx.next_user()
+        db.get_due_cards(user_id, ctx.rng.choice(ctx.dataset.decks[user_id]))
+    return _timed(op, n)
+
+
+@benchmark('db.get_decks_with_stats')
+def bench_decks_with_stats(ctx: Context, n: int) -> list[float]:
+    return _timed(lambda: db.get_decks_with_stats(ctx.next_user()), n)
+
+
+@benchmark('db.get_card_stats')
+def bench_card_stats(ctx: Context, n: int) -> list[float]:
+    return _timed(lambda: db.get_card_stats(ctx.next_user()), n)
+
+
+@benchmark('db.get_forecast')
+def bench_forecast(ctx: Context, n: int) -> list[float]:
+    return _timed(lambda: db.get_forecast(ctx.next_user()), n)
+
+
+@benchmark('db.update_card_srs')
+def bench_update_card_srs(ctx: Context, n: int) -> list[float]:
+    user_id = ctx.next_user()
+    cards = db.get_due_cards(user_id)
+    samples = []
+    for i in range(n):
+        card = cards[i % len(cards)]
+        r = schedule(card, GOOD)
+        t0 = time.perf_counter()
+        db.update_card_srs(
+            card['card_id'], r['due_date'], r['stability'], r['difficulty'], r['reps'], r['lapses'],
+            r['state'], r['scheduled_days'], user_id=user_id,
+        )
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ── Scheduler ────────────────────────────────────────────────
+
+@benchmark('srs.schedule_all_ratings')
+def bench_schedule_all_ratings(ctx: Context, n: int) -> list[float]:
+    cards = db.get_due_cards(ctx.next_user())
+    it = iter(range(n))
+    return _timed(lambda: schedule_all_ratings(cards[next(it) % len(cards)]), n)
+
+
+# ── Persistence ──────────────────────────────────────────────
+
+def _session_user_data(ctx: Context, user_id: int) -> dict:
+    """user_data as it looks mid-review: the due queue is the bulk of it."""
+    cards = db.get_due_cards(user_id)[:50]
+    return {
+        'default_deck_id': ctx.dataset.decks[user_id][0], 'default_card_type': 'basic',
+        'review_cards': cards, 'review_index': 3, 'review_correct': 2, 'review_total': len(cards),
+    }
+
+
+@benchmark('persistence.update_user_data')
+def bench_update_user_data(ctx: Context, n: int) -> list[float]:
+    persistence = SQLitePersistence(db.DB_PATH)
+    data = {uid: _session_user_data(ctx, uid) for uid in ctx.dataset.user_ids}
+
+    def op() -> None:
+        user_id = ctx.next_user()
+        ctx.loop.run_until_complete(persistence.update_user_data(user_id, data[user_id]))
+    return _timed(op, n)
+
+
+@benchmark('persistence.update_conversation')
+def bench_update_conversation(ctx: Context, n: int) -> list[float]:
+    persistence = SQLitePersistence(db.DB_PATH)
+    states = [1, 2, None]
+
+    def op() -> None:
+        user_id = ctx.next_user()
+        state = ctx.rng.choice(states)
+        ctx.loop.run_until_complete(persistence.update_conversation('review', (user_id, user_id), state))
+    return _timed(op, n)
+
+
+# ── Handler round trips ──────────────────────────────────────
+
+class BotHarness:
+    """The real Application from bot.build_application, on the fake Bot API."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, rtt: float = 0.0) -> None:
+        import bot
+        from utils.telegram_helpers import set_dispatcher
+
+        self._bot_module = bot
+        self._saved = (bot.TG_BOT_TOKEN, bot.DB_PATH)
+        bot.TG_BOT_TOKEN = FAKE_TOKEN
+        bot.DB_PATH = db.DB_PATH
+        self.loop = loop
+        self.request = FakeBotRequest(rtt=rtt)
+        self.app = bot.build_application(request=self.request)
+        set_dispatcher(None)
+        self._update_ids = count(1)
+        loop.run_until_complete(self.app.initialize())
+
+    def _process(self, payload: dict) -> None:
+        self.loop.run_until_complete(self.app.process_update(Update.de_json(payload, self.app.bot)))
+
+    def tap(self, user_id: int, data: str) -> None:
+        self._process(make_callback_update(next(self._update_ids), user_id, data))
+
+    def say(self, user_id: int, text: str) -> None:
+        self._process(make_update(next(self._update_ids), user_id, text))
+
+    def user_data(self, user_id: int) -> dict:
+        return self.app.user_data[user_id]
+
+    def close(self) -> None:
+        from utils.telegram_helpers import set_dispatcher
+
+        self.loop.run_until_complete(self.app.shutdown())
+        set_dispatcher(None)
+        self._bot_module.TG_BOT_TOKEN, self._bot_module.DB_PATH = self._saved
+
+
+def _start_review(harness: BotHarness, user_id: int) -> None:
+    harness.tap(user_id, 'review')
+    harness.tap(user_id, 'review_deck_all')   # deck picker; ignored when there is only one deck
+
+
+@benchmark('handler.review_start')
+def bench_review_start(ctx: Context, n: int) -> list[float]:
+    harness = ctx.bot()
+    samples = []
+    for _ in range(n):
+        user_id = ctx.next_user()
+        t0 = time.perf_counter()
+        _start_review(harness, user_id)
+        samples.append(time.perf_counter() - t0)
+        harness.tap(user_id, 'cancel_review')
+    return samples
+
+
+@benchmark('handler.review_card')
+def bench_review_card(ctx: Context, n: int) -> list[float]:
+    """Show answer + rate Good: the two taps behind every reviewed card."""
+    harness = ctx.bot()
+    user_id = ctx.next_user()
+    samples = []
+    for _ in range(n):
+        if 'review_cards' not in harness.user_data(user_id):
+            user_id = ctx.next_user()           # session over: move on to the next user's queue
+            _start_review(harness, user_id)
+        t0 = time.perf_counter()
+        harness.tap(user_id, 'show_answer')
+        harness.tap(user_id, cb.make(cb.RATE, GOOD))
+        samples.append(time.perf_counter() - t0)
+    harness.tap(user_id, 'cancel_review')
+    return samples
+
+
+@benchmark('handler.add_card')
+def bench_add_card(ctx: Context, n: int) -> list[float]:
+    """Add card → send "front | back" → Save, for a user with a default deck."""
+    harness = ctx.bot()
+    samples = []
+    for i in range(n):
+        user_id = ctx.next_user()
+        user_data = harness.user_data(user_id)
+        if not user_data.get('default_deck_id'):
+            user_data['default_deck_id'] = ctx.dataset.decks[user_id][0]
+            user_data['default_card_type'] = 'basic'
+        t0 = time.perf_counter()
+        harness.tap(user_id, 'add_card')
+        harness.say(user_id, f"bench front {i} | bench back {i}")
+        harness.tap(user_id, 'save_card')
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ── Callback dispatch ────────────────────────────────────────
+
+def _bot_routes(ctx: Context, scale: int) -> list[Route]:
+    """Every distinct route bot.py registers; scale > 1 adds scale - 1 look-alike routes per route."""
+    routes: dict[str, Route] = {}
+    for route in iter_routes(ctx.bot().app.handlers[0]):
+        routes.setdefault(route.prefix, route)
+        for k in range(1, scale):
+            variant = f"{route.prefix}{k}"
+            routes.setdefault(variant, Route(variant, route.callback, *route.args))
+    return list(routes.values())
+
+
+def _callback_updates(ctx: Context, routes: list[Route], size: int = 256) -> list[Update]:
+    real = [r for r in routes if not r.prefix[-1].isdigit()]
+    updates = []
+    for i in range(size):
+        route = ctx.rng.choice(real)
+        args = [ctx.rng.randint(1, 99999) if a is DIGITS else ctx.rng.choice(sorted(a.values)) for a in route.args]
+        updates.append(Update.de_json(make_callback_update(i, 1, cb.make(route.prefix, *args)), None))
+    return updates
+
+
+def _bench_dispatch(ctx: Context, n: int, scale: int, trie: bool) -> list[float]:
+    """Find the handler for a tap: one router lookup, or the old regex handler scan."""
+    routes = _bot_routes(ctx, scale)
+    updates = _callback_updates(ctx, routes)
+    if trie:
+        router = CallbackRouter(routes)
+        check = router.check_update
+    else:
+        handlers = [CallbackQueryHandler(r.callback, pattern=r.pattern()) for r in routes]
+
+        def check(update: Update) -> Any:
+            for handler in handlers:
+                result = handler.check_update(update)
+                if result is not None and result is not False:
+                    return result
+            return None
+
+    it = iter(range(n))
+    return _timed(lambda: check(updates[next(it) % len(updates)]), n)
+
+
+@benchmark('dispatch.router')
+def bench_dispatch_router(ctx: Context, n: int) -> list[float]:
+    return _bench_dispatch(ctx, n, 1, trie=True)
+
+
+@benchmark('dispatch.router[10x]')
+def bench_dispatch_router_10x(ctx: Context, n: int) -> list[float]:
+    return _bench_dispatch(ctx, n, 10, trie=True)
+
+
+@benchmark('dispatch.regex')
+def bench_dispatch_regex(ctx: Context, n: int) -> list[float]:
+    return _bench_dispatch(ctx, n, 1, trie=False)
+
+
+@benchmark('dispatch.regex[10x]')
+def bench_dispatch_regex_10x(ctx: Context, n: int) -> list[float]:
+    return _bench_dispatch(ctx, n, 10, trie=False)
+
+
+# ── Runner ───────────────────────────────────────────────────
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    us = 1e6
+
+    def pct(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    mean = statistics.fmean(ordered)
+    return {
+        'n': len(ordered),
+        'median_us': round(statistics.median(ordered) * us, 1),
+        'p95_us': round(pct(0.95) * us, 1),
+        'p99_us': round(pct(0.99) * us, 1),
+        'mean_us': round(mean * us, 1),
+        'min_us': round(ordered[0] * us, 1),
+        'ops_per_s': round(1 / mean, 1) if mean else 0.0,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale: str = 'small', seed_value: int = 1, n: int = 200, warmup: int = 20,
+        only: list[str] | None = None, rtt: float = 0.0) -> dict[str, Any]:
+    """Seed a fresh database at `scale` and run the selected benchmarks."""
+    names = [name for name in BENCHMARKS if not only or any(name.startswith(o) for o in only)]
+    saved = (db.DB_PATH, db.DB_SHARDS)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        db.DB_SHARDS = 1
+        db.init_db()
+        t0 = time.perf_counter()
+        dataset = seed(scale, seed_value)
+        seeded = time.perf_counter() - t0
+
+        ctx = Context(dataset, seed_value, rtt)
+        results = {}
+        try:
+            for name in names:
+                BENCHMARKS[name](ctx, warmup)
+                results[name] = summarize(BENCHMARKS[name](ctx, n))
+        finally:
+            ctx.close()
+            db.set_backend(None)
+            db.DB_PATH, db.DB_SHARDS = saved
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'scale': vars(dataset.scale) | {'total_cards': dataset.scale.total_cards},
+            'seed': seed_value,
+            'n': n,
+            'rtt_ms': rtt * 1000,
+            'seed_seconds': round(seeded, 2),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Median change per shared benchmark; returns the names that regressed past threshold."""
+    regressed = []
+    print(f"{'benchmark':<36} {'base us':>10} {'now us':>10} {'change':>8}", file=sys.stderr)
+    for name, now in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        change = now['median_us'] / base['median_us'] - 1 if base['median_us'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36} {base['median_us']:>10.1f} {now['median_us']:>10.1f} {change:>+8.1%}{flag}",
+              file=sys.stderr)
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-n', type=int, default=200, help='timed operations per benchmark')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='+', help='benchmark name prefixes, e.g. db. handler.')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='simulated Bot API round trip for handler.*')
+    parser.add_argument('--out', help='write the JSON here instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    parser.add_argument('--list', action='store_true', help='list benchmark names and exit')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)  # before bot.py's INFO config: keep per-update logs out
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return
+
+    result = run(args.scale, args.seed, args.n, args.warmup, args.only, args.rtt_ms / 1000)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,32 @@
+import asyncio
 import logging
+import secrets
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
-from telegram import Update
+from telegram import Bot, Update
 from telegram.error import BadRequest, Forbidden, TimedOut, NetworkError
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     MessageHandler,
     ConversationHandler,
-    CallbackQueryHandler,
     ContextTypes,
     filters,
 )
+from telegram.request import BaseRequest
 
-from config import TG_BOT_TOKEN, PROXY_URL, DB_PATH
-from database.database import init_db
-from database.persistence import SQLitePersistence
+from config import (
+    TG_BOT_TOKEN, PROXY_URL, TELEGRAM_API_URL, DB_PATH, DATABASE_URL, REMINDER_INTERVAL, UNBURY_INTERVAL, MAX_CONCURRENT_UPDATES, SHARDS,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS,
+    METRICS_PORT, METRICS_LISTEN, DUE_NOTICE_INTERVAL,
+)
+from database.database import get_backend, get_profiler, init_db
+from database.persistence import DatabasePersistence, SQLitePersistence
 import handlers.cards as hand_card
 import handlers.start as hand_start
 import handlers.flow_handlers as hand_flow
@@ -29,24 +36,83 @@ import handlers.stats as hand_stats
 import handlers.decks_menu as hand_decks_menu
 import handlers.help as hand_help
 import handlers.manage as hand_manage
+import handlers.export as hand_export
+import handlers.reminders as hand_reminders
+import handlers.admin as hand_admin
 import utils.callbacks as cb
+from utils.dispatcher import OutboundDispatcher
+from utils.metrics import METRICS, instrument_application, serve_metrics
+from utils.rate_limit import GLOBAL_RATE, GLOBAL_BURST
+from utils.router import DIGITS, CallbackRouter, OneOf, Route
+from utils.render import RENDERED
+from utils.sharding import ShardPool, serve_front
+from utils.telegram_helpers import set_dispatcher
+from utils.update_processor import PerUserUpdateProcessor
 from utils.constants import AddCardState, ReviewState, ManageState
 
 
-def main() -> None:
-    logging.info("Running main")
-
-    persistence = SQLitePersistence(DB_PATH)
-
-    builder = ApplicationBuilder().token(TG_BOT_TOKEN).persistence(persistence)
-    if PROXY_URL:
+def build_application(shard: tuple[int, int] | None = None, request: BaseRequest | None = None) -> Application:
+    """Build the Application with persistence, handlers and jobs registered.
+
+    shard=(index, count) builds one worker of a sharded deployment: no Updater
+    (the front receiver feeds it), only its users' persisted data, and a 1/count
+    share of the global send rate.
+
+    request replaces the HTTP transport for every Bot API call (benchmarks and
+    tests pass benchmarks.fake_api.FakeBotRequest).
+    """
+    if DATABASE_URL:
+        persistence = DatabasePersistence(get_backend(), shard=shard)
+    else:
+        persistence = SQLitePersistence(DB_PATH, shard=shard)
+
+    # All outbound API calls from utils.telegram_helpers go through one dispatcher
+    shards = shard[1] if shard else 1
+    dispatcher = OutboundDispatcher(global_rate=GLOBAL_RATE / shards, global_burst=max(1, GLOBAL_BURST // shards))
+    set_dispatcher(dispatcher)
+
+    METRICS.register_gauges('dispatcher', dispatcher.metrics.snapshot)
+    METRICS.register_gauges('render', RENDERED.snapshot)
+    metrics_server = None
+
+    async def on_start(_app) -> None:
+        nonlocal metrics_server
+        await dispatcher.start()
+        if METRICS_PORT:
+            metrics_server = serve_metrics(METRICS_PORT + (shard[0] + 1 if shard else 0), METRICS_LISTEN)
+
+    async def on_shutdown(_app) -> None:
+        await dispatcher.stop()
+        logging.info(f"Outbound dispatcher stopped: {dispatcher.metrics.snapshot()}")
+        if metrics_server:
+            metrics_server.shutdown()
+        profiler = get_profiler()
+        if profiler:
+            logging.info(profiler.report())
+
+    builder = (
+        ApplicationBuilder()
+        .token(TG_BOT_TOKEN)
+        .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(on_start)
+        .post_shutdown(on_shutdown)
+    )
+    if TELEGRAM_API_URL:
+        api = TELEGRAM_API_URL.rstrip('/')
+        builder = builder.base_url(f"{api}/bot").base_file_url(f"{api}/file/bot")
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    elif PROXY_URL:
         builder = builder.proxy(PROXY_URL).get_updates_proxy(PROXY_URL)
+    if shard:
+        builder = builder.updater(None)
     application = builder.build()
 
     # Add Card conversation
     add_card_handler = ConversationHandler(
         entry_points=[
-            CallbackQueryHandler(hand_card.add_card_entry, pattern='^add_card$')
+            CallbackRouter([Route('add_card', hand_card.add_card_entry)])
         ],
         name='add_card',
         persistent=True,
@@ -54,17 +120,21 @@ def main() -> None:
 
         states={
             AddCardState.AWAITING_CONTENT: [
-                CallbackQueryHandler(hand_flow.menu_exit, pattern='^main_menu$'),
-                CallbackQueryHandler(hand_card.change_settings, pattern='^change_settings$'),
+                CallbackRouter([
+                    Route('main_menu', hand_flow.menu_exit),
+                    Route('change_settings', hand_card.change_settings),
+                ]),
                 MessageHandler(filters.PHOTO, hand_flow.get_content),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, hand_flow.get_content),
             ],
 
             AddCardState.AWAITING_DECK: [
-                CallbackQueryHandler(hand_deck.selected_deck, pattern=cb.pattern(cb.DECK, r'\d+')),
-                CallbackQueryHandler(hand_deck.create_new_deck, pattern='^new_deck$'),
-                CallbackQueryHandler(hand_flow.back_to_content, pattern='^back$'),
-                CallbackQueryHandler(hand_flow.cancel, pattern='^cancel$'),
+                CallbackRouter([
+                    Route(cb.DECK, hand_deck.selected_deck, DIGITS),
+                    Route('new_deck', hand_deck.create_new_deck),
+                    Route('back', hand_flow.back_to_content),
+                    Route('cancel', hand_flow.cancel),
+                ]),
             ],
 
             AddCardState.CREATING_DECK: [
@@ -72,14 +142,16 @@ def main() -> None:
             ],
 
             AddCardState.CONFIRMATION_PREVIEW: [
-                CallbackQueryHandler(hand_card.save_card, pattern='^save_card$'),
-                CallbackQueryHandler(hand_card.edit_card, pattern='^edit_card$'),
-                CallbackQueryHandler(hand_card.change_settings, pattern='^change_settings$'),
-                CallbackQueryHandler(hand_card.change_type_entry, pattern='^change_type$'),
-                CallbackQueryHandler(hand_card.set_card_type, pattern=cb.pattern(cb.SET_TYPE, r'(basic|reverse)')),
-                CallbackQueryHandler(hand_card.type_back, pattern='^type_back$'),
-                CallbackQueryHandler(hand_flow.back_to_content, pattern='^back$'),
-                CallbackQueryHandler(hand_flow.cancel, pattern='^cancel$'),
+                CallbackRouter([
+                    Route('save_card', hand_card.save_card),
+                    Route('edit_card', hand_card.edit_card),
+                    Route('change_settings', hand_card.change_settings),
+                    Route('change_type', hand_card.change_type_entry),
+                    Route(cb.SET_TYPE, hand_card.set_card_type, OneOf('basic', 'reverse', 'cloze')),
+                    Route('type_back', hand_card.type_back),
+                    Route('back', hand_flow.back_to_content),
+                    Route('cancel', hand_flow.cancel),
+                ]),
             ]
         },
 
@@ -89,7 +161,7 @@ def main() -> None:
     # Review conversation
     review_handler = ConversationHandler(
         entry_points=[
-            CallbackQueryHandler(hand_review.review_entry, pattern='^review$')
+            CallbackRouter([Route('review', hand_review.review_entry)])
         ],
         name='review',
         persistent=True,
@@ -97,19 +169,27 @@ def main() -> None:
 
         states={
             ReviewState.DECK_PICKER: [
-                CallbackQueryHandler(hand_review.review_deck_selected, pattern=cb.pattern(cb.REVIEW_DECK, r'\d+')),
-                CallbackQueryHandler(hand_review.review_all_decks, pattern='^review_deck_all$'),
+                CallbackRouter([
+                    Route(cb.REVIEW_DECK, hand_review.review_deck_selected, DIGITS, session='review'),
+                    Route(cb.REVIEW_DECK_ALL, hand_review.review_all_decks, session='review'),
+                ]),
             ],
 
             ReviewState.SHOWING_FRONT: [
-                CallbackQueryHandler(hand_review.show_answer, pattern='^show_answer$'),
-                CallbackQueryHandler(hand_review.cancel_review, pattern='^cancel_review$'),
+                CallbackRouter([
+                    Route(cb.SHOW_ANSWER, hand_review.show_answer, session='review'),
+                    Route('cancel_review', hand_review.cancel_review),
+                ]),
             ],
 
             ReviewState.RATING: [
-                CallbackQueryHandler(hand_review.rate_card, pattern=cb.pattern(cb.RATE, r'\d')),
-                CallbackQueryHandler(hand_review.cancel_review, pattern='^cancel_review$'),
-                CallbackQueryHandler(hand_review.edit_card_in_review, pattern=cb.pattern(cb.EDIT_REVIEW, r'\d+')),
+                CallbackRouter([
+                    Route(cb.RATE, hand_review.rate_card, DIGITS, session='review'),
+                    Route('cancel_review', hand_review.cancel_review),
+                    Route(cb.EDIT_REVIEW, hand_review.edit_card_in_review, DIGITS, session='review'),
+                    Route(cb.SUSPEND_REVIEW, hand_review.suspend_in_review, DIGITS, session='review'),
+                    Route(cb.BURY_REVIEW, hand_review.bury_in_review, DIGITS, session='review'),
+                ]),
             ],
 
             ReviewState.EDITING_CARD: [
@@ -117,8 +197,10 @@ def main() -> None:
             ],
 
             ReviewState.EDITING_CARD_PREVIEW: [
-                CallbackQueryHandler(hand_review.save_review_edit, pattern='^save_review_edit$'),
-                CallbackQueryHandler(hand_review.cancel_review_edit, pattern='^cancel_review_edit$'),
+                CallbackRouter([
+                    Route('save_review_edit', hand_review.save_review_edit),
+                    Route('cancel_review_edit', hand_review.cancel_review_edit),
+                ]),
             ],
         },
 
@@ -134,6 +216,8 @@ def main() -> None:
     application.add_handler(hand_manage.rename_deck_handler)
     application.add_handler(hand_manage.pick_edit_handler)
     application.add_handler(hand_manage.pick_delete_handler)
+    application.add_handler(hand_manage.pick_suspend_handler)
+    application.add_handler(hand_manage.preset_handler)
 
     # Slash commands
     application.add_handler(CommandHandler('clear', hand_start.clear_command))
@@ -141,25 +225,139 @@ def main() -> None:
     application.add_handler(CommandHandler('stats', hand_stats.stats_command))
     application.add_handler(CommandHandler('decks', hand_decks_menu.decks_command))
     application.add_handler(CommandHandler('help', hand_help.help_command))
+    application.add_handler(CommandHandler('export', hand_export.export_command))
+    application.add_handler(CommandHandler('reminders', hand_reminders.reminders_command))
+    application.add_handler(CommandHandler('admin_stats', hand_admin.admin_stats_command))
+    application.add_handler(MessageHandler(filters.Document.ALL, hand_export.import_document))
+
+    # Standalone callback buttons — one router for all of them
+    application.add_handler(CallbackRouter([
+        Route('main_menu', hand_start.main_menu),
+        Route('stats', hand_stats.stats_entry),
+        Route('leeches', hand_stats.leeches_entry),
+        Route('help', hand_help.help_entry),
+
+        # My Decks
+        Route('my_decks', hand_decks_menu.my_decks_entry),
+        Route(cb.DECKS_PAGE, hand_decks_menu.decks_page, DIGITS),
+
+        # Manage: deck detail & card actions
+        Route(cb.DECK_OPEN, hand_manage.deck_open, DIGITS),
+        Route(cb.DECK_PAGE, hand_manage.deck_cards_page, DIGITS, DIGITS),
+        Route(cb.CARD_DELETE_YES, hand_manage.card_delete_yes, DIGITS, session='manage'),
+        Route(cb.DECK_DELETE, hand_manage.deck_delete_confirm, DIGITS),
+        Route(cb.DECK_DELETE_YES, hand_manage.deck_delete_yes, DIGITS),
+        Route(cb.DECK_EXPORT, hand_export.deck_export, DIGITS),
+    ]))
+
+    application.add_error_handler(error_handler)
 
-    # Standalone callback handlers
-    application.add_handler(CallbackQueryHandler(hand_start.main_menu, pattern='^main_menu$'))
-    application.add_handler(CallbackQueryHandler(hand_stats.stats_entry, pattern='^stats$'))
-    application.add_handler(CallbackQueryHandler(hand_help.help_entry, pattern='^help$'))
+    # Latency histograms for every handler callback (utils.metrics)
+    instrument_application(application)
+
+    # Due-card reminders
+    if REMINDER_INTERVAL > 0:
+        application.job_queue.run_repeating(
+            hand_reminders.reminder_job,
+            interval=REMINDER_INTERVAL,
+            first=60,
+            name='due_reminders',
+            data=shard,
+        )
+
+    # Due notices for cards in learning (utils/timer_wheel.py): rebuilt from the
+    # database once, then advanced every DUE_NOTICE_INTERVAL seconds
+    if DUE_NOTICE_INTERVAL > 0:
+        application.job_queue.run_once(hand_reminders.load_due_timers_job, when=0, name='load_due_timers', data=shard)
+        application.job_queue.run_repeating(
+            hand_reminders.due_notice_job,
+            interval=DUE_NOTICE_INTERVAL,
+            first=DUE_NOTICE_INTERVAL,
+            name='due_notices',
+        )
+
+    # Buried cards back in review after their user's day ends. One UPDATE covers
+    # every user, so only the first shard runs it
+    if UNBURY_INTERVAL > 0 and (shard is None or shard[0] == 0):
+        application.job_queue.run_repeating(
+            hand_review.unbury_job,
+            interval=UNBURY_INTERVAL,
+            first=30,
+            name='unbury_cards',
+        )
+
+    return application
+
+
+def build_shard(index: int, count: int) -> Application:
+    """ShardPool app factory (module-level so worker processes can import it)."""
+    return build_application(shard=(index, count))
+
+
+_generated_secret: str | None = None
+
+
+def webhook_secret() -> str:
+    """WEBHOOK_SECRET, or a random one for this run — a webhook never runs without one.
+
+    Telegram gets it through set_webhook on every start, so a generated secret
+    only has to last as long as the process.
+    """
+    global _generated_secret
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    if _generated_secret is None:
+        logging.warning("WEBHOOK_SECRET not set — using a random secret for this run")
+        _generated_secret = secrets.token_urlsafe(32)
+    return _generated_secret
+
+
+def webhook_kwargs() -> dict:
+    """Arguments for Application.run_webhook, from config."""
+    path = WEBHOOK_PATH.strip('/')
+    return {
+        'listen': WEBHOOK_LISTEN,
+        'port': WEBHOOK_PORT,
+        'url_path': path,
+        'webhook_url': f"{WEBHOOK_URL.rstrip('/')}/{path}",
+        'secret_token': webhook_secret(),
+        'max_connections': WEBHOOK_MAX_CONNECTIONS,
+    }
+
+
+async def run_sharded() -> None:
+    """Front receiver in this process, SHARDS worker processes behind it."""
+    kwargs = webhook_kwargs()
+    pool = ShardPool(SHARDS, build_shard)
+    pool.start()
+    try:
+        async with Bot(TG_BOT_TOKEN) as tg:
+            await tg.set_webhook(
+                kwargs['webhook_url'],
+                secret_token=kwargs['secret_token'],
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        await serve_front(pool.inboxes, WEBHOOK_LISTEN, WEBHOOK_PORT, kwargs['url_path'], kwargs['secret_token'])
+    finally:
+        pool.stop()
 
-    # My Decks
-    application.add_handler(CallbackQueryHandler(hand_decks_menu.my_decks_entry, pattern='^my_decks$'))
-    application.add_handler(CallbackQueryHandler(hand_decks_menu.decks_page, pattern=cb.pattern(cb.DECKS_PAGE, r'\d+')))
 
-    # Manage: deck detail & card actions
-    application.add_handler(CallbackQueryHandler(hand_manage.deck_open, pattern=cb.pattern(cb.DECK_OPEN, r'\d+')))
-    application.add_handler(CallbackQueryHandler(hand_manage.deck_cards_page, pattern=cb.pattern(cb.DECK_PAGE, r'\d+', r'\d+')))
-    application.add_handler(CallbackQueryHandler(hand_manage.card_delete_yes, pattern=cb.pattern(cb.CARD_DELETE_YES, r'\d+')))
-    application.add_handler(CallbackQueryHandler(hand_manage.deck_delete_confirm, pattern=cb.pattern(cb.DECK_DELETE, r'\d+')))
-    application.add_handler(CallbackQueryHandler(hand_manage.deck_delete_yes, pattern=cb.pattern(cb.DECK_DELETE_YES, r'\d+')))
+def main() -> None:
+    logging.info("Running main")
+    if SHARDS > 1:
+        if not WEBHOOK_URL:
+            raise SystemExit("SHARDS > 1 needs WEBHOOK_URL — the front receiver is a webhook")
+        logging.info(f"Sharded mode: {SHARDS} workers")
+        asyncio.run(run_sharded())
+        return
 
-    application.add_error_handler(error_handler)
-    application.run_polling()
+    application = build_application()
+
+    if WEBHOOK_URL:
+        logging.info(f"Webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}")
+        application.run_webhook(**webhook_kwargs())
+    else:
+        application.run_polling()
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
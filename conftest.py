@@ -17,3 +17,39 @@ def tdb(tmp_path, monkeypatch):
     monkeypatch.setattr(_db, 'DB_PATH', db_path)
     db.init_db()
     return db_path
+
+
+@pytest.fixture(autouse=True)
+def _fresh_render_record():
+    """Message ids restart with every fake bot, so don't let recorded screens leak between tests."""
+    from utils.render import RENDERED
+    RENDERED.clear()
+    yield
+    RENDERED.clear()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_due_load():
+    """Every test starts a new database, so cached due histograms must not outlive it."""
+    from utils.due_load import DUE_LOAD
+    DUE_LOAD.clear()
+    yield
+    DUE_LOAD.clear()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_presets():
+    """Deck ids restart with every database, so cached presets must not outlive it."""
+    from utils.presets import PRESETS
+    PRESETS.clear()
+    yield
+    PRESETS.clear()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_due_timers():
+    """Card ids restart with every database, so pending due-notice timers must not outlive it."""
+    from utils.timer_wheel import DUE_TIMERS
+    DUE_TIMERS.clear()
+    yield
+    DUE_TIMERS.clear()
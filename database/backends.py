@@ -0,0 +1,482 @@
+"""
+Storage backends for the card store and PTB persistence.
+
+database/database.py is the repository the handlers talk to; it writes one set
+of portable SQL (qmark `?` placeholders, timestamps bound from Python as
+'YYYY-MM-DD HH:MM:SS' UTC text, no SQLite-only functions) and gets connections
+from a Backend:
+
+  SQLiteBackend   — the default: one file, or DB_SHARDS files routed by user id.
+  PostgresBackend — a server database (DATABASE_URL) behind a bounded
+                    connection pool; no single-writer limit, so no sharding.
+
+A backend hands out connections in a transaction (commit on success, rollback
+on error), runs a function once per physical database (fan_out) and creates or
+upgrades the schema (migrate).
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from database.schema import (
+    user_schema, deck_schema, note_schema, card_schema, preset_schema, indexes_schema, added_columns, legacy_card_columns, pg_schema,
+)
+from utils.sharding import shard_for, shard_key
+from utils.templates import FORWARD, REVERSE
+
+T = TypeVar('T')
+
+# A DB-API connection: sqlite3.Connection, or _PgConnection below
+Connection = Any
+
+
+class Backend(ABC):
+    """Where the card store lives. A subclass missing a method fails when it is created."""
+
+    dialect = ''
+
+    @abstractmethod
+    def connect(self, user_id: int | None = None) -> AbstractContextManager[Connection]:
+        """Connection to the database holding user_id's data, in a transaction."""
+
+    @abstractmethod
+    def fan_out(self, fn: Callable[[Connection], T]) -> list[T]:
+        """Run fn once per physical database, each in its own transaction."""
+
+    def group_users(self, user_ids: list[int]) -> list[list[int]]:
+        """Split user_ids into groups that share one database."""
+        return [list(user_ids)] if user_ids else []
+
+    @abstractmethod
+    def migrate(self) -> None:
+        """Create the schema, or upgrade an older one in place."""
+
+    def close(self) -> None:
+        pass
+
+
+# ── SQLite ───────────────────────────────────────────────────
+#
+# With shards > 1 users are spread over that many files by user_id hash (same
+# hash as utils.sharding, so with SHARDS == DB_SHARDS every worker process
+# touches exactly one file). A heavy write transaction then only blocks the
+# users sharing its file. deck_id / card_id are unique per file only; every
+# lookup is already scoped by user_id, which picks the file.
+
+class SQLiteBackend(Backend):
+    dialect = 'sqlite'
+
+    def __init__(self, path: str, shards: int = 1) -> None:
+        self.path = path
+        self.shards = max(1, shards)
+
+    def paths(self) -> list[str]:
+        """Every database file, in shard order."""
+        if self.shards == 1:
+            return [self.path]
+        root, ext = os.path.splitext(self.path)
+        return [f"{root}.shard{i}{ext}" for i in range(self.shards)]
+
+    def path_for(self, user_id: int | None) -> str:
+        if self.shards == 1:
+            return self.path
+        if user_id is None:
+            raise ValueError("DB_SHARDS > 1: pass the user_id, or use fan_out() for cross-user queries")
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.shard{shard_for(user_id, self.shards)}{ext}"
+
+    @contextmanager
+    def connect(self, user_id: int | None = None) -> Generator[sqlite3.Connection, None, None]:
+        with self._open(self.path_for(user_id)) as conn:
+            yield conn
+
+    @staticmethod
+    @contextmanager
+    def _open(path: str) -> Generator[sqlite3.Connection, None, None]:
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def fan_out(self, fn: Callable[[sqlite3.Connection], T]) -> list[T]:
+        results = []
+        for path in self.paths():
+            with self._open(path) as conn:
+                results.append(fn(conn))
+        return results
+
+    def group_users(self, user_ids: list[int]) -> list[list[int]]:
+        groups: dict[str, list[int]] = defaultdict(list)
+        for uid in user_ids:
+            groups[self.path_for(uid)].append(uid)
+        return list(groups.values())
+
+    def migrate(self) -> None:
+        self.fan_out(self._migrate)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        # WAL: readers never block the writer — needed once several processes share the file
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(user_schema)
+        conn.execute(deck_schema)
+        conn.execute(note_schema)
+        conn.execute(card_schema)
+        conn.execute(preset_schema)
+        SQLiteBackend._add_missing_columns(conn)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(cards)")}
+        split_notes(conn, columns)
+        fill_shard_keys(conn)
+        for stmt in indexes_schema.strip().split(';'):
+            stmt = stmt.strip()
+            if stmt:
+                conn.execute(stmt)
+
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection) -> None:
+        """Bring tables created by an older schema up to date."""
+        for table, columns in added_columns.items():
+            existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                    logging.info(f"Added column {table}.{name}")
+
+
+# ── Data migrations ──────────────────────────────────────────
+
+MIGRATION_BATCH = 1000
+
+
+def link_reverse_siblings(conn: Connection, batch_size: int = MIGRATION_BATCH) -> int:
+    """Set sibling_id on legacy reverse pairs that lack it. Returns pairs linked.
+
+    Before notes, save_cards inserted a pair as two consecutive rows — the
+    card, then its mirror (front and back swapped) in the same deck — so two
+    unlinked reverse cards with adjacent ids and mirrored content are a pair.
+    Rows are read in id order, batch_size at a time, and linked with one
+    executemany per batch; an unmatched last row carries over to the next.
+    """
+    linked = 0
+    pending = None
+    after = 0
+    while True:
+        rows = conn.execute(
+            "SELECT card_id, user_id, deck_id, front, back FROM cards "
+            "WHERE card_type = 'reverse' AND sibling_id IS NULL AND card_id > ? "
+            "ORDER BY card_id LIMIT ?",
+            (after, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        pairs = []
+        for row in rows:
+            if (
+                pending is not None
+                and row['card_id'] == pending['card_id'] + 1
+                and row['user_id'] == pending['user_id']
+                and row['deck_id'] == pending['deck_id']
+                and row['front'] == pending['back']
+                and row['back'] == pending['front']
+            ):
+                pairs.append((row['card_id'], pending['card_id']))
+                pairs.append((pending['card_id'], row['card_id']))
+                pending = None
+            else:
+                pending = row
+        if pairs:
+            conn.executemany("UPDATE cards SET sibling_id = ? WHERE card_id = ?", pairs)
+            linked += len(pairs) // 2
+        after = rows[-1]['card_id']
+    if linked:
+        logging.info(f"Linked {linked} reverse card pairs")
+    return linked
+
+
+def fill_shard_keys(conn: Connection, batch_size: int = MIGRATION_BATCH) -> int:
+    """Set users.shard_key on rows from before the column existed. Returns users updated."""
+    filled = 0
+    while True:
+        rows = conn.execute(
+            "SELECT user_id FROM users WHERE shard_key IS NULL LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            return filled
+        conn.executemany(
+            "UPDATE users SET shard_key = ? WHERE user_id = ?",
+            [(shard_key(row['user_id']), row['user_id']) for row in rows]
+        )
+        filled += len(rows)
+
+
+def split_notes(conn: Connection, columns: set[str], batch_size: int = MIGRATION_BATCH) -> int:
+    """Move a pre-notes cards table's content into notes. Returns notes created.
+
+    `columns` are the cards table's current columns; without 'front' there is
+    nothing to do. Every card gets a note from its own content (template
+    forward), except the second card of a reverse pair, which joins its
+    sibling's note as the reverse template. Cards are read in id order,
+    batch_size at a time, each batch updated with one executemany; then the
+    content columns are dropped. Runs inside migrate's transaction, so a
+    failure leaves the old layout intact.
+    """
+    if 'front' not in columns:
+        return 0
+    if 'sibling_id' not in columns:
+        conn.execute("ALTER TABLE cards ADD COLUMN sibling_id BIGINT")
+        link_reverse_siblings(conn, batch_size)
+    created = 0
+    after = 0
+    while True:
+        rows = conn.execute(
+            "SELECT card_id, deck_id, user_id, front, back, card_type, content_type, sibling_id, created_at "
+            "FROM cards WHERE card_id > ? ORDER BY card_id LIMIT ?",
+            (after, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        notes: dict[int, int] = {}                 # card_id -> note_id, this batch
+        updates = []
+        for row in rows:
+            sibling = row['sibling_id']
+            note_id = None
+            if sibling is not None and sibling < row['card_id']:
+                note_id = notes.get(sibling)
+                if note_id is None:
+                    found = conn.execute("SELECT note_id FROM cards WHERE card_id = ?", (sibling,)).fetchone()
+                    note_id = found['note_id'] if found else None
+            if note_id is not None:
+                updates.append((note_id, REVERSE, row['card_id']))
+            else:
+                note_id = conn.execute(
+                    "INSERT INTO notes (deck_id, user_id, front, back, note_type, content_type, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING note_id",
+                    (row['deck_id'], row['user_id'], row['front'], row['back'],
+                     row['card_type'] or 'basic', row['content_type'] or 'text', row['created_at']),
+                ).fetchone()['note_id']
+                created += 1
+                updates.append((note_id, FORWARD, row['card_id']))
+            notes[row['card_id']] = note_id
+        conn.executemany("UPDATE cards SET note_id = ?, template = ? WHERE card_id = ?", updates)
+        after = rows[-1]['card_id']
+    conn.execute("DROP INDEX IF EXISTS idx_cards_sibling_id")
+    for column in legacy_card_columns:
+        conn.execute(f"ALTER TABLE cards DROP COLUMN {column}")
+    logging.info(f"Moved card content into {created} notes")
+    return created
+
+
+# ── PostgreSQL ───────────────────────────────────────────────
+
+class PoolTimeout(Exception):
+    """No pooled connection became free in time."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections, opened on demand.
+
+    At most `size` connections exist at once; acquire() blocks up to `timeout`
+    seconds for one to be released. Connections that come back broken are
+    closed and their slot freed.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 10, timeout: float = 30.0) -> None:
+        if size < 1:
+            raise ValueError("pool size must be >= 1")
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle: list[Any] = []
+        self._opened = 0
+        self._cond = threading.Condition()
+
+    @property
+    def opened(self) -> int:
+        return self._opened
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self) -> Any:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._opened >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no free connection within {self.timeout}s (pool size {self.size})")
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()      # most recently used — warmest
+            self._opened += 1
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: Any, broken: bool = False) -> None:
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._cond:
+            if broken:
+                self._opened -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+@lru_cache(maxsize=256)
+def to_format_style(sql: str) -> str:
+    """Rewrite qmark placeholders for a 'format' paramstyle driver (psycopg)."""
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+class _PgCursor:
+    """Cursor wrapper that accepts the repository's qmark SQL."""
+
+    def __init__(self, raw: Any) -> None:
+        self._raw = raw
+
+    def execute(self, sql: str, params: Any = ()) -> '_PgCursor':
+        self._raw.execute(to_format_style(sql), params)
+        return self
+
+    def executemany(self, sql: str, seq: Any) -> '_PgCursor':
+        self._raw.executemany(to_format_style(sql), seq)
+        return self
+
+    def fetchone(self) -> Any:
+        return self._raw.fetchone()
+
+    def fetchmany(self, size: int) -> list[Any]:
+        return self._raw.fetchmany(size)
+
+    def fetchall(self) -> list[Any]:
+        return self._raw.fetchall()
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    @property
+    def rowcount(self) -> int:
+        return self._raw.rowcount
+
+
+class _PgConnection:
+    """The subset of sqlite3.Connection the repository uses, over a pooled connection."""
+
+    def __init__(self, raw: Any) -> None:
+        self._raw = raw
+
+    def cursor(self) -> _PgCursor:
+        return _PgCursor(self._raw.cursor())
+
+    def execute(self, sql: str, params: Any = ()) -> _PgCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq: Any) -> _PgCursor:
+        return self.cursor().executemany(sql, seq)
+
+
+def psycopg_factory(dsn: str) -> Callable[[], Any]:
+    """Connection factory for a real server — psycopg 3 with dict rows."""
+    try:
+        import psycopg
+        from psycopg.rows import dict_row
+    except ImportError as e:
+        raise RuntimeError("DATABASE_URL is set but psycopg is not installed: pip install 'psycopg[binary]'") from e
+    return lambda: psycopg.connect(dsn, row_factory=dict_row)
+
+
+class PostgresBackend(Backend):
+    """
+    PostgreSQL through a connection pool.
+
+    `factory` opens one DB-API connection (format paramstyle, rows as dicts);
+    it defaults to psycopg for `dsn`, and tests pass an in-process stand-in.
+    """
+
+    dialect = 'postgres'
+
+    def __init__(
+        self,
+        dsn: str = '',
+        pool_size: int = 10,
+        factory: Callable[[], Any] | None = None,
+        pool_timeout: float = 30.0,
+    ) -> None:
+        self.pool = ConnectionPool(factory or psycopg_factory(dsn), pool_size, pool_timeout)
+
+    @contextmanager
+    def connect(self, user_id: int | None = None) -> Generator[_PgConnection, None, None]:
+        raw = self.pool.acquire()
+        broken = False
+        try:
+            yield _PgConnection(raw)
+            raw.commit()
+        except BaseException:
+            # BaseException too: a closed generator (GeneratorExit) must not
+            # hand back a connection with an open transaction
+            try:
+                raw.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            broken = broken or bool(getattr(raw, 'broken', False) or getattr(raw, 'closed', False))
+            self.pool.release(raw, broken=broken)
+
+    def fan_out(self, fn: Callable[[_PgConnection], T]) -> list[T]:
+        with self.connect() as conn:
+            return [fn(conn)]
+
+    def migrate(self) -> None:
+        with self.connect() as conn:
+            for stmt in pg_schema.strip().split(';'):
+                stmt = stmt.strip()
+                if stmt:
+                    conn.execute(stmt)
+            for table, columns in added_columns.items():
+                for name, ddl in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {ddl}")
+            rows = conn.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'cards'"
+            ).fetchall()
+            split_notes(conn, {row['column_name'] for row in rows})
+            fill_shard_keys(conn)
+            for stmt in indexes_schema.strip().split(';'):
+                stmt = stmt.strip()
+                if stmt:
+                    conn.execute(stmt)
+
+    def close(self) -> None:
+        self.pool.close()
@@ -1,35 +1,52 @@
 import logging
-import sqlite3
-from collections.abc import Generator
+import sys
+from collections import defaultdict
+from collections.abc import Callable, Generator, Iterable
 from contextlib import contextmanager
-from datetime import date, timedelta
-from typing import Any
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, TypeVar
 
-from database.schema import user_schema, deck_schema, card_schema, indexes_schema
-from config import DB_PATH
+from database.backends import Backend, Connection, PostgresBackend, SQLiteBackend
+from database.profiler import QueryProfiler
+from utils.due_load import DUE_LOAD
+from utils.metrics import instrument_module
+from utils.presets import DEFAULT_DECK, MAX_RELEARNING_STEPS, PRESETS, format_steps, parse_steps
+from utils.sharding import shard_key
+from utils.srs import DEFAULT_PRESET, Preset
+from utils.templates import cloze_number, cloze_numbers, cloze_template, note_fields, render, templates_for
+from utils.timer_wheel import DUE_TIMERS, epoch
+from config import (
+    DB_PATH, DB_SHARDS, DATABASE_URL, DB_POOL_SIZE, DUE_NOTICE_INTERVAL, SQL_PROFILE, SQL_SLOW_MS, SQL_SLOW_LOG,
+)
+
+T = TypeVar('T')
+
+LEARNING_STATES = ('learning', 'relearning')    # due in minutes: tracked by the due-notice timers
 
 
 # USER COMMANDS ============================================
 
 def create_user(user_id: int, username: str | None, first_name: str) -> None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            'INSERT INTO users (user_id, username, name) VALUES (?, ?, ?)',
-            (user_id, username, first_name)
+            'INSERT INTO users (user_id, username, name, shard_key) VALUES (?, ?, ?, ?)',
+            (user_id, username, first_name, shard_key(user_id))
         )
         logging.info(f"Created user: {user_id}")
 
 
-def get_user(user_id: int) -> sqlite3.Row | None:
-    with get_db() as conn:
+def get_user(user_id: int) -> dict[str, Any] | None:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE user_id=?', (user_id,))
-        return cursor.fetchone()
+        row = cursor.fetchone()
+        return dict(row) if row else None
 
 
 def get_user_defaults(user_id: int) -> dict[str, Any] | None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
             'SELECT default_deck_id, default_card_type FROM users WHERE user_id = ?',
@@ -46,13 +63,13 @@ def get_user_defaults(user_id: int) -> dict[str, Any] | None:
 
 def clear_default_deck(user_id: int) -> None:
     """Set default_deck_id to NULL (used when the saved deck is deleted)."""
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute('UPDATE users SET default_deck_id = NULL WHERE user_id = ?', (user_id,))
 
 
 def update_user_defaults(user_id: int, deck_id: int | None = None, card_type: str | None = None) -> None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         if deck_id is not None:
             cursor.execute(
@@ -67,10 +84,48 @@ def update_user_defaults(user_id: int, deck_id: int | None = None, card_type: st
         logging.info(f"Updated defaults for user {user_id}: deck={deck_id}, type={card_type}")
 
 
+def get_reminder_settings(user_id: int) -> dict[str, Any] | None:
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT reminders_enabled, timezone, quiet_start, quiet_end FROM users WHERE user_id = ?',
+            (user_id,)
+        )
+        row = cursor.fetchone()
+        if row:
+            return {
+                'enabled': bool(row['reminders_enabled']),
+                'timezone': row['timezone'],
+                'quiet_start': row['quiet_start'],
+                'quiet_end': row['quiet_end'],
+            }
+        return None
+
+
+def update_reminder_settings(
+    user_id: int,
+    enabled: bool | None = None,
+    timezone: str | None = None,
+    quiet_start: int | None = None,
+    quiet_end: int | None = None,
+) -> None:
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        if enabled is not None:
+            cursor.execute('UPDATE users SET reminders_enabled = ? WHERE user_id = ?', (int(enabled), user_id))
+        if timezone is not None:
+            cursor.execute('UPDATE users SET timezone = ? WHERE user_id = ?', (timezone, user_id))
+        if quiet_start is not None and quiet_end is not None:
+            cursor.execute(
+                'UPDATE users SET quiet_start = ?, quiet_end = ? WHERE user_id = ?',
+                (quiet_start, quiet_end, user_id)
+            )
+
+
 # DECKS COMMANDS =============================================
 
 def get_all_decks(user_id: int) -> list[dict[str, Any]]:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT deck_id, deck_name FROM decks WHERE user_id = ?', (user_id,))
         rows = cursor.fetchall()
@@ -78,7 +133,7 @@ def get_all_decks(user_id: int) -> list[dict[str, Any]]:
 
 
 def get_deck_id(user_id: int, deck_name: str) -> int | None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT deck_id FROM decks WHERE user_id = ? AND deck_name = ?",
@@ -90,10 +145,13 @@ def get_deck_id(user_id: int, deck_name: str) -> int | None:
         return None
 
 
-def get_deck_name(deck_id: int) -> str | None:
-    with get_db() as conn:
+def get_deck_name(deck_id: int, user_id: int | None = None) -> str | None:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT deck_name FROM decks WHERE deck_id = ?", (deck_id,))
+        if user_id is None:
+            cursor.execute("SELECT deck_name FROM decks WHERE deck_id = ?", (deck_id,))
+        else:
+            cursor.execute("SELECT deck_name FROM decks WHERE deck_id = ? AND user_id = ?", (deck_id, user_id))
         row = cursor.fetchone()
         if row:
             return row['deck_name']
@@ -101,30 +159,31 @@ def get_deck_name(deck_id: int) -> str | None:
 
 
 def create_deck_db(user_id: int, deck_name: str) -> int:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            'INSERT INTO decks (user_id, deck_name) VALUES (?, ?)',
+            'INSERT INTO decks (user_id, deck_name) VALUES (?, ?) RETURNING deck_id',
             (user_id, deck_name)
         )
-        return cursor.lastrowid
+        return cursor.fetchone()['deck_id']
 
 
 def get_decks_with_stats(user_id: int) -> list[dict[str, Any]]:
-    """Get all decks with card count and due count in a single query."""
-    with get_db() as conn:
+    """Get all decks with active card count and due count in a single query."""
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
             """SELECT d.deck_id, d.deck_name,
                       COUNT(c.card_id) AS card_count,
-                      SUM(CASE WHEN c.due_date <= datetime('now') THEN 1 ELSE 0 END) AS due_count
+                      COUNT(CASE WHEN c.due_date <= ? THEN 1 END) AS due_count
                FROM decks d
                LEFT JOIN cards c ON c.deck_id = d.deck_id
+                                AND c.suspended = 0 AND c.buried_until IS NULL
                WHERE d.user_id = ?
                GROUP BY d.deck_id
                ORDER BY d.deck_name
             """,
-            (user_id,)
+            (_now(), user_id)
         )
         return [dict(row) for row in cursor.fetchall()]
 
@@ -133,131 +192,208 @@ def get_decks_with_stats(user_id: int) -> list[dict[str, Any]]:
 
 def save_card(card_dict: dict[str, Any], card_type: str, deck_id: int, user_id: int) -> None:
     """card_dict is always {'front': ..., 'back': ..., optional 'is_photo': bool}"""
-    with get_db() as conn:
-        cursor = conn.cursor()
+    save_cards([card_dict], card_type, deck_id, user_id)
 
-        front = card_dict['front']
-        back = card_dict['back']
-        content_type = 'photo' if card_dict.get('is_photo') else 'text'
 
-        cursor.execute(
-            "INSERT INTO cards (front, back, card_type, content_type, deck_id, user_id) VALUES (?, ?, ?, ?, ?, ?)",
-            (front, back, card_type, content_type, deck_id, user_id)
-        )
+def save_cards(cards: list[dict[str, Any]], card_type: str, deck_id: int, user_id: int) -> int:
+    """Insert many notes and their cards in one transaction. Returns cards inserted.
 
-        if card_type.lower() == 'reverse':
+    card_type is the note type: a basic note gets one card, a reverse note a
+    forward and a reverse card over the same text, a cloze note one card per
+    deletion number in its front (utils.templates). A note that would get no
+    cards (cloze text without deletions) is not stored.
+    """
+    card_rows = []
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        for card_dict in cards:
+            templates = templates_for(card_type, card_dict['front'])
+            if not templates:
+                continue
+            content_type = 'photo' if card_dict.get('is_photo') else 'text'
             cursor.execute(
-                "INSERT INTO cards (front, back, card_type, content_type, deck_id, user_id) VALUES (?, ?, ?, ?, ?, ?)",
-                (back, front, card_type, content_type, deck_id, user_id)
+                "INSERT INTO notes (front, back, note_type, content_type, deck_id, user_id) "
+                "VALUES (?, ?, ?, ?, ?, ?) RETURNING note_id",
+                (card_dict['front'], card_dict['back'], card_type, content_type, deck_id, user_id)
             )
+            note_id = cursor.fetchone()['note_id']
+            card_rows.extend((note_id, template, deck_id, user_id) for template in templates)
+        cursor.executemany(
+            "INSERT INTO cards (note_id, template, deck_id, user_id) VALUES (?, ?, ?, ?)",
+            card_rows
+        )
+    return len(card_rows)
+
+
+def _card(row: Any) -> dict[str, Any]:
+    """A card row as the handlers see it: front/back rendered through its template."""
+    card = dict(row)
+    card['front'], card['back'] = render(card['template'], card['front'], card['back'])
+    return card
 
 
 # REVIEW COMMANDS ============================================
 
 def get_due_cards(user_id: int, deck_id: int | None = None) -> list[dict[str, Any]]:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         if deck_id is not None:
             cursor.execute(
-                """SELECT card_id, front, back, card_type, content_type, state,
-                          stability, difficulty, reps, lapses, deck_id,
-                          due_date, scheduled_days
-                   FROM cards
-                   WHERE user_id = ? AND deck_id = ? AND due_date <= datetime('now')
+                """SELECT c.card_id, c.note_id, c.template, n.front, n.back,
+                          n.note_type AS card_type, n.content_type, c.state,
+                          c.stability, c.difficulty, c.reps, c.lapses, c.deck_id,
+                          c.due_date, c.scheduled_days, d.deck_name
+                   FROM cards c
+                   JOIN decks d ON d.deck_id = c.deck_id
+                   JOIN notes n ON n.note_id = c.note_id
+                   WHERE c.user_id = ? AND c.deck_id = ? AND c.due_date <= ?
+                     AND c.suspended = 0 AND c.buried_until IS NULL
                    ORDER BY
-                       CASE state WHEN 'new' THEN 0 WHEN 'learning' THEN 1
-                                  WHEN 'relearning' THEN 2 ELSE 3 END,
-                       due_date
+                       CASE c.state WHEN 'new' THEN 0 WHEN 'learning' THEN 1
+                                    WHEN 'relearning' THEN 2 ELSE 3 END,
+                       c.due_date
                 """,
-                (user_id, deck_id)
+                (user_id, deck_id, _now())
             )
         else:
             cursor.execute(
-                """SELECT card_id, front, back, card_type, content_type, state,
-                          stability, difficulty, reps, lapses, deck_id,
-                          due_date, scheduled_days
-                   FROM cards
-                   WHERE user_id = ? AND due_date <= datetime('now')
+                """SELECT c.card_id, c.note_id, c.template, n.front, n.back,
+                          n.note_type AS card_type, n.content_type, c.state,
+                          c.stability, c.difficulty, c.reps, c.lapses, c.deck_id,
+                          c.due_date, c.scheduled_days, d.deck_name
+                   FROM cards c
+                   JOIN decks d ON d.deck_id = c.deck_id
+                   JOIN notes n ON n.note_id = c.note_id
+                   WHERE c.user_id = ? AND c.due_date <= ?
+                     AND c.suspended = 0 AND c.buried_until IS NULL
                    ORDER BY
-                       CASE state WHEN 'new' THEN 0 WHEN 'learning' THEN 1
-                                  WHEN 'relearning' THEN 2 ELSE 3 END,
-                       due_date
+                       CASE c.state WHEN 'new' THEN 0 WHEN 'learning' THEN 1
+                                    WHEN 'relearning' THEN 2 ELSE 3 END,
+                       c.due_date
                 """,
-                (user_id,)
+                (user_id, _now())
             )
         rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        return [_card(row) for row in rows]
 
 
 def get_cards_in_deck(deck_id: int, user_id: int) -> list[dict[str, Any]]:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT card_id, front, back, card_type, content_type FROM cards WHERE deck_id = ? AND user_id = ? ORDER BY card_id",
+            """SELECT c.card_id, c.note_id, c.template, n.front, n.back,
+                      n.note_type AS card_type, n.content_type, c.suspended, c.buried_until, c.leech
+               FROM cards c
+               JOIN notes n ON n.note_id = c.note_id
+               WHERE c.deck_id = ? AND c.user_id = ?
+               ORDER BY c.card_id
+            """,
             (deck_id, user_id)
         )
-        return [dict(row) for row in cursor.fetchall()]
+        return [_card(row) for row in cursor.fetchall()]
 
 
 def get_card(card_id: int, user_id: int) -> dict[str, Any] | None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT card_id, front, back, card_type, content_type, deck_id FROM cards WHERE card_id = ? AND user_id = ?",
+            """SELECT c.card_id, c.note_id, c.template, n.front, n.back,
+                      n.note_type AS card_type, n.content_type, c.deck_id,
+                      n.front AS note_front, n.back AS note_back
+               FROM cards c
+               JOIN notes n ON n.note_id = c.note_id
+               WHERE c.card_id = ? AND c.user_id = ?
+            """,
             (card_id, user_id)
         )
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return _card(row) if row else None
 
 
 def update_card_caption(card_id: int, user_id: int, caption: str) -> None:
     """Update only the back (caption) of a photo card, leaving front (file_id) untouched."""
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "UPDATE cards SET back = ?, updated_at = datetime('now') WHERE card_id = ? AND user_id = ?",
-            (caption, card_id, user_id)
+            """UPDATE notes SET back = ?, updated_at = ?
+               WHERE note_id = (SELECT note_id FROM cards WHERE card_id = ? AND user_id = ?)
+            """,
+            (caption, _now(), card_id, user_id)
         )
 
 
 def delete_card(card_id: int, user_id: int) -> None:
-    with get_db() as conn:
+    """Delete one card; its note goes with its last card."""
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM cards WHERE card_id = ? AND user_id = ?", (card_id, user_id))
+        cursor.execute("DELETE FROM cards WHERE card_id = ? AND user_id = ? RETURNING note_id", (card_id, user_id))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(
+                "DELETE FROM notes WHERE note_id = ? AND NOT EXISTS (SELECT 1 FROM cards WHERE note_id = ?)",
+                (row['note_id'], row['note_id'])
+            )
+    DUE_LOAD.invalidate(user_id)
+    DUE_TIMERS.cancel((user_id, card_id))
 
 
 def update_card_content(card_id: int, user_id: int, front: str, back: str) -> None:
-    with get_db() as conn:
+    """Edit a card as it shows (front/back); the change lands on its note, so siblings follow.
+
+    Editing a cloze note adds cards for new deletion numbers and deletes the
+    cards of numbers that are gone; the others keep their scheduling.
+    """
+    gone: list[tuple[int]] = []
+    added: list[tuple[int, str, int, int]] = []
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
-        # Read old state first — needed to locate reverse sibling
         cursor.execute(
-            "SELECT front, back, card_type, deck_id FROM cards WHERE card_id = ? AND user_id = ?",
+            "SELECT note_id, template, deck_id FROM cards WHERE card_id = ? AND user_id = ?",
             (card_id, user_id)
         )
-        old = cursor.fetchone()
+        row = cursor.fetchone()
+        if row is None:
+            return
+        note_id = row['note_id']
+        note_front, note_back = note_fields(row['template'], front, back)
+        if cloze_number(row['template']) is not None:
+            wanted = set(cloze_numbers(note_front))
+            if not wanted:
+                raise ValueError("a cloze note needs at least one {{c1::...}} deletion")
+            cursor.execute("SELECT card_id, template FROM cards WHERE note_id = ?", (note_id,))
+            have = {cloze_number(r['template']): r['card_id'] for r in cursor.fetchall()}
+            gone = [(have[n],) for n in have.keys() - wanted]
+            added = [(note_id, cloze_template(n), row['deck_id'], user_id) for n in sorted(wanted - have.keys())]
+            if gone:
+                cursor.executemany("DELETE FROM cards WHERE card_id = ?", gone)
+            if added:
+                cursor.executemany(
+                    "INSERT INTO cards (note_id, template, deck_id, user_id) VALUES (?, ?, ?, ?)",
+                    added
+                )
         cursor.execute(
-            "UPDATE cards SET front = ?, back = ?, updated_at = datetime('now') WHERE card_id = ? AND user_id = ?",
-            (front, back, card_id, user_id)
+            "UPDATE notes SET front = ?, back = ?, updated_at = ? WHERE note_id = ?",
+            (note_front, note_back, _now(), note_id)
         )
-        # P-3: keep reverse sibling in sync
-        if old and old['card_type'] == 'reverse':
-            cursor.execute(
-                """UPDATE cards SET front = ?, back = ?, updated_at = datetime('now')
-                   WHERE user_id = ? AND deck_id = ? AND card_type = 'reverse'
-                     AND front = ? AND back = ? AND card_id != ?""",
-                (back, front, user_id, old['deck_id'], old['back'], old['front'], card_id)
-            )
+    if gone or added:
+        DUE_LOAD.invalidate(user_id)
+    for (gone_id,) in gone:
+        DUE_TIMERS.cancel((user_id, gone_id))
 
 
 def delete_deck(deck_id: int, user_id: int) -> None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM cards WHERE deck_id = ? AND user_id = ?", (deck_id, user_id))
+        cursor.execute("DELETE FROM notes WHERE deck_id = ? AND user_id = ?", (deck_id, user_id))
         cursor.execute("DELETE FROM decks WHERE deck_id = ? AND user_id = ?", (deck_id, user_id))
+        cursor.execute("DELETE FROM presets WHERE deck_id = ? AND user_id = ?", (deck_id, user_id))
+    DUE_LOAD.invalidate(user_id)
+    PRESETS.invalidate(user_id, deck_id)
 
 
 def rename_deck(deck_id: int, user_id: int, new_name: str) -> None:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE decks SET deck_name = ? WHERE deck_id = ? AND user_id = ?",
@@ -275,54 +411,481 @@ def update_card_srs(
     state: str,
     scheduled_days: int,
     elapsed_days: int = 0,
+    user_id: int | None = None,
+    leech: bool = False,
+    suspend: bool = False,
+    previous_due: str | None = None,
 ) -> None:
-    with get_db() as conn:
+    """Store a rating's result. leech tags the card (utils.srs.is_leech), suspend also
+    takes it out of review — in the same statement, so a leech costs no extra query.
+
+    previous_due (the card's due_date before the rating) keeps the user's cached
+    due histogram (get_due_load) current without a query. A card left in
+    learning gets a due-notice timer (utils.timer_wheel) for its new due_date.
+    """
+    flags = (', leech = 1' if leech else '') + (', suspended = 1' if suspend else '')
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            """UPDATE cards
+            f"""UPDATE cards
                SET due_date = ?, stability = ?, difficulty = ?,
                    reps = ?, lapses = ?, state = ?, scheduled_days = ?,
-                   elapsed_days = ?, updated_at = datetime('now')
+                   elapsed_days = ?, updated_at = ?{flags}
                WHERE card_id = ?
             """,
-            (due_date, stability, difficulty, reps, lapses, state, scheduled_days, elapsed_days, card_id)
+            (due_date, stability, difficulty, reps, lapses, state, scheduled_days, elapsed_days, _now(), card_id)
+        )
+    if suspend:
+        DUE_LOAD.invalidate(user_id)
+    else:
+        DUE_LOAD.move(user_id, previous_due, due_date, _now())
+    if user_id is not None and DUE_NOTICE_INTERVAL > 0:
+        if state in LEARNING_STATES and not suspend:
+            DUE_TIMERS.add((user_id, card_id), user_id, epoch(due_date))
+        else:
+            DUE_TIMERS.cancel((user_id, card_id))
+
+
+def get_due_load(user_id: int) -> dict[str, int]:
+    """user_id's active cards due per day from now on, {'YYYY-MM-DD': count}, for utils.srs.schedule.
+
+    One GROUP BY over the partial (user_id, due_date) index the first time, then
+    from memory (utils.due_load), kept current by update_card_srs.
+    """
+    counts = DUE_LOAD.get(user_id)
+    if counts is not None:
+        return counts
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT substr(due_date, 1, 10) AS day, COUNT(*) AS cnt
+               FROM cards
+               WHERE user_id = ? AND due_date > ?
+                 AND suspended = 0 AND buried_until IS NULL
+               GROUP BY substr(due_date, 1, 10)
+            """,
+            (user_id, _now())
+        )
+        return DUE_LOAD.put(user_id, {row['day']: row['cnt'] for row in cursor.fetchall()})
+
+
+# PRESET COMMANDS ============================================
+
+def get_preset(deck_id: int, user_id: int) -> Preset:
+    """The preset deck_id schedules with: its own, else user_id's default, else DEFAULT_PRESET.
+
+    Cached per deck (utils.presets), so rating a card costs no query for its
+    options. deck_id 0 (DEFAULT_DECK) reads the user's default itself.
+    """
+    cached = PRESETS.get(user_id, deck_id)
+    if cached is not None:
+        return cached
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT learning_steps, relearning_steps, graduating_interval, easy_interval,
+                      max_interval, new_per_day, reviews_per_day
+               FROM presets
+               WHERE user_id = ? AND deck_id IN (?, ?)
+               ORDER BY deck_id DESC
+               LIMIT 1
+            """,
+            (user_id, deck_id, DEFAULT_DECK)
+        )
+        row = cursor.fetchone()
+    return PRESETS.put(user_id, deck_id, _preset(row) if row else DEFAULT_PRESET)
+
+
+def _preset(row: Any) -> Preset:
+    return Preset(
+        learning_steps=parse_steps(row['learning_steps']),
+        relearning_steps=parse_steps(row['relearning_steps'], MAX_RELEARNING_STEPS),
+        graduating_interval=row['graduating_interval'],
+        easy_interval=row['easy_interval'],
+        max_interval=row['max_interval'],
+        new_per_day=row['new_per_day'],
+        reviews_per_day=row['reviews_per_day'],
+    )
+
+
+def save_preset(user_id: int, deck_id: int, preset: Preset) -> None:
+    """Store deck_id's preset (DEFAULT_DECK: the user's default) and drop what it made stale."""
+    with get_db(user_id) as conn:
+        conn.execute(
+            """INSERT INTO presets (user_id, deck_id, learning_steps, relearning_steps, graduating_interval,
+                                  easy_interval, max_interval, new_per_day, reviews_per_day, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (user_id, deck_id) DO UPDATE SET
+                   learning_steps = excluded.learning_steps,
+                   relearning_steps = excluded.relearning_steps,
+                   graduating_interval = excluded.graduating_interval,
+                   easy_interval = excluded.easy_interval,
+                   max_interval = excluded.max_interval,
+                   new_per_day = excluded.new_per_day,
+                   reviews_per_day = excluded.reviews_per_day,
+                   updated_at = excluded.updated_at
+            """,
+            (user_id, deck_id, format_steps(preset.learning_steps), format_steps(preset.relearning_steps),
+             preset.graduating_interval, preset.easy_interval, preset.max_interval,
+             preset.new_per_day, preset.reviews_per_day, _now())
+        )
+    PRESETS.invalidate(user_id, deck_id)
+
+
+def delete_preset(user_id: int, deck_id: int) -> None:
+    """Back to the user's default (or, for DEFAULT_DECK, to DEFAULT_PRESET)."""
+    with get_db(user_id) as conn:
+        conn.execute("DELETE FROM presets WHERE user_id = ? AND deck_id = ?", (user_id, deck_id))
+    PRESETS.invalidate(user_id, deck_id)
+
+
+# SUSPEND / BURY COMMANDS ====================================
+#
+# Suspended and buried cards stay in the deck but out of review: every query
+# that feeds review or a due count filters on the active predicate the
+# partial indexes are built with (database/schema.py).
+
+def set_card_suspended(card_id: int, user_id: int, suspended: bool) -> None:
+    """Take a card out of review until it is resumed (or put it back)."""
+    with get_db(user_id) as conn:
+        conn.execute(
+            "UPDATE cards SET suspended = ?, updated_at = ? WHERE card_id = ? AND user_id = ?",
+            (int(suspended), _now(), card_id, user_id)
+        )
+    DUE_LOAD.invalidate(user_id)
+    if suspended:
+        DUE_TIMERS.cancel((user_id, card_id))
+
+
+def bury_card(card_id: int, user_id: int, until: str) -> None:
+    """Hide a card from review until `until` (UTC text, see utils.reminders.next_day_start)."""
+    with get_db(user_id) as conn:
+        conn.execute(
+            "UPDATE cards SET buried_until = ? WHERE card_id = ? AND user_id = ?",
+            (until, card_id, user_id)
+        )
+
+
+def bury_siblings(card_id: int, user_id: int, until: str) -> int:
+    """Bury the other cards of card_id's note until `until` — one UPDATE. Returns cards buried."""
+    with get_db(user_id) as conn:
+        cursor = conn.execute(
+            """UPDATE cards SET buried_until = ?
+               WHERE note_id = (SELECT note_id FROM cards WHERE card_id = ? AND user_id = ?)
+                 AND card_id != ? AND suspended = 0 AND buried_until IS NULL
+            """,
+            (until, card_id, user_id, card_id)
+        )
+        return cursor.rowcount
+
+
+def unbury_cards() -> int:
+    """Return every card whose bury has run out to review. Returns cards unburied.
+
+    One set-based UPDATE per database over the partial idx_cards_buried index,
+    for all users at once: each bury already stores its user's day boundary.
+    """
+    now = _now()
+
+    def update(conn: Connection) -> int:
+        cursor = conn.execute(
+            "UPDATE cards SET buried_until = NULL WHERE buried_until IS NOT NULL AND buried_until <= ?",
+            (now,)
+        )
+        return cursor.rowcount
+
+    return sum(fan_out(update))
+
+
+def get_leeches(user_id: int, min_lapses: int, limit: int) -> list[dict[str, Any]]:
+    """Cards lapsed at least min_lapses times, most lapsed first — a range scan of
+    idx_cards_leeches, however big the collection."""
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT c.card_id, c.note_id, c.template, n.front, n.back,
+                      n.note_type AS card_type, n.content_type, c.lapses,
+                      c.suspended, c.leech, d.deck_name
+               FROM cards c
+               JOIN notes n ON n.note_id = c.note_id
+               JOIN decks d ON d.deck_id = c.deck_id
+               WHERE c.user_id = ? AND c.lapses >= ?
+               ORDER BY c.lapses DESC
+               LIMIT ?
+            """,
+            (user_id, min_lapses, limit)
         )
+        return [_card(row) for row in cursor.fetchall()]
+
+
+# EXPORT COMMANDS ============================================
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def iter_export_rows(
+    user_id: int,
+    deck_id: int | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Generator[dict[str, Any], None, None]:
+    """Yield every card (its note's fields + SRS state) with its deck name, chunk_size rows per fetch.
+
+    front and back are the note's as stored, not rendered through the card's
+    template; the cards of one note share its note_id.
+
+    The connection stays open until the generator is exhausted or closed, so only one
+    chunk is ever held in memory regardless of collection size.
+    """
+    sql = """SELECT d.deck_name, c.note_id, c.template, n.front, n.back, n.note_type AS card_type, n.content_type,
+                    c.state, c.due_date, c.stability, c.difficulty, c.elapsed_days,
+                    c.scheduled_days, c.reps, c.lapses, c.suspended, c.buried_until, c.leech,
+                    c.created_at
+             FROM cards c
+             JOIN decks d ON d.deck_id = c.deck_id
+             JOIN notes n ON n.note_id = c.note_id
+             WHERE c.user_id = ?"""
+    params: tuple[Any, ...] = (user_id,)
+    if deck_id is not None:
+        sql += " AND c.deck_id = ?"
+        params += (deck_id,)
+    sql += " ORDER BY c.card_id"
+
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+
+
+IMPORT_DECK = 'Imported'     # for rows that name no deck
+
+_IMPORT_CARD_COLUMNS = (
+    'state', 'due_date', 'stability', 'difficulty', 'elapsed_days', 'scheduled_days',
+    'reps', 'lapses', 'suspended', 'buried_until', 'leech', 'created_at',
+)
+
+
+def import_rows(rows: Iterable[dict[str, Any]], user_id: int) -> int:
+    """Store rows in iter_export_rows' shape as user_id's notes and cards, in one
+    transaction. Returns cards inserted.
+
+    Rows sharing a note_id become one note with a card per row, each keeping its
+    template and SRS state; decks are matched by name and created if missing.
+    note_id only groups rows: the notes get new ids.
+    """
+    now = _now()
+    decks: dict[str, int] = {}
+    notes: dict[Any, int] = {}
+    learning: list[tuple[int, str]] = []
+    count = 0
+    columns = ', '.join(_IMPORT_CARD_COLUMNS)
+    placeholders = ', '.join('?' * len(_IMPORT_CARD_COLUMNS))
+    with get_db(user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT deck_id, deck_name FROM decks WHERE user_id = ?", (user_id,))
+        for deck in cursor.fetchall():
+            decks.setdefault(deck['deck_name'], deck['deck_id'])
+
+        for row in rows:
+            deck_name = row.get('deck_name') or IMPORT_DECK
+            deck_id = decks.get(deck_name)
+            if deck_id is None:
+                cursor.execute(
+                    'INSERT INTO decks (user_id, deck_name) VALUES (?, ?) RETURNING deck_id',
+                    (user_id, deck_name)
+                )
+                deck_id = decks[deck_name] = cursor.fetchone()['deck_id']
+
+            key = row.get('note_id')
+            note_id = notes.get(key) if key is not None else None
+            if note_id is None:
+                cursor.execute(
+                    "INSERT INTO notes (front, back, note_type, content_type, deck_id, user_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?) RETURNING note_id",
+                    (row['front'], row['back'], row.get('card_type') or 'basic',
+                     row.get('content_type') or 'text', deck_id, user_id)
+                )
+                note_id = cursor.fetchone()['note_id']
+                if key is not None:
+                    notes[key] = note_id
+
+            card = {
+                'state': 'new', 'due_date': now, 'stability': 0.0, 'difficulty': 5.0,
+                'elapsed_days': 0, 'scheduled_days': 0, 'reps': 0, 'lapses': 0,
+                'suspended': 0, 'buried_until': None, 'leech': 0, 'created_at': now,
+            }
+            card.update((k, row[k]) for k in _IMPORT_CARD_COLUMNS if row.get(k) is not None)
+            cursor.execute(
+                f"INSERT INTO cards (note_id, template, deck_id, user_id, {columns}) "
+                f"VALUES (?, ?, ?, ?, {placeholders}) RETURNING card_id",
+                (note_id, row.get('template') or 'forward', deck_id, user_id,
+                 *(card[k] for k in _IMPORT_CARD_COLUMNS))
+            )
+            card_id = cursor.fetchone()['card_id']
+            if card['state'] in LEARNING_STATES and not card['suspended']:
+                learning.append((card_id, card['due_date']))
+            count += 1
+
+    DUE_LOAD.invalidate(user_id)
+    if DUE_NOTICE_INTERVAL > 0:
+        for card_id, due_date in learning:
+            DUE_TIMERS.add((user_id, card_id), user_id, epoch(due_date))
+    return count
+
+
+# REMINDER COMMANDS ==========================================
+
+def _shard_filter(shard: tuple[int, int] | None, alias: str = 'u') -> tuple[str, tuple[int, ...]]:
+    """SQL (and params) keeping only the users of shard (index, count) — utils.sharding.shard_for
+    over the stored users.shard_key — or nothing for no shard."""
+    if shard is None or shard[1] <= 1:
+        return '', ()
+    index, count = shard
+    return f" AND {alias}.shard_key % ? = ?", (count, index)
+
+
+def get_reminder_candidates(min_gap_hours: int, shard: tuple[int, int] | None = None) -> list[dict[str, Any]]:
+    """Every user with due cards who wants reminders and wasn't reminded recently
+    (of shard (index, count)'s users only, if given).
+
+    One set-based query for all users: the inner GROUP BY runs over the covering
+    (user_id, due_date) index, so cost grows with the index, not with a query per user.
+    Quiet hours are applied by the caller (they depend on each user's timezone).
+    """
+    now = _now()
+    stale = _now(timedelta(hours=-min_gap_hours))
+    in_shard, shard_params = _shard_filter(shard)
+
+    def query(conn: Connection) -> list[dict[str, Any]]:
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT u.user_id, u.timezone, u.quiet_start, u.quiet_end, due.due_count
+               FROM (
+                   SELECT user_id, COUNT(*) AS due_count
+                   FROM cards
+                   WHERE due_date <= ? AND suspended = 0 AND buried_until IS NULL
+                   GROUP BY user_id
+               ) AS due
+               JOIN users u ON u.user_id = due.user_id
+               WHERE u.reminders_enabled = 1
+                 AND (u.last_reminded_at IS NULL
+                      OR u.last_reminded_at <= ?)""" + in_shard,
+            (now, stale, *shard_params)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    return [row for rows in fan_out(query) for row in rows]
+
+
+def get_learning_due(start: str, end: str, shard: tuple[int, int] | None = None) -> list[dict[str, Any]]:
+    """(card_id, user_id, due_date) of every active card in learning due in (start, end] —
+    what the due-notice timers are rebuilt from on startup. Only shard (index, count)'s
+    users' cards, if given.
+
+    One range scan per database over the partial idx_cards_learning_due index.
+    """
+    in_shard, shard_params = _shard_filter(shard)
+    join = " JOIN users u ON u.user_id = c.user_id" if in_shard else ""
+
+    def query(conn: Connection) -> list[dict[str, Any]]:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT c.card_id, c.user_id, c.due_date
+                FROM cards c{join}
+                WHERE c.due_date > ? AND c.due_date <= ?
+                  AND c.state IN ('learning', 'relearning') AND c.suspended = 0 AND c.buried_until IS NULL"""
+            + in_shard,
+            (start, end, *shard_params)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    return [row for rows in fan_out(query) for row in rows]
+
+
+def get_due_notice_recipients(cards: dict[int, list[int]], until: str) -> list[dict[str, Any]]:
+    """Of {user_id: [card_id, ...]} (the cards whose due-notice timers fired), the users who
+    want reminders, with how many of those cards are still active, in learning and due by
+    `until`, and their reminder settings (the shape get_reminder_candidates returns).
+
+    Only the fired cards count — the notice is about the next learning step, not the
+    review backlog. One query per database.
+    """
+    recipients = []
+    for group in get_backend().group_users(list(cards)):
+        card_ids = [card_id for uid in group for card_id in cards[uid]]
+        users = ', '.join('?' for _ in group)
+        marks = ', '.join('?' for _ in card_ids)
+        with get_db(group[0]) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT u.user_id, u.timezone, u.quiet_start, u.quiet_end, due.due_count
+                    FROM (
+                        SELECT user_id, COUNT(*) AS due_count
+                        FROM cards
+                        WHERE user_id IN ({users}) AND card_id IN ({marks}) AND due_date <= ?
+                          AND state IN ('learning', 'relearning') AND suspended = 0 AND buried_until IS NULL
+                        GROUP BY user_id
+                    ) AS due
+                    JOIN users u ON u.user_id = due.user_id
+                    WHERE u.reminders_enabled = 1
+                """,
+                (*group, *card_ids, until)
+            )
+            recipients.extend(dict(row) for row in cursor.fetchall())
+    return recipients
+
+
+def mark_reminded(user_ids: list[int]) -> None:
+    """Stamp last_reminded_at for a batch of users — one transaction per database."""
+    now = _now()
+    for group in get_backend().group_users(user_ids):
+        with get_db(group[0]) as conn:
+            conn.executemany(
+                "UPDATE users SET last_reminded_at = ? WHERE user_id = ?",
+                [(now, uid) for uid in group]
+            )
 
 
 # STATS COMMANDS =============================================
 
 def get_card_stats(user_id: int) -> dict[str, int]:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
             """SELECT
                    COUNT(*) AS total,
-                   SUM(state = 'new') AS new,
-                   SUM(state = 'learning') AS learning,
-                   SUM(state = 'review') AS review,
-                   SUM(state = 'relearning') AS relearning,
-                   SUM(due_date <= datetime('now')) AS due_today
-               FROM cards WHERE user_id = ?
+                   COUNT(CASE WHEN state = 'new' THEN 1 END) AS new,
+                   COUNT(CASE WHEN state = 'learning' THEN 1 END) AS learning,
+                   COUNT(CASE WHEN state = 'review' THEN 1 END) AS review,
+                   COUNT(CASE WHEN state = 'relearning' THEN 1 END) AS relearning,
+                   COUNT(CASE WHEN due_date <= ? THEN 1 END) AS due_today
+               FROM cards
+               WHERE user_id = ? AND suspended = 0 AND buried_until IS NULL
             """,
-            (user_id,)
+            (_now(), user_id)
         )
         row = cursor.fetchone()
         return {k: (row[k] or 0) for k in row.keys()}
 
 
 def get_forecast(user_id: int, days: int = 7) -> list[dict[str, Any]]:
-    with get_db() as conn:
+    with get_db(user_id) as conn:
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT date(due_date) AS day, COUNT(*) AS cnt
+            """SELECT substr(due_date, 1, 10) AS day, COUNT(*) AS cnt
                FROM cards
                WHERE user_id = ?
-                 AND due_date > datetime('now')
-                 AND due_date <= datetime('now', ? || ' days')
-               GROUP BY date(due_date)
+                 AND due_date > ?
+                 AND due_date <= ?
+                 AND suspended = 0 AND buried_until IS NULL
+               GROUP BY substr(due_date, 1, 10)
                ORDER BY day
             """,
-            (user_id, str(days))
+            (user_id, _now(), _now(timedelta(days=days)))
         )
         rows = {row['day']: row['cnt'] for row in cursor.fetchall()}
 
@@ -333,29 +896,106 @@ def get_forecast(user_id: int, days: int = 7) -> list[dict[str, Any]]:
     ]
 
 
+def get_global_stats() -> dict[str, int]:
+    """Whole-bot totals, summed across every database file."""
+    now = _now()
+
+    def query(conn: Connection) -> dict[str, int]:
+        row = conn.execute(
+            """SELECT
+                   (SELECT COUNT(*) FROM users) AS users,
+                   (SELECT COUNT(*) FROM decks) AS decks,
+                   (SELECT COUNT(*) FROM cards) AS cards,
+                   (SELECT COUNT(*) FROM cards
+                    WHERE due_date <= ? AND suspended = 0 AND buried_until IS NULL) AS due
+            """,
+            (now,)
+        ).fetchone()
+        return dict(row)
+
+    totals: dict[str, int] = defaultdict(int)
+    for part in fan_out(query):
+        for key, value in part.items():
+            totals[key] += value
+    return dict(totals)
+
+
 # DB CONNECTION ==============================================
+#
+# Queries above are portable across backends (database/backends.py): qmark
+# placeholders, and "now" bound from Python as UTC text in the same
+# 'YYYY-MM-DD HH:MM:SS' form SQLite's datetime('now') produces.
 
-@contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+_backend: Backend | None = None
+_profiler: QueryProfiler | None = None
 
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+
+def _now(offset: timedelta = timedelta()) -> str:
+    return (datetime.now(timezone.utc) + offset).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def set_backend(backend: Backend | None) -> None:
+    """Use `backend` for every query (None = back to the configured default)."""
+    global _backend
+    if _backend is not None and _backend is not backend:
+        _backend.close()
+    _backend = backend
+
+
+def get_backend() -> Backend:
+    """The active backend: PostgreSQL if DATABASE_URL is set, else SQLite at DB_PATH."""
+    global _backend
+    if _backend is None and DATABASE_URL:
+        _backend = PostgresBackend(DATABASE_URL, DB_POOL_SIZE)
+    if _backend is not None:
+        return _backend
+    return _sqlite_backend(DB_PATH, DB_SHARDS)
+
+
+@lru_cache(maxsize=8)
+def _sqlite_backend(path: str, shards: int) -> SQLiteBackend:
+    # Keyed on the module globals so tests can repoint DB_PATH / DB_SHARDS
+    return SQLiteBackend(path, shards)
+
+
+def set_profiler(profiler: QueryProfiler | None) -> None:
+    """Profile every statement run through get_db / fan_out (None = off)."""
+    global _profiler
+    _profiler = profiler
+
+
+def get_profiler() -> QueryProfiler | None:
+    return _profiler
+
+
+@contextmanager
+def get_db(user_id: int | None = None) -> Generator[Connection, None, None]:
+    """Connection to the database holding user_id's data (the only one when unsharded)."""
+    with get_backend().connect(user_id) as conn:
+        if _profiler is None:
+            yield conn
+            return
+        profiled = _profiler.wrap(conn)
+        try:
+            yield profiled
+        finally:
+            profiled.finish()
+
+
+def fan_out(fn: Callable[[Connection], T]) -> list[T]:
+    """Run fn once per physical database, each in its own transaction. Results in shard order."""
+    if _profiler is None:
+        return get_backend().fan_out(fn)
+    profiler, caller = _profiler, sys._getframe(1).f_code.co_name
+    return get_backend().fan_out(lambda conn: profiler.run(fn, conn, caller))
 
 
 def init_db() -> None:
-    with get_db() as conn:
-        conn.execute(user_schema)
-        conn.execute(deck_schema)
-        conn.execute(card_schema)
-        for stmt in indexes_schema.strip().split(';'):
-            stmt = stmt.strip()
-            if stmt:
-                conn.execute(stmt)
+    get_backend().migrate()
+
+
+# Time every query function above (utils.metrics, family "db")
+instrument_module(globals(), 'db', exclude={'get_db', 'fan_out', 'get_backend', 'set_backend', 'get_profiler', 'set_profiler'})
+
+if SQL_PROFILE:
+    set_profiler(QueryProfiler(SQL_SLOW_MS, 'postgres' if DATABASE_URL else 'sqlite', SQL_SLOW_LOG or None))
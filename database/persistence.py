@@ -1,18 +1,27 @@
-"""SQLite-backed persistence for python-telegram-bot.
+"""Database-backed persistence for python-telegram-bot.
 
 Stores user_data, chat_data, bot_data, and conversation states as JSON blobs
-in dedicated tables. Uses the same DB file as the main application data.
+in dedicated tables, through any storage backend (database/backends.py).
+SQLitePersistence uses the same DB file as the main application data.
+
+In sharded mode (utils.sharding) each worker passes shard=(index, count) and
+only loads the users, chats and conversations that route to it; bot_data is
+owned by shard 0.
 """
 
 import json
 import logging
-import sqlite3
+from contextlib import AbstractContextManager
 
 from telegram.ext import BasePersistence, PersistenceInput
 
+from database.backends import Backend, Connection, SQLiteBackend
+from utils.metrics import timed
+from utils.sharding import shard_for
+
 logger = logging.getLogger(__name__)
 
-_SCHEMA = """
+_SQLITE_SCHEMA = """
 CREATE TABLE IF NOT EXISTS persistence_user_data (
     user_id INTEGER PRIMARY KEY,
     data TEXT NOT NULL DEFAULT '{}'
@@ -33,75 +42,69 @@ CREATE TABLE IF NOT EXISTS persistence_conversations (
 );
 """
 
+_SCHEMA = {
+    'sqlite': _SQLITE_SCHEMA,
+    'postgres': _SQLITE_SCHEMA.replace('INTEGER PRIMARY KEY,', 'BIGINT PRIMARY KEY,'),
+}
+
 
-class SQLitePersistence(BasePersistence):
-    """Persist PTB state to SQLite — survives bot restarts."""
+class DatabasePersistence(BasePersistence):
+    """Persist PTB state to the storage backend — survives bot restarts."""
 
-    def __init__(self, db_path: str) -> None:
+    def __init__(self, backend: Backend, shard: tuple[int, int] | None = None) -> None:
         super().__init__(
             store_data=PersistenceInput(
-                bot_data=True,
+                bot_data=shard is None or shard[0] == 0,
                 chat_data=True,
                 user_data=True,
                 callback_data=False,
             ),
         )
-        self.db_path = db_path
+        self.backend = backend
+        self.shard = shard
         self._init_tables()
 
     # ── Internals ────────────────────────────────────────────
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _owns(self, key: int) -> bool:
+        return self.shard is None or shard_for(key, self.shard[1]) == self.shard[0]
+
+    def _conn(self) -> AbstractContextManager[Connection]:
+        # Persistence rows are not user-sharded: always the backend's main database
+        return self.backend.connect()
 
     def _init_tables(self) -> None:
-        conn = self._conn()
-        try:
-            for stmt in _SCHEMA.strip().split(';'):
+        with self._conn() as conn:
+            for stmt in _SCHEMA[self.backend.dialect].strip().split(';'):
                 stmt = stmt.strip()
                 if stmt:
                     conn.execute(stmt)
-            conn.commit()
-        finally:
-            conn.close()
 
     # ── Read ─────────────────────────────────────────────────
 
     async def get_bot_data(self) -> dict:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             row = conn.execute(
                 "SELECT data FROM persistence_bot_data WHERE id = 1"
             ).fetchone()
             return json.loads(row['data']) if row else {}
-        finally:
-            conn.close()
 
     async def get_user_data(self) -> dict[int, dict]:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             rows = conn.execute(
                 "SELECT user_id, data FROM persistence_user_data"
             ).fetchall()
-            return {row['user_id']: json.loads(row['data']) for row in rows}
-        finally:
-            conn.close()
+            return {row['user_id']: json.loads(row['data']) for row in rows if self._owns(row['user_id'])}
 
     async def get_chat_data(self) -> dict[int, dict]:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             rows = conn.execute(
                 "SELECT chat_id, data FROM persistence_chat_data"
             ).fetchall()
-            return {row['chat_id']: json.loads(row['data']) for row in rows}
-        finally:
-            conn.close()
+            return {row['chat_id']: json.loads(row['data']) for row in rows if self._owns(row['chat_id'])}
 
     async def get_conversations(self, name: str) -> dict:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             rows = conn.execute(
                 "SELECT key, state FROM persistence_conversations WHERE handler_name = ?",
                 (name,),
@@ -109,61 +112,52 @@ class SQLitePersistence(BasePersistence):
             result = {}
             for row in rows:
                 key = tuple(json.loads(row['key']))
+                if not self._owns(key[-1]):   # (chat_id, user_id) — route by user
+                    continue
                 state = json.loads(row['state'])
                 result[key] = state
             return result
-        finally:
-            conn.close()
 
     async def get_callback_data(self) -> None:
         return None
 
     # ── Write ────────────────────────────────────────────────
 
+    @timed('persistence')
     async def update_bot_data(self, data: dict) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             conn.execute(
                 "INSERT INTO persistence_bot_data (id, data) VALUES (1, ?) "
                 "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
                 (json.dumps(data),),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
+    @timed('persistence')
     async def update_user_data(self, user_id: int, data: dict) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             conn.execute(
                 "INSERT INTO persistence_user_data (user_id, data) VALUES (?, ?) "
                 "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
                 (user_id, json.dumps(data)),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
+    @timed('persistence')
     async def update_chat_data(self, chat_id: int, data: dict) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             conn.execute(
                 "INSERT INTO persistence_chat_data (chat_id, data) VALUES (?, ?) "
                 "ON CONFLICT(chat_id) DO UPDATE SET data = excluded.data",
                 (chat_id, json.dumps(data)),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
     async def update_callback_data(self, data) -> None:
         pass
 
+    @timed('persistence')
     async def update_conversation(
         self, name: str, key: tuple, new_state: object | None
     ) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             key_json = json.dumps(list(key))
             if new_state is None:
                 conn.execute(
@@ -178,9 +172,6 @@ class SQLitePersistence(BasePersistence):
                     "ON CONFLICT(handler_name, key) DO UPDATE SET state = excluded.state",
                     (name, key_json, json.dumps(new_state)),
                 )
-            conn.commit()
-        finally:
-            conn.close()
 
     # ── Refresh (no external source — no-ops) ────────────────
 
@@ -195,29 +186,31 @@ class SQLitePersistence(BasePersistence):
 
     # ── Drop ─────────────────────────────────────────────────
 
+    @timed('persistence')
     async def drop_user_data(self, user_id: int) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             conn.execute(
                 "DELETE FROM persistence_user_data WHERE user_id = ?",
                 (user_id,),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
+    @timed('persistence')
     async def drop_chat_data(self, chat_id: int) -> None:
-        conn = self._conn()
-        try:
+        with self._conn() as conn:
             conn.execute(
                 "DELETE FROM persistence_chat_data WHERE chat_id = ?",
                 (chat_id,),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
     # ── Flush (all writes are immediate — no-op) ─────────────
 
     async def flush(self) -> None:
         pass
+
+
+class SQLitePersistence(DatabasePersistence):
+    """DatabasePersistence over a single SQLite file."""
+
+    def __init__(self, db_path: str, shard: tuple[int, int] | None = None) -> None:
+        self.db_path = db_path
+        super().__init__(SQLiteBackend(db_path), shard)
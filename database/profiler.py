@@ -0,0 +1,256 @@
+"""
+Opt-in SQL profiler for database/database.py.
+
+With SQL_PROFILE=1 (or db.set_profiler(...)) every connection handed out by
+get_db / fan_out is wrapped so each statement is timed from execute() through
+its last fetch. Statements are grouped by the repository function that ran
+them and their normalized SQL (literals -> ?, IN lists collapsed, whitespace
+squeezed), with
+
+  calls, total / max time, rows returned (or affected),
+  the query plan — EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (PostgreSQL) —
+  captured the first time a statement is seen.
+
+Statements slower than slow_ms go to the 'retain.sql.slow' logger (and to
+SQL_SLOW_LOG if set); report() renders the top-N table logged on shutdown.
+Parameters are never logged — they carry user content.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, TypeVar
+
+T = TypeVar('T')
+
+slow_log = logging.getLogger('retain.sql.slow')
+
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+_SKIP_FILES = {os.path.normcase(__file__)}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """One shape per statement: literals become ?, IN lists collapse, whitespace squeezed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+@dataclass
+class QueryStats:
+    caller: str
+    sql: str
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    rows: int = 0
+    plan: list[str] = field(default_factory=list)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+def _caller() -> str:
+    """Name of the first frame outside this module and contextlib — the repository function."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if (
+            os.path.normcase(code.co_filename) not in _SKIP_FILES
+            and not code.co_filename.endswith('contextlib.py')
+            and code.co_name not in ('get_db', 'fan_out', 'wrapper', '<lambda>')
+        ):
+            return code.co_name
+        frame = frame.f_back
+    return '?'
+
+
+class QueryProfiler:
+    def __init__(self, slow_ms: float = 50.0, dialect: str = 'sqlite', slow_log_path: str | None = None) -> None:
+        self.slow_ms = slow_ms
+        self.dialect = dialect
+        self.stats: dict[tuple[str, str], QueryStats] = {}
+        self._lock = threading.Lock()
+        if slow_log_path:
+            handler = logging.FileHandler(slow_log_path)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_log.addHandler(handler)
+
+    # ── Wrapping ─────────────────────────────────────────────
+
+    def wrap(self, conn: Any, caller: str | None = None) -> '_ProfiledConnection':
+        return _ProfiledConnection(conn, self, caller or _caller())
+
+    def run(self, fn: Callable[[Any], T], conn: Any, caller: str) -> T:
+        """fan_out helper: call fn on a profiled view of conn, then account its statements."""
+        profiled = self.wrap(conn, caller)
+        try:
+            return fn(profiled)
+        finally:
+            profiled.finish()
+
+    # ── Accounting ───────────────────────────────────────────
+
+    def _begin(self, caller: str, sql: str, params: Any, conn: Any) -> QueryStats:
+        key = (caller, normalize_sql(sql))
+        stats = self.stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(key, QueryStats(caller, key[1]))
+            if not stats.plan:
+                stats.plan = self._explain(conn, sql, params)
+        return stats
+
+    def _explain(self, conn: Any, sql: str, params: Any) -> list[str]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        prefix = 'EXPLAIN QUERY PLAN ' if self.dialect == 'sqlite' else 'EXPLAIN '
+        try:
+            rows = conn.execute(prefix + sql, params).fetchall()
+        except Exception as e:
+            return [f"(no plan: {e})"]
+        if self.dialect == 'sqlite':
+            return [row[3] for row in rows]
+        return [next(iter(dict(row).values())) for row in rows]
+
+    def _record(self, stats: QueryStats, seconds: float, rows: int) -> None:
+        with self._lock:
+            stats.calls += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.rows += rows
+        if seconds * 1000 >= self.slow_ms:
+            slow_log.warning(f"slow query {seconds * 1000:.1f} ms rows={rows} in {stats.caller}: {stats.sql}")
+
+    # ── Output ───────────────────────────────────────────────
+
+    def top(self, n: int = 10, by: str = 'total') -> list[QueryStats]:
+        return sorted(self.stats.values(), key=lambda s: getattr(s, by), reverse=True)[:n]
+
+    def report(self, n: int = 10, by: str = 'total') -> str:
+        lines = [
+            f"SQL profile — top {n} by {by} ({len(self.stats)} distinct statements)",
+            f"{'total ms':>10} {'calls':>7} {'mean ms':>8} {'max ms':>8} {'rows':>8}  caller / sql",
+        ]
+        for s in self.top(n, by):
+            lines.append(
+                f"{s.total * 1000:>10.1f} {s.calls:>7} {s.mean * 1000:>8.2f} {s.max * 1000:>8.2f} "
+                f"{s.rows:>8}  {s.caller}: {s.sql[:160]}"
+            )
+            lines.extend(f"{'':>46}plan: {step}" for step in s.plan)
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+
+class _ProfiledCursor:
+    """Times one cursor's statements; each is finished at the next execute or at finish()."""
+
+    def __init__(self, raw: Any, profiler: QueryProfiler, caller: str, conn: Any) -> None:
+        self._raw = raw
+        self._profiler = profiler
+        self._caller = caller
+        self._conn = conn
+        self._stats: QueryStats | None = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _start(self, sql: str, params: Any) -> None:
+        self.finish()
+        self._stats = self._profiler._begin(self._caller, sql, params, self._conn)
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def execute(self, sql: str, params: Any = ()) -> '_ProfiledCursor':
+        self._start(sql, params)
+        start = perf_counter()
+        self._raw.execute(sql, params)
+        self._elapsed += perf_counter() - start
+        return self
+
+    def executemany(self, sql: str, seq: Any) -> '_ProfiledCursor':
+        seq = list(seq)
+        self._start(sql, seq[0] if seq else ())
+        start = perf_counter()
+        self._raw.executemany(sql, seq)
+        self._elapsed += perf_counter() - start
+        return self
+
+    def fetchone(self) -> Any:
+        start = perf_counter()
+        row = self._raw.fetchone()
+        self._elapsed += perf_counter() - start
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size: int) -> list[Any]:
+        start = perf_counter()
+        rows = self._raw.fetchmany(size)
+        self._elapsed += perf_counter() - start
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        start = perf_counter()
+        rows = self._raw.fetchall()
+        self._elapsed += perf_counter() - start
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)           # rowcount, description, ...
+
+    def finish(self) -> None:
+        if self._stats is None:
+            return
+        rows = self._rows or max(getattr(self._raw, 'rowcount', 0) or 0, 0)
+        self._profiler._record(self._stats, self._elapsed, rows)
+        self._stats = None
+
+
+class _ProfiledConnection:
+    def __init__(self, raw: Any, profiler: QueryProfiler, caller: str) -> None:
+        self._raw = raw
+        self._profiler = profiler
+        self._caller = caller
+        self._cursors: list[_ProfiledCursor] = []
+
+    def cursor(self) -> _ProfiledCursor:
+        cursor = _ProfiledCursor(self._raw.cursor(), self._profiler, self._caller, self._raw)
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, sql: str, params: Any = ()) -> _ProfiledCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq: Any) -> _ProfiledCursor:
+        return self.cursor().executemany(sql, seq)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+    def finish(self) -> None:
+        for cursor in self._cursors:
+            cursor.finish()
+        self._cursors.clear()
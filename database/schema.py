@@ -11,19 +11,39 @@ deck_schema = '''
     )
 '''
 
-# ======================= CARDS ==========================
+# ======================= NOTES ==========================
+#
+# A note holds the content once; its cards (one per template, utils/templates.py)
+# hold only scheduling state. A reverse note has a forward and a reverse card
+# over the same text, so editing the pair is one row.
 
-card_schema = '''
-    CREATE TABLE IF NOT EXISTS cards (
-        card_id INTEGER PRIMARY KEY AUTOINCREMENT,
+note_schema = '''
+    CREATE TABLE IF NOT EXISTS notes (
+        note_id INTEGER PRIMARY KEY AUTOINCREMENT,
         deck_id INTEGER NOT NULL,
         user_id INTEGER NOT NULL,
-        
-        -- Card content
+
         front TEXT NOT NULL,
         back TEXT NOT NULL,
-        card_type TEXT DEFAULT 'basic',
+        note_type TEXT DEFAULT 'basic',     -- picks the templates: basic, reverse
         content_type TEXT DEFAULT 'text',
+
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+        FOREIGN KEY (deck_id) REFERENCES decks(deck_id) ON DELETE CASCADE
+    )
+'''
+
+# ======================= CARDS ==========================
+
+card_schema = '''
+    CREATE TABLE IF NOT EXISTS cards (
+        card_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        note_id INTEGER,
+        template TEXT DEFAULT 'forward',
+        deck_id INTEGER NOT NULL,           -- the note's, kept here for the per-deck/due indexes
+        user_id INTEGER NOT NULL,
         
         -- SRS parameters (for FSRS algorithm)
         state TEXT DEFAULT 'new',
@@ -34,16 +54,46 @@ card_schema = '''
         scheduled_days INTEGER DEFAULT 0,
         reps INTEGER DEFAULT 0,
         lapses INTEGER DEFAULT 0,
+
+        -- Out of review: suspended until the user resumes it, buried until
+        -- buried_until (the user's next local midnight, UTC) passes
+        suspended INTEGER DEFAULT 0,
+        buried_until TIMESTAMP,
+        leech INTEGER DEFAULT 0,            -- lapsed LEECH_THRESHOLD times (config.py)
         
         -- Metadata
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         
-        -- Foreign key relationship
+        -- Foreign key relationships
+        FOREIGN KEY (note_id) REFERENCES notes(note_id) ON DELETE CASCADE,
         FOREIGN KEY (deck_id) REFERENCES decks(deck_id) ON DELETE CASCADE
     )
 '''
 
+# ======================= PRESETS ========================
+#
+# Scheduling options (utils/srs.py Preset) per deck; deck_id 0 is the user's
+# default for decks without a row. Steps are space-separated minutes.
+
+preset_schema = '''
+    CREATE TABLE IF NOT EXISTS presets (
+        user_id INTEGER NOT NULL,
+        deck_id INTEGER NOT NULL,           -- 0 = the user's default
+
+        learning_steps TEXT NOT NULL,
+        relearning_steps TEXT NOT NULL,
+        graduating_interval INTEGER NOT NULL,
+        easy_interval INTEGER NOT NULL,
+        max_interval INTEGER NOT NULL,
+        new_per_day INTEGER NOT NULL,
+        reviews_per_day INTEGER NOT NULL,
+
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, deck_id)
+    )
+'''
+
 # ======================= USERS ==========================
 
 user_schema = '''
@@ -55,14 +105,144 @@ user_schema = '''
         default_deck_id INTEGER,
         default_card_type TEXT DEFAULT 'basic',
 
+        -- Due-card reminders
+        reminders_enabled INTEGER DEFAULT 1,
+        timezone TEXT DEFAULT 'UTC',
+        quiet_start INTEGER DEFAULT 22,     -- local hour, inclusive
+        quiet_end INTEGER DEFAULT 8,        -- local hour, exclusive
+        last_reminded_at TIMESTAMP,
+
+        shard_key INTEGER,                  -- utils.sharding.shard_key(user_id)
+
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (default_deck_id) REFERENCES decks(deck_id)
     )
 '''
 
+# Columns added after a table first shipped. init_db() adds any that an
+# existing database is missing via ALTER TABLE ... ADD COLUMN.
+added_columns = {
+    'users': [
+        ('reminders_enabled', 'INTEGER DEFAULT 1'),
+        ('timezone', "TEXT DEFAULT 'UTC'"),
+        ('quiet_start', 'INTEGER DEFAULT 22'),
+        ('quiet_end', 'INTEGER DEFAULT 8'),
+        ('last_reminded_at', 'TIMESTAMP'),
+        ('shard_key', 'BIGINT'),
+    ],
+    'cards': [
+        ('note_id', 'BIGINT'),
+        ('template', "TEXT DEFAULT 'forward'"),
+        ('suspended', 'INTEGER DEFAULT 0'),
+        ('buried_until', 'TEXT'),
+        ('leech', 'INTEGER DEFAULT 0'),
+    ],
+}
+
+# Content columns cards had before notes existed. init_db() moves them into
+# notes and drops them (database/backends.py, split_notes).
+legacy_card_columns = ('front', 'back', 'card_type', 'content_type', 'sibling_id')
+
+# Review, the due counts and the deck list only ever read active cards
+# (suspended = 0 AND buried_until IS NULL — the queries spell the predicate
+# out exactly so SQLite can match it), so their indexes are partial: suspended
+# and buried cards cost nothing there. idx_cards_buried is what the unbury job
+# (database.unbury_cards) scans, idx_cards_leeches the Leeches view, and
+# idx_cards_learning_due the range of learning cards the due-notice timers are
+# rebuilt from on startup (database.get_learning_due).
+
 indexes_schema = '''
     CREATE INDEX IF NOT EXISTS idx_decks_user_id ON decks(user_id);
     CREATE INDEX IF NOT EXISTS idx_cards_user_id ON cards(user_id);
     CREATE INDEX IF NOT EXISTS idx_cards_deck_id ON cards(deck_id);
     CREATE INDEX IF NOT EXISTS idx_cards_due_date ON cards(user_id, due_date);
-'''
\ No newline at end of file
+    CREATE INDEX IF NOT EXISTS idx_cards_note_id ON cards(note_id);
+    CREATE INDEX IF NOT EXISTS idx_notes_deck_id ON notes(deck_id);
+    CREATE INDEX IF NOT EXISTS idx_cards_active_due ON cards(user_id, due_date)
+        WHERE suspended = 0 AND buried_until IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_cards_active_deck ON cards(deck_id, due_date)
+        WHERE suspended = 0 AND buried_until IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_cards_buried ON cards(buried_until)
+        WHERE buried_until IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_cards_leeches ON cards(user_id, lapses);
+    CREATE INDEX IF NOT EXISTS idx_cards_learning_due ON cards(due_date)
+        WHERE state IN ('learning', 'relearning') AND suspended = 0 AND buried_until IS NULL;
+'''
+
+# ======================= POSTGRESQL =====================
+#
+# The same tables for PostgresBackend. Timestamps stay TEXT in the
+# 'YYYY-MM-DD HH:MM:SS' UTC form SQLite uses, so the repository's SQL (string
+# comparisons against bound timestamps, substr() for the day) runs unchanged
+# on both. Telegram ids exceed 32 bits — BIGINT throughout.
+# DDL in added_columns must be valid in both dialects. indexes_schema runs
+# after added_columns on both, so an index may cover an added column.
+
+_PG_NOW = "(to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS'))"
+
+pg_schema = f'''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id BIGINT PRIMARY KEY,
+        username TEXT,
+        name TEXT NOT NULL,
+        default_deck_id BIGINT,
+        default_card_type TEXT DEFAULT 'basic',
+        reminders_enabled INTEGER DEFAULT 1,
+        timezone TEXT DEFAULT 'UTC',
+        quiet_start INTEGER DEFAULT 22,
+        quiet_end INTEGER DEFAULT 8,
+        last_reminded_at TEXT,
+        shard_key BIGINT,
+        created_at TEXT DEFAULT {_PG_NOW}
+    );
+    CREATE TABLE IF NOT EXISTS decks (
+        deck_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+        deck_name TEXT NOT NULL,
+        created_at TEXT DEFAULT {_PG_NOW}
+    );
+    CREATE TABLE IF NOT EXISTS notes (
+        note_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        deck_id BIGINT NOT NULL REFERENCES decks(deck_id) ON DELETE CASCADE,
+        user_id BIGINT NOT NULL,
+        front TEXT NOT NULL,
+        back TEXT NOT NULL,
+        note_type TEXT DEFAULT 'basic',
+        content_type TEXT DEFAULT 'text',
+        created_at TEXT DEFAULT {_PG_NOW},
+        updated_at TEXT DEFAULT {_PG_NOW}
+    );
+    CREATE TABLE IF NOT EXISTS cards (
+        card_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        note_id BIGINT REFERENCES notes(note_id) ON DELETE CASCADE,
+        template TEXT DEFAULT 'forward',
+        deck_id BIGINT NOT NULL REFERENCES decks(deck_id) ON DELETE CASCADE,
+        user_id BIGINT NOT NULL,
+        state TEXT DEFAULT 'new',
+        due_date TEXT DEFAULT {_PG_NOW},
+        stability REAL DEFAULT 0.0,
+        difficulty REAL DEFAULT 5.0,
+        elapsed_days INTEGER DEFAULT 0,
+        scheduled_days INTEGER DEFAULT 0,
+        reps INTEGER DEFAULT 0,
+        lapses INTEGER DEFAULT 0,
+        suspended INTEGER DEFAULT 0,
+        buried_until TEXT,
+        leech INTEGER DEFAULT 0,
+        created_at TEXT DEFAULT {_PG_NOW},
+        updated_at TEXT DEFAULT {_PG_NOW}
+    );
+    CREATE TABLE IF NOT EXISTS presets (
+        user_id BIGINT NOT NULL,
+        deck_id BIGINT NOT NULL,
+        learning_steps TEXT NOT NULL,
+        relearning_steps TEXT NOT NULL,
+        graduating_interval INTEGER NOT NULL,
+        easy_interval INTEGER NOT NULL,
+        max_interval INTEGER NOT NULL,
+        new_per_day INTEGER NOT NULL,
+        reviews_per_day INTEGER NOT NULL,
+        updated_at TEXT DEFAULT {_PG_NOW},
+        PRIMARY KEY (user_id, deck_id)
+    )
+'''
@@ -0,0 +1,43 @@
+import html
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+import database.database as db
+from config import ADMIN_IDS
+from utils.metrics import METRICS
+from utils.telegram_helpers import safe_send_text
+
+TOP = 12
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def build_admin_stats_text() -> str:
+    totals = db.get_global_stats()
+    lines = [
+        f"{'call':<32} {'n':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'err':>4}",
+    ]
+    for row in METRICS.summary()[:TOP]:
+        name = f"{row['family']}:{row['name']}"[:32]
+        lines.append(
+            f"{name:<32} {row['count']:>7} {_ms(row['p50']):>7} {_ms(row['p95']):>7} "
+            f"{_ms(row['p99']):>7} {row['errors']:>4}"
+        )
+    return (
+        f"<b>\U0001f6e0 Admin stats</b>\n\n"
+        f"\U0001f464 Users: <b>{totals['users']}</b> \u00b7 "
+        f"\U0001f4da Decks: <b>{totals['decks']}</b> \u00b7 "
+        f"\U0001f0cf Cards: <b>{totals['cards']}</b> \u00b7 "
+        f"\U0001f514 Due: <b>{totals['due']}</b>\n\n"
+        f"<b>Busiest calls</b> (ms, by total time)\n"
+        f"<pre>{html.escape(chr(10).join(lines))}</pre>"
+    )
+
+
+async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id not in ADMIN_IDS:
+        return  # not advertised; stay silent for everyone else
+    await safe_send_text(update.message, build_admin_stats_text())
@@ -1,5 +1,6 @@
 import html
 import logging
+from functools import lru_cache
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
@@ -7,20 +8,20 @@ from telegram.ext import ContextTypes, ConversationHandler
 import database.database as db
 import handlers.flow_handlers as hand_flow
 import utils.utils as utils
-import utils.callbacks as cb
 from utils.constants import AddCardState
-from utils.telegram_helpers import safe_edit_text
+from utils.telegram_helpers import answer_soon, safe_edit_text
+from utils.templates import CLOZE, is_cloze
 
 
 async def add_card_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     deck_id = context.user_data.get('default_deck_id')
     card_type = context.user_data.get('default_card_type')
 
     if deck_id and card_type:
-        deck_name = db.get_deck_name(deck_id)
+        deck_name = db.get_deck_name(deck_id, update.effective_user.id)
 
         if deck_name is None:
             logging.info("Can't get a deck name from the db")
@@ -46,6 +47,7 @@ async def add_card_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             query,
             "\U0001f4dd Send me text or a photo\n\n"
             "<i>Text: use <code>front | back</code> or two lines\n"
+            "Cloze: <code>{{c1::Paris}} is the capital of {{c2::France}}</code>\n"
             "Photo: add a caption \u2014 it becomes the back side</i>"
         )
 
@@ -54,12 +56,13 @@ async def add_card_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def save_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     cur_card = context.user_data.get('cur_card')
+    cur_cards = context.user_data.get('cur_cards')
     deck_id = context.user_data.get('cur_deck_id') or context.user_data.get('default_deck_id')
 
-    if not cur_card or not deck_id:
+    if not (cur_card or cur_cards) or not deck_id:
         await safe_edit_text(
             query,
             "\u26a0\ufe0f Session expired \u2014 please start over.",
@@ -70,8 +73,14 @@ async def save_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     # temp_type (explicit choice this session) takes priority over stored default
     card_type = context.user_data.get('temp_type') or context.user_data.get('default_card_type', 'basic')
 
-    logging.info("Saving card...")
-    db.save_card(cur_card, card_type, deck_id, update.effective_user.id)
+    if cur_cards:
+        logging.info(f"Saving {len(cur_cards)} cards...")
+        saved = db.save_cards(cur_cards, card_type, deck_id, update.effective_user.id)
+        done_text = f"\u2714\ufe0f Saved {saved} cards! Send me more"
+    else:
+        logging.info("Saving card...")
+        db.save_card(cur_card, card_type, deck_id, update.effective_user.id)
+        done_text = "\u2714\ufe0f Saved! Send me another one"
 
     user_id = update.effective_user.id
 
@@ -81,17 +90,22 @@ async def save_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         context.user_data['default_deck_id'] = new_deck_id
         db.update_user_defaults(user_id, deck_id=new_deck_id)
 
-    # Persist type choice as new default
-    context.user_data['default_card_type'] = card_type
-    db.update_user_defaults(user_id, card_type=card_type)
+    # Persist type choice as new default (cloze follows the content, it is never a default)
+    if card_type != CLOZE:
+        context.user_data['default_card_type'] = card_type
+        db.update_user_defaults(user_id, card_type=card_type)
 
     context.user_data.pop('cur_card', None)
+    context.user_data.pop('cur_cards', None)
+    context.user_data.pop('bulk_skipped', None)
+    context.user_data.pop('bulk_too_long', None)
+    context.user_data.pop('bulk_cloze', None)
     context.user_data.pop('cur_deck_id', None)
     context.user_data.pop('temp_type', None)
 
     await safe_edit_text(
         query,
-        "\u2714\ufe0f Saved! Send me another one",
+        done_text,
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("Menu", callback_data='main_menu')]
         ])
@@ -102,7 +116,7 @@ async def save_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def change_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     user_id = update.effective_user.id
     decks = db.get_all_decks(user_id)
@@ -122,50 +136,79 @@ async def change_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     await safe_edit_text(query, "\u270f\ufe0f Send the new content")
 
     return AddCardState.AWAITING_CONTENT
 
 
-async def change_type_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Show card type picker."""
-    query = update.callback_query
-    await query.answer()
+_TYPE_EMOJIS = {'basic': '\U0001f4c4', 'reverse': '\U0001f501', 'cloze': '\U0001f573'}
 
-    current = context.user_data.get('temp_type') or context.user_data.get('default_card_type', 'basic')
+_TYPE_PICKER_TEXT = (
+    "<b>Card type</b>\n\n"
+    "\U0001f4c4 Basic \u2014 one card (front \u2192 back)\n"
+    "\U0001f501 Reverse \u2014 two cards (front \u2192 back <b>+</b> back \u2192 front)\n"
+    "\U0001f573 Cloze \u2014 one card per <code>{{c1::blank}}</code> in the text"
+)
 
-    _EMOJIS = {'basic': '\U0001f4c4', 'reverse': '\U0001f501'}
 
+@lru_cache(maxsize=16)
+def _type_picker_markup(current: str, cloze: bool = False) -> InlineKeyboardMarkup:
+    """The type picker with `current` ticked — one markup per card type (Cloze only offered for cloze text)."""
     def _label(name: str) -> str:
-        base = f"{_EMOJIS[name]} {name.capitalize()}"
+        base = f"{_TYPE_EMOJIS[name]} {name.capitalize()}"
         return f"\u2714 {base}" if current == name else base
 
+    row = [
+        InlineKeyboardButton(_label("basic"), callback_data='set_type_basic'),
+        InlineKeyboardButton(_label("reverse"), callback_data='set_type_reverse'),
+    ]
+    if cloze:
+        row.append(InlineKeyboardButton(_label(CLOZE), callback_data='set_type_cloze'))
+    return InlineKeyboardMarkup([
+        row,
+        [InlineKeyboardButton("\u2190 Back", callback_data='type_back')],
+    ])
+
+
+_NOT_CLOZE_TEXT = "The text has no {{c1::...}} blanks \u2014 it can't be a cloze card"
+
+
+def _can_be_cloze(context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Only a single text card with deletions can be a cloze card."""
+    cur_card = context.user_data.get('cur_card') or {}
+    return not cur_card.get('is_photo') and is_cloze(cur_card.get('front') or '')
+
+
+async def change_type_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Show card type picker."""
+    query = update.callback_query
+    answer_soon(query)
+
+    current = context.user_data.get('temp_type') or context.user_data.get('default_card_type', 'basic')
+
     await safe_edit_text(
         query,
-        "<b>Card type</b>\n\n"
-        "\U0001f4c4 Basic \u2014 one card (front \u2192 back)\n"
-        "\U0001f501 Reverse \u2014 two cards (front \u2192 back <b>+</b> back \u2192 front)",
-        reply_markup=InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton(_label("basic"), callback_data='set_type_basic'),
-                InlineKeyboardButton(_label("reverse"), callback_data='set_type_reverse'),
-            ],
-            [InlineKeyboardButton("\u2190 Back", callback_data='type_back')],
-        ])
+        _TYPE_PICKER_TEXT,
+        reply_markup=_type_picker_markup(current, _can_be_cloze(context))
     )
 
     return AddCardState.CONFIRMATION_PREVIEW
 
 
 async def set_card_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """User picked a type — store it and return to preview."""
-    query = update.callback_query
-    await query.answer()
+    """User picked a type — store it and return to preview.
 
-    card_type = cb.parse_args(query.data, cb.SET_TYPE)[0]
-    context.user_data['temp_type'] = card_type
+    A Cloze button from an older picker can outlive the text it was offered for.
+    """
+    query = update.callback_query
+    [card_type] = context.args
+    if card_type == CLOZE and not _can_be_cloze(context):
+        answer_soon(query, _NOT_CLOZE_TEXT, show_alert=True)
+    else:
+        answer_soon(query)
+        context.user_data['temp_type'] = card_type
 
     await hand_flow.preview(query, context)
     return AddCardState.CONFIRMATION_PREVIEW
@@ -174,7 +217,7 @@ async def set_card_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 async def type_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Back from type picker — re-show preview without changing anything."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     await hand_flow.preview(query, context)
     return AddCardState.CONFIRMATION_PREVIEW
@@ -6,9 +6,8 @@ from telegram.ext import ContextTypes
 
 import database.database as db
 import handlers.flow_handlers as hand_flow
-import utils.callbacks as cb
 from utils.constants import AddCardState, DECK_NAME_MAX
-from utils.telegram_helpers import safe_send_text, safe_edit_text
+from utils.telegram_helpers import answer_soon, safe_send_text, safe_edit_text
 
 
 async def create_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -30,7 +29,7 @@ async def create_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     deck_id = db.create_deck_db(update.effective_user.id, deck_name)
     context.user_data['cur_deck_id'] = deck_id
 
-    if context.user_data.get('cur_card'):
+    if context.user_data.get('cur_card') or context.user_data.get('cur_cards'):
         await hand_flow.preview(update.message, context)
         return AddCardState.CONFIRMATION_PREVIEW
 
@@ -49,9 +48,9 @@ async def create_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
 async def selected_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
-    deck_id = cb.parse_int(query.data, cb.DECK)
+    [deck_id] = context.args
     context.user_data['cur_deck_id'] = deck_id
 
     await hand_flow.preview(query, context)
@@ -60,7 +59,7 @@ async def selected_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
 async def create_new_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     await safe_edit_text(query, "\u270f\ufe0f Name for the new deck:")
     return AddCardState.CREATING_DECK
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Any
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, Message
@@ -5,15 +6,16 @@ from telegram.ext import ContextTypes
 
 import database.database as db
 import utils.callbacks as cb
-from utils.telegram_helpers import safe_edit_text, safe_send_text
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text
 
 DECKS_PER_PAGE = 5
+DECK_PAGE_CACHE_SIZE = 1024
 
 
 async def my_decks_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Entry point from main menu — show first page of decks."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     user_id = update.effective_user.id
     decks = db.get_decks_with_stats(user_id)
@@ -37,9 +39,9 @@ async def my_decks_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def decks_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle page navigation."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
-    page = cb.parse_int(query.data, cb.DECKS_PAGE)
+    [page] = context.args
     await _show_decks_page(query, context, page)
 
 
@@ -66,13 +68,20 @@ async def decks_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 # ── private helpers ──────────────────────────────────────────
 
-def _deck_button(deck: dict[str, Any]) -> InlineKeyboardButton:
+DeckRow = tuple[int, str, int, int]      # deck_id, name, card_count, due_count
+
+
+def _deck_row(deck: dict[str, Any]) -> DeckRow:
+    """The fields a deck button shows — part of its page's cache key."""
+    return deck['deck_id'], deck['deck_name'], deck['card_count'] or 0, deck['due_count'] or 0
+
+
+def _deck_button(row: DeckRow) -> InlineKeyboardButton:
     """Build a single deck row button."""
-    due = deck['due_count'] or 0
-    total = deck['card_count'] or 0
+    deck_id, name, total, due = row
     due_part = f"  \u2757 {due} due" if due > 0 else ""
-    label = f"\U0001f4da {deck['deck_name']} \u00b7 {total} cards{due_part}"
-    return InlineKeyboardButton(label, callback_data=cb.make(cb.DECK_OPEN, deck['deck_id']))
+    label = f"\U0001f4da {name} \u00b7 {total} cards{due_part}"
+    return InlineKeyboardButton(label, callback_data=cb.make(cb.DECK_OPEN, deck_id))
 
 
 def _build_decks_markup(
@@ -80,16 +89,21 @@ def _build_decks_markup(
     page: int,
     total_pages: int,
 ) -> tuple[str, InlineKeyboardMarkup]:
+    """Header and markup for one page, built once per distinct page content."""
     start = page * DECKS_PER_PAGE
-    page_decks = decks[start:start + DECKS_PER_PAGE]
+    rows = tuple(_deck_row(d) for d in decks[start:start + DECKS_PER_PAGE])
+    return _render_decks_page(rows, page, total_pages)
+
 
+@lru_cache(maxsize=DECK_PAGE_CACHE_SIZE)
+def _render_decks_page(rows: tuple[DeckRow, ...], page: int, total_pages: int) -> tuple[str, InlineKeyboardMarkup]:
     if total_pages > 1:
         header = f"\U0001f4da My Decks ({page + 1}/{total_pages})"
     else:
         header = "\U0001f4da My Decks"
 
     buttons: list[list[InlineKeyboardButton]] = [
-        [_deck_button(d)] for d in page_decks
+        [_deck_button(row)] for row in rows
     ]
 
     if total_pages > 1:
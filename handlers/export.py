@@ -0,0 +1,126 @@
+import asyncio
+import html
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+import database.database as db
+from utils.export import FORMATS, export_cards, export_filename, read_export
+from utils.telegram_helpers import answer_soon, safe_send_text, safe_send_document
+
+
+EXPORT_USAGE = (
+    "<b>\U0001f4e6 Export</b>\n\n"
+    "<code>/export</code> \u2014 whole collection as CSV\n"
+    "<code>/export json</code> \u2014 as JSON\n"
+    "<code>/export French gz</code> \u2014 one deck, gzip-compressed\n\n"
+    "Send an exported file back to import it, scheduling and all."
+)
+
+# Telegram lets bots download files up to 20 MB
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/export [deck name] [csv|json] [gz]"""
+    user_id = update.effective_user.id
+    fmt = 'csv'
+    compress = False
+    name_parts: list[str] = []
+
+    for arg in context.args or []:
+        token = arg.lower()
+        if token in FORMATS:
+            fmt = token
+        elif token in ('gz', 'gzip'):
+            compress = True
+        elif token == 'help':
+            await safe_send_text(update.message, EXPORT_USAGE)
+            return
+        else:
+            name_parts.append(arg)
+
+    deck_id = None
+    deck_name = None
+    if name_parts:
+        deck_name = ' '.join(name_parts)
+        deck_id = db.get_deck_id(user_id, deck_name)
+        if deck_id is None:
+            await safe_send_text(
+                update.message,
+                f"\u26a0\ufe0f No deck named <b>{html.escape(deck_name)}</b>.\n\n{EXPORT_USAGE}"
+            )
+            return
+
+    await _send_export(update.effective_chat.id, context, user_id, deck_id, deck_name, fmt, compress)
+
+
+async def deck_export(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """'Export' button in the deck detail view — sends that deck as CSV."""
+    query = update.callback_query
+    answer_soon(query)
+
+    [deck_id] = context.args
+    user_id = update.effective_user.id
+    deck_name = db.get_deck_name(deck_id, user_id)
+    if deck_name is None:
+        return
+
+    await _send_export(query.message.chat_id, context, user_id, deck_id, deck_name, 'csv', False)
+
+
+async def _send_export(
+    chat_id: int,
+    context: ContextTypes.DEFAULT_TYPE,
+    user_id: int,
+    deck_id: int | None,
+    deck_name: str | None,
+    fmt: str,
+    compress: bool,
+) -> None:
+    target = (chat_id, context.bot)
+
+    # Building the file touches every card — keep it off the event loop
+    document, count = await asyncio.to_thread(
+        export_cards, db.iter_export_rows(user_id, deck_id), fmt, compress
+    )
+    try:
+        if count == 0:
+            await safe_send_text(target, "\U0001f4ed Nothing to export yet.")
+            return
+
+        logging.info(f"Exporting {count} cards for user {user_id} (deck={deck_id}, fmt={fmt}, gz={compress})")
+        await safe_send_document(
+            target,
+            document,
+            filename=export_filename(deck_name, fmt, compress),
+            caption=f"\U0001f4e6 {count} card{'s' if count != 1 else ''}",
+        )
+    finally:
+        document.close()
+
+
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """A document sent outside any conversation: an /export file to import."""
+    user_id = update.effective_user.id
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await safe_send_text(update.message, "\u26a0\ufe0f That file is too big to import (20 MB at most).")
+        return
+
+    file = await document.get_file()
+    data = bytes(await file.download_as_bytearray())
+    try:
+        rows = await asyncio.to_thread(read_export, data)
+    except (ValueError, OSError) as e:
+        logging.info(f"Rejected import from user {user_id}: {e}")
+        await safe_send_text(
+            update.message,
+            f"\u26a0\ufe0f That isn't a file from /export ({html.escape(str(e))}).\n\n{EXPORT_USAGE}"
+        )
+        return
+
+    count = await asyncio.to_thread(db.import_rows, rows, user_id)
+    logging.info(f"Imported {count} cards for user {user_id}")
+    await safe_send_text(update.message, f"\U0001f4e5 Imported {count} card{'s' if count != 1 else ''}.")
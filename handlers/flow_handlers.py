@@ -6,11 +6,22 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 import database.database as db
 import utils.utils as utils
-from utils.constants import AddCardState, PREVIEW_BUTTONS
-from utils.telegram_helpers import safe_edit_text, safe_send_text, safe_send_photo
+from utils.constants import AddCardState, PREVIEW_MARKUP
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text, safe_send_photo
+from utils.templates import CLOZE, cloze_numbers, is_cloze
 
 
 CARD_SIDE_MAX = 1000
+BULK_PREVIEW_ROWS = 10
+BULK_PREVIEW_SIDE_MAX = 40
+
+
+def _set_cloze(context: ContextTypes.DEFAULT_TYPE, cloze: bool) -> None:
+    """Cloze is picked by the content: text with {{c1::...}} deletions is a cloze card, anything else isn't."""
+    if cloze:
+        context.user_data['temp_type'] = CLOZE
+    elif context.user_data.get('temp_type') == CLOZE:
+        context.user_data.pop('temp_type')
 
 
 async def get_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -18,8 +29,48 @@ async def get_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
     card_type = context.user_data.get('default_card_type')
     if update.message.photo:
+        _set_cloze(context, False)
         raw_content = update.message.photo[-1]
         context.user_data['cur_card'] = utils.parse_photo(raw_content, update.message.caption)
+        context.user_data.pop('cur_cards', None)
+    elif utils.is_bulk(update.message.text):
+        _set_cloze(context, False)
+        cards, skipped = utils.parse_bulk(update.message.text)
+        fitting = [c for c in cards if len(c['front']) <= CARD_SIDE_MAX and len(c['back']) <= CARD_SIDE_MAX]
+        too_long = len(cards) - len(fitting)
+        # Cloze notes are one per message: a bulk line is a plain front | back pair
+        cards = [c for c in fitting if not is_cloze(c['front']) and not is_cloze(c['back'])]
+        cloze = len(fitting) - len(cards)
+
+        if not cards:
+            if cloze:
+                await safe_send_text(
+                    update.message,
+                    "\u26a0\ufe0f Cloze cards (<code>{{c1::...}}</code>) can't be added in bulk. "
+                    "Send each one as its own message:"
+                )
+                return AddCardState.AWAITING_CONTENT
+            if too_long:
+                await safe_send_text(
+                    update.message,
+                    f"\u26a0\ufe0f Too long \u2014 each side can be up to {CARD_SIDE_MAX} characters. Try again:"
+                )
+                return AddCardState.AWAITING_CONTENT
+            await safe_send_text(
+                update.message,
+                "\u26a0\ufe0f No complete cards found.\n\n"
+                "Send one <code>front | back</code> pair per line:"
+            )
+            return AddCardState.AWAITING_CONTENT
+
+        logging.info(
+            f"Got {len(cards)} cards in bulk ({len(skipped)} lines incomplete, {too_long} too long, {cloze} cloze)"
+        )
+        context.user_data['cur_cards'] = cards
+        context.user_data['bulk_skipped'] = len(skipped)
+        context.user_data['bulk_too_long'] = too_long
+        context.user_data['bulk_cloze'] = cloze
+        context.user_data.pop('cur_card', None)
     else:
         raw_content = update.message.text
         parsed = utils.parse_text(raw_content, card_type)
@@ -35,7 +86,10 @@ async def get_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             )
             return AddCardState.AWAITING_CONTENT
 
-        if not parsed['back']:
+        cloze = is_cloze(parsed['front'])
+        _set_cloze(context, cloze)
+
+        if not parsed['back'] and not cloze:
             front_hint = html.escape(parsed['front'][:20])
             await safe_send_text(
                 update.message,
@@ -48,6 +102,7 @@ async def get_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             return AddCardState.AWAITING_CONTENT
 
         context.user_data['cur_card'] = parsed
+        context.user_data.pop('cur_cards', None)
 
     if context.user_data.get('default_deck_id'):
         await preview(update.message, context)
@@ -80,7 +135,11 @@ async def _show_deck_selection(message, context: ContextTypes.DEFAULT_TYPE) -> i
 
 
 async def preview(message_or_query, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Works with both Message and CallbackQuery. Handles photo and text cards."""
+    """Works with both Message and CallbackQuery. Handles photo, text and bulk cards."""
+    if context.user_data.get('cur_cards'):
+        await _preview_bulk(message_or_query, context)
+        return
+
     cur_card = context.user_data.get('cur_card', {})
     is_photo = cur_card.get('is_photo', False)
     front = cur_card.get('front', '[empty]')
@@ -89,10 +148,13 @@ async def preview(message_or_query, context: ContextTypes.DEFAULT_TYPE) -> None:
     deck_id = context.user_data.get('cur_deck_id') or context.user_data.get('default_deck_id')
     card_type = context.user_data.get('temp_type') or context.user_data.get('default_card_type', 'basic')
 
-    deck_name = db.get_deck_name(deck_id) if deck_id else "\u2014"
-    markup = InlineKeyboardMarkup(PREVIEW_BUTTONS)
+    deck_name = db.get_deck_name(deck_id, message_or_query.from_user.id) if deck_id else "\u2014"
+    markup = PREVIEW_MARKUP
 
     type_note = "\n<i>Creates 2 cards (original + flipped)</i>" if card_type == 'reverse' else ""
+    if card_type == CLOZE:
+        count = len(cloze_numbers(front))
+        type_note = f"\n<i>Creates {count} card{'s' if count != 1 else ''} (one per cloze number)</i>"
 
     if is_photo:
         no_caption_warning = "\n\u26a0\ufe0f <i>No caption \u2014 the answer will be empty during review</i>" if not back else ""
@@ -124,9 +186,59 @@ async def preview(message_or_query, context: ContextTypes.DEFAULT_TYPE) -> None:
             await safe_edit_text(message_or_query, preview_text, reply_markup=markup)
 
 
+async def _preview_bulk(message_or_query, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Summary preview for a multi-line message: count plus the first few pairs."""
+    cards = context.user_data['cur_cards']
+    skipped = context.user_data.get('bulk_skipped', 0)
+    too_long = context.user_data.get('bulk_too_long', 0)
+    cloze = context.user_data.get('bulk_cloze', 0)
+
+    deck_id = context.user_data.get('cur_deck_id') or context.user_data.get('default_deck_id')
+    card_type = context.user_data.get('temp_type') or context.user_data.get('default_card_type', 'basic')
+    deck_name = db.get_deck_name(deck_id, message_or_query.from_user.id) if deck_id else "\u2014"
+
+    def _short(text: str) -> str:
+        return html.escape(text if len(text) <= BULK_PREVIEW_SIDE_MAX else text[:BULK_PREVIEW_SIDE_MAX - 1] + '\u2026')
+
+    lines = [
+        f"{i}. {_short(c['front'])} \u2192 {_short(c['back'])}"
+        for i, c in enumerate(cards[:BULK_PREVIEW_ROWS], start=1)
+    ]
+    if len(cards) > BULK_PREVIEW_ROWS:
+        lines.append(f"<i>\u2026and {len(cards) - BULK_PREVIEW_ROWS} more</i>")
+
+    count = len(cards)
+    notes = ""
+    if card_type == 'reverse':
+        notes += f"\n<i>Creates {count * 2} cards (original + flipped)</i>"
+    if skipped:
+        notes += f"\n\u26a0\ufe0f <i>{skipped} line{'s' if skipped != 1 else ''} skipped \u2014 missing a side</i>"
+    if too_long:
+        notes += (
+            f"\n\u26a0\ufe0f <i>{too_long} line{'s' if too_long != 1 else ''} skipped \u2014 "
+            f"a side over {CARD_SIDE_MAX} characters</i>"
+        )
+    if cloze:
+        notes += (
+            f"\n\u26a0\ufe0f <i>{cloze} line{'s' if cloze != 1 else ''} skipped \u2014 "
+            f"cloze cards go one per message</i>"
+        )
+
+    preview_text = (
+        f"<b>\U0001f4cb Preview \u00b7 {count} card{'s' if count != 1 else ''}</b>\n\n"
+        + '\n'.join(lines) +
+        f"\n\n<i>\U0001f4c1 {html.escape(deck_name or '')} \u00b7 {card_type}</i>{notes}"
+    )
+    markup = PREVIEW_MARKUP
+    if hasattr(message_or_query, 'reply_text'):
+        await safe_send_text(message_or_query, preview_text, reply_markup=markup)
+    else:
+        await safe_edit_text(message_or_query, preview_text, reply_markup=markup)
+
+
 async def back_to_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     await safe_edit_text(query, "\u270f\ufe0f Send me new text or a photo")
     return AddCardState.AWAITING_CONTENT
@@ -134,9 +246,13 @@ async def back_to_content(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def menu_exit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     context.user_data.pop('cur_card', None)
+    context.user_data.pop('cur_cards', None)
+    context.user_data.pop('bulk_skipped', None)
+    context.user_data.pop('bulk_too_long', None)
+    context.user_data.pop('bulk_cloze', None)
     context.user_data.pop('cur_deck_id', None)
     context.user_data.pop('temp_type', None)
 
@@ -148,6 +264,10 @@ async def menu_exit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.pop('cur_card', None)
+    context.user_data.pop('cur_cards', None)
+    context.user_data.pop('bulk_skipped', None)
+    context.user_data.pop('bulk_too_long', None)
+    context.user_data.pop('bulk_cloze', None)
     context.user_data.pop('cur_deck_id', None)
     context.user_data.pop('temp_type', None)
 
@@ -155,7 +275,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text, markup = build_main_menu(update.effective_user.id)
 
     if update.callback_query:
-        await update.callback_query.answer()
+        answer_soon(update.callback_query)
         await safe_edit_text(update.callback_query, text, reply_markup=markup)
     else:
         await safe_send_text(update.message, text, reply_markup=markup)
@@ -1,13 +1,14 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils.telegram_helpers import safe_send_text
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text
 
 
 HELP_TEXT = (
     "<b>\u2753 How it works</b>\n\n"
     "1. Send me text or a photo \u2014 I'll make a card\n"
     "2. Use <code>front | back</code> to set both sides\n"
+    "   (one pair per line adds many cards at once)\n"
     "3. Hit Review when cards are due\n"
     "4. Rate how well you remembered\n\n"
     "I'll schedule each card so you review it "
@@ -21,8 +22,8 @@ _MARKUP = InlineKeyboardMarkup([
 
 async def help_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    await query.edit_message_text(HELP_TEXT, reply_markup=_MARKUP, parse_mode='HTML')
+    answer_soon(query)
+    await safe_edit_text(query, HELP_TEXT, reply_markup=_MARKUP)
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -4,14 +4,17 @@ import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from telegram.ext import (
     ContextTypes, ConversationHandler,
-    MessageHandler, CommandHandler, CallbackQueryHandler, filters,
+    MessageHandler, CommandHandler, filters,
 )
 
 import database.database as db
 import utils.callbacks as cb
 from handlers.start import force_start
 from utils.constants import ManageState, DECK_NAME_MAX
-from utils.telegram_helpers import safe_edit_text, safe_send_text
+from utils.presets import DEFAULT_DECK, SETTINGS_USAGE, describe, parse_setting
+from utils.router import DIGITS, CallbackRouter, Route
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text
+from utils.templates import cloze_number, edit_sides, is_cloze
 from utils.utils import parse_text
 
 CARDS_PER_PAGE = 5
@@ -22,6 +25,22 @@ def _truncate(text: str, max_len: int) -> str:
     return text if len(text) <= max_len else text[:max_len - 1] + '\u2026'
 
 
+def _card_label(card: dict) -> str:
+    if card.get('content_type') == 'photo':
+        return '\U0001f4f7 Photo card'
+    return _truncate(card['front'], FRONT_MAX)
+
+
+def _status_mark(card: dict) -> str:
+    """' \U0001fa78' for a leech, then ' \u23f8' if suspended or ' \U0001f4a4' if buried until tomorrow."""
+    mark = ' \U0001fa78' if card.get('leech') else ''
+    if card.get('suspended'):
+        return mark + ' \u23f8'
+    if card.get('buried_until'):
+        return mark + ' \U0001f4a4'
+    return mark
+
+
 async def _show_deck_detail(
     query: CallbackQuery,
     context: ContextTypes.DEFAULT_TYPE,
@@ -30,7 +49,7 @@ async def _show_deck_detail(
 ) -> None:
     user_id = query.from_user.id
 
-    deck_name = db.get_deck_name(deck_id)
+    deck_name = db.get_deck_name(deck_id, user_id)
     if not deck_name:
         await safe_edit_text(
             query,
@@ -52,15 +71,12 @@ async def _show_deck_detail(
     start = page * CARDS_PER_PAGE
     page_cards = cards[start:start + CARDS_PER_PAGE]
     context.user_data['manage_page_cards'] = page_cards
+    nonce = cb.new_nonce(context.user_data, 'manage')
 
     # Build numbered text list
     lines = []
     for i, card in enumerate(page_cards, start=1):
-        if card.get('content_type') == 'photo':
-            label = '\U0001f4f7 Photo card'
-        else:
-            label = _truncate(card['front'], FRONT_MAX)
-        lines.append(f"{i}. {html.escape(label)}")
+        lines.append(f"{i}. {html.escape(_card_label(card))}{_status_mark(card)}")
 
     card_list = '\n'.join(lines) if lines else '<i>No cards yet</i>'
 
@@ -84,15 +100,24 @@ async def _show_deck_detail(
 
     if total > 0:
         buttons.append([
-            InlineKeyboardButton('\u270f\ufe0f Edit card', callback_data=cb.make(cb.PICK_EDIT, deck_id)),
-            InlineKeyboardButton('\U0001f5d1\ufe0f Delete card', callback_data=cb.make(cb.PICK_DELETE, deck_id)),
+            InlineKeyboardButton('\u270f\ufe0f Edit card', callback_data=cb.pack(cb.PICK_EDIT, deck_id, nonce=nonce)),
+            InlineKeyboardButton('\U0001f5d1\ufe0f Delete card', callback_data=cb.pack(cb.PICK_DELETE, deck_id, nonce=nonce)),
+        ])
+        buttons.append([
+            InlineKeyboardButton('\u23f8 Suspend / resume card', callback_data=cb.pack(cb.PICK_SUSPEND, deck_id, nonce=nonce)),
         ])
 
+    buttons.append([
+        InlineKeyboardButton('\u2699\ufe0f Scheduling', callback_data=cb.make(cb.DECK_PRESET, deck_id)),
+    ])
     buttons.append([
         InlineKeyboardButton('\u270f\ufe0f Rename', callback_data=cb.make(cb.DECK_RENAME, deck_id)),
         InlineKeyboardButton('\U0001f5d1\ufe0f Delete deck', callback_data=cb.make(cb.DECK_DELETE, deck_id)),
     ])
-    buttons.append([InlineKeyboardButton('My Decks', callback_data='my_decks')])
+    buttons.append([
+        InlineKeyboardButton('\U0001f4e6 Export', callback_data=cb.make(cb.DECK_EXPORT, deck_id)),
+        InlineKeyboardButton('My Decks', callback_data='my_decks'),
+    ])
 
     await safe_edit_text(query, text, reply_markup=InlineKeyboardMarkup(buttons))
 
@@ -101,23 +126,22 @@ async def _show_deck_detail(
 
 async def deck_open(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.DECK_OPEN)
+    answer_soon(query)
+    [deck_id] = context.args
     await _show_deck_detail(query, context, deck_id)
 
 
 async def deck_cards_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.DECK_PAGE, 0)
-    page = cb.parse_int(query.data, cb.DECK_PAGE, 1)
+    answer_soon(query)
+    [deck_id, page] = context.args
     await _show_deck_detail(query, context, deck_id, page)
 
 
 async def card_delete_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    card_id = cb.parse_int(query.data, cb.CARD_DELETE_YES)
+    answer_soon(query)
+    [card_id] = context.args
     user_id = update.effective_user.id
 
     deck_id = context.user_data.get('manage_deck_id', 0)
@@ -141,10 +165,10 @@ async def card_delete_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def deck_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.DECK_DELETE)
+    answer_soon(query)
+    [deck_id] = context.args
 
-    deck_name = db.get_deck_name(deck_id) or 'this deck'
+    deck_name = db.get_deck_name(deck_id, query.from_user.id) or 'this deck'
     await safe_edit_text(
         query,
         f"\U0001f5d1\ufe0f Delete deck <b>{html.escape(deck_name)}</b> and all its cards?\n<i>This cannot be undone.</i>",
@@ -159,8 +183,8 @@ async def deck_delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def deck_delete_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.DECK_DELETE_YES)
+    answer_soon(query)
+    [deck_id] = context.args
     user_id = update.effective_user.id
 
     db.delete_deck(deck_id, user_id)
@@ -192,8 +216,8 @@ async def deck_delete_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def pick_card_to_edit_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.PICK_EDIT)
+    answer_soon(query)
+    [deck_id] = context.args
     context.user_data['manage_deck_id'] = deck_id
 
     page_cards = context.user_data.get('manage_page_cards', [])
@@ -249,8 +273,8 @@ async def receive_pick_edit(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def pick_card_to_delete_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.PICK_DELETE)
+    answer_soon(query)
+    [deck_id] = context.args
     context.user_data['manage_deck_id'] = deck_id
 
     page_cards = context.user_data.get('manage_page_cards', [])
@@ -280,17 +304,17 @@ async def receive_pick_delete(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     card = page_cards[n - 1]
     card_id = card['card_id']
-    if card.get('content_type') == 'photo':
-        label = '\U0001f4f7 Photo card'
-    else:
-        label = _truncate(card['front'], FRONT_MAX)
+    label = _card_label(card)
 
     await safe_send_text(
         update.message,
         f"\U0001f5d1\ufe0f Delete <b>{html.escape(label)}</b>? This cannot be undone.",
         reply_markup=InlineKeyboardMarkup([
             [
-                InlineKeyboardButton('Yes, delete', callback_data=cb.make(cb.CARD_DELETE_YES, card_id)),
+                InlineKeyboardButton(
+                    'Yes, delete',
+                    callback_data=cb.pack(cb.CARD_DELETE_YES, card_id, nonce=cb.current_nonce(context.user_data, 'manage')),
+                ),
                 InlineKeyboardButton('Cancel', callback_data=cb.make(cb.DECK_OPEN, deck_id)),
             ]
         ]),
@@ -298,12 +322,64 @@ async def receive_pick_delete(update: Update, context: ContextTypes.DEFAULT_TYPE
     return ConversationHandler.END
 
 
+# ── Pick card to suspend conversation ────────────────────────
+
+async def pick_card_to_suspend_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    answer_soon(query)
+    [deck_id] = context.args
+    context.user_data['manage_deck_id'] = deck_id
+
+    page_cards = context.user_data.get('manage_page_cards', [])
+    count = len(page_cards)
+
+    await safe_edit_text(
+        query,
+        f"\u23f8 <b>Suspend or resume which card?</b>\n\n"
+        f"Suspended cards stay in the deck but never come up for review.\n"
+        f"Send a number 1\u2013{count}.\n<i>/cancel to abort</i>",
+    )
+    return ManageState.PICK_CARD_TO_SUSPEND
+
+
+async def receive_pick_suspend(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    page_cards = context.user_data.get('manage_page_cards', [])
+    deck_id = context.user_data.get('manage_deck_id', 0)
+
+    try:
+        n = int(text)
+    except ValueError:
+        await safe_send_text(update.message, f"\u274c Not a number. Send 1\u2013{len(page_cards)}:")
+        return ManageState.PICK_CARD_TO_SUSPEND
+
+    if not (1 <= n <= len(page_cards)):
+        await safe_send_text(update.message, f"\u274c Enter a number between 1 and {len(page_cards)}:")
+        return ManageState.PICK_CARD_TO_SUSPEND
+
+    card = page_cards[n - 1]
+    suspend = not card.get('suspended')
+    db.set_card_suspended(card['card_id'], update.effective_user.id, suspend)
+    card['suspended'] = int(suspend)
+
+    label = html.escape(_card_label(card))
+    done = f"\u23f8 Suspended <b>{label}</b>" if suspend else f"\u25b6\ufe0f Resumed <b>{label}</b>"
+    await safe_send_text(
+        update.message,
+        done,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton('\U0001f4da Back to deck', callback_data=cb.make(cb.DECK_OPEN, deck_id))]
+        ]),
+    )
+    return ConversationHandler.END
+
+
 # ── Edit card conversation ────────────────────────────────────
 
 async def start_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    card_id = cb.parse_int(query.data, cb.CARD_EDIT)
+    answer_soon(query)
+    [card_id] = context.args
     user_id = update.effective_user.id
 
     card = db.get_card(card_id, user_id)
@@ -312,9 +388,9 @@ async def start_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return ConversationHandler.END
 
     context.user_data['editing_card_id'] = card_id
+    context.user_data['editing_card_cloze'] = cloze_number(card['template']) is not None
 
-    raw_front = card['front']
-    raw_back = card['back'] or ''
+    raw_front, raw_back = edit_sides(card)
     copyable = f"{raw_front} | {raw_back}" if raw_back else raw_front
 
     await safe_edit_text(
@@ -348,6 +424,9 @@ async def receive_edit_content(update: Update, context: ContextTypes.DEFAULT_TYP
     if not parsed['front']:
         await safe_send_text(update.message, "\u26a0\ufe0f Card can't be empty. Try again:")
         return ManageState.EDIT_CARD_CONTENT
+    if context.user_data.get('editing_card_cloze') and not is_cloze(parsed['front']):
+        await safe_send_text(update.message, "\u26a0\ufe0f Keep at least one <code>{{c1::...}}</code> blank. Try again:")
+        return ManageState.EDIT_CARD_CONTENT
 
     context.user_data['edit_card_is_photo'] = False
     context.user_data['edit_card_parsed'] = parsed
@@ -368,9 +447,10 @@ async def receive_edit_content(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def save_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     card_id = context.user_data.pop('editing_card_id', None)
+    context.user_data.pop('editing_card_cloze', None)
     parsed = context.user_data.pop('edit_card_parsed', {})
     is_photo = context.user_data.pop('edit_card_is_photo', False)
     user_id = update.effective_user.id
@@ -389,12 +469,13 @@ async def save_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def cancel_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     context.user_data.pop('editing_card_id', None)
     context.user_data.pop('edit_card_parsed', None)
     context.user_data.pop('editing_card_photo', None)
     context.user_data.pop('edit_card_is_photo', None)
+    context.user_data.pop('editing_card_cloze', None)
 
     deck_id = context.user_data.get('manage_deck_id', 0)
     page = context.user_data.get('manage_deck_page', 0)
@@ -406,10 +487,10 @@ async def cancel_edit_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def start_rename_deck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    deck_id = cb.parse_int(query.data, cb.DECK_RENAME)
+    answer_soon(query)
+    [deck_id] = context.args
 
-    deck_name = db.get_deck_name(deck_id) or 'this deck'
+    deck_name = db.get_deck_name(deck_id, query.from_user.id) or 'this deck'
     context.user_data['renaming_deck_id'] = deck_id
 
     await safe_edit_text(
@@ -446,18 +527,91 @@ async def receive_rename(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return ConversationHandler.END
 
 
+# ── Scheduling preset conversation ────────────────────────────
+
+_PRESET_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton('\u2714 Done', callback_data='preset_done')]])
+
+
+def _preset_text(deck_id: int, user_id: int) -> str:
+    preset = db.get_preset(deck_id, user_id)
+    if deck_id == DEFAULT_DECK:
+        title = "your defaults"
+        note = "<i>Used by every deck without its own settings.</i>\n\n"
+    else:
+        title = html.escape(db.get_deck_name(deck_id, user_id) or 'this deck')
+        note = ""
+    return (
+        f"\u2699\ufe0f <b>Scheduling \u00b7 {title}</b>\n\n"
+        f"{note}{describe(preset)}\n\n"
+        f"Send a setting to change it:\n{SETTINGS_USAGE}\n\n"
+        f"<i>/cancel to abort</i>"
+    )
+
+
+async def start_edit_preset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    answer_soon(query)
+    [deck_id] = context.args
+
+    context.user_data['preset_deck_id'] = deck_id
+    await safe_edit_text(query, _preset_text(deck_id, query.from_user.id), reply_markup=_PRESET_MARKUP)
+    return ManageState.EDIT_PRESET
+
+
+async def presets_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """/presets — edit the scheduling defaults every deck without its own settings uses."""
+    context.user_data['preset_deck_id'] = DEFAULT_DECK
+    await safe_send_text(update.message, _preset_text(DEFAULT_DECK, update.effective_user.id), reply_markup=_PRESET_MARKUP)
+    return ManageState.EDIT_PRESET
+
+
+async def receive_preset_setting(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    user_id = update.effective_user.id
+    deck_id = context.user_data.get('preset_deck_id', DEFAULT_DECK)
+
+    if text.lower() == 'reset':
+        db.delete_preset(user_id, deck_id)
+    else:
+        try:
+            preset = parse_setting(text, db.get_preset(deck_id, user_id))
+        except ValueError as error:
+            await safe_send_text(update.message, f"\u26a0\ufe0f {error} Try one of:\n{SETTINGS_USAGE}")
+            return ManageState.EDIT_PRESET
+        db.save_preset(user_id, deck_id, preset)
+
+    await safe_send_text(update.message, _preset_text(deck_id, user_id), reply_markup=_PRESET_MARKUP)
+    return ManageState.EDIT_PRESET
+
+
+async def finish_edit_preset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    answer_soon(query)
+
+    deck_id = context.user_data.pop('preset_deck_id', DEFAULT_DECK)
+    if deck_id != DEFAULT_DECK:
+        await _show_deck_detail(query, context, deck_id, context.user_data.get('manage_deck_page', 0))
+        return ConversationHandler.END
+
+    from handlers.start import build_main_menu
+    text, markup = build_main_menu(query.from_user.id)
+    await safe_edit_text(query, text, reply_markup=markup)
+    return ConversationHandler.END
+
+
 async def cancel_manage(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.pop('editing_card_id', None)
     context.user_data.pop('edit_card_parsed', None)
     context.user_data.pop('editing_card_photo', None)
     context.user_data.pop('edit_card_is_photo', None)
     context.user_data.pop('renaming_deck_id', None)
+    context.user_data.pop('preset_deck_id', None)
 
     from handlers.start import build_main_menu
     text, markup = build_main_menu(update.effective_user.id)
 
     if update.callback_query:
-        await update.callback_query.answer()
+        answer_soon(update.callback_query)
         await safe_edit_text(update.callback_query, text, reply_markup=markup)
     else:
         await safe_send_text(update.message, text, reply_markup=markup)
@@ -468,7 +622,7 @@ async def cancel_manage(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 # ── ConversationHandlers ──────────────────────────────────────
 
 edit_card_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(start_edit_card, pattern=cb.pattern(cb.CARD_EDIT, r'\d+'))],
+    entry_points=[CallbackRouter([Route(cb.CARD_EDIT, start_edit_card, DIGITS)])],
     name='edit_card',
     per_message=False,
     states={
@@ -476,15 +630,17 @@ edit_card_handler = ConversationHandler(
             MessageHandler(filters.TEXT & ~filters.COMMAND, receive_edit_content),
         ],
         ManageState.EDIT_CARD_PREVIEW: [
-            CallbackQueryHandler(save_edit_card, pattern='^save_edit$'),
-            CallbackQueryHandler(cancel_edit_card, pattern='^cancel_edit$'),
+            CallbackRouter([
+                Route('save_edit', save_edit_card),
+                Route('cancel_edit', cancel_edit_card),
+            ]),
         ],
     },
     fallbacks=[CommandHandler('cancel', cancel_manage), CommandHandler('start', force_start)],
 )
 
 rename_deck_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(start_rename_deck, pattern=cb.pattern(cb.DECK_RENAME, r'\d+'))],
+    entry_points=[CallbackRouter([Route(cb.DECK_RENAME, start_rename_deck, DIGITS)])],
     name='rename_deck',
     per_message=False,
     states={
@@ -496,7 +652,7 @@ rename_deck_handler = ConversationHandler(
 )
 
 pick_edit_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(pick_card_to_edit_entry, pattern=cb.pattern(cb.PICK_EDIT, r'\d+'))],
+    entry_points=[CallbackRouter([Route(cb.PICK_EDIT, pick_card_to_edit_entry, DIGITS, session='manage')])],
     name='pick_edit',
     per_message=False,
     states={
@@ -507,15 +663,45 @@ pick_edit_handler = ConversationHandler(
             MessageHandler(filters.TEXT & ~filters.COMMAND, receive_edit_content),
         ],
         ManageState.EDIT_CARD_PREVIEW: [
-            CallbackQueryHandler(save_edit_card, pattern='^save_edit$'),
-            CallbackQueryHandler(cancel_edit_card, pattern='^cancel_edit$'),
+            CallbackRouter([
+                Route('save_edit', save_edit_card),
+                Route('cancel_edit', cancel_edit_card),
+            ]),
+        ],
+    },
+    fallbacks=[CommandHandler('cancel', cancel_manage), CommandHandler('start', force_start)],
+)
+
+preset_handler = ConversationHandler(
+    entry_points=[
+        CallbackRouter([Route(cb.DECK_PRESET, start_edit_preset, DIGITS)]),
+        CommandHandler('presets', presets_command),
+    ],
+    name='edit_preset',
+    per_message=False,
+    states={
+        ManageState.EDIT_PRESET: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, receive_preset_setting),
+            CallbackRouter([Route('preset_done', finish_edit_preset)]),
+        ],
+    },
+    fallbacks=[CommandHandler('cancel', cancel_manage), CommandHandler('start', force_start)],
+)
+
+pick_suspend_handler = ConversationHandler(
+    entry_points=[CallbackRouter([Route(cb.PICK_SUSPEND, pick_card_to_suspend_entry, DIGITS, session='manage')])],
+    name='pick_suspend',
+    per_message=False,
+    states={
+        ManageState.PICK_CARD_TO_SUSPEND: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, receive_pick_suspend),
         ],
     },
     fallbacks=[CommandHandler('cancel', cancel_manage), CommandHandler('start', force_start)],
 )
 
 pick_delete_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(pick_card_to_delete_entry, pattern=cb.pattern(cb.PICK_DELETE, r'\d+'))],
+    entry_points=[CallbackRouter([Route(cb.PICK_DELETE, pick_card_to_delete_entry, DIGITS, session='manage')])],
     name='pick_delete',
     per_message=False,
     states={
@@ -0,0 +1,87 @@
+import html
+import logging
+import re
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+import database.database as db
+from handlers.review import in_review
+from utils.reminders import is_valid_timezone, load_due_timers, run_due_notices, run_reminders
+from utils.telegram_helpers import safe_send_text
+
+
+REMINDERS_USAGE = (
+    "<code>/reminders on</code> \u00b7 <code>/reminders off</code>\n"
+    "<code>/reminders tz Europe/Berlin</code> \u2014 your timezone\n"
+    "<code>/reminders quiet 22-8</code> \u2014 no reminders between these hours"
+)
+
+_QUIET_RE = re.compile(r'^(\d{1,2})-(\d{1,2})$')
+
+
+async def reminder_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback — one reminder pass. job.data is the (index, count) shard, if any."""
+    try:
+        await run_reminders(context.bot, shard=context.job.data)
+    except Exception:
+        logging.exception("Reminder run failed")
+
+
+async def load_due_timers_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback, once on startup — track the cards in learning already scheduled."""
+    try:
+        load_due_timers(shard=context.job.data)
+    except Exception:
+        logging.exception("Loading due-notice timers failed")
+
+
+async def due_notice_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback — advance the due-notice timers, notify whoever's cards came due
+    (except users in a review session right now)."""
+    user_data = context.application.user_data
+    now = time.time()
+    try:
+        await run_due_notices(context.bot, busy=lambda user_id: in_review(user_data.get(user_id, {}), now))
+    except Exception:
+        logging.exception("Due notice run failed")
+
+
+def _settings_text(settings: dict) -> str:
+    status = '\u2705 on' if settings['enabled'] else '\u23f8 off'
+    return (
+        f"<b>\U0001f514 Reminders</b> \u00b7 {status}\n\n"
+        f"Timezone: <b>{html.escape(settings['timezone'] or 'UTC')}</b>\n"
+        f"Quiet hours: <b>{settings['quiet_start']:02d}:00\u2013{settings['quiet_end']:02d}:00</b>\n\n"
+        f"{REMINDERS_USAGE}"
+    )
+
+
+async def reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/reminders [on|off|tz <zone>|quiet <start>-<end>]"""
+    user_id = update.effective_user.id
+    args = context.args or []
+
+    if not db.get_user(user_id):
+        await safe_send_text(update.message, "Send /start first.")
+        return
+
+    if args:
+        cmd = args[0].lower()
+        if cmd in ('on', 'off'):
+            db.update_reminder_settings(user_id, enabled=(cmd == 'on'))
+        elif cmd == 'tz' and len(args) == 2 and is_valid_timezone(args[1]):
+            db.update_reminder_settings(user_id, timezone=args[1])
+        elif cmd == 'quiet' and len(args) == 2 and (m := _QUIET_RE.match(args[1])):
+            start, end = int(m.group(1)), int(m.group(2))
+            if not (0 <= start < 24 and 0 <= end < 24):
+                await safe_send_text(update.message, f"\u26a0\ufe0f Hours must be 0\u201323.\n\n{REMINDERS_USAGE}")
+                return
+            db.update_reminder_settings(user_id, quiet_start=start, quiet_end=end)
+        else:
+            await safe_send_text(update.message, f"\u26a0\ufe0f Didn't get that.\n\n{REMINDERS_USAGE}")
+            return
+
+    settings = db.get_reminder_settings(user_id)
+    await safe_send_text(update.message, _settings_text(settings))
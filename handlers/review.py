@@ -1,6 +1,8 @@
 import html
 import logging
+import time
 from collections import defaultdict
+from collections.abc import Mapping
 from datetime import datetime
 from typing import Any
 
@@ -9,19 +11,39 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 import database.database as db
 import utils.callbacks as cb
+from config import LEECH_ACTION, LEECH_THRESHOLD
 from utils.constants import ReviewState
+from utils.reminders import next_day_start
+from utils.templates import cloze_number, edit_sides, is_cloze
 from utils.utils import parse_text
-from utils.srs import schedule, schedule_all_ratings, _format_interval, AGAIN, HARD, GOOD, EASY
-from utils.telegram_helpers import safe_edit_text, safe_edit_caption, safe_send_text, safe_send_photo, safe_delete
+from utils.srs import (
+    DEFAULT_PRESET, Preset, is_leech, schedule, schedule_all_ratings, _format_interval, AGAIN, HARD, GOOD, EASY,
+)
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_edit_caption, safe_send_text, safe_send_photo, safe_delete
+
+LEECH_TEXT = "\U0001fa78 Leech \u2014 this card keeps slipping. Try rewording it"
+LEECH_SUSPENDED_TEXT = "\U0001fa78 Leech \u2014 suspended. Reword it, then resume it from its deck"
+
+REVIEW_IDLE_SECONDS = 600     # a session untouched this long counts as abandoned
+
+
+def in_review(user_data: Mapping[str, Any], now: float | None = None) -> bool:
+    """True while user_data holds a review session used in the last REVIEW_IDLE_SECONDS."""
+    now = time.time() if now is None else now
+    return 'review_cards' in user_data and now - user_data.get('review_active_at', 0) < REVIEW_IDLE_SECONDS
+
+
+def _touch(context: ContextTypes.DEFAULT_TYPE) -> None:
+    context.user_data['review_active_at'] = time.time()
 
 
 async def review_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Entry point: user clicks 'Review'."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     user_id = update.effective_user.id
-    cards = db.get_due_cards(user_id)
+    cards = _apply_limits(_bury_siblings(db.get_due_cards(user_id)), user_id)
 
     if not cards:
         await safe_edit_text(
@@ -42,17 +64,18 @@ async def review_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         context.user_data['review_index'] = 0
         context.user_data['review_correct'] = 0
         context.user_data['review_total'] = len(cards)
+        nonce = cb.new_nonce(context.user_data, 'review')
 
         picker_buttons: list[list[InlineKeyboardButton]] = []
         for deck_id, count in deck_counts.items():
-            deck_name = db.get_deck_name(deck_id) or f"Deck {deck_id}"
+            deck_name = db.get_deck_name(deck_id, user_id) or f"Deck {deck_id}"
             picker_buttons.append([InlineKeyboardButton(
                 f"\U0001f4da {deck_name}  \u00b7  {count} due",
-                callback_data=cb.make(cb.REVIEW_DECK, deck_id),
+                callback_data=cb.pack(cb.REVIEW_DECK, deck_id, nonce=nonce),
             )])
         picker_buttons.append([InlineKeyboardButton(
             f"\u25b6 All decks \u00b7 {len(cards)} due",
-            callback_data='review_deck_all',
+            callback_data=cb.pack(cb.REVIEW_DECK_ALL, nonce=nonce),
         )])
 
         total = len(cards)
@@ -68,9 +91,9 @@ async def review_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def review_deck_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
-    deck_id = cb.parse_int(query.data, cb.REVIEW_DECK)
+    [deck_id] = context.args
     all_cards = context.user_data.get('review_cards', [])
     filtered = [c for c in all_cards if c['deck_id'] == deck_id]
 
@@ -79,7 +102,7 @@ async def review_deck_selected(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def review_all_decks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     cards = context.user_data.get('review_cards', [])
     return await _start_review(query, cards, context)
@@ -88,7 +111,7 @@ async def review_all_decks(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """/review slash command."""
     user_id = update.effective_user.id
-    cards = db.get_due_cards(user_id)
+    cards = _apply_limits(_bury_siblings(db.get_due_cards(user_id)), user_id)
     count = len(cards)
 
     if count == 0:
@@ -106,7 +129,8 @@ async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
+    _touch(context)
 
     cards = context.user_data.get('review_cards', [])
     index = context.user_data.get('review_index', 0)
@@ -119,10 +143,14 @@ async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     back = html.escape(card['back']) if card['back'] else '<i>(empty)</i>'
     is_photo = card.get('content_type') == 'photo'
 
-    deck_name = html.escape(db.get_deck_name(card['deck_id']) or "\u2014")
+    deck_name = html.escape(card.get('deck_name') or "\u2014")
     progress = f"{index + 1}/{len(cards)}"
 
-    rating_buttons = InlineKeyboardMarkup(_build_rating_buttons(card))
+    user_id = query.from_user.id
+    rating_buttons = InlineKeyboardMarkup(_build_rating_buttons(
+        card, cb.current_nonce(context.user_data, 'review'),
+        db.get_due_load(user_id), db.get_preset(card['deck_id'], user_id),
+    ))
 
     if is_photo:
         caption = (
@@ -146,18 +174,22 @@ async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
 async def rate_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-
-    rating = cb.parse_int(query.data, cb.RATE)
+    [rating] = context.args
 
     cards = context.user_data.get('review_cards', [])
     index = context.user_data.get('review_index', 0)
 
     if index >= len(cards):
+        answer_soon(query)
         return await _finish_review(query, context)
 
     card = cards[index]
-    result = schedule(card, rating)
+    user_id = update.effective_user.id
+    preset = db.get_preset(card['deck_id'], user_id)
+    result = schedule(card, rating, db.get_due_load(user_id), preset)
+    leech = is_leech(card, result, LEECH_THRESHOLD)
+    suspend = leech and LEECH_ACTION == 'suspend'
+    answer_soon(query, (LEECH_SUSPENDED_TEXT if suspend else LEECH_TEXT) if leech else None)
 
     # Compute actual elapsed days since last review.
     # scheduled_days = planned interval; overdue = extra days past due_date.
@@ -181,8 +213,16 @@ async def rate_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         result['state'],
         result['scheduled_days'],
         elapsed_days,
+        user_id=user_id,
+        leech=leech,
+        suspend=suspend,
+        previous_due=card.get('due_date'),
     )
 
+    if card.get('card_type', 'basic') != 'basic':
+        # Its siblings would give this answer away until the user's day is over
+        db.bury_siblings(card['card_id'], user_id, _bury_until(context))
+
     if rating > AGAIN:  # Hard, Good, Easy all count as recalled; Again does not
         context.user_data['review_correct'] = context.user_data.get('review_correct', 0) + 1
 
@@ -191,21 +231,36 @@ async def rate_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         f"next due {result['due_date']}, state={result['state']}"
     )
 
-    context.user_data['review_index'] = index + 1
+    return await _next_card(query, context)
 
-    if index + 1 >= len(cards):
-        return await _finish_review(query, context)
 
-    next_card = cards[index + 1]
-    next_is_photo = next_card.get('content_type') == 'photo'
-    cur_is_photo = card.get('content_type') == 'photo'
+async def suspend_in_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Take the current card out of review until it is resumed from its deck, and move on."""
+    query = update.callback_query
+    answer_soon(query, "\u23f8 Suspended \u2014 resume it from its deck")
+    [card_id] = context.args
+    db.set_card_suspended(card_id, update.effective_user.id, True)
+    return await _skip_card(query, context)
 
-    if not cur_is_photo and not next_is_photo:
-        return await _show_front_edit(query, context)
 
-    chat_id = query.message.chat_id
-    await safe_delete(query.message)
-    return await _show_front_in_chat(chat_id, context)
+async def bury_in_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Hide the current card until tomorrow, and move on."""
+    query = update.callback_query
+    answer_soon(query, "\U0001f4a4 Buried until tomorrow")
+    [card_id] = context.args
+    db.bury_card(card_id, update.effective_user.id, _bury_until(context))
+    return await _skip_card(query, context)
+
+
+async def unbury_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback — return cards whose bury has run out to review."""
+    try:
+        count = db.unbury_cards()
+    except Exception:
+        logging.exception("Unbury run failed")
+        return
+    if count:
+        logging.info(f"Unburied {count} cards")
 
 
 async def cancel_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -213,7 +268,7 @@ async def cancel_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
     from handlers.start import build_main_menu
     if update.callback_query:
-        await update.callback_query.answer()
+        answer_soon(update.callback_query)
         user_id = update.callback_query.from_user.id
         text, markup = build_main_menu(user_id)
         await safe_edit_text(update.callback_query, text, reply_markup=markup)
@@ -228,9 +283,9 @@ async def cancel_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 async def edit_card_in_review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show an inline edit prompt for this specific card without leaving review."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
-    card_id = cb.parse_int(query.data, cb.EDIT_REVIEW)
+    [card_id] = context.args
     user_id = update.effective_user.id
 
     card = db.get_card(card_id, user_id)
@@ -242,6 +297,7 @@ async def edit_card_in_review(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
 
     context.user_data['review_editing_card_id'] = card_id
+    context.user_data['review_editing_cloze'] = cloze_number(card['template']) is not None
 
     if card.get('content_type') == 'photo':
         context.user_data['review_editing_is_photo'] = True
@@ -253,8 +309,7 @@ async def edit_card_in_review(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
     else:
         context.user_data.pop('review_editing_is_photo', None)
-        raw_front = card['front']
-        raw_back = card['back'] or ''
+        raw_front, raw_back = edit_sides(card)
         copyable = f"{raw_front} | {raw_back}" if raw_back else raw_front
         await safe_edit_text(
             query,
@@ -287,6 +342,9 @@ async def receive_review_edit_content(update: Update, context: ContextTypes.DEFA
     if not parsed['front']:
         await safe_send_text(update.message, "\u26a0\ufe0f Card can't be empty. Try again:")
         return ReviewState.EDITING_CARD
+    if context.user_data.get('review_editing_cloze') and not is_cloze(parsed['front']):
+        await safe_send_text(update.message, "\u26a0\ufe0f Keep at least one <code>{{c1::...}}</code> blank. Try again:")
+        return ReviewState.EDITING_CARD
 
     context.user_data['review_edit_is_photo'] = False
     context.user_data['review_edit_parsed'] = parsed
@@ -307,9 +365,10 @@ async def receive_review_edit_content(update: Update, context: ContextTypes.DEFA
 
 async def save_review_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     card_id = context.user_data.pop('review_editing_card_id', None)
+    context.user_data.pop('review_editing_cloze', None)
     parsed = context.user_data.pop('review_edit_parsed', {})
     is_photo = context.user_data.pop('review_edit_is_photo', False)
     user_id = update.effective_user.id
@@ -329,12 +388,13 @@ async def save_review_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def cancel_review_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     context.user_data.pop('review_editing_card_id', None)
     context.user_data.pop('review_edit_parsed', None)
     context.user_data.pop('review_editing_is_photo', None)
     context.user_data.pop('review_edit_is_photo', None)
+    context.user_data.pop('review_editing_cloze', None)
     _cleanup_review_data(context)
     from handlers.start import build_main_menu
     text, markup = build_main_menu(update.effective_user.id)
@@ -344,6 +404,64 @@ async def cancel_review_edit(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # ── Private helpers ───────────────────────────────────────────
 
+def _bury_siblings(cards: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Keep one due card per note — a reverse card's sibling would give the answer away."""
+    kept = []
+    seen: set[int] = set()
+    for card in cards:
+        if card['note_id'] in seen:
+            continue
+        seen.add(card['note_id'])
+        kept.append(card)
+    return kept
+
+
+def _apply_limits(cards: list[dict[str, Any]], user_id: int) -> list[dict[str, Any]]:
+    """At most new_per_day new and reviews_per_day other cards of each deck (its preset) per session."""
+    kept = []
+    taken: dict[tuple[int, bool], int] = defaultdict(int)
+    limits: dict[int, Preset] = {}
+    for card in cards:
+        deck_id = card['deck_id']
+        if deck_id not in limits:
+            limits[deck_id] = db.get_preset(deck_id, user_id)
+        is_new = card['state'] == 'new'
+        limit = limits[deck_id].new_per_day if is_new else limits[deck_id].reviews_per_day
+        if taken[deck_id, is_new] >= limit:
+            continue
+        taken[deck_id, is_new] += 1
+        kept.append(card)
+    return kept
+
+
+async def _skip_card(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Leave the current card unrated: it no longer counts towards the session's total."""
+    context.user_data['review_total'] = max(0, context.user_data.get('review_total', 0) - 1)
+    return await _next_card(query, context)
+
+
+async def _next_card(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE) -> int:
+    cards = context.user_data.get('review_cards', [])
+    index = context.user_data.get('review_index', 0)
+
+    context.user_data['review_index'] = index + 1
+    cb.new_nonce(context.user_data, 'review')     # this card's buttons are spent
+    _touch(context)
+
+    if index + 1 >= len(cards):
+        return await _finish_review(query, context)
+
+    next_is_photo = cards[index + 1].get('content_type') == 'photo'
+    cur_is_photo = cards[index].get('content_type') == 'photo'
+
+    if not cur_is_photo and not next_is_photo:
+        return await _show_front_edit(query, context)
+
+    chat_id = query.message.chat_id
+    await safe_delete(query.message)
+    return await _show_front_in_chat(chat_id, context)
+
+
 async def _start_review(
     query: CallbackQuery,
     cards: list[dict[str, Any]],
@@ -353,6 +471,10 @@ async def _start_review(
     context.user_data['review_index'] = 0
     context.user_data['review_correct'] = 0
     context.user_data['review_total'] = len(cards)
+    cb.new_nonce(context.user_data, 'review')
+    _touch(context)
+    settings = db.get_reminder_settings(query.from_user.id)
+    context.user_data['review_bury_until'] = next_day_start(settings['timezone'] if settings else None)
 
     count = len(cards)
     await safe_edit_text(
@@ -362,19 +484,25 @@ async def _start_review(
     return await _show_front(query.message, context)
 
 
+def _bury_until(context: ContextTypes.DEFAULT_TYPE) -> str:
+    """When today's buries end: the user's next local midnight, fixed when the session started."""
+    return context.user_data.get('review_bury_until') or next_day_start(None)
+
+
 def _progress_label(index: int, total: int) -> str:
     return f"{index + 1}/{total}"
 
 
-def _front_buttons() -> InlineKeyboardMarkup:
+def _front_buttons(context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardMarkup:
+    nonce = cb.current_nonce(context.user_data, 'review')
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton("\U0001f441 Show answer", callback_data='show_answer')],
+        [InlineKeyboardButton("\U0001f441 Show answer", callback_data=cb.pack(cb.SHOW_ANSWER, nonce=nonce))],
         [InlineKeyboardButton("\u23f9 Stop", callback_data='cancel_review')],
     ])
 
 
 def _front_meta(card: dict[str, Any], index: int, total: int) -> str:
-    deck_name = html.escape(db.get_deck_name(card['deck_id']) or '\u2014')
+    deck_name = html.escape(card.get('deck_name') or '\u2014')
     progress = _progress_label(index, total)
     return f"<i>\U0001f4c1 {deck_name}  \u00b7  {progress}</i>"
 
@@ -389,7 +517,7 @@ async def _show_front(message: Message, context: ContextTypes.DEFAULT_TYPE) -> i
     card = cards[index]
     is_photo = card.get('content_type') == 'photo'
     meta = _front_meta(card, index, len(cards))
-    buttons = _front_buttons()
+    buttons = _front_buttons(context)
 
     if is_photo:
         await safe_send_photo(message, card['front'], caption=meta, reply_markup=buttons)
@@ -410,7 +538,7 @@ async def _show_front_edit(query: CallbackQuery, context: ContextTypes.DEFAULT_T
     card = cards[index]
     meta = _front_meta(card, index, len(cards))
     text = f"{meta}\n\n<b>{html.escape(card['front'])}</b>"
-    await safe_edit_text(query, text, reply_markup=_front_buttons())
+    await safe_edit_text(query, text, reply_markup=_front_buttons(context))
 
     return ReviewState.SHOWING_FRONT
 
@@ -426,7 +554,7 @@ async def _show_front_in_chat(chat_id: int, context: ContextTypes.DEFAULT_TYPE)
     is_photo = card.get('content_type') == 'photo'
     meta = _front_meta(card, index, len(cards))
     target = (chat_id, context.bot)
-    buttons = _front_buttons()
+    buttons = _front_buttons(context)
 
     if is_photo:
         await safe_send_photo(target, card['front'], caption=meta, reply_markup=buttons)
@@ -437,33 +565,40 @@ async def _show_front_in_chat(chat_id: int, context: ContextTypes.DEFAULT_TYPE)
     return ReviewState.SHOWING_FRONT
 
 
-def _build_rating_buttons(card: dict[str, Any]) -> list[list[InlineKeyboardButton]]:
-    results = schedule_all_ratings(card)
+def _build_rating_buttons(
+    card: dict[str, Any],
+    nonce: int,
+    load: dict[str, int] | None = None,
+    preset: Preset = DEFAULT_PRESET,
+) -> list[list[InlineKeyboardButton]]:
+    results = schedule_all_ratings(card, load, preset)
     return [
         [
             InlineKeyboardButton(
                 f"\U0001f534 Again \u00b7 {_format_interval(results[AGAIN])}",
-                callback_data=cb.make(cb.RATE, AGAIN),
+                callback_data=cb.pack(cb.RATE, AGAIN, nonce=nonce),
             ),
             InlineKeyboardButton(
                 f"\U0001f7e0 Hard \u00b7 {_format_interval(results[HARD])}",
-                callback_data=cb.make(cb.RATE, HARD),
+                callback_data=cb.pack(cb.RATE, HARD, nonce=nonce),
             ),
         ],
         [
             InlineKeyboardButton(
                 f"\U0001f7e2 Good \u00b7 {_format_interval(results[GOOD])}",
-                callback_data=cb.make(cb.RATE, GOOD),
+                callback_data=cb.pack(cb.RATE, GOOD, nonce=nonce),
             ),
             InlineKeyboardButton(
                 f"\U0001f535 Easy \u00b7 {_format_interval(results[EASY])}",
-                callback_data=cb.make(cb.RATE, EASY),
+                callback_data=cb.pack(cb.RATE, EASY, nonce=nonce),
             ),
         ],
         [
-            InlineKeyboardButton("\u270f\ufe0f Edit", callback_data=cb.make(cb.EDIT_REVIEW, card['card_id'])),
-            InlineKeyboardButton("\u23f9 Stop", callback_data='cancel_review'),
+            InlineKeyboardButton("\u270f\ufe0f Edit", callback_data=cb.pack(cb.EDIT_REVIEW, card['card_id'], nonce=nonce)),
+            InlineKeyboardButton("\u23f8 Suspend", callback_data=cb.pack(cb.SUSPEND_REVIEW, card['card_id'], nonce=nonce)),
+            InlineKeyboardButton("\U0001f4a4 Bury", callback_data=cb.pack(cb.BURY_REVIEW, card['card_id'], nonce=nonce)),
         ],
+        [InlineKeyboardButton("\u23f9 Stop", callback_data='cancel_review')],
     ]
 
 
@@ -485,7 +620,11 @@ def _cleanup_review_data(context: ContextTypes.DEFAULT_TYPE) -> None:
     context.user_data.pop('review_index', None)
     context.user_data.pop('review_correct', None)
     context.user_data.pop('review_total', None)
+    context.user_data.pop('review_bury_until', None)
+    context.user_data.pop('review_active_at', None)
     context.user_data.pop('review_editing_card_id', None)
     context.user_data.pop('review_edit_parsed', None)
     context.user_data.pop('review_editing_is_photo', None)
     context.user_data.pop('review_edit_is_photo', None)
+    context.user_data.pop('review_editing_cloze', None)
+    context.user_data.pop(cb.nonce_key('review'), None)
@@ -5,7 +5,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 
 import database.database as db
-from utils.telegram_helpers import safe_edit_text, safe_send_text
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text
 
 
 def build_main_menu(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
@@ -88,7 +88,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 _CONV_KEYS = (
     # add-card flow
-    'cur_card', 'cur_deck_id', 'temp_type',
+    'cur_card', 'cur_cards', 'bulk_skipped', 'bulk_too_long', 'bulk_cloze', 'cur_deck_id', 'temp_type',
     # review flow
     'review_cards', 'review_index', 'review_correct', 'review_total',
     # manage flow
@@ -123,7 +123,7 @@ async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Callback handler for the 'Menu' button (outside conversation)."""
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     user_id = update.effective_user.id
     _load_defaults(user_id, context)
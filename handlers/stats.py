@@ -6,7 +6,8 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 import database.database as db
-from utils.telegram_helpers import safe_edit_text, safe_send_text
+from config import LEECH_THRESHOLD
+from utils.telegram_helpers import answer_soon, safe_edit_text, safe_send_text
 
 
 def _forecast_lines(forecast: list[dict[str, Any]]) -> str:
@@ -38,16 +39,61 @@ def _build_stats_text(user_id: int) -> str:
     )
 
 
+LEECHES_SHOWN = 20
+LABEL_MAX = 30
+
+_STATS_MARKUP = InlineKeyboardMarkup([[
+    InlineKeyboardButton('\U0001fa78 Leeches', callback_data='leeches'),
+    InlineKeyboardButton('Menu', callback_data='main_menu'),
+]])
+_LEECHES_MARKUP = InlineKeyboardMarkup([[
+    InlineKeyboardButton('\U0001f4ca Stats', callback_data='stats'),
+    InlineKeyboardButton('Menu', callback_data='main_menu'),
+]])
+
+
+def _build_leeches_text(user_id: int) -> str:
+    threshold = max(1, LEECH_THRESHOLD)
+    leeches = db.get_leeches(user_id, threshold, LEECHES_SHOWN + 1)
+    header = f"<b>\U0001fa78 Leeches</b>\n<i>Cards forgotten {threshold}+ times</i>\n\n"
+    if not leeches:
+        return header + "No leeches \u2014 nothing keeps slipping."
+
+    lines = []
+    for i, card in enumerate(leeches[:LEECHES_SHOWN], start=1):
+        if card.get('content_type') == 'photo':
+            label = '\U0001f4f7 Photo card'
+        else:
+            label = card['front'] if len(card['front']) <= LABEL_MAX else card['front'][:LABEL_MAX - 1] + '\u2026'
+        paused = ' \u23f8' if card['suspended'] else ''
+        lines.append(
+            f"{i}. {html.escape(label)}{paused}\n"
+            f"    <i>{html.escape(card['deck_name'])} \u00b7 {card['lapses']} lapses</i>"
+        )
+    if len(leeches) > LEECHES_SHOWN:
+        lines.append("<i>\u2026and more</i>")
+    return (
+        header + '\n'.join(lines) +
+        "\n\n<i>Reword these cards; \u23f8 ones are suspended until you resume them from their deck.</i>"
+    )
+
+
 async def stats_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
+    answer_soon(query)
 
     text = _build_stats_text(update.effective_user.id)
-    buttons = [[InlineKeyboardButton('Menu', callback_data='main_menu')]]
-    await safe_edit_text(query, text, reply_markup=InlineKeyboardMarkup(buttons))
+    await safe_edit_text(query, text, reply_markup=_STATS_MARKUP)
 
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = _build_stats_text(update.effective_user.id)
-    buttons = [[InlineKeyboardButton('Menu', callback_data='main_menu')]]
-    await safe_send_text(update.message, text, reply_markup=InlineKeyboardMarkup(buttons))
+    await safe_send_text(update.message, text, reply_markup=_STATS_MARKUP)
+
+
+async def leeches_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    answer_soon(query)
+
+    text = _build_leeches_text(update.effective_user.id)
+    await safe_edit_text(query, text, reply_markup=_LEECHES_MARKUP)
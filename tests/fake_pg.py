@@ -0,0 +1,147 @@
+"""
+In-process stand-in for a PostgreSQL server, for backend tests.
+
+FakePgServer.connect() returns a DB-API connection with psycopg's surface —
+'format' paramstyle, rows as dicts, no lastrowid — executing on a shared SQLite
+file. It accepts the Postgres DDL in database/schema.py (and the
+information_schema.columns lookup migrate uses) by rewriting its few
+non-SQLite constructs, and rejects SQL that only SQLite would run (qmark
+placeholders, datetime(), PRAGMA, SUM over a comparison, ...), so a query that
+slips back into SQLite dialect fails here the way it would on a server.
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Any
+
+
+class ProgrammingError(Exception):
+    pass
+
+
+_SQLITE_ONLY = re.compile(
+    r"\?|\bdatetime\(|\bdate\(|\bjulianday\(|\bstrftime\(|\bPRAGMA\b|\bAUTOINCREMENT\b"
+    r"|\bINSERT\s+OR\b|\bSUM\(\s*[\w.]+\s*(=|<|>)",
+    re.IGNORECASE,
+)
+_PG_TO_SQLITE = [
+    (re.compile(r"BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY"), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"to_char\(now\(\) AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS'\)"), "CURRENT_TIMESTAMP"),
+]
+_ADD_COLUMN = re.compile(r"ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+) (.+)", re.IGNORECASE | re.DOTALL)
+_COLUMNS = re.compile(r"SELECT column_name FROM information_schema\.columns WHERE table_name = '(\w+)'", re.IGNORECASE)
+_PARAM = re.compile(r"%(s|%)")
+
+
+def _dict_row(cursor: sqlite3.Cursor, row: tuple) -> dict[str, Any]:
+    return {d[0]: v for d, v in zip(cursor.description, row)}
+
+
+class FakePgCursor:
+    def __init__(self, conn: 'FakePgConnection') -> None:
+        self._conn = conn
+        self._cur = conn._db.cursor()
+
+    def _translate(self, sql: str) -> str | None:
+        for pattern, replacement in _PG_TO_SQLITE:
+            sql = pattern.sub(replacement, sql)
+        if _SQLITE_ONLY.search(sql.replace('INTEGER PRIMARY KEY AUTOINCREMENT', '')):
+            raise ProgrammingError(f"not PostgreSQL: {sql.strip()[:120]}")
+        added = _ADD_COLUMN.match(sql.strip())
+        if added:
+            table, column, ddl = added.groups()
+            existing = {row['name'] for row in self._conn._db.execute(f"PRAGMA table_info({table})")}
+            if column in existing:
+                return None
+            sql = f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"
+        columns = _COLUMNS.match(sql.strip())
+        if columns:
+            sql = f"SELECT name AS column_name FROM pragma_table_info('{columns.group(1)}')"
+        self._conn.server.statements += 1
+        return _PARAM.sub(lambda m: '?' if m.group(1) == 's' else '%', sql)
+
+    def execute(self, sql: str, params: Any = None) -> 'FakePgCursor':
+        self._conn._check_open()
+        translated = self._translate(sql)
+        if translated is not None:
+            self._cur.execute(translated, tuple(params or ()))
+        return self
+
+    def executemany(self, sql: str, seq: Any) -> 'FakePgCursor':
+        self._conn._check_open()
+        self._cur.executemany(self._translate(sql), [tuple(p) for p in seq])
+        return self
+
+    def fetchone(self) -> dict[str, Any] | None:
+        return self._cur.fetchone()
+
+    def fetchmany(self, size: int) -> list[dict[str, Any]]:
+        return self._cur.fetchmany(size)
+
+    def fetchall(self) -> list[dict[str, Any]]:
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self) -> int:
+        raise ProgrammingError("no lastrowid on PostgreSQL — use RETURNING")
+
+
+class FakePgConnection:
+    def __init__(self, server: 'FakePgServer') -> None:
+        self.server = server
+        self._db = sqlite3.connect(server.path, timeout=30, check_same_thread=False)
+        self._db.row_factory = _dict_row
+        self.closed = False
+        self.broken = False
+
+    def _check_open(self) -> None:
+        if self.closed or self.broken:
+            raise ProgrammingError("connection is closed")
+
+    def cursor(self) -> FakePgCursor:
+        return FakePgCursor(self)
+
+    def commit(self) -> None:
+        self._check_open()
+        self._db.commit()
+
+    def rollback(self) -> None:
+        self._check_open()
+        self._db.rollback()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._db.close()
+            self.server._closed()
+
+
+class FakePgServer:
+    """One 'database'; counts the connections clients hold open."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.opened = 0
+        self.open = 0
+        self.peak_open = 0
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def connect(self) -> FakePgConnection:
+        with self._lock:
+            self.opened += 1
+            self.open += 1
+            self.peak_open = max(self.peak_open, self.open)
+        return FakePgConnection(self)
+
+    def _closed(self) -> None:
+        with self._lock:
+            self.open -= 1
@@ -0,0 +1,224 @@
+"""
+Tests for database/backends.py — the repository over a PostgreSQL backend, and
+the connection pool. The server is the in-process stand-in in tests/fake_pg.py.
+"""
+
+import threading
+import time
+
+import pytest
+
+import database.database as db
+from database.backends import Backend, ConnectionPool, PoolTimeout, PostgresBackend, SQLiteBackend, to_format_style
+from database.persistence import DatabasePersistence
+from tests.fake_pg import FakePgServer, ProgrammingError
+
+
+@pytest.fixture()
+def pg(tmp_path):
+    """Route every repository call through a pooled PostgresBackend on a fake server."""
+    server = FakePgServer(str(tmp_path / "pg.db"))
+    db.set_backend(PostgresBackend(factory=server.connect, pool_size=4))
+    db.init_db()
+    yield server
+    db.set_backend(None)
+
+
+def _user_with_deck(uid: int = 1, name: str = 'French') -> int:
+    db.create_user(uid, None, f"u{uid}")
+    return db.create_deck_db(uid, name)
+
+
+class TestRepositoryOnPostgres:
+    def test_migrate_is_idempotent(self, pg):
+        db.init_db()
+        _user_with_deck()
+        db.init_db()
+        assert db.get_all_decks(1) == [{'id': 1, 'name': 'French'}]
+
+    def test_users_and_defaults(self, pg):
+        deck_id = _user_with_deck()
+        assert db.get_user(1)['name'] == 'u1'
+        assert db.get_user(2) is None
+        db.update_user_defaults(1, deck_id=deck_id, card_type='reverse')
+        assert db.get_user_defaults(1) == {'deck_id': deck_id, 'card_type': 'reverse'}
+        db.update_reminder_settings(1, enabled=False, timezone='Europe/Berlin')
+        assert db.get_reminder_settings(1)['enabled'] is False
+
+    def test_cards_review_and_stats(self, pg):
+        deck_id = _user_with_deck()
+        assert db.save_cards([{'front': 'a', 'back': 'b'}, {'front': 'c', 'back': 'd'}], 'basic', deck_id, 1) == 2
+
+        due = db.get_due_cards(1)
+        assert [c['front'] for c in due] == ['a', 'c']
+        assert due[0]['deck_name'] == 'French'
+        assert db.get_decks_with_stats(1)[0]['due_count'] == 2
+
+        db.update_card_srs(due[0]['card_id'], '2099-01-01 00:00:00', 3.0, 5.0, 1, 0, 'review', 3, user_id=1)
+        stats = db.get_card_stats(1)
+        assert (stats['total'], stats['new'], stats['review'], stats['due_today']) == (2, 1, 1, 1)
+        assert all(isinstance(v, int) for v in stats.values())
+        assert len(db.get_forecast(1)) == 7
+
+    def test_reverse_sibling_edit(self, pg):
+        deck_id = _user_with_deck()
+        db.save_card({'front': 'dog', 'back': 'Hund'}, 'reverse', deck_id, 1)
+        first = db.get_cards_in_deck(deck_id, 1)[0]
+        db.update_card_content(first['card_id'], 1, 'cat', 'Katze')
+        assert {(c['front'], c['back']) for c in db.get_cards_in_deck(deck_id, 1)} == {('cat', 'Katze'), ('Katze', 'cat')}
+
+    def test_migrate_splits_legacy_cards_into_notes(self, pg):
+        """A cards table from before notes: content moves to notes, the pair shares one."""
+        deck_id = _user_with_deck()
+        with db.get_db() as conn:
+            conn.execute("DROP TABLE cards")
+            conn.execute("DROP TABLE notes")
+            conn.execute(
+                "CREATE TABLE cards (card_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+                "deck_id BIGINT NOT NULL, user_id BIGINT NOT NULL, front TEXT NOT NULL, back TEXT NOT NULL, "
+                "card_type TEXT DEFAULT 'basic', content_type TEXT DEFAULT 'text', state TEXT DEFAULT 'new', "
+                "due_date TEXT, stability REAL DEFAULT 0.0, difficulty REAL DEFAULT 5.0, "
+                "elapsed_days INTEGER DEFAULT 0, scheduled_days INTEGER DEFAULT 0, reps INTEGER DEFAULT 0, "
+                "lapses INTEGER DEFAULT 0, created_at TEXT, updated_at TEXT)"
+            )
+            conn.executemany(
+                "INSERT INTO cards (front, back, card_type, deck_id, user_id, due_date) "
+                "VALUES (?, ?, 'reverse', ?, 1, '2000-01-01 00:00:00')",
+                [('dog', 'Hund', deck_id), ('Hund', 'dog', deck_id)],
+            )
+        db.init_db()
+        first, second = db.get_cards_in_deck(deck_id, 1)
+        assert first['note_id'] == second['note_id']
+        assert [(c['front'], c['back']) for c in (first, second)] == [('dog', 'Hund'), ('Hund', 'dog')]
+        db.update_card_content(second['card_id'], 1, 'Katze', 'cat')
+        assert db.get_card(first['card_id'], 1)['front'] == 'cat'
+
+    def test_export_reminders_and_global_stats(self, pg):
+        for uid in (1, 2):
+            deck_id = _user_with_deck(uid)
+            db.save_card({'front': 'q', 'back': 'a'}, 'basic', deck_id, uid)
+        assert [r['front'] for r in db.iter_export_rows(1)] == ['q']
+        assert {r['user_id'] for r in db.get_reminder_candidates(20)} == {1, 2}
+        db.mark_reminded([1])
+        assert {r['user_id'] for r in db.get_reminder_candidates(20)} == {2}
+        assert db.get_global_stats() == {'users': 2, 'decks': 2, 'cards': 2, 'due': 2}
+
+    def test_import_exported_rows(self, pg):
+        deck_id = _user_with_deck(1)
+        db.save_card({'front': 'q', 'back': 'a'}, 'reverse', deck_id, 1)
+        db.create_user(2, None, 'u2')
+        assert db.import_rows(list(db.iter_export_rows(1)), 2) == 2
+        assert [(r['deck_name'], r['template'], r['front']) for r in db.iter_export_rows(2)] == [
+            ('French', 'forward', 'q'), ('French', 'reverse', 'q')]
+
+    def test_rename_and_delete(self, pg):
+        deck_id = _user_with_deck()
+        db.save_card({'front': 'q', 'back': 'a'}, 'basic', deck_id, 1)
+        db.rename_deck(deck_id, 1, 'Spanish')
+        assert db.get_deck_name(deck_id, 1) == 'Spanish'
+        db.delete_deck(deck_id, 1)
+        assert db.get_all_decks(1) == [] and db.get_due_cards(1) == []
+
+    def test_stand_in_rejects_sqlite_dialect(self, pg):
+        with pytest.raises(ProgrammingError):
+            with db.get_db() as conn:
+                conn.execute("SELECT datetime('now')")
+
+
+@pytest.mark.asyncio
+class TestPersistenceOnPostgres:
+    async def test_round_trip(self, pg):
+        persistence = DatabasePersistence(db.get_backend())
+        await persistence.update_user_data(5, {'review_index': 3})
+        await persistence.update_conversation('review', (5, 5), 1)
+        await persistence.update_bot_data({'k': 'v'})
+        assert await persistence.get_user_data() == {5: {'review_index': 3}}
+        assert await persistence.get_conversations('review') == {(5, 5): 1}
+        assert await persistence.get_bot_data() == {'k': 'v'}
+
+
+class TestConnectionPool:
+    def test_reuses_connections(self, pg):
+        for uid in range(1, 21):
+            db.create_user(uid, None, 'U')
+        assert pg.opened == 1                       # sequential calls share one connection
+
+    def test_bounded_under_concurrency(self, pg):
+        _user_with_deck()
+        errors = []
+
+        def worker() -> None:
+            try:
+                for _ in range(20):
+                    db.get_due_cards(1)
+            except Exception as e:                  # pragma: no cover — surfaced below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors
+        assert pg.peak_open <= 4
+
+    def test_rollback_on_error_and_connection_returned(self, pg):
+        backend = db.get_backend()
+        with pytest.raises(RuntimeError):
+            with backend.connect() as conn:
+                conn.execute("INSERT INTO users (user_id, name) VALUES (?, ?)", (9, 'x'))
+                raise RuntimeError
+        assert db.get_user(9) is None
+        assert backend.pool.idle == backend.pool.opened == 1
+
+    def test_closed_generator_releases(self, pg):
+        deck_id = _user_with_deck()
+        db.save_cards([{'front': str(i), 'back': 'b'} for i in range(10)], 'basic', deck_id, 1)
+        rows = db.iter_export_rows(1, chunk_size=2)
+        next(rows)
+        rows.close()
+        assert db.get_backend().pool.idle == db.get_backend().pool.opened
+
+    def test_broken_connection_discarded(self, pg):
+        backend = db.get_backend()
+        with pytest.raises(ProgrammingError):
+            with backend.connect() as conn:
+                conn._raw.broken = True             # server went away mid-transaction
+        assert backend.pool.opened == 0
+        assert db.get_user(1) is None               # a fresh connection is opened
+
+    def test_timeout(self):
+        pool = ConnectionPool(object, size=1, timeout=0.05)
+        pool.acquire()
+        t0 = time.monotonic()
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+        assert time.monotonic() - t0 >= 0.05
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(object, size=1, timeout=5)
+        conn = pool.acquire()
+        threading.Timer(0.02, pool.release, args=(conn,)).start()
+        assert pool.acquire() is conn
+
+    def test_rejects_bad_size(self):
+        with pytest.raises(ValueError):
+            ConnectionPool(object, size=0)
+
+
+class TestDialect:
+    def test_format_style(self):
+        assert to_format_style("SELECT * FROM t WHERE a = ? AND b LIKE '5%'") == \
+            "SELECT * FROM t WHERE a = %s AND b LIKE '5%%'"
+
+    def test_default_is_sqlite(self, tdb):
+        backend = db.get_backend()
+        assert isinstance(backend, SQLiteBackend) and backend.path == tdb
+
+    def test_incomplete_backend_fails_when_created(self):
+        class Partial(Backend):
+            def connect(self, user_id=None):
+                raise AssertionError('never reached')
+
+        with pytest.raises(TypeError, match='fan_out'):
+            Partial()
@@ -0,0 +1,49 @@
+"""Smoke tests for benchmarks/ — seeded datasets and the JSON benchmark suite."""
+
+import database.database as db
+from benchmarks import suite
+from benchmarks.datasets import SCALES, seed
+
+
+def _cards(user_id: int) -> list[tuple]:
+    with db.get_db(user_id) as conn:
+        return [tuple(r) for r in conn.execute(
+            "SELECT n.front, c.state, c.stability, c.reps FROM cards c JOIN notes n ON n.note_id = c.note_id "
+            "WHERE c.user_id = ? ORDER BY c.card_id", (user_id,)
+        )]
+
+
+class TestDatasets:
+    def test_shape(self, tdb):
+        data = seed('tiny', seed=3)
+        scale = SCALES['tiny']
+        assert len(data.user_ids) == scale.users
+        assert all(len(decks) == scale.decks for decks in data.decks.values())
+        assert db.get_global_stats()['cards'] == scale.total_cards
+        assert 0 < db.get_global_stats()['due'] < scale.total_cards
+
+    def test_reproducible(self, tdb, tmp_path, monkeypatch):
+        first = seed('tiny', seed=7)
+        rows = _cards(first.user_ids[0])
+        monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'again.db'))
+        db.init_db()
+        seed('tiny', seed=7)
+        assert _cards(first.user_ids[0]) == rows
+
+
+class TestSuite:
+    def test_run_emits_every_benchmark(self, tdb):
+        path = db.DB_PATH
+        result = suite.run('tiny', n=3, warmup=1)
+        assert db.DB_PATH == path                 # the throwaway database is undone
+        assert result['meta']['scale']['name'] == 'tiny'
+        assert set(result['results']) == set(suite.BENCHMARKS)
+        for stats in result['results'].values():
+            assert stats['n'] == 3 and 0 < stats['min_us'] <= stats['median_us'] <= stats['p99_us']
+
+    def test_only_and_compare(self, tdb):
+        result = suite.run('tiny', n=3, warmup=0, only=['srs.'])
+        assert list(result['results']) == ['srs.schedule_all_ratings']
+        faster = {'results': {'srs.schedule_all_ratings': {'median_us': result['results']['srs.schedule_all_ratings']['median_us'] / 2}}}
+        assert suite.compare(result, faster, threshold=0.15) == ['srs.schedule_all_ratings']
+        assert suite.compare(result, result, threshold=0.15) == []
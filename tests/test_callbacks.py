@@ -103,7 +103,7 @@ class TestAllPrefixes:
         cb.DECK, cb.DECK_OPEN, cb.DECK_DELETE, cb.DECK_DELETE_YES,
         cb.DECK_RENAME, cb.DECKS_PAGE, cb.PICK_EDIT, cb.PICK_DELETE,
         cb.CARD_EDIT, cb.CARD_DELETE_YES, cb.RATE, cb.REVIEW_DECK,
-        cb.EDIT_REVIEW,
+        cb.EDIT_REVIEW, cb.DECK_EXPORT,
     ]
 
     @pytest.mark.parametrize("prefix", _INT_PREFIXES)
@@ -120,3 +120,47 @@ class TestAllPrefixes:
         for t in ("basic", "reverse"):
             data = cb.make(cb.SET_TYPE, t)
             assert cb.parse_args(data, cb.SET_TYPE) == [t]
+
+
+# ── pack() / unpack() ────────────────────────────────────────
+
+class TestPacked:
+    @pytest.mark.parametrize("prefix,args,nonce", [
+        (cb.SHOW_ANSWER, (), 1),
+        (cb.RATE, (3,), 2 ** 32 - 1),
+        (cb.DECK_PAGE, (2 ** 40, 0), 0),
+        (cb.CARD_DELETE_YES, (127, ), 5),
+        (cb.CARD_DELETE_YES, (128, ), 5),
+    ])
+    def test_roundtrip(self, prefix, args, nonce):
+        data = cb.pack(prefix, *args, nonce=nonce)
+        assert data.startswith(cb.PACKED) and data.isascii()
+        assert cb.unpack(data) == (prefix, list(args), nonce)
+
+    def test_fits_callback_limit(self):
+        data = cb.pack(cb.DECK_PAGE, 2 ** 63, 2 ** 63, nonce=2 ** 32 - 1)
+        assert len(data.encode()) <= cb.MAX_DATA_BYTES
+        with pytest.raises(ValueError):
+            cb.pack(cb.DECK_PAGE, *[2 ** 63] * 6)
+
+    def test_codes_are_unique_and_plain_data_unaffected(self):
+        assert len(set(cb.CODES.values())) == len(cb.CODES)
+        assert not any(prefix.startswith(cb.PACKED) for prefix in cb.CODES)
+
+    @pytest.mark.parametrize("data", ['deck_open_1', '~', '~!!!!', '~AQ', '~CQAAAAAB', '~AX8AAAAA', '~AQIAAAAAgA'])
+    def test_rejects_garbage(self, data):
+        with pytest.raises(ValueError):
+            cb.unpack(data)
+
+    def test_unknown_prefix_or_negative_arg(self):
+        with pytest.raises(ValueError):
+            cb.pack(cb.SET_TYPE, 1)
+        with pytest.raises(ValueError):
+            cb.pack(cb.DECK_OPEN, -1)
+
+    def test_nonces(self):
+        user_data: dict = {}
+        assert cb.current_nonce(user_data, 'review') == 0
+        first = cb.new_nonce(user_data, 'review')
+        assert first and cb.current_nonce(user_data, 'review') == first
+        assert cb.current_nonce(user_data, 'manage') == 0
@@ -5,6 +5,8 @@ Uses a real SQLite file in a pytest tmp_path so every test gets an isolated DB.
 No Telegram objects, no async — pure DB logic.
 """
 import sqlite3
+from datetime import datetime, timezone
+
 import pytest
 
 import database.database as db
@@ -36,6 +38,38 @@ def _raw(db_path: str, sql: str, params=()):
     return [dict(r) for r in rows]
 
 
+def _write(db_path: str, sql: str, params=()):
+    """Run a raw statement against the test DB and commit."""
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+# The cards table before notes existed (content on every card)
+LEGACY_CARDS = """
+    CREATE TABLE cards (
+        card_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        deck_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        front TEXT NOT NULL,
+        back TEXT NOT NULL,
+        card_type TEXT DEFAULT 'basic',
+        content_type TEXT DEFAULT 'text',
+        state TEXT DEFAULT 'new',
+        due_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        stability REAL DEFAULT 0.0,
+        difficulty REAL DEFAULT 5.0,
+        elapsed_days INTEGER DEFAULT 0,
+        scheduled_days INTEGER DEFAULT 0,
+        reps INTEGER DEFAULT 0,
+        lapses INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
 # ── User ──────────────────────────────────────────────────────
 
 class TestUser:
@@ -47,6 +81,15 @@ class TestUser:
         assert user['username'] == 'alice'
         assert user['name'] == 'Alice'
 
+    def test_shard_key_stored_and_backfilled(self, tdb):
+        from utils.sharding import shard_key
+        db.create_user(3, None, 'C')
+        assert db.get_user(3)['shard_key'] == shard_key(3)
+        with db.get_db() as conn:
+            conn.execute("INSERT INTO users (user_id, name) VALUES (4, 'D')")     # from before the column
+        db.init_db()
+        assert db.get_user(4)['shard_key'] == shard_key(4)
+
     def test_get_nonexistent_returns_none(self, tdb):
         assert db.get_user(999) is None
 
@@ -255,6 +298,46 @@ class TestCard:
         card = db.get_card(original['card_id'], 29)
         assert card['front'] == 'x'
 
+    def test_update_card_content_leaves_identical_pairs_alone(self, tdb):
+        """The sibling is found by id, not by content — a duplicate pair keeps its text."""
+        db.create_user(28, None, 'U')
+        deck_id = db.create_deck_db(28, 'D')
+        db.save_card({'front': 'cat', 'back': 'кот'}, 'reverse', deck_id, 28)
+        db.save_card({'front': 'cat', 'back': 'кот'}, 'reverse', deck_id, 28)
+        first = db.get_cards_in_deck(deck_id, 28)[0]
+        db.update_card_content(first['card_id'], 28, 'kitten', 'котёнок')
+        pairs = sorted((c['front'], c['back']) for c in db.get_cards_in_deck(deck_id, 28))
+        assert pairs == sorted([('kitten', 'котёнок'), ('котёнок', 'kitten'), ('cat', 'кот'), ('кот', 'cat')])
+
+    def test_cloze_edit_adds_and_removes_cards_incrementally(self, tdb):
+        """Cards for kept numbers keep their id (and scheduling); only the difference changes."""
+        db.create_user(28, None, 'U')
+        deck_id = db.create_deck_db(28, 'D')
+        db.save_card({'front': "{{c1::a}} {{c2::b}}", 'back': ''}, 'cloze', deck_id, 28)
+        c1, c2 = db.get_cards_in_deck(deck_id, 28)
+        db.update_card_content(c2['card_id'], 28, "{{c1::a}} {{c3::b}} {{c4::d}}", 'x')
+        cards = db.get_cards_in_deck(deck_id, 28)
+        assert [(c['card_id'], c['template']) for c in cards] == [
+            (c1['card_id'], 'c1'), (c2['card_id'] + 1, 'c3'), (c2['card_id'] + 2, 'c4'),
+        ]
+        assert cards[0]['back'] == "a b d\n\nx"
+        with pytest.raises(ValueError):
+            db.update_card_content(c1['card_id'], 28, "no blanks left", '')
+
+    def test_cloze_edit_drops_cached_state_of_removed_cards(self, tdb):
+        from utils.due_load import DUE_LOAD
+        from utils.timer_wheel import DUE_TIMERS
+        db.create_user(28, None, 'U')
+        deck_id = db.create_deck_db(28, 'D')
+        db.save_card({'front': "{{c1::a}} {{c2::b}}", 'back': ''}, 'cloze', deck_id, 28)
+        c1, c2 = db.get_cards_in_deck(deck_id, 28)
+        db.update_card_srs(c2['card_id'], '2099-01-01 10:00:00', 0.0, 5.0, 0, 0, 'learning', 0, user_id=28)
+        db.get_due_load(28)
+        DUE_TIMERS.add((28, c2['card_id']), 28, DUE_TIMERS.clock() + 60)
+        db.update_card_content(c1['card_id'], 28, "{{c1::a}} b", '')
+        assert DUE_LOAD.get(28) is None
+        assert len(DUE_TIMERS) == 0
+
     def test_update_card_caption_only_updates_back(self, tdb):
         """P-6: update_card_caption must not touch front (the file_id)."""
         db.create_user(30, None, 'U')
@@ -275,6 +358,160 @@ class TestCard:
         assert db.get_card(card_id, 31)['back'] == ''
 
 
+# ── Bulk save ─────────────────────────────────────────────────
+
+class TestSaveCards:
+    def test_saves_all_cards(self, tdb):
+        db.create_user(32, None, 'U')
+        deck_id = db.create_deck_db(32, 'D')
+        cards = [{'front': f'q{i}', 'back': f'a{i}'} for i in range(50)]
+        assert db.save_cards(cards, 'basic', deck_id, 32) == 50
+        saved = db.get_cards_in_deck(deck_id, 32)
+        assert [c['front'] for c in saved] == [f'q{i}' for i in range(50)]
+
+    def test_reverse_adds_sibling_per_card(self, tdb):
+        db.create_user(33, None, 'U')
+        deck_id = db.create_deck_db(33, 'D')
+        cards = [{'front': 'cat', 'back': 'кот'}, {'front': 'dog', 'back': 'собака'}]
+        assert db.save_cards(cards, 'reverse', deck_id, 33) == 4
+        pairs = {(c['front'], c['back']) for c in db.get_cards_in_deck(deck_id, 33)}
+        assert pairs == {('cat', 'кот'), ('кот', 'cat'), ('dog', 'собака'), ('собака', 'dog')}
+
+    def test_reverse_pair_shares_one_note(self, tdb):
+        """The text is stored once; the two cards differ only in template."""
+        db.create_user(33, None, 'U')
+        deck_id = db.create_deck_db(33, 'D')
+        db.save_cards([{'front': 'cat', 'back': 'кот'}, {'front': 'dog', 'back': 'собака'}], 'reverse', deck_id, 33)
+        assert _raw(tdb, "SELECT front, back, note_type FROM notes ORDER BY note_id") == [
+            {'front': 'cat', 'back': 'кот', 'note_type': 'reverse'},
+            {'front': 'dog', 'back': 'собака', 'note_type': 'reverse'},
+        ]
+        cards = db.get_cards_in_deck(deck_id, 33)
+        assert [(c['note_id'], c['template']) for c in cards] == [
+            (1, 'forward'), (1, 'reverse'), (2, 'forward'), (2, 'reverse'),
+        ]
+
+    def test_basic_note_has_one_card(self, tdb):
+        db.create_user(33, None, 'U')
+        deck_id = db.create_deck_db(33, 'D')
+        db.save_card({'front': 'q', 'back': 'a'}, 'basic', deck_id, 33)
+        [card] = db.get_due_cards(33)
+        assert (card['template'], card['card_type']) == ('forward', 'basic')
+
+    def test_cloze_note_gets_one_card_per_number(self, tdb):
+        db.create_user(33, None, 'U')
+        deck_id = db.create_deck_db(33, 'D')
+        assert db.save_cards([{'front': "{{c1::a}} {{c2::b}} {{c1::c}}", 'back': ''},
+                              {'front': "no blanks", 'back': ''}], 'cloze', deck_id, 33) == 2
+        cards = db.get_cards_in_deck(deck_id, 33)
+        assert [(c['template'], c['front']) for c in cards] == [('c1', '[...] b [...]'), ('c2', 'a [...] c')]
+        assert _raw(tdb, "SELECT front FROM notes WHERE note_id = 1") == [{'front': "{{c1::a}} {{c2::b}} {{c1::c}}"}]
+        assert _raw(tdb, "SELECT COUNT(*) AS n FROM notes") == [{'n': 1}]     # no orphan note for "no blanks"
+
+    def test_empty_list_is_noop(self, tdb):
+        db.create_user(34, None, 'U')
+        deck_id = db.create_deck_db(34, 'D')
+        assert db.save_cards([], 'basic', deck_id, 34) == 0
+        assert db.get_cards_in_deck(deck_id, 34) == []
+
+    def test_all_or_nothing(self, tdb):
+        """A bad row rolls back the whole batch."""
+        db.create_user(35, None, 'U')
+        deck_id = db.create_deck_db(35, 'D')
+        cards = [{'front': 'ok', 'back': 'ok'}, {'front': None, 'back': 'bad'}]
+        with pytest.raises(sqlite3.IntegrityError):
+            db.save_cards(cards, 'basic', deck_id, 35)
+        assert db.get_cards_in_deck(deck_id, 35) == []
+
+
+class TestNotesMigration:
+    """A database from before notes: content moves into notes, reverse pairs share one."""
+
+    def _legacy_db(self, tdb, user_id, rows, with_sibling_id=False):
+        """Replace the cards table with the pre-notes layout and fill it; returns the deck id."""
+        db.create_user(user_id, None, 'U')
+        deck_id = db.create_deck_db(user_id, 'D')
+        conn = sqlite3.connect(tdb)
+        conn.executescript("DROP TABLE cards; DROP TABLE notes;" + LEGACY_CARDS)
+        if with_sibling_id:
+            conn.executescript("ALTER TABLE cards ADD COLUMN sibling_id INTEGER;"
+                               "CREATE INDEX idx_cards_sibling_id ON cards(sibling_id) WHERE sibling_id IS NOT NULL;")
+        for row in rows:
+            columns = ', '.join(row)
+            conn.execute(f"INSERT INTO cards (deck_id, user_id, {columns}) VALUES (?, ?{', ?' * len(row)})",
+                         (deck_id, user_id, *row.values()))
+        conn.commit()
+        conn.close()
+        return deck_id
+
+    def _reverse_pairs(self, pairs):
+        return [row for front, back in pairs for row in (
+            {'front': front, 'back': back, 'card_type': 'reverse'},
+            {'front': back, 'back': front, 'card_type': 'reverse'},
+        )]
+
+    def test_pairs_become_one_note(self, tdb):
+        rows = self._reverse_pairs([('a', 'b'), ('a', 'b')]) + [{'front': 'q', 'back': 'x', 'state': 'review', 'reps': 3}]
+        deck_id = self._legacy_db(tdb, 40, rows)
+        db.init_db()
+        cards = db.get_cards_in_deck(deck_id, 40)
+        assert [(c['front'], c['back']) for c in cards] == [(r['front'], r['back']) for r in rows]
+        assert [(c['note_id'], c['template']) for c in cards] == [
+            (1, 'forward'), (1, 'reverse'), (2, 'forward'), (2, 'reverse'), (3, 'forward'),
+        ]
+        assert _raw(tdb, "SELECT state, reps FROM cards WHERE card_id = 5") == [{'state': 'review', 'reps': 3}]
+        columns = {r['name'] for r in _raw(tdb, "PRAGMA table_info(cards)")}
+        assert not columns & {'front', 'back', 'card_type', 'content_type', 'sibling_id'}
+
+    def test_linked_pairs_keep_their_links(self, tdb):
+        """A database that already had sibling_id pairs by it, not by content."""
+        rows = [
+            {'front': 'a', 'back': 'b', 'card_type': 'reverse', 'sibling_id': 3},
+            {'front': 'q', 'back': 'x', 'card_type': 'basic', 'sibling_id': None},
+            {'front': 'b', 'back': 'a', 'card_type': 'reverse', 'sibling_id': 1},
+        ]
+        deck_id = self._legacy_db(tdb, 41, rows, with_sibling_id=True)
+        db.init_db()
+        assert [(c['note_id'], c['template']) for c in db.get_cards_in_deck(deck_id, 41)] == [
+            (1, 'forward'), (2, 'forward'), (1, 'reverse'),
+        ]
+
+    def test_batches(self, tdb):
+        from database.backends import SQLiteBackend, split_notes
+        from database.schema import note_schema
+        deck_id = self._legacy_db(tdb, 42, self._reverse_pairs([(f'q{i}', f'a{i}') for i in range(5)]))
+        conn = sqlite3.connect(tdb)
+        conn.row_factory = sqlite3.Row
+        conn.execute(note_schema)
+        SQLiteBackend._add_missing_columns(conn)
+        assert split_notes(conn, {'front', 'back', 'card_type', 'content_type'}, batch_size=3) == 5
+        conn.commit()
+        conn.close()
+        db.init_db()
+        cards = db.get_cards_in_deck(deck_id, 42)
+        assert [c['front'] for c in cards[:4]] == ['q0', 'a0', 'q1', 'a1']
+        assert len({c['note_id'] for c in cards}) == 5
+
+    def test_orphans_get_their_own_note(self, tdb):
+        """Only adjacent mirrored ids pair up; a card whose partner was deleted stands alone."""
+        rows = self._reverse_pairs([('a', 'b'), ('x', 'y'), ('a', 'b')])
+        del rows[4], rows[1]
+        deck_id = self._legacy_db(tdb, 43, rows)
+        db.init_db()
+        db.init_db()
+        cards = db.get_cards_in_deck(deck_id, 43)
+        assert [(c['front'], c['back'], c['template']) for c in cards] == [
+            ('a', 'b', 'forward'), ('x', 'y', 'forward'), ('y', 'x', 'reverse'), ('b', 'a', 'forward'),
+        ]
+
+    def test_edits_after_migration_reach_both_cards(self, tdb):
+        deck_id = self._legacy_db(tdb, 44, self._reverse_pairs([('cat', 'кот')]))
+        db.init_db()
+        db.update_card_content(2, 44, 'котёнок', 'kitten')
+        pairs = [(c['front'], c['back']) for c in db.get_cards_in_deck(deck_id, 44)]
+        assert pairs == [('kitten', 'котёнок'), ('котёнок', 'kitten')]
+
+
 # ── Due cards ─────────────────────────────────────────────────
 
 class TestDueCards:
@@ -318,6 +555,16 @@ class TestDueCards:
                       'difficulty', 'reps', 'lapses', 'deck_id', 'due_date', 'scheduled_days'):
             assert field in card, f"missing field: {field}"
 
+    def test_review_session_buries_reverse_siblings(self, tdb):
+        """A review session shows one card of each due pair; basic cards are untouched."""
+        from handlers.review import _bury_siblings
+        db.create_user(16, None, 'U')
+        deck_id = db.create_deck_db(16, 'D')
+        db.save_cards([{'front': 'cat', 'back': 'кот'}, {'front': 'dog', 'back': 'собака'}], 'reverse', deck_id, 16)
+        db.save_cards([{'front': 'q', 'back': 'a'}, {'front': 'q', 'back': 'a'}], 'basic', deck_id, 16)
+        session = _bury_siblings(db.get_due_cards(16))
+        assert sorted(c['front'] for c in session) == ['cat', 'dog', 'q', 'q']
+
     def test_due_cards_isolated_per_user(self, tdb):
         db.create_user(44, None, 'U1')
         db.create_user(45, None, 'U2')
@@ -339,6 +586,83 @@ class TestDueCards:
         assert due[0]['state'] == 'new'
 
 
+# ── Suspend / bury ────────────────────────────────────────────
+
+class TestSuspendBury:
+    def _pair(self, uid):
+        db.create_user(uid, None, 'U')
+        deck_id = db.create_deck_db(uid, 'D')
+        db.save_card({'front': 'cat', 'back': 'кот'}, 'reverse', deck_id, uid)
+        return deck_id, [c['card_id'] for c in db.get_cards_in_deck(deck_id, uid)]
+
+    def test_suspended_card_leaves_review_and_counts(self, tdb):
+        deck_id, (fwd, rev) = self._pair(70)
+        db.set_card_suspended(fwd, 70, True)
+        assert [c['card_id'] for c in db.get_due_cards(70)] == [rev]
+        assert [c['card_id'] for c in db.get_due_cards(70, deck_id)] == [rev]
+        assert db.get_card_stats(70)['total'] == 1
+        assert db.get_card_stats(70)['due_today'] == 1
+        [deck] = db.get_decks_with_stats(70)
+        assert (deck['card_count'], deck['due_count']) == (1, 1)
+        # still listed in its deck, marked
+        assert [c['suspended'] for c in db.get_cards_in_deck(deck_id, 70)] == [1, 0]
+
+    def test_global_due_count_skips_suspended_and_buried(self, tdb):
+        _, (fwd, rev) = self._pair(76)
+        db.set_card_suspended(fwd, 76, True)
+        assert db.get_global_stats()['due'] == 1
+        db.bury_card(rev, 76, '2099-01-01 00:00:00')
+        assert db.get_global_stats() == {'users': 1, 'decks': 1, 'cards': 2, 'due': 0}
+
+    def test_resume(self, tdb):
+        _, (fwd, _rev) = self._pair(71)
+        db.set_card_suspended(fwd, 71, True)
+        db.set_card_suspended(fwd, 71, False)
+        assert len(db.get_due_cards(71)) == 2
+
+    def test_suspend_other_users_card_is_noop(self, tdb):
+        _, (fwd, _rev) = self._pair(72)
+        db.set_card_suspended(fwd, 99, True)
+        assert len(db.get_due_cards(72)) == 2
+
+    def test_bury_siblings_hides_the_rest_of_the_note(self, tdb):
+        _, (fwd, rev) = self._pair(73)
+        assert db.bury_siblings(fwd, 73, '2099-01-01 00:00:00') == 1
+        assert [c['card_id'] for c in db.get_due_cards(73)] == [fwd]
+        assert db.get_card_stats(73)['total'] == 1
+
+    def test_bury_siblings_of_basic_card_touches_nothing(self, tdb):
+        db.create_user(74, None, 'U')
+        deck_id = db.create_deck_db(74, 'D')
+        db.save_cards([{'front': 'q', 'back': 'a'}] * 2, 'basic', deck_id, 74)
+        card_id = db.get_cards_in_deck(deck_id, 74)[0]['card_id']
+        assert db.bury_siblings(card_id, 74, '2099-01-01 00:00:00') == 0
+
+    def test_unbury_returns_expired_buries_only(self, tdb):
+        _, (fwd, rev) = self._pair(75)
+        db.bury_card(fwd, 75, '2000-01-01 00:00:00')
+        db.bury_card(rev, 75, '2099-01-01 00:00:00')
+        assert db.get_due_cards(75) == []
+        assert db.unbury_cards() == 1
+        assert [c['card_id'] for c in db.get_due_cards(75)] == [fwd]
+
+    def test_active_queries_use_partial_indexes(self, tdb):
+        def plan(sql):
+            with db.get_db() as conn:
+                return ' '.join(row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (1, '2099')))
+        assert 'idx_cards_active_due' in plan(
+            "SELECT card_id FROM cards WHERE user_id = ? AND due_date <= ? "
+            "AND suspended = 0 AND buried_until IS NULL")
+        assert 'idx_cards_active_deck' in plan(
+            "SELECT card_id FROM cards WHERE deck_id = ? AND due_date <= ? "
+            "AND suspended = 0 AND buried_until IS NULL")
+        with db.get_db() as conn:
+            detail = ' '.join(row['detail'] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT card_id FROM cards WHERE buried_until IS NOT NULL AND buried_until <= ?",
+                ('2099',)))
+        assert 'idx_cards_buried' in detail
+
+
 # ── SRS update ────────────────────────────────────────────────
 
 class TestSrsUpdate:
@@ -373,6 +697,121 @@ class TestSrsUpdate:
         assert r['elapsed_days'] == 1
 
 
+# ── Leeches ───────────────────────────────────────────────────
+
+class TestLeeches:
+    def _cards(self, uid, n):
+        db.create_user(uid, None, 'U')
+        deck_id = db.create_deck_db(uid, 'D')
+        db.save_cards([{'front': f'q{i}', 'back': 'a'} for i in range(n)], 'basic', deck_id, uid)
+        return deck_id, [c['card_id'] for c in db.get_cards_in_deck(deck_id, uid)]
+
+    def _lapse(self, card_id, uid, lapses, **flags):
+        db.update_card_srs(card_id, '2000-01-01 00:00:00', 1.0, 5.0, 3, lapses, 'relearning', 0,
+                           user_id=uid, **flags)
+
+    def test_leech_tag_and_suspend_in_the_rating_update(self, tdb):
+        deck_id, (a, b) = self._cards(80, 2)
+        self._lapse(a, 80, 8, leech=True, suspend=True)
+        self._lapse(b, 80, 8, leech=True)
+        rows = {r['card_id']: r for r in _raw(tdb, "SELECT card_id, leech, suspended, lapses FROM cards")}
+        assert (rows[a]['leech'], rows[a]['suspended'], rows[a]['lapses']) == (1, 1, 8)
+        assert (rows[b]['leech'], rows[b]['suspended']) == (1, 0)
+        assert [c['card_id'] for c in db.get_due_cards(80)] == [b]
+
+    def test_plain_rating_leaves_flags_alone(self, tdb):
+        _, [a] = self._cards(81, 1)
+        self._lapse(a, 81, 8, leech=True, suspend=True)
+        self._lapse(a, 81, 8)
+        assert _raw(tdb, "SELECT leech, suspended FROM cards") == [{'leech': 1, 'suspended': 1}]
+
+    def test_get_leeches_most_lapsed_first(self, tdb):
+        _, (a, b, c) = self._cards(82, 3)
+        self._lapse(a, 82, 9)
+        self._lapse(b, 82, 3)
+        self._lapse(c, 82, 12)
+        leeches = db.get_leeches(82, 8, 10)
+        assert [(l['card_id'], l['lapses']) for l in leeches] == [(c, 12), (a, 9)]
+        assert leeches[0]['deck_name'] == 'D' and leeches[0]['front'] == 'q2'
+        assert db.get_leeches(82, 8, 1) == leeches[:1]
+        assert db.get_leeches(83, 1, 10) == []
+
+    def test_leeches_query_uses_lapses_index(self, tdb):
+        with db.get_db() as conn:
+            plan = ' '.join(row['detail'] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT card_id FROM cards WHERE user_id = ? AND lapses >= ? "
+                "ORDER BY lapses DESC LIMIT 20", (1, 8)))
+        assert 'idx_cards_leeches' in plan
+
+
+# ── Due load histogram ────────────────────────────────────────
+
+class TestDueLoad:
+    def _cards(self, uid, n):
+        db.create_user(uid, None, 'U')
+        deck_id = db.create_deck_db(uid, 'D')
+        db.save_cards([{'front': f'q{i}', 'back': 'a'} for i in range(n)], 'basic', deck_id, uid)
+        return [c['card_id'] for c in db.get_cards_in_deck(deck_id, uid)]
+
+    def _rate(self, card_id, uid, due, previous_due=None):
+        db.update_card_srs(card_id, due, 3.0, 5.0, 1, 0, 'review', 3, user_id=uid, previous_due=previous_due)
+
+    def test_loads_future_days_once(self, tdb):
+        from utils.due_load import DUE_LOAD
+        a, b, c = self._cards(90, 3)
+        self._rate(a, 90, '2099-01-01 10:00:00')
+        self._rate(b, 90, '2099-01-01 12:00:00')
+        self._rate(c, 90, '2099-01-03 10:00:00')
+        assert db.get_due_load(90) == {'2099-01-01': 2, '2099-01-03': 1}
+        loads = DUE_LOAD.loads
+        db.get_due_load(90)
+        assert DUE_LOAD.loads == loads
+
+    def test_ratings_move_counts_without_reloading(self, tdb):
+        [a] = self._cards(91, 1)
+        self._rate(a, 91, '2099-01-01 10:00:00')
+        db.get_due_load(91)
+        self._rate(a, 91, '2099-01-05 10:00:00', previous_due='2099-01-01 10:00:00')
+        assert db.get_due_load(91) == {'2099-01-05': 1}
+        with db.get_db() as conn:
+            fresh = conn.execute(
+                "SELECT substr(due_date, 1, 10) AS day, COUNT(*) AS n FROM cards WHERE user_id = 91 "
+                "GROUP BY day").fetchall()
+        assert {r['day']: r['n'] for r in fresh} == {'2099-01-05': 1}
+
+    def test_rating_an_overdue_card_leaves_its_day_alone(self, tdb):
+        """An overdue card was never in the histogram, so its old day keeps its count."""
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        a, b = self._cards(94, 2)
+        self._rate(b, 94, f'{today} 23:59:59')
+        assert db.get_due_load(94) == {today: 1}
+        self._rate(a, 94, '2099-01-05 10:00:00', previous_due=f'{today} 00:00:00')
+        assert db.get_due_load(94) == {today: 1, '2099-01-05': 1}
+
+    def test_suspended_cards_do_not_count(self, tdb):
+        a, b = self._cards(92, 2)
+        self._rate(a, 92, '2099-01-01 10:00:00')
+        self._rate(b, 92, '2099-01-01 10:00:00')
+        assert db.get_due_load(92) == {'2099-01-01': 2}
+        db.set_card_suspended(a, 92, True)
+        assert db.get_due_load(92) == {'2099-01-01': 1}
+        db.delete_card(b, 92)
+        assert db.get_due_load(92) == {}
+
+    def test_balanced_reviews_spread_over_days(self, tdb):
+        """Cards learned together, rated together: balancing spreads what would be one spike."""
+        from utils.srs import GOOD, schedule
+        ids = self._cards(93, 30)
+        for card_id in ids:
+            card = {'state': 'review', 'stability': 10.0, 'difficulty': 5.0, 'reps': 3, 'lapses': 0}
+            result = schedule(card, GOOD, db.get_due_load(93))
+            db.update_card_srs(card_id, result['due_date'], result['stability'], result['difficulty'],
+                               result['reps'], result['lapses'], result['state'], result['scheduled_days'],
+                               user_id=93)
+        counts = sorted(db.get_due_load(93).values())
+        assert counts == [10, 10, 10]      # a 22-day interval may move a day either way
+
+
 # ── Stats ─────────────────────────────────────────────────────
 
 class TestStats:
@@ -439,3 +878,56 @@ class TestStats:
         db.save_card({'front': 'q', 'back': 'a'}, 'basic', deck_id, 67)
         forecast = db.get_forecast(67, days=7)
         assert sum(d['count'] for d in forecast) == 0
+
+
+class TestPresets:
+    def _deck(self, uid):
+        db.create_user(uid, None, 'U')
+        return db.create_deck_db(uid, 'D')
+
+    def test_defaults_without_rows(self, tdb):
+        from utils.srs import DEFAULT_PRESET
+        deck_id = self._deck(100)
+        assert db.get_preset(deck_id, 100) == DEFAULT_PRESET
+
+    def test_deck_row_overrides_user_default(self, tdb):
+        from utils.srs import Preset
+        deck_id = self._deck(101)
+        other = db.create_deck_db(101, 'E')
+        db.save_preset(101, 0, Preset(new_per_day=5))
+        db.save_preset(101, deck_id, Preset(learning_steps=(2, 20), max_interval=90))
+        assert db.get_preset(deck_id, 101) == Preset(learning_steps=(2, 20), max_interval=90)
+        assert db.get_preset(other, 101) == Preset(new_per_day=5)
+        db.delete_preset(101, deck_id)
+        assert db.get_preset(deck_id, 101) == Preset(new_per_day=5)
+
+    def test_cached_until_saved(self, tdb):
+        from utils.presets import PRESETS
+        from utils.srs import Preset
+        deck_id = self._deck(102)
+        db.get_preset(deck_id, 102)
+        loads = PRESETS.loads
+        db.get_preset(deck_id, 102)
+        assert PRESETS.loads == loads
+        db.save_preset(102, 0, Preset(easy_interval=6))
+        assert db.get_preset(deck_id, 102).easy_interval == 6
+        db.save_preset(102, deck_id, Preset(easy_interval=8))
+        assert db.get_preset(deck_id, 102).easy_interval == 8
+
+    def test_deleting_the_deck_drops_its_preset(self, tdb):
+        from utils.srs import Preset
+        deck_id = self._deck(103)
+        db.save_preset(103, deck_id, Preset(max_interval=10))
+        db.delete_deck(deck_id, 103)
+        with db.get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM presets WHERE user_id = 103").fetchone()[0] == 0
+
+    def test_review_session_takes_the_deck_limits(self, tdb):
+        from handlers.review import _apply_limits
+        from utils.srs import Preset
+        deck_id = self._deck(104)
+        db.save_cards([{'front': f'q{i}', 'back': 'a'} for i in range(5)], 'basic', deck_id, 104)
+        db.save_preset(104, deck_id, Preset(new_per_day=2))
+        cards = db.get_due_cards(104)
+        assert len(cards) == 5
+        assert len(_apply_limits(cards, 104)) == 2
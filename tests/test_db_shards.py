@@ -0,0 +1,115 @@
+"""Tests for the sharded card store (DB_SHARDS > 1) in database/database.py."""
+
+import os
+import sqlite3
+
+import pytest
+
+import database.database as db
+from utils.sharding import shard_for
+
+K = 4
+
+
+@pytest.fixture()
+def sdb(tmp_path, monkeypatch):
+    """K shard files next to a temp DB_PATH, schema initialised in each."""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / "retain.db"))
+    monkeypatch.setattr(db, 'DB_SHARDS', K)
+    db.init_db()
+    return tmp_path
+
+
+def _users_in(path: str) -> set[int]:
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT user_id FROM users")}
+    finally:
+        conn.close()
+
+
+class TestLayout:
+    def test_one_file_per_shard(self, sdb):
+        paths = db.get_backend().paths()
+        assert len(paths) == K
+        assert all(os.path.exists(p) for p in paths)
+        assert [os.path.basename(p) for p in paths] == [f"retain.shard{i}.db" for i in range(K)]
+
+    def test_user_lands_in_exactly_one_file(self, sdb):
+        for uid in range(1, 21):
+            db.create_user(uid, None, f"u{uid}")
+        for i, path in enumerate(db.get_backend().paths()):
+            assert all(shard_for(uid, K) == i for uid in _users_in(path))
+        assert set().union(*(_users_in(p) for p in db.get_backend().paths())) == set(range(1, 21))
+
+    def test_unscoped_connection_refused(self, sdb):
+        with pytest.raises(ValueError):
+            with db.get_db():
+                pass
+
+    def test_unsharded_paths(self, tdb):
+        assert db.get_backend().paths() == [tdb]
+        assert db.get_backend().path_for(None) == tdb
+
+
+class TestUserScopedCalls:
+    def test_card_lifecycle(self, sdb):
+        db.create_user(7, None, 'U')
+        deck_id = db.create_deck_db(7, 'French')
+        db.save_cards([{'front': 'a', 'back': 'b'}, {'front': 'c', 'back': 'd'}], 'basic', deck_id, 7)
+
+        due = db.get_due_cards(7)
+        assert [c['front'] for c in due] == ['a', 'c']
+        assert due[0]['deck_name'] == 'French'
+        assert db.get_deck_name(deck_id, 7) == 'French'
+
+        card = due[0]
+        db.update_card_srs(card['card_id'], '2099-01-01 00:00:00', 3.0, 5.0, 1, 0, 'review', 3, user_id=7)
+        assert db.get_due_cards(7)[0]['front'] == 'c'
+        assert db.get_card(card['card_id'], 7)['front'] == 'a'
+        assert db.get_card_stats(7)['total'] == 2
+        assert len(list(db.iter_export_rows(7))) == 2
+
+    def test_ids_are_per_file_but_lookups_stay_scoped(self, sdb):
+        a, b = 1, next(uid for uid in range(2, 100) if shard_for(uid, K) != shard_for(1, K))
+        for uid in (a, b):
+            db.create_user(uid, None, 'U')
+        deck_a = db.create_deck_db(a, 'Mine')
+        deck_b = db.create_deck_db(b, 'Theirs')
+        assert deck_a == deck_b                  # both first rows in their own file
+        assert db.get_deck_name(deck_a, a) == 'Mine'
+        assert db.get_deck_name(deck_b, b) == 'Theirs'
+
+
+class TestFanOut:
+    def test_runs_once_per_shard(self, sdb):
+        assert db.fan_out(lambda conn: conn.execute("SELECT 1").fetchone()[0]) == [1] * K
+
+    def test_global_stats_sum_shards(self, sdb):
+        for uid in range(1, 13):
+            db.create_user(uid, None, 'U')
+            deck_id = db.create_deck_db(uid, 'D')
+            db.save_cards([{'front': 'q', 'back': 'a'}] * 3, 'basic', deck_id, uid)
+        assert db.get_global_stats() == {'users': 12, 'decks': 12, 'cards': 36, 'due': 36}
+
+    def test_reminders_span_shards(self, sdb):
+        for uid in range(1, 13):
+            db.create_user(uid, None, 'U')
+            deck_id = db.create_deck_db(uid, 'D')
+            db.save_card({'front': 'q', 'back': 'a'}, 'basic', deck_id, uid)
+        candidates = db.get_reminder_candidates(20)
+        assert {c['user_id'] for c in candidates} == set(range(1, 13))
+
+        db.mark_reminded(list(range(1, 7)))
+        assert {c['user_id'] for c in db.get_reminder_candidates(20)} == set(range(7, 13))
+
+    def test_migration_reaches_every_shard(self, sdb):
+        for path in db.get_backend().paths():
+            conn = sqlite3.connect(path)
+            try:
+                cols = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+                mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            finally:
+                conn.close()
+            assert 'reminders_enabled' in cols
+            assert mode == 'wal'
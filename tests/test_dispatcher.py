@@ -0,0 +1,243 @@
+"""Tests for utils/dispatcher.py — priority, retries and flood waits on a simulated clock."""
+
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from tests.test_rate_limit import FakeBot, FakeClock
+from utils.dispatcher import Dropped, OutboundDispatcher, Priority
+from utils.telegram_helpers import safe_send_text, set_dispatcher
+
+# Constructing RetryAfter with an int warns on PTB 22.x
+pytestmark = pytest.mark.filterwarnings("ignore::telegram.warnings.PTBDeprecationWarning")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _make(clock: FakeClock, **kwargs) -> OutboundDispatcher:
+    return OutboundDispatcher(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class FlakyBot(FakeBot):
+    """Raises the queued errors in order, then sends normally."""
+
+    def __init__(self, clock: FakeClock, errors: list[Exception]) -> None:
+        super().__init__(clock)
+        self.errors = errors
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        await super().send_message(chat_id, text)
+
+
+@pytest.mark.asyncio
+class TestDispatcher:
+    async def test_not_running_calls_directly(self, clock):
+        d = _make(clock)
+        bot = FakeBot(clock)
+        await d.submit(1, lambda: bot.send_message(1, "hi"))
+        assert len(bot.sent) == 1
+        assert d.metrics.submitted == 0
+
+    async def test_returns_call_result(self, clock):
+        d = _make(clock)
+        await d.start()
+
+        async def call():
+            return 42
+
+        assert await d.submit(1, call) == 42
+        await d.stop()
+
+    async def test_global_rate_respected(self, clock):
+        d = _make(clock, global_rate=10, global_burst=10)
+        bot = FakeBot(clock)
+        await d.start()
+        await asyncio.gather(*(d.submit(i, lambda i=i: bot.send_message(i, "hi")) for i in range(100)))
+        await d.stop()
+        assert len(bot.sent) == 100
+        assert d.metrics.sent == 100
+        assert clock.now <= 10.0 + 1e-9
+
+    async def test_per_chat_rate_respected(self, clock):
+        d = _make(clock, per_chat_rate=1, per_chat_burst=1)
+        bot = FakeBot(clock)
+        await d.start()
+        await asyncio.gather(*(d.submit(42, lambda: bot.send_message(42, "hi")) for _ in range(5)))
+        await d.stop()
+        times = sorted(t for t, _, _ in bot.sent)
+        assert len(times) == 5
+        assert all(b - a >= 1.0 - 1e-9 for a, b in zip(times, times[1:]))
+        assert d.metrics.deferred > 0
+
+    async def test_deferred_jobs_do_not_spend_global_tokens(self, clock):
+        """A chat over its own budget must not use up the sends other chats are owed."""
+        # Ten global tokens, the next one 1000s away: exactly enough for the ten sends
+        d = _make(clock, workers=1, global_rate=0.001, global_burst=10, per_chat_rate=1, per_chat_burst=1)
+        bot = FakeBot(clock)
+        await d.start()
+        await asyncio.gather(
+            *(d.submit(42, lambda: bot.send_message(42, "burst")) for _ in range(5)),
+            *(d.submit(i, lambda i=i: bot.send_message(i, "hi")) for i in range(1, 6)),
+        )
+        await d.stop()
+        assert d.metrics.deferred > 0
+        assert len(bot.sent) == 10
+        assert max(t for t, _, _ in bot.sent) < 10     # only the chat's own 1/s pacing
+
+    async def test_interactive_jumps_broadcast_backlog(self, clock):
+        d = _make(clock, workers=1, global_rate=1, global_burst=1)
+        bot = FakeBot(clock)
+        await d.start()
+        broadcast = [
+            asyncio.create_task(d.submit(i, lambda i=i: bot.send_message(i, "bulk"), Priority.BROADCAST))
+            for i in range(1, 11)
+        ]
+        await asyncio.sleep(0)
+        await d.submit(999, lambda: bot.send_message(999, "tap"))
+        await asyncio.gather(*broadcast)
+        await d.stop()
+        order = [chat_id for _, chat_id, _ in bot.sent]
+        assert order.index(999) <= 2   # at most the jobs already picked up go first
+
+    async def test_broadcast_dropped_when_queue_full(self, clock):
+        d = _make(clock, workers=1, global_rate=1, global_burst=1, max_queue=3)
+        bot = FakeBot(clock)
+        await d.start()
+        results = await asyncio.gather(
+            *(d.submit(i, lambda i=i: bot.send_message(i, "bulk"), Priority.BROADCAST) for i in range(10)),
+            return_exceptions=True,
+        )
+        await d.stop()
+        dropped = [r for r in results if isinstance(r, Dropped)]
+        assert dropped
+        assert d.metrics.dropped == len(dropped)
+        assert len(bot.sent) == 10 - len(dropped)
+
+    async def test_retry_after_waits_server_delay(self, clock):
+        d = _make(clock)
+        bot = FlakyBot(clock, [RetryAfter(5)])
+        await d.start()
+        await d.submit(7, lambda: bot.send_message(7, "hi"))
+        await d.stop()
+        assert bot.calls == 2
+        assert bot.sent[0][0] >= 5.0
+        assert d.metrics.flood_waits == 1
+        assert d.metrics.retried == 1
+
+    async def test_retry_after_holds_back_same_chat(self, clock):
+        d = _make(clock)
+        bot = FlakyBot(clock, [RetryAfter(5)])
+        await d.start()
+        first = asyncio.create_task(d.submit(7, lambda: bot.send_message(7, "one")))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await d.submit(7, lambda: bot.send_message(7, "two"))
+        await first
+        await d.stop()
+        assert all(t >= 5.0 for t, _, _ in bot.sent)
+
+    async def test_network_errors_back_off_then_succeed(self, clock):
+        d = _make(clock, backoff_base=0.5)
+        bot = FlakyBot(clock, [TimedOut(), NetworkError("reset")])
+        await d.start()
+        await d.submit(1, lambda: bot.send_message(1, "hi"))
+        await d.stop()
+        assert bot.calls == 3
+        assert bot.sent[0][0] >= 0.5 + 1.0
+        assert d.metrics.retried == 2
+
+    async def test_timed_out_send_is_not_retried(self, clock):
+        """A send that timed out may have been delivered: retrying could post it twice."""
+        d = _make(clock)
+        bot = FlakyBot(clock, [TimedOut()])
+        await d.start()
+        with pytest.raises(TimedOut):
+            await d.submit(1, lambda: bot.send_message(1, "hi"), idempotent=False)
+        await d.stop()
+        assert bot.calls == 1 and d.metrics.retried == 0
+
+    async def test_send_still_retries_network_errors_and_flood_waits(self, clock):
+        d = _make(clock)
+        bot = FlakyBot(clock, [NetworkError("connect"), RetryAfter(1)])
+        await d.start()
+        await d.submit(1, lambda: bot.send_message(1, "hi"), idempotent=False)
+        await d.stop()
+        assert bot.calls == 3 and len(bot.sent) == 1
+
+    async def test_retries_exhausted_raise_last_error(self, clock):
+        d = _make(clock, max_retries=2)
+        bot = FlakyBot(clock, [TimedOut() for _ in range(5)])
+        await d.start()
+        with pytest.raises(TimedOut):
+            await d.submit(1, lambda: bot.send_message(1, "hi"))
+        await d.stop()
+        assert bot.calls == 3
+        assert d.metrics.failed == 1
+
+    @pytest.mark.parametrize("error", [Forbidden("blocked"), BadRequest("Chat not found")])
+    async def test_permanent_errors_not_retried(self, clock, error):
+        d = _make(clock)
+        bot = FlakyBot(clock, [error])
+        await d.start()
+        with pytest.raises(type(error)):
+            await d.submit(1, lambda: bot.send_message(1, "hi"))
+        await d.stop()
+        assert bot.calls == 1
+
+    async def test_stop_fails_pending_jobs(self, clock):
+        d = _make(clock, workers=1, global_rate=1, global_burst=1)
+        bot = FakeBot(clock)
+        await d.start()
+        pending = [asyncio.create_task(d.submit(i, lambda i=i: bot.send_message(i, "hi"))) for i in range(5)]
+        await asyncio.sleep(0)
+        await d.stop()
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        assert all(r is None or isinstance(r, Dropped) for r in results)
+        assert any(isinstance(r, Dropped) for r in results)
+
+    async def test_metrics_snapshot(self, clock):
+        d = _make(clock)
+        await d.start()
+        bot = FakeBot(clock)
+        await d.submit(1, lambda: bot.send_message(1, "hi"))
+        await d.stop()
+        snap = d.metrics.snapshot()
+        assert snap['submitted'] == 1
+        assert snap['sent'] == 1
+        assert snap['queue_interactive'] == 0
+        assert snap['queue_broadcast'] == 0
+
+
+@pytest.mark.asyncio
+class TestHelpersUseDispatcher:
+    async def test_safe_send_text_routed_and_retried(self, clock):
+        d = _make(clock)
+        bot = FlakyBot(clock, [RetryAfter(2)])
+        await d.start()
+        set_dispatcher(d)
+        try:
+            assert await safe_send_text((5, bot), "hi") is True
+        finally:
+            set_dispatcher(None)
+            await d.stop()
+        assert d.metrics.sent == 1
+        assert d.metrics.flood_waits == 1
+
+    async def test_safe_send_text_reports_final_failure(self, clock):
+        d = _make(clock, max_retries=1)
+        bot = FlakyBot(clock, [NetworkError("down") for _ in range(3)])
+        await d.start()
+        set_dispatcher(d)
+        try:
+            assert await safe_send_text((5, bot), "hi") is False
+        finally:
+            set_dispatcher(None)
+            await d.stop()
@@ -0,0 +1,221 @@
+"""
+Tests for utils/export.py and database.iter_export_rows — streaming card export.
+"""
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+
+import pytest
+
+import database.database as db
+from utils.export import EXPORT_FIELDS, export_cards, export_filename, read_export
+
+
+def _seed(user_id: int, n: int, deck_name: str = 'D') -> int:
+    db.create_user(user_id, None, 'U')
+    deck_id = db.create_deck_db(user_id, deck_name)
+    with db.get_db() as conn:
+        conn.executemany(
+            "INSERT INTO notes (front, back, deck_id, user_id) VALUES (?, ?, ?, ?)",
+            ((f"front {i}", f"back {i}", deck_id, user_id) for i in range(n)),
+        )
+        conn.execute(
+            "INSERT INTO cards (note_id, deck_id, user_id) SELECT note_id, deck_id, user_id FROM notes "
+            "WHERE deck_id = ? ORDER BY note_id",
+            (deck_id,),
+        )
+    return deck_id
+
+
+def _read(fh, fmt: str, compress: bool) -> list[dict]:
+    raw = fh.read()
+    if compress:
+        raw = gzip.decompress(raw)
+    text = raw.decode('utf-8')
+    if fmt == 'json':
+        return json.loads(text)
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+# ── iter_export_rows ──────────────────────────────────────────
+
+class TestIterExportRows:
+    def test_yields_all_cards_in_order(self, tdb):
+        _seed(1, 25)
+        rows = list(db.iter_export_rows(1, chunk_size=7))
+        assert [r['front'] for r in rows] == [f"front {i}" for i in range(25)]
+
+    def test_includes_deck_name_and_srs_state(self, tdb):
+        _seed(2, 1, deck_name='French')
+        row = next(db.iter_export_rows(2))
+        assert row['deck_name'] == 'French'
+        for field in EXPORT_FIELDS:
+            assert field in row
+
+    def test_filtered_by_deck(self, tdb):
+        d1 = _seed(3, 3, deck_name='A')
+        d2 = db.create_deck_db(3, 'B')
+        db.save_card({'front': 'only', 'back': 'b'}, 'basic', d2, 3)
+        assert len(list(db.iter_export_rows(3, d1))) == 3
+        assert [r['front'] for r in db.iter_export_rows(3, d2)] == ['only']
+
+    def test_notes_export_once_per_card_unrendered(self, tdb):
+        """A reverse note's two cards and a cloze note's cards carry the note as typed."""
+        db.create_user(6, None, 'U')
+        deck_id = db.create_deck_db(6, 'D')
+        db.save_card({'front': 'chien', 'back': 'dog'}, 'reverse', deck_id, 6)
+        db.save_card({'front': '{{c1::Paris}} is in {{c2::France}}', 'back': ''}, 'cloze', deck_id, 6)
+        rows = [{k: r[k] for k in ('note_id', 'template', 'front', 'back', 'card_type')}
+                for r in db.iter_export_rows(6)]
+        reverse_id, cloze_id = rows[0]['note_id'], rows[2]['note_id']
+        assert rows == [
+            {'note_id': reverse_id, 'template': 'forward', 'front': 'chien', 'back': 'dog', 'card_type': 'reverse'},
+            {'note_id': reverse_id, 'template': 'reverse', 'front': 'chien', 'back': 'dog', 'card_type': 'reverse'},
+            {'note_id': cloze_id, 'template': 'c1', 'front': '{{c1::Paris}} is in {{c2::France}}',
+             'back': '', 'card_type': 'cloze'},
+            {'note_id': cloze_id, 'template': 'c2', 'front': '{{c1::Paris}} is in {{c2::France}}',
+             'back': '', 'card_type': 'cloze'},
+        ]
+        assert reverse_id != cloze_id
+
+    def test_includes_suspend_bury_and_leech_flags(self, tdb):
+        _seed(7, 3)
+        first, second, _ = (c['card_id'] for c in db.get_cards_in_deck(db.get_deck_id(7, 'D'), 7))
+        db.set_card_suspended(first, 7, True)
+        db.bury_card(second, 7, '2099-01-01 00:00:00')
+        with db.get_db() as conn:
+            conn.execute("UPDATE cards SET leech = 1 WHERE card_id = ?", (first,))
+        rows = [(r['suspended'], r['buried_until'], r['leech']) for r in db.iter_export_rows(7)]
+        assert rows == [(1, None, 1), (0, '2099-01-01 00:00:00', 0), (0, None, 0)]
+
+    def test_isolated_per_user(self, tdb):
+        _seed(4, 5)
+        db.create_user(5, None, 'Other')
+        assert list(db.iter_export_rows(5)) == []
+
+
+# ── export_cards ──────────────────────────────────────────────
+
+class TestExportCards:
+    @pytest.mark.parametrize("fmt", ["csv", "json"])
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_roundtrip(self, tdb, fmt, compress):
+        _seed(10, 12)
+        with db.get_db() as conn:
+            conn.execute(
+                "UPDATE cards SET state = 'review', stability = 3.5, reps = 2, lapses = 1 "
+                "WHERE note_id = (SELECT note_id FROM notes WHERE user_id = 10 AND front = 'front 0')"
+            )
+        fh, count = export_cards(db.iter_export_rows(10), fmt, compress)
+        rows = _read(fh, fmt, compress)
+        fh.close()
+
+        assert count == 12
+        assert len(rows) == 12
+        first = rows[0]
+        assert first['front'] == 'front 0'
+        assert first['state'] == 'review'
+        assert float(first['stability']) == 3.5
+        assert int(first['reps']) == 2
+        assert int(first['lapses']) == 1
+
+    def test_empty_export(self, tdb):
+        db.create_user(11, None, 'U')
+        fh, count = export_cards(db.iter_export_rows(11), 'json')
+        assert count == 0
+        assert json.loads(fh.read()) == []
+
+    def test_csv_escapes_separators_and_newlines(self):
+        row = dict.fromkeys(EXPORT_FIELDS, '')
+        row.update(front='a, "b"', back='line1\nline2')
+        fh, _ = export_cards([row], 'csv')
+        parsed = _read(fh, 'csv', False)
+        assert parsed[0]['front'] == 'a, "b"'
+        assert parsed[0]['back'] == 'line1\nline2'
+
+    def test_unknown_format_raises(self):
+        with pytest.raises(ValueError):
+            export_cards([], 'xml')
+
+    def test_memory_stays_flat(self, tdb):
+        """Peak allocation must not grow with collection size."""
+        _seed(12, 2_000)
+        _seed(13, 20_000)
+
+        def peak(user_id: int) -> int:
+            tracemalloc.start()
+            fh, _ = export_cards(db.iter_export_rows(user_id), 'csv', compress=True)
+            _, high = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            fh.close()
+            return high
+
+        small, large = peak(12), peak(13)
+        assert large < small * 2
+
+
+# ── read_export / import_rows ─────────────────────────────────
+
+class TestImport:
+    def _collection(self, user_id: int) -> None:
+        db.create_user(user_id, None, 'U')
+        french = db.create_deck_db(user_id, 'French')
+        geo = db.create_deck_db(user_id, 'Geo')
+        db.save_card({'front': 'chien', 'back': 'dog'}, 'reverse', french, user_id)
+        db.save_card({'front': 'chat', 'back': 'cat'}, 'basic', french, user_id)
+        db.save_card({'front': '{{c1::Paris}} is in {{c2::France}}', 'back': 'Europe'}, 'cloze', geo, user_id)
+        fwd, _rev, basic = (c['card_id'] for c in db.get_cards_in_deck(french, user_id))
+        db.update_card_srs(fwd, '2099-01-05 10:00:00', 3.5, 4.25, 2, 1, 'review', 7,
+                           elapsed_days=3, user_id=user_id, leech=True)
+        db.set_card_suspended(basic, user_id, True)
+        db.bury_card(db.get_cards_in_deck(geo, user_id)[1]['card_id'], user_id, '2099-01-01 00:00:00')
+
+    def _comparable(self, user_id: int) -> list[dict]:
+        rows = list(db.iter_export_rows(user_id))
+        first = {}
+        for row in rows:
+            row['note_id'] = first.setdefault(row['note_id'], len(first))   # grouping, not the id itself
+        return rows
+
+    @pytest.mark.parametrize("fmt", ["csv", "json"])
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_export_then_import_keeps_notes_and_scheduling(self, tdb, fmt, compress):
+        self._collection(20)
+        fh, count = export_cards(db.iter_export_rows(20), fmt, compress)
+        rows = read_export(fh.read())
+        fh.close()
+
+        db.create_user(21, None, 'V')
+        assert db.import_rows(rows, 21) == count == 5
+        assert self._comparable(21) == self._comparable(20)
+        assert sorted(d['deck_name'] for d in db.get_decks_with_stats(21)) == ['French', 'Geo']
+        with db.get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) AS n FROM notes WHERE user_id = 21").fetchone()['n'] == 3
+
+    def test_imports_into_existing_deck_by_name(self, tdb):
+        db.create_user(22, None, 'U')
+        deck_id = db.create_deck_db(22, 'French')
+        db.import_rows([{'deck_name': 'French', 'front': 'q', 'back': 'a'}], 22)
+        [card] = db.get_cards_in_deck(deck_id, 22)
+        assert card['front'] == 'q'
+
+    @pytest.mark.parametrize("data", [
+        b'not,an\nexport,file\n',
+        b'[1, 2]',
+        'front,back,state\nq,a,flying\n'.encode(),
+        'front,back,reps\nq,a,many\n'.encode(),
+        'front,back,due_date\nq,a,tomorrow\n'.encode(),
+    ])
+    def test_rejects_what_export_never_writes(self, data):
+        with pytest.raises(ValueError):
+            read_export(data)
+
+
+class TestExportFilename:
+    def test_whole_collection(self):
+        assert export_filename(None, 'csv', False) == 'retain-export.csv'
+
+    def test_deck_name_sanitised(self):
+        assert export_filename('My deck/1', 'json', True) == 'retain-My_deck_1.json.gz'
@@ -0,0 +1,83 @@
+"""Tests for benchmarks/fake_server.py and benchmarks/load.py — the local Bot API and the load generator."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from benchmarks.fake_api import FAKE_TOKEN
+from benchmarks.fake_server import FakeTelegramServer
+from benchmarks.load import run_load
+
+KEYBOARD = json.dumps({'inline_keyboard': [[{'text': 'Go', 'callback_data': 'go'}]]})
+
+
+@pytest_asyncio.fixture()
+async def api():
+    server = FakeTelegramServer(flood_rate=0)
+    server.start()
+    async with httpx.AsyncClient(base_url=f"{server.url}/bot{FAKE_TOKEN}") as client:
+        yield server, client
+    await server.stop()
+
+
+async def _call(client: httpx.AsyncClient, method: str, **params) -> dict:
+    return (await client.post(f"/{method}", data=params)).json()
+
+
+@pytest.mark.asyncio
+class TestFakeServer:
+    async def test_send_and_screen(self, api):
+        server, client = api
+        reply = await _call(client, 'sendMessage', chat_id=7, text='Hello', reply_markup=KEYBOARD)
+        assert reply['ok'] and reply['result']['chat']['id'] == 7
+        chat = server.chat(7)
+        assert (chat.text(), chat.buttons(), chat.renders) == ('Hello', ['go'], 1)
+
+    async def test_edit_errors_match_telegram(self, api):
+        server, client = api
+        sent = (await _call(client, 'sendMessage', chat_id=7, text='A'))['result']
+        same = await _call(client, 'editMessageText', chat_id=7, message_id=sent['message_id'], text='A')
+        assert same['error_code'] == 400 and 'message is not modified' in same['description']
+        missing = await _call(client, 'editMessageText', chat_id=7, message_id=999, text='B')
+        assert 'message to edit not found' in missing['description']
+        edited = await _call(client, 'editMessageText', chat_id=7, message_id=sent['message_id'], text='B')
+        assert edited['ok'] and server.chat(7).text() == 'B'
+        assert server.errors['editMessageText:400'] == 2
+
+    async def test_long_poll_and_offset(self, api):
+        server, client = api
+        poll = asyncio.create_task(_call(client, 'getUpdates', timeout=5))
+        await asyncio.sleep(0.05)
+        server.tap(7, 'go')
+        [update] = (await poll)['result']
+        assert update['callback_query']['data'] == 'go'
+        server.send_text(7, '/start')
+        batch = (await _call(client, 'getUpdates', offset=update['update_id'] + 1))['result']
+        assert [u['message']['entities'][0]['type'] for u in batch] == ['bot_command']
+
+    async def test_flood_control(self, api):
+        server, client = api
+        server.flood_rate, server.flood_burst = 1.0, 2
+        replies = [await _call(client, 'sendMessage', chat_id=7, text=str(i)) for i in range(3)]
+        assert [r['ok'] for r in replies] == [True, True, False]
+        assert replies[2]['error_code'] == 429 and replies[2]['parameters']['retry_after'] >= 1
+
+    async def test_bad_token(self, api):
+        server, _ = api
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(f"{server.url}/botwrong/getMe")
+        assert resp.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_load_run_drives_real_handlers(tdb):
+    result = await run_load(users=3, seconds=0.5, think=0.01, in_process=True, decks=2, cards=10,
+                            cards_per_session=2, timeout=5)
+    assert result['errors'] == {}
+    assert sum(result['sessions'].values()) >= 3
+    assert result['steps']['start']['n'] >= 3
+    assert {'review.open', 'review.show_answer', 'review.rate'} <= set(result['steps'])
+    assert result['api_calls']['answerCallbackQuery'] > 0
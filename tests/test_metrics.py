@@ -0,0 +1,195 @@
+"""Tests for utils/metrics.py — histograms, timing decorators, exposition and /admin_stats."""
+
+import asyncio
+import time
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler
+
+import database.database as db
+import handlers.admin as hand_admin
+from utils.metrics import METRICS, Histogram, Registry, instrument_application, instrument_module, serve_metrics
+from utils.router import CallbackRouter, Route
+
+
+class TestHistogram:
+    def test_buckets(self):
+        h = Histogram((0.01, 0.1, 1.0))
+        for v in (0.005, 0.01, 0.05, 0.5, 3.0):
+            h.observe(v)
+        assert h.counts == [2, 1, 1, 1]           # le=0.01 is inclusive, 3.0 lands in +Inf
+        assert h.count == 5 and h.sum == pytest.approx(3.565)
+
+    def test_quantile_interpolates(self):
+        h = Histogram((0.01, 0.02))
+        for _ in range(10):
+            h.observe(0.015)
+        assert h.quantile(0.5) == pytest.approx(0.015)
+        assert Histogram().quantile(0.5) == 0.0
+
+
+class TestTimed:
+    def test_sync(self):
+        reg = Registry()
+
+        @reg.timed('db')
+        def add(a, b):
+            return a + b
+
+        assert add(2, 3) == 5 and add.__name__ == 'add'
+        assert reg.histogram('db', 'add').count == 1
+
+    def test_errors_counted_and_raised(self):
+        reg = Registry()
+
+        @reg.timed('db', 'boom')
+        def boom():
+            raise KeyError
+
+        with pytest.raises(KeyError):
+            boom()
+        h = reg.histogram('db', 'boom')
+        assert (h.count, h.errors) == (1, 1)
+
+    def test_async(self):
+        reg = Registry()
+
+        @reg.timed('telegram')
+        async def send():
+            await asyncio.sleep(0.01)
+            return True
+
+        assert asyncio.run(send()) is True
+        h = reg.histogram('telegram', 'send')
+        assert h.count == 1 and h.sum >= 0.01
+
+    def test_overhead_under_20us(self):
+        reg = Registry()
+
+        def noop():
+            return None
+
+        wrapped = reg.timed('db', 'noop')(noop)
+        n = 100_000
+        best = float('inf')
+        for _ in range(3):                        # best of three damps scheduler noise
+            t0 = time.perf_counter()
+            for _ in range(n):
+                noop()
+            bare = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _ in range(n):
+                wrapped()
+            best = min(best, (time.perf_counter() - t0 - bare) / n)
+        assert best < 20e-6
+
+
+class TestInstrumentation:
+    def test_instrument_module(self):
+        def public():
+            return 1
+
+        def gen():
+            yield 1
+
+        def _private():
+            return 2
+
+        public.__module__ = gen.__module__ = _private.__module__ = 'fake_mod'
+        ns = {'__name__': 'fake_mod', 'public': public, 'gen': gen, '_private': _private, 'skip': public, 'len': len}
+        instrument_module(ns, 'db', exclude={'skip'})
+        assert getattr(ns['public'], '_metrics_timed', False)
+        assert ns['gen'] is gen and ns['_private'] is _private and ns['skip'] is public and ns['len'] is len
+
+    def test_database_functions_are_timed(self, tdb):
+        h = METRICS.histogram('db', 'get_card_stats')
+        before = h.count
+        db.create_user(1, None, 'U')
+        db.get_card_stats(1)
+        assert h.count == before + 1
+        assert not getattr(db.get_db, '_metrics_timed', False)
+
+    def test_instrument_application_walks_conversations(self):
+        async def entry(update, context):
+            return 1
+
+        async def step(update, context):
+            return None
+
+        conv = ConversationHandler(
+            entry_points=[CallbackQueryHandler(entry, pattern='^go$')],
+            states={1: [CallbackQueryHandler(step, pattern='^x$')], 2: [CallbackRouter([Route('y', step)])]},
+            fallbacks=[CommandHandler('cancel', step)],
+            per_message=False,
+        )
+        plain = CommandHandler('ping', step)
+        app = SimpleNamespace(handlers={0: [conv, plain]})
+        reg = Registry()
+        instrument_application(app, reg)
+        instrument_application(app, reg)          # idempotent
+
+        assert getattr(conv.entry_points[0].callback, '_metrics_timed', False)
+        assert getattr(plain.callback, '_metrics_timed', False)
+        assert plain.callback.__wrapped__ is step
+        asyncio.run(conv.states[1][0].callback(None, None))
+        asyncio.run(conv.states[2][0].routes[0].callback(None, None))
+        assert reg.histogram('handler', 'test_metrics.TestInstrumentation.test_instrument_application_walks_conversations.<locals>.step').count == 2
+
+
+class TestExposition:
+    def test_render(self):
+        reg = Registry()
+        reg.histogram('db', 'get_due_cards').observe(0.003)
+        reg.register_gauges('dispatcher', lambda: {'sent': 7})
+        text = reg.render()
+        assert 'retain_db_seconds_bucket{name="get_due_cards",le="0.0025"} 0' in text
+        assert 'retain_db_seconds_bucket{name="get_due_cards",le="0.005"} 1' in text
+        assert 'retain_db_seconds_count{name="get_due_cards"} 1' in text
+        assert 'retain_db_errors_total{name="get_due_cards"} 0' in text
+        assert 'retain_dispatcher_sent 7' in text
+
+    def test_summary_orders_by_total_time(self):
+        reg = Registry()
+        reg.histogram('db', 'fast').observe(0.001)
+        reg.histogram('db', 'slow').observe(0.2)
+        assert [r['name'] for r in reg.summary()] == ['slow', 'fast']
+
+    def test_http_endpoint(self):
+        reg = Registry()
+        reg.histogram('handler', 'h').observe(0.01)
+        server = serve_metrics(0, registry=reg)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}"
+            with urllib.request.urlopen(f"{url}/metrics") as resp:
+                assert resp.status == 200
+                assert 'retain_handler_seconds_count{name="h"} 1' in resp.read().decode()
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/other")
+        finally:
+            server.shutdown()
+
+
+@pytest.mark.asyncio
+class TestAdminStats:
+    async def _run(self, user_id):
+        message = SimpleNamespace(chat_id=user_id, reply_text=AsyncMock())
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=message)
+        await hand_admin.admin_stats_command(update, None)
+        return message.reply_text
+
+    async def test_admin_gets_report(self, tdb, monkeypatch):
+        monkeypatch.setattr(hand_admin, 'ADMIN_IDS', {42})
+        db.create_user(42, None, 'Admin')
+        reply = await self._run(42)
+        text = reply.call_args.args[0]
+        assert 'Admin stats' in text and 'Users: <b>1</b>' in text
+        assert 'db:create_user' in text
+
+    async def test_others_ignored(self, tdb, monkeypatch):
+        monkeypatch.setattr(hand_admin, 'ADMIN_IDS', {42})
+        reply = await self._run(7)
+        reply.assert_not_called()
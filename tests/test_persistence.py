@@ -122,3 +122,33 @@ class TestCallbackData:
 class TestFlush:
     async def test_flush_no_error(self, persistence):
         await persistence.flush()
+
+
+# ── Shard partition ──────────────────────────────────────────
+
+@pytest.mark.asyncio
+class TestShardPartition:
+    async def test_each_shard_loads_only_its_users(self, tmp_path):
+        from utils.sharding import shard_for
+
+        path = str(tmp_path / "shared.db")
+        writer = SQLitePersistence(path)
+        for uid in range(1, 41):
+            await writer.update_user_data(uid, {"uid": uid})
+            await writer.update_chat_data(uid, {"uid": uid})
+            await writer.update_conversation("review", (uid, uid), 2)
+
+        seen: set[int] = set()
+        for index in range(3):
+            shard = SQLitePersistence(path, shard=(index, 3))
+            users = await shard.get_user_data()
+            assert all(shard_for(uid, 3) == index for uid in users)
+            assert set(await shard.get_chat_data()) == set(users)
+            assert {k[-1] for k in await shard.get_conversations("review")} == set(users)
+            seen |= set(users)
+        assert seen == set(range(1, 41))
+
+    async def test_only_shard_zero_owns_bot_data(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        assert SQLitePersistence(path, shard=(0, 2)).store_data.bot_data
+        assert not SQLitePersistence(path, shard=(1, 2)).store_data.bot_data
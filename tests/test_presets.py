@@ -0,0 +1,77 @@
+"""
+Tests for utils/presets.py — parsing settings and the per-deck preset cache.
+"""
+import pytest
+
+from utils.presets import DEFAULT_DECK, PresetCache, describe, parse_setting, parse_steps
+from utils.srs import DEFAULT_PRESET, Preset
+
+
+class TestParse:
+    def test_steps(self):
+        assert parse_steps('1 10') == (1, 10)
+        assert parse_steps('10', limit=1) == (10,)
+
+    @pytest.mark.parametrize("text", ['', '0', '1 10 60', '1441', 'ten'])
+    def test_bad_steps(self, text):
+        with pytest.raises(ValueError):
+            parse_steps(text)
+
+    def test_each_setting_changes_one_field(self):
+        assert parse_setting('steps 2 20', DEFAULT_PRESET).learning_steps == (2, 20)
+        assert parse_setting('Relearn 5', DEFAULT_PRESET).relearning_steps == (5,)
+        assert parse_setting('graduate 3', DEFAULT_PRESET).graduating_interval == 3
+        assert parse_setting('easy 7', DEFAULT_PRESET).easy_interval == 7
+        assert parse_setting('max 180', DEFAULT_PRESET).max_interval == 180
+        assert parse_setting('new 0', DEFAULT_PRESET).new_per_day == 0
+        changed = parse_setting(' reviews 50 ', DEFAULT_PRESET)
+        assert changed == Preset(reviews_per_day=50)
+
+    @pytest.mark.parametrize("text", ['max 0', 'new -1', 'easy', 'graduate x', 'speed 2', '', 'relearn 5 10'])
+    def test_bad_settings(self, text):
+        with pytest.raises(ValueError):
+            parse_setting(text, DEFAULT_PRESET)
+
+    def test_steps_the_scheduler_would_ignore_are_refused(self):
+        with pytest.raises(ValueError, match='1 to 2 steps'):
+            parse_setting('steps 1 10 60', DEFAULT_PRESET)
+        with pytest.raises(ValueError, match='one step'):
+            parse_setting('relearn 5 20', DEFAULT_PRESET)
+
+    def test_describe_lists_the_values(self):
+        text = describe(Preset(learning_steps=(1, 10), max_interval=90))
+        assert '1 10' in text and '90d' in text
+
+
+class TestPresetCache:
+    def test_keys_by_user_and_deck(self):
+        cache = PresetCache()
+        cache.put(1, 5, Preset(new_per_day=1))
+        assert cache.get(2, 5) is None
+        assert cache.get(1, 5).new_per_day == 1
+
+    def test_deck_invalidation_keeps_other_decks(self):
+        cache = PresetCache()
+        cache.put(1, 5, DEFAULT_PRESET)
+        cache.put(1, 6, DEFAULT_PRESET)
+        cache.invalidate(1, 5)
+        assert cache.get(1, 5) is None and cache.get(1, 6) is not None
+
+    def test_default_invalidation_drops_every_deck_of_the_user(self):
+        cache = PresetCache()
+        cache.put(1, 5, DEFAULT_PRESET)
+        cache.put(1, 6, DEFAULT_PRESET)
+        cache.put(2, 5, DEFAULT_PRESET)
+        cache.invalidate(1, DEFAULT_DECK)
+        assert cache.get(1, 5) is None and cache.get(1, 6) is None
+        assert cache.get(2, 5) is not None
+
+    def test_evicts_least_recently_used(self):
+        cache = PresetCache(max_decks=2)
+        cache.put(1, 1, DEFAULT_PRESET)
+        cache.put(1, 2, DEFAULT_PRESET)
+        cache.get(1, 1)
+        cache.put(1, 3, DEFAULT_PRESET)
+        assert cache.get(1, 2) is None and len(cache) == 2
+        cache.invalidate(1, DEFAULT_DECK)
+        assert len(cache) == 0
@@ -0,0 +1,128 @@
+"""Tests for database/profiler.py — SQL normalization, per-statement stats, plans and the slow log."""
+
+import logging
+import sqlite3
+
+import pytest
+
+import database.database as db
+from database.profiler import QueryProfiler, normalize_sql
+
+
+@pytest.fixture()
+def prof(tdb):
+    profiler = QueryProfiler(slow_ms=1e9)
+    db.set_profiler(profiler)
+    yield profiler
+    db.set_profiler(None)
+
+
+def _seed(n: int = 5) -> int:
+    db.create_user(1, None, 'U')
+    deck_id = db.create_deck_db(1, 'D')
+    db.save_cards([{'front': f"q{i}", 'back': 'a'} for i in range(n)], 'basic', deck_id, 1)
+    return deck_id
+
+
+def _by_caller(profiler: QueryProfiler, caller: str):
+    return [s for s in profiler.stats.values() if s.caller == caller]
+
+
+class TestNormalize:
+    def test_literals_and_whitespace(self):
+        assert normalize_sql("SELECT *\n  FROM cards WHERE state = 'new' AND reps > 3") == \
+            "SELECT * FROM cards WHERE state = ? AND reps > ?"
+
+    def test_in_list_collapses(self):
+        assert normalize_sql("DELETE FROM t WHERE id IN (?, ?, ?)") == normalize_sql("DELETE FROM t WHERE id IN (?)")
+
+    def test_identifiers_keep_digits(self):
+        assert normalize_sql("SELECT col1 FROM t2") == "SELECT col1 FROM t2"
+
+
+class TestProfiling:
+    def test_off_by_default(self, tdb):
+        assert db.get_profiler() is None
+        with db.get_db() as conn:
+            assert isinstance(conn, sqlite3.Connection)
+
+    def test_groups_by_repository_function(self, prof):
+        _seed()
+        db.get_due_cards(1)
+        db.get_due_cards(1)
+        db.get_card_stats(1)
+
+        [due] = _by_caller(prof, 'get_due_cards')
+        assert due.calls == 2 and due.rows == 10
+        assert due.total > 0 and due.max <= due.total
+        assert 'FROM cards c JOIN decks d' in due.sql
+        [stats] = _by_caller(prof, 'get_card_stats')
+        assert stats.calls == 1 and stats.rows == 1
+
+    def test_writes_count_affected_rows(self, prof):
+        _seed(3)
+        cards, notes = sorted(_by_caller(prof, 'save_cards'), key=lambda s: s.sql)
+        assert 'INTO cards' in cards.sql and cards.calls == 1 and cards.rows == 3
+        assert 'INTO notes' in notes.sql and notes.calls == 3
+
+    def test_plan_captured_once(self, prof):
+        _seed()
+        db.get_due_cards(1)
+        [due] = _by_caller(prof, 'get_due_cards')
+        plan = list(due.plan)
+        assert any('INDEX' in step for step in plan)
+        db.get_due_cards(1)
+        assert due.plan == plan
+
+    def test_chunked_fetches_are_counted(self, prof):
+        _seed(7)
+        assert len(list(db.iter_export_rows(1, chunk_size=2))) == 7
+        [export] = _by_caller(prof, 'iter_export_rows')
+        assert export.rows == 7
+
+    def test_fan_out_attributed(self, prof):
+        _seed()
+        db.get_global_stats()
+        [stats] = _by_caller(prof, 'get_global_stats')
+        assert stats.calls == 1
+
+    def test_results_unchanged(self, prof):
+        _seed(2)
+        profiled = db.get_card_stats(1)
+        db.set_profiler(None)
+        assert db.get_card_stats(1) == profiled
+
+
+class TestOutput:
+    def test_slow_log(self, tdb, caplog):
+        db.set_profiler(QueryProfiler(slow_ms=0))
+        try:
+            with caplog.at_level(logging.WARNING, logger='retain.sql.slow'):
+                db.create_user(1, None, 'U')
+        finally:
+            db.set_profiler(None)
+        assert any('slow query' in r.message and 'create_user' in r.message for r in caplog.records)
+        assert all("'U'" not in r.message for r in caplog.records)        # no parameters
+
+    def test_slow_log_file(self, tdb, tmp_path):
+        path = tmp_path / "slow.log"
+        profiler = QueryProfiler(slow_ms=0, slow_log_path=str(path))
+        db.set_profiler(profiler)
+        try:
+            db.create_user(1, None, 'U')
+        finally:
+            db.set_profiler(None)
+            for handler in list(logging.getLogger('retain.sql.slow').handlers):
+                handler.close()
+                logging.getLogger('retain.sql.slow').removeHandler(handler)
+        assert 'INSERT INTO users' in path.read_text()
+
+    def test_report_and_top(self, prof):
+        _seed()
+        for _ in range(6):
+            db.get_due_cards(1)
+        assert prof.top(1, by='calls')[0].caller == 'get_due_cards'
+        report = prof.report(3)
+        assert report.startswith('SQL profile') and 'plan:' in report
+        prof.reset()
+        assert prof.stats == {}
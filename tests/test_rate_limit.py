@@ -0,0 +1,108 @@
+"""Tests for utils/rate_limit.py — token buckets on a simulated clock."""
+
+import asyncio
+
+import pytest
+
+from utils.rate_limit import ChatBuckets, TokenBucket
+
+
+class FakeClock:
+    """Monotonic clock that only moves when someone sleeps.
+
+    Concurrent sleepers overlap: each wakes at (time it started sleeping) + seconds,
+    and the clock never runs backwards.
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        wake = self.now + seconds
+        await asyncio.sleep(0)
+        self.now = max(self.now, wake)
+
+
+class FakeBot:
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+        self.sent: list[tuple[float, int, str]] = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.sent.append((self.clock.now, chat_id, text))
+
+
+# ── TokenBucket ───────────────────────────────────────────────
+
+class TestTokenBucket:
+    def test_burst_then_empty(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert bucket.try_acquire() == pytest.approx(0.5)
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        for _ in range(3):
+            bucket.try_acquire()
+        clock.now = 1.0
+        assert bucket.try_acquire() == 0.0
+        assert bucket.try_acquire() == 0.0
+        assert bucket.try_acquire() > 0
+
+    def test_never_exceeds_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+        clock.now = 100.0
+        assert bucket.is_full
+        bucket.try_acquire()
+        bucket.try_acquire()
+        assert bucket.try_acquire() > 0
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, capacity=1, clock=clock, sleep=clock.sleep)
+        for _ in range(11):
+            await bucket.acquire()
+        assert clock.now == pytest.approx(2.0)
+
+    def test_refund_returns_a_token_up_to_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+        bucket.try_acquire()
+        bucket.try_acquire()
+        bucket.refund()
+        assert bucket.try_acquire() == 0.0
+        bucket.refund()
+        bucket.refund()
+        bucket.refund()
+        assert bucket.is_full
+
+    def test_drain_pushes_next_token_out(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+        bucket.drain(5)
+        assert bucket.try_acquire() == pytest.approx(5.0)
+        clock.now = 5.0
+        assert bucket.try_acquire() == 0.0
+
+
+# ── ChatBuckets ───────────────────────────────────────────────
+
+class TestChatBuckets:
+    def test_same_bucket_per_chat(self):
+        buckets = ChatBuckets()
+        assert buckets.get(1) is buckets.get(1)
+        assert buckets.get(1) is not buckets.get(2)
+
+    def test_evicts_past_max_size(self):
+        clock = FakeClock()
+        buckets = ChatBuckets(max_size=100, clock=clock)
+        for chat_id in range(1_000):
+            buckets.get(chat_id)
+        assert len(buckets) <= 100
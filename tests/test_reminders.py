@@ -0,0 +1,345 @@
+"""
+Tests for utils/reminders.py and the reminder queries in database/database.py.
+
+The simulation at the bottom drives a full reminder pass against a fake bot on
+a simulated clock, so rate limits can be checked without real sleeping.
+"""
+import asyncio
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+
+import database.database as db
+from tests.test_rate_limit import FakeBot, FakeClock
+from utils.dispatcher import OutboundDispatcher
+from utils.telegram_helpers import set_dispatcher
+from utils.reminders import (
+    in_quiet_hours, load_due_timers, next_day_start, run_due_notices, run_reminders, select_recipients,
+)
+from utils.sharding import shard_for, shard_key
+from utils.timer_wheel import DUE_TIMERS
+
+
+NOON_UTC = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _seed_users(start: int, n: int, due: bool = True, **user_cols) -> None:
+    """n users with one deck and one card each, inserted in bulk."""
+    cols = ', '.join(user_cols)
+    marks = ', '.join('?' for _ in user_cols)
+    due_expr = "datetime('now')" if due else "datetime('now', '+3 days')"
+    with db.get_db() as conn:
+        conn.executemany(
+            f"INSERT INTO users (user_id, name, shard_key{', ' + cols if cols else ''}) "
+            f"VALUES (?, 'U', ?{', ' + marks if marks else ''})",
+            ((uid, shard_key(uid), *user_cols.values()) for uid in range(start, start + n)),
+        )
+        conn.executemany(
+            "INSERT INTO decks (deck_id, user_id, deck_name) VALUES (?, ?, 'D')",
+            ((uid, uid) for uid in range(start, start + n)),
+        )
+        conn.executemany(
+            "INSERT INTO notes (note_id, front, back, deck_id, user_id) VALUES (?, 'q', 'a', ?, ?)",
+            ((uid, uid, uid) for uid in range(start, start + n)),
+        )
+        conn.executemany(
+            f"INSERT INTO cards (note_id, deck_id, user_id, due_date) VALUES (?, ?, ?, {due_expr})",
+            ((uid, uid, uid) for uid in range(start, start + n)),
+        )
+
+
+# ── Quiet hours ───────────────────────────────────────────────
+
+class TestQuietHours:
+    @pytest.mark.parametrize("hour,expected", [(21, False), (22, True), (3, True), (7, True), (8, False), (12, False)])
+    def test_window_wrapping_midnight(self, hour, expected):
+        assert in_quiet_hours(hour, 22, 8) is expected
+
+    @pytest.mark.parametrize("hour,expected", [(12, False), (13, True), (14, True), (15, False)])
+    def test_window_within_day(self, hour, expected):
+        assert in_quiet_hours(hour, 13, 15) is expected
+
+    def test_equal_bounds_disable(self):
+        assert not any(in_quiet_hours(h, 5, 5) for h in range(24))
+
+    def test_select_uses_local_time(self):
+        candidates = [
+            {'user_id': 1, 'timezone': 'UTC', 'quiet_start': 22, 'quiet_end': 8, 'due_count': 1},
+            # 12:00 UTC is 21:00 in Tokyo → awake; 01:00 in Auckland (NZDT) → quiet
+            {'user_id': 2, 'timezone': 'Asia/Tokyo', 'quiet_start': 22, 'quiet_end': 8, 'due_count': 1},
+            {'user_id': 3, 'timezone': 'Pacific/Auckland', 'quiet_start': 22, 'quiet_end': 8, 'due_count': 1},
+            {'user_id': 4, 'timezone': 'Not/AZone', 'quiet_start': 22, 'quiet_end': 8, 'due_count': 1},
+        ]
+        assert [c['user_id'] for c in select_recipients(candidates, NOON_UTC)] == [1, 2, 4]
+
+    def test_next_day_start_is_local_midnight(self):
+        assert next_day_start('UTC', NOON_UTC) == '2026-03-11 00:00:00'
+        # 21:00 in Tokyo: midnight is three hours away
+        assert next_day_start('Asia/Tokyo', NOON_UTC) == '2026-03-10 15:00:00'
+        assert next_day_start('Not/AZone', NOON_UTC) == '2026-03-11 00:00:00'
+
+
+# ── DB queries ────────────────────────────────────────────────
+
+class TestReminderQueries:
+    def test_candidates_only_users_with_due_cards(self, tdb):
+        _seed_users(1, 3, due=True)
+        _seed_users(10, 3, due=False)
+        rows = db.get_reminder_candidates(20)
+        assert sorted(r['user_id'] for r in rows) == [1, 2, 3]
+        assert all(r['due_count'] == 1 for r in rows)
+
+    def test_due_count_per_user(self, tdb):
+        _seed_users(1, 1)
+        db.save_cards([{'front': 'x', 'back': 'y'}] * 4, 'basic', 1, 1)
+        assert db.get_reminder_candidates(20)[0]['due_count'] == 5
+
+    def test_disabled_users_excluded(self, tdb):
+        _seed_users(1, 2)
+        db.update_reminder_settings(1, enabled=False)
+        assert [r['user_id'] for r in db.get_reminder_candidates(20)] == [2]
+
+    def test_recently_reminded_excluded(self, tdb):
+        _seed_users(1, 2)
+        db.mark_reminded([1])
+        assert [r['user_id'] for r in db.get_reminder_candidates(20)] == [2]
+        assert len(db.get_reminder_candidates(0)) == 2
+
+    def test_suspended_cards_do_not_remind(self, tdb):
+        _seed_users(1, 1)
+        db.set_card_suspended(db.get_cards_in_deck(1, 1)[0]['card_id'], 1, True)
+        assert db.get_reminder_candidates(20) == []
+
+    def test_shard_is_filtered_in_the_query(self, tdb):
+        _seed_users(1, 20)
+        for index in range(3):
+            rows = db.get_reminder_candidates(20, shard=(index, 3))
+            assert sorted(r['user_id'] for r in rows) == [u for u in range(1, 21) if shard_for(u, 3) == index]
+        assert len(db.get_reminder_candidates(20, shard=(0, 1))) == 20
+
+    def test_candidates_query_uses_due_index(self, tdb):
+        with db.get_db() as conn:
+            plan = ' '.join(
+                row['detail'] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT user_id, COUNT(*) FROM cards "
+                    "WHERE due_date <= datetime('now') GROUP BY user_id"
+                )
+            )
+        assert 'idx_cards_due_date' in plan
+
+    def test_settings_roundtrip(self, tdb):
+        db.create_user(1, None, 'U')
+        assert db.get_reminder_settings(1) == {
+            'enabled': True, 'timezone': 'UTC', 'quiet_start': 22, 'quiet_end': 8,
+        }
+        db.update_reminder_settings(1, enabled=False, timezone='Europe/Berlin', quiet_start=23, quiet_end=7)
+        assert db.get_reminder_settings(1) == {
+            'enabled': False, 'timezone': 'Europe/Berlin', 'quiet_start': 23, 'quiet_end': 7,
+        }
+
+    def test_init_db_adds_columns_to_old_users_table(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, name TEXT NOT NULL, "
+                     "default_deck_id INTEGER, default_card_type TEXT DEFAULT 'basic', created_at TIMESTAMP)")
+        conn.execute("INSERT INTO users (user_id, name) VALUES (7, 'Old')")
+        conn.commit()
+        conn.close()
+
+        monkeypatch.setattr(db, 'DB_PATH', path)
+        db.init_db()
+        assert db.get_reminder_settings(7)['timezone'] == 'UTC'
+
+
+# ── Due notices ───────────────────────────────────────────────
+
+def _ts(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _learning_card(user_id: int, due: datetime, state: str = 'learning') -> int:
+    """Rate user_id's (first) card into `state`, due at `due`; returns its card_id."""
+    card_id = db.get_cards_in_deck(user_id, user_id)[0]['card_id']
+    db.update_card_srs(card_id, _ts(due), 0.0, 5.0, 0, 0, state, 0, user_id=user_id)
+    return card_id
+
+
+class TestDueTimers:
+    def test_rating_into_learning_sets_a_timer(self, tdb):
+        _seed_users(1, 1)
+        now = datetime.now(timezone.utc)
+        _learning_card(1, now + timedelta(minutes=10))
+        assert len(DUE_TIMERS) == 1
+        _learning_card(1, now + timedelta(days=3), state='review')   # graduated
+        assert len(DUE_TIMERS) == 0
+
+    def test_suspend_and_delete_cancel(self, tdb):
+        _seed_users(1, 2)
+        now = datetime.now(timezone.utc)
+        a = _learning_card(1, now + timedelta(minutes=1))
+        b = _learning_card(2, now + timedelta(minutes=1))
+        db.set_card_suspended(a, 1, True)
+        db.delete_card(b, 2)
+        assert len(DUE_TIMERS) == 0
+
+    def test_rebuild_takes_upcoming_learning_cards_of_the_shard(self, tdb):
+        _seed_users(1, 30)
+        now = datetime.now(timezone.utc)
+        for uid in range(1, 31):
+            _learning_card(uid, now + timedelta(minutes=uid))
+        _learning_card(30, now - timedelta(minutes=5))          # already overdue: not a notice
+        DUE_TIMERS.clear()
+        mine = [uid for uid in range(1, 30) if shard_for(uid, 2) == 0]
+        assert load_due_timers(now, shard=(0, 2)) == len(mine)
+        assert len(DUE_TIMERS) == len(mine)
+
+    def test_rebuild_query_uses_learning_index(self, tdb):
+        with db.get_db() as conn:
+            plan = ' '.join(row['detail'] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT card_id, user_id, due_date FROM cards "
+                "WHERE due_date > ? AND due_date <= ? "
+                "AND state IN ('learning', 'relearning') AND suspended = 0 AND buried_until IS NULL",
+                ('2026', '2027')))
+        assert 'idx_cards_learning_due' in plan
+
+    def test_recipients_count_only_fired_learning_cards(self, tdb):
+        _seed_users(1, 3)                                           # a due new card each: backlog, not a notice
+        now = datetime.now(timezone.utc)
+        db.save_cards([{'front': 'x', 'back': 'y'}] * 2, 'basic', 1, 1)
+        cards = [c['card_id'] for c in db.get_cards_in_deck(1, 1)]
+        for card_id in cards[1:]:
+            db.update_card_srs(card_id, _ts(now - timedelta(minutes=1)), 0.0, 5.0, 0, 0, 'learning', 0, user_id=1)
+        fired = {1: cards, 2: [_learning_card(2, now - timedelta(minutes=1))], 3: [3]}
+        db.update_reminder_settings(2, enabled=False)
+        rows = db.get_due_notice_recipients(fired, _ts(now))
+        assert [(r['user_id'], r['due_count']) for r in rows] == [(1, 2)]
+
+    def test_abandoned_sessions_stop_counting_as_review(self):
+        from handlers.review import REVIEW_IDLE_SECONDS, in_review
+        session = {'review_cards': [], 'review_active_at': 1000.0}
+        assert in_review(session, 1000.0 + REVIEW_IDLE_SECONDS - 1)
+        assert not in_review(session, 1000.0 + REVIEW_IDLE_SECONDS)
+        assert not in_review({}, 1000.0)
+
+
+@pytest.mark.asyncio
+class TestDueNotices:
+    async def test_one_notice_per_user_when_cards_come_due(self, tdb, dispatcher):
+        _seed_users(1, 2, due=False, quiet_start=0, quiet_end=0)     # no quiet hours: any time of day
+        db.save_cards([{'front': 'x', 'back': 'y'}], 'basic', 1, 1)
+        now = datetime.now(timezone.utc)
+        first, second = (c['card_id'] for c in db.get_cards_in_deck(1, 1))
+        for card_id, minutes in ((first, 1), (second, 2)):
+            db.update_card_srs(card_id, _ts(now + timedelta(minutes=minutes)), 0.0, 5.0, 0, 0, 'learning', 0, user_id=1)
+        _learning_card(2, now + timedelta(minutes=30))
+
+        bot = FakeBot(dispatcher.clock)
+        assert await run_due_notices(bot, now) == 0                 # nothing due yet
+        later = now + timedelta(minutes=2, seconds=30)
+        with db.get_db() as conn:                                   # the clock moves on
+            conn.execute("UPDATE cards SET due_date = ? WHERE user_id = 1", (_ts(now - timedelta(seconds=1)),))
+        assert await run_due_notices(bot, later) == 1
+        [(_, chat_id, text)] = bot.sent
+        assert chat_id == 1 and '2 cards due again' in text
+        assert len(DUE_TIMERS) == 1                                 # user 2's card still pending
+        assert len(db.get_reminder_candidates(20)) == 1             # a notice doesn't stamp the daily reminder
+
+    async def test_stale_timers_send_nothing(self, tdb, dispatcher):
+        _seed_users(1, 1, due=False, quiet_start=0, quiet_end=0)
+        now = datetime.now(timezone.utc)
+        _learning_card(1, now + timedelta(minutes=1))
+        db.bury_card(db.get_cards_in_deck(1, 1)[0]['card_id'], 1, _ts(now + timedelta(days=1)))
+        bot = FakeBot(dispatcher.clock)
+        assert await run_due_notices(bot, now + timedelta(minutes=2)) == 0
+        assert bot.sent == [] and len(DUE_TIMERS) == 0
+
+    async def test_backlog_is_not_counted(self, tdb, dispatcher):
+        _seed_users(1, 1, quiet_start=0, quiet_end=0)               # one review card already due
+        db.save_cards([{'front': 'x', 'back': 'y'}], 'basic', 1, 1)
+        now = datetime.now(timezone.utc)
+        card_id = db.get_cards_in_deck(1, 1)[1]['card_id']
+        db.update_card_srs(card_id, _ts(now + timedelta(minutes=1)), 0.0, 5.0, 0, 0, 'learning', 0, user_id=1)
+        bot = FakeBot(dispatcher.clock)
+        assert await run_due_notices(bot, now + timedelta(minutes=1, seconds=10)) == 1
+        assert '1 card due again' in bot.sent[0][2]
+
+    async def test_users_in_review_hear_after_the_session(self, tdb, dispatcher):
+        from utils.reminders import DEFER_SECONDS
+        _seed_users(1, 1, due=False, quiet_start=0, quiet_end=0)
+        now = datetime.now(timezone.utc)
+        _learning_card(1, now + timedelta(minutes=1))
+        reviewing = {1}
+        bot = FakeBot(dispatcher.clock)
+        assert await run_due_notices(bot, now + timedelta(minutes=2), busy=reviewing.__contains__) == 0
+        assert len(DUE_TIMERS) == 1                                 # deferred, not dropped
+        reviewing.clear()
+        later = now + timedelta(minutes=2, seconds=DEFER_SECONDS + 10)
+        assert await run_due_notices(bot, later, busy=reviewing.__contains__) == 1
+        assert [chat_id for _, chat_id, _ in bot.sent] == [1]
+
+
+# ── Simulation ────────────────────────────────────────────────
+
+@pytest_asyncio.fixture
+async def dispatcher():
+    clock = FakeClock()
+    d = OutboundDispatcher(global_rate=25, global_burst=25, max_queue=200_000, clock=clock, sleep=clock.sleep)
+    d.clock = clock
+    await d.start()
+    set_dispatcher(d)
+    yield d
+    set_dispatcher(None)
+    await d.stop()
+
+
+@pytest.mark.asyncio
+class TestReminderSimulation:
+    async def test_fan_out_within_limits(self, tdb, dispatcher):
+        """100k users: everyone awake gets exactly one message, never above the global rate."""
+        _seed_users(1, 100_000)                                     # UTC, awake at noon
+        _seed_users(200_001, 1_000, timezone='Pacific/Auckland')    # 01:00 local → quiet
+        _seed_users(300_001, 500, due=False)                        # nothing due
+
+        clock = dispatcher.clock
+        bot = FakeBot(clock)
+        rate = 25
+
+        delivered = await run_reminders(bot, now=NOON_UTC)
+
+        assert delivered == 100_000
+        per_chat = Counter(chat_id for _, chat_id, _ in bot.sent)
+        assert set(per_chat) == set(range(1, 100_001))
+        assert max(per_chat.values()) == 1
+
+        per_second = Counter(int(t) for t, _, _ in bot.sent)
+        assert max(per_second.values()) <= 2 * rate   # burst + refill within one window
+        assert clock.now == pytest.approx((100_000 - rate) / rate, rel=0.01)
+
+        # Second pass right after: everybody was stamped, nobody is re-notified
+        assert await run_reminders(bot, now=NOON_UTC) == 0
+        assert len(bot.sent) == 100_000
+        assert dispatcher.metrics.sent == 100_000
+
+    async def test_failed_sends_still_stamped(self, tdb, dispatcher):
+        _seed_users(1, 3)
+        clock = dispatcher.clock
+
+        class BlockedBot(FakeBot):
+            async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+                from telegram.error import Forbidden
+                raise Forbidden("blocked")
+
+        assert await run_reminders(BlockedBot(clock), now=NOON_UTC) == 0
+        assert db.get_reminder_candidates(20) == []
+
+    async def test_shard_only_reminds_its_users(self, tdb, dispatcher):
+        _seed_users(1, 60)
+        bot = FakeBot(dispatcher.clock)
+        delivered = await run_reminders(bot, now=NOON_UTC, shard=(1, 3))
+        sent_to = {chat_id for _, chat_id, _ in bot.sent}
+        assert delivered == len(sent_to) > 0
+        assert all(shard_for(uid, 3) == 1 for uid in sent_to)
+        assert len(db.get_reminder_candidates(20)) == 60 - delivered   # other shards untouched
@@ -0,0 +1,129 @@
+"""Tests for utils/router.py — longest-prefix callback routing with typed arguments."""
+
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+
+import utils.callbacks as cb
+from benchmarks.fake_api import make_callback_update
+from utils.router import DIGITS, STALE_TEXT, CallbackRouter, OneOf, Route, iter_routes
+from utils.telegram_helpers import set_dispatcher
+
+
+async def _noop(update, context):
+    return None
+
+
+def _router() -> CallbackRouter:
+    return CallbackRouter([
+        Route('main_menu', _noop),
+        Route(cb.DECK, _noop, DIGITS),
+        Route(cb.DECK_OPEN, _noop, DIGITS),
+        Route(cb.DECK_PAGE, _noop, DIGITS, DIGITS),
+        Route(cb.DECK_DELETE, _noop, DIGITS),
+        Route(cb.DECK_DELETE_YES, _noop, DIGITS),
+        Route(cb.SET_TYPE, _noop, OneOf('basic', 'reverse')),
+    ])
+
+
+def _match(router: CallbackRouter, data: str):
+    found = router.match(data)
+    return (found[0].prefix, found[1]) if found else None
+
+
+class TestMatch:
+    @pytest.mark.parametrize('data, expected', [
+        ('main_menu', ('main_menu', [])),
+        ('deck_7', ('deck', [7])),
+        ('deck_open_42', ('deck_open', [42])),
+        ('deck_page_5_2', ('deck_page', [5, 2])),
+        ('deck_delete_3', ('deck_delete', [3])),
+        ('deck_delete_yes_3', ('deck_delete_yes', [3])),
+        ('set_type_reverse', ('set_type', ['reverse'])),
+    ])
+    def test_longest_prefix_with_typed_args(self, data, expected):
+        assert _match(_router(), data) == expected
+
+    @pytest.mark.parametrize('data', [
+        'main_menu_1', 'main', 'deck', 'deck_', 'deck_x', 'deck_-1', 'deck_١',
+        'deck_page_5', 'deck_page_5_2_1', 'deck_open_', 'set_type_cloze', 'unknown',
+    ])
+    def test_rejects_what_the_regexes_rejected(self, data):
+        assert _match(_router(), data) is None
+
+    def test_agrees_with_regex_patterns(self):
+        router = _router()
+        for data in ('deck_1', 'deck_open_1', 'deck_page_1_2', 'deck_delete_yes_1', 'set_type_basic', 'deck_open_x'):
+            by_regex = [r.prefix for r in router.routes if re.match(r.pattern(), data)]
+            assert by_regex == ([_match(router, data)[0]] if _match(router, data) else [])
+
+    def test_packed_data(self):
+        router = _router()
+        assert router.match(cb.pack(cb.DECK_PAGE, 5, 2, nonce=9))[1:] == ([5, 2], 9)
+        assert router.match(cb.pack(cb.DECK_DELETE_YES, 3))[0].prefix == cb.DECK_DELETE_YES
+        assert router.match(cb.pack(cb.DECK_PAGE, 5)) is None            # wrong arity
+        assert router.match(cb.pack(cb.CARD_EDIT, 5)) is None            # not routed here
+        assert router.match('~garbage') is None
+
+    def test_duplicate_prefix_rejected(self):
+        with pytest.raises(ValueError):
+            CallbackRouter([Route('help', _noop), Route('help', _noop)])
+
+
+class TestHandler:
+    def test_passes_parsed_args_and_returns_state(self):
+        seen = []
+
+        async def deck_open(update, context):
+            seen.append(context.args)
+            return 5
+
+        router = CallbackRouter([Route(cb.DECK_OPEN, deck_open, DIGITS)])
+        update = Update.de_json(make_callback_update(1, 9, 'deck_open_42'), None)
+        check = router.check_update(update)
+        context = SimpleNamespace(args=None)
+        assert asyncio.run(router.handle_update(update, None, check, context)) == 5
+        assert seen == [[42]]
+
+    def test_stale_nonce_rejected_before_the_handler(self):
+        calls, answers = [], []
+
+        async def rate(update, context):
+            calls.append(context.args)
+            return 7
+
+        async def answer(text=None, show_alert=False):
+            answers.append(text)
+
+        async def tap(data: str, user_data: dict):
+            update = SimpleNamespace(callback_query=SimpleNamespace(answer=answer))
+            context = SimpleNamespace(args=None, user_data=user_data)
+            result = await router.handle_update(update, None, router.match(data), context)
+            await asyncio.sleep(0)                # let answer_soon run
+            return result
+
+        router = CallbackRouter([Route(cb.RATE, rate, DIGITS, session='review')])
+        user_data: dict = {}
+        nonce = cb.new_nonce(user_data, 'review')
+        assert asyncio.run(tap(cb.pack(cb.RATE, 3, nonce=nonce), user_data)) == 7
+        cb.new_nonce(user_data, 'review')
+        assert asyncio.run(tap(cb.pack(cb.RATE, 3, nonce=nonce), user_data)) is None
+        assert asyncio.run(tap(cb.pack(cb.RATE, 3, nonce=nonce), {})) is None          # session over
+        assert asyncio.run(tap(cb.make(cb.RATE, 4), user_data)) == 7                    # plain data: old buttons
+        assert calls == [[3], [4]]
+        assert answers == [STALE_TEXT, STALE_TEXT]
+
+    def test_ignores_other_updates(self):
+        assert _router().check_update(Update.de_json(make_callback_update(1, 9, 'nope'), None)) is None
+        assert _router().check_update('deck_7') is None
+
+    def test_bot_routes(self, monkeypatch):
+        import bot
+        monkeypatch.setattr(bot, 'TG_BOT_TOKEN', '123:abc')
+        app = bot.build_application()
+        set_dispatcher(None)
+        prefixes = {route.prefix for route in iter_routes(app.handlers[0])}
+        assert {'review', 'add_card', cb.RATE, cb.DECK_OPEN, cb.CARD_EDIT, 'main_menu'} <= prefixes
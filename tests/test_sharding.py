@@ -0,0 +1,129 @@
+"""Tests for utils/sharding.py — routing, the front receiver and shard workers."""
+
+import asyncio
+import json
+import queue
+from collections import Counter
+
+import httpx
+import pytest
+from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
+
+from benchmarks.bench_updates import free_port
+from benchmarks.fake_api import FAKE_TOKEN, FakeBotRequest, make_callback_update, make_update
+from utils.sharding import SECRET_HEADER, UpdateRouter, serve_front, serve_shard, shard_for, update_user_id
+
+
+class TestShardFor:
+    def test_stable_and_in_range(self):
+        assert [shard_for(uid, 4) for uid in range(100)] == [shard_for(uid, 4) for uid in range(100)]
+        assert {shard_for(uid, 4) for uid in range(1_000)} == {0, 1, 2, 3}
+
+    def test_single_shard(self):
+        assert shard_for(123456789, 1) == 0
+
+    def test_roughly_even(self):
+        counts = Counter(shard_for(uid, 8) for uid in range(100_000, 180_000))
+        assert max(counts.values()) < 1.1 * min(counts.values())
+
+    def test_negative_ids(self):
+        assert 0 <= shard_for(-1001234567890, 4) < 4     # group / channel chat ids
+
+
+class TestUpdateUserId:
+    def test_message(self):
+        assert update_user_id(make_update(1, 42)) == 42
+
+    def test_callback_query(self):
+        assert update_user_id(make_callback_update(1, 7, 'x')) == 7
+
+    def test_poll_answer(self):
+        assert update_user_id({'update_id': 1, 'poll_answer': {'poll_id': 'p', 'user': {'id': 9}}}) == 9
+
+    def test_channel_post_falls_back_to_chat(self):
+        data = {'update_id': 1, 'channel_post': {'message_id': 1, 'chat': {'id': -100}}}
+        assert update_user_id(data) == -100
+
+    def test_no_user(self):
+        assert update_user_id({'update_id': 1, 'poll': {'id': 'p'}}) is None
+
+
+class TestUpdateRouter:
+    def test_same_user_same_shard(self):
+        inboxes = [queue.Queue() for _ in range(4)]
+        router = UpdateRouter(inboxes)
+        first = router.route(make_update(1, 55), b'a')
+        assert all(router.route(make_update(i, 55), b'x') == first for i in range(2, 10))
+        assert inboxes[first].qsize() == 9
+
+    def test_userless_updates_go_to_shard_zero(self):
+        inboxes = [queue.Queue() for _ in range(3)]
+        assert UpdateRouter(inboxes).route({'update_id': 1}, b'x') == 0
+
+
+@pytest.mark.asyncio
+class TestFront:
+    async def test_routes_and_checks_secret(self):
+        inboxes = [queue.Queue() for _ in range(2)]
+        port = free_port()
+        stop = asyncio.Event()
+        server = asyncio.create_task(serve_front(inboxes, '127.0.0.1', port, 'hook', 's3cret', stop))
+        await asyncio.sleep(0.05)
+        url = f"http://127.0.0.1:{port}/hook"
+        try:
+            async with httpx.AsyncClient() as client:
+                ok = await client.post(url, json=make_update(1, 77), headers={SECRET_HEADER: 's3cret'})
+                forbidden = await client.post(url, json=make_update(2, 77), headers={SECRET_HEADER: 'nope'})
+                bad = await client.post(url, content=b'not json', headers={SECRET_HEADER: 's3cret'})
+        finally:
+            stop.set()
+            await server
+
+        assert (ok.status_code, forbidden.status_code, bad.status_code) == (200, 403, 400)
+        inbox = inboxes[shard_for(77, 2)]
+        assert inbox.qsize() == 1
+        assert json.loads(inbox.get_nowait())['update_id'] == 1
+
+
+@pytest.mark.asyncio
+class TestServeShard:
+    async def test_feeds_application_and_runs_lifecycle_hooks(self):
+        handled: list[int] = []
+        hooks: list[str] = []
+
+        def factory(index: int, shards: int):
+            async def post_init(_app):
+                hooks.append('init')
+
+            async def post_shutdown(_app):
+                hooks.append('shutdown')
+
+            request = FakeBotRequest()
+            app = (
+                ApplicationBuilder().token(FAKE_TOKEN).request(request).updater(None)
+                .post_init(post_init).post_shutdown(post_shutdown).build()
+            )
+
+            async def on_message(update, context: ContextTypes.DEFAULT_TYPE) -> None:
+                handled.append(update.effective_user.id)
+
+            app.add_handler(MessageHandler(filters.TEXT, on_message))
+            return app
+
+        inbox: queue.Queue = queue.Queue()
+        for i in range(5):
+            inbox.put(json.dumps(make_update(i + 1, 100 + i)).encode())
+        inbox.put(None)
+
+        await asyncio.wait_for(serve_shard(0, 1, inbox, factory), 10)
+        assert handled == [100, 101, 102, 103, 104]
+        assert hooks == ['init', 'shutdown']
+
+
+class TestShardPool:
+    def test_end_to_end_across_processes(self):
+        from benchmarks.bench_shards import run
+
+        result = run(workers=2, n=200, users=50, work=1, concurrency=8)
+        assert sum(result['per_shard']) == 200
+        assert all(result['per_shard'])
@@ -9,7 +9,8 @@ from utils.srs import (
     AGAIN, EASY, GOOD, HARD,
     MAX_DIFFICULTY, MIN_DIFFICULTY,
     _ease_from_difficulty, _format_interval,
-    schedule, schedule_all_ratings,
+    DEFAULT_PRESET, Preset,
+    balance_range, is_leech, schedule, schedule_all_ratings,
 )
 
 
@@ -280,3 +281,106 @@ class TestFormatInterval:
 
     def test_365_days_converts_to_years(self):
         assert _format_interval(_make_result(365)) == '1.0y'
+
+
+# ── Leeches ───────────────────────────────────────────────────
+
+class TestLeech:
+    def test_lapse_reaching_threshold_is_leech(self):
+        c = card(state='review', stability=10.0, reps=9, lapses=7)
+        assert is_leech(c, schedule(c, AGAIN), 8)
+
+    def test_lapse_below_threshold_is_not(self):
+        c = card(state='review', stability=10.0, reps=9, lapses=6)
+        assert not is_leech(c, schedule(c, AGAIN), 8)
+
+    def test_every_lapse_past_threshold_flags_again(self):
+        c = card(state='review', stability=10.0, reps=9, lapses=11)
+        assert is_leech(c, schedule(c, AGAIN), 8)
+
+    def test_recall_never_flags(self):
+        c = card(state='review', stability=10.0, reps=9, lapses=11)
+        assert not any(is_leech(c, schedule(c, r), 8) for r in (HARD, GOOD, EASY))
+
+    def test_again_in_learning_is_not_a_lapse(self):
+        c = card(state='learning', lapses=9)
+        assert not is_leech(c, schedule(c, AGAIN), 8)
+
+    def test_zero_threshold_disables(self):
+        c = card(state='review', stability=10.0, reps=9, lapses=7)
+        assert not is_leech(c, schedule(c, AGAIN), 0)
+
+
+# ── Load balancing ────────────────────────────────────────────
+
+def _day(result, offset=0):
+    due = datetime.strptime(result['due_date'], '%Y-%m-%d %H:%M:%S')
+    return (due + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+class TestLoadBalance:
+    @pytest.mark.parametrize("days,expected", [
+        (1, (1, 1)), (2, (2, 2)), (3, (2, 4)), (6, (5, 7)), (10, (9, 11)), (40, (38, 42)), (200, (190, 210)),
+    ])
+    def test_balance_range(self, days, expected):
+        assert balance_range(days) == expected
+
+    def test_moves_to_least_loaded_day(self):
+        c = card(state='review', stability=10.0, reps=3)
+        plain = schedule(c, GOOD)
+        days = plain['scheduled_days']
+        load = {_day(plain, d): 5 for d in range(-5, 6)}
+        load[_day(plain, 1)] = 0
+        balanced = schedule(c, GOOD, load)
+        assert balanced['scheduled_days'] == days + 1
+        assert _day(balanced) == _day(plain, 1)
+        assert balanced['stability'] == plain['stability']
+
+    def test_ties_stay_on_the_computed_day(self):
+        c = card(state='review', stability=10.0, reps=3)
+        assert schedule(c, GOOD, {})['scheduled_days'] == schedule(c, GOOD)['scheduled_days']
+
+    def test_ties_prefer_nearest_then_sooner(self):
+        c = card(state='review', stability=10.0, reps=3)
+        plain = schedule(c, GOOD)
+        load = {_day(plain): 9}
+        assert schedule(c, GOOD, load)['scheduled_days'] == plain['scheduled_days'] - 1
+
+    def test_short_and_learning_intervals_never_move(self):
+        c = card(state='learning')
+        assert schedule(c, GOOD, {_day(schedule(c, GOOD)): 100})['scheduled_days'] == 1
+        c = card(state='review', stability=1.0, reps=1, difficulty=9.0)
+        assert schedule(c, HARD, {_day(schedule(c, HARD)): 100})['scheduled_days'] == 1
+        c = card(state='review', stability=10.0, reps=3)
+        assert schedule(c, AGAIN, {_day(schedule(c, AGAIN)): 100})['scheduled_days'] == 0
+
+
+# ── Presets ───────────────────────────────────────────────────
+
+class TestPresets:
+    def test_learning_steps_come_from_the_preset(self):
+        preset = Preset(learning_steps=(5, 30))
+        for rating, minutes in ((AGAIN, 5), (HARD, 30)):
+            result = schedule(card(), rating, preset=preset)
+            due = datetime.strptime(result['due_date'], '%Y-%m-%d %H:%M:%S')
+            assert result['state'] == 'learning'
+            assert abs((due - datetime.now()) - timedelta(minutes=minutes)) < timedelta(seconds=5)
+
+    def test_graduating_and_easy_intervals(self):
+        preset = Preset(learning_steps=(1,), graduating_interval=3, easy_interval=9)
+        c = card(state='learning', reps=1)
+        assert schedule(c, GOOD, preset=preset)['scheduled_days'] == 3
+        assert schedule(card(), EASY, preset=preset)['scheduled_days'] == 9
+
+    def test_max_interval_clamps(self):
+        c = card(state='review', stability=400.0, reps=8)
+        assert schedule(c, EASY)['scheduled_days'] > 30
+        capped = schedule(c, EASY, preset=Preset(max_interval=30))
+        assert capped['scheduled_days'] == 30
+        loaded = schedule(c, EASY, {}, preset=Preset(max_interval=30))
+        assert loaded['scheduled_days'] <= 30
+
+    def test_default_preset_matches_no_preset(self):
+        c = card(state='review', stability=10.0, reps=3)
+        assert schedule(c, GOOD, preset=DEFAULT_PRESET)['scheduled_days'] == schedule(c, GOOD)['scheduled_days']
+        assert schedule_all_ratings(c, preset=DEFAULT_PRESET).keys() == schedule_all_ratings(c).keys()
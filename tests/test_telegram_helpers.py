@@ -0,0 +1,119 @@
+"""Tests for utils/telegram_helpers.py — non-blocking callback answers and skipped identical edits."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, TimedOut
+
+from utils.render import RENDERED, RenderedMessages
+from utils.telegram_helpers import answer_soon, safe_answer, safe_edit_text
+
+RTT = 0.05
+
+
+def _query(error: Exception | None = None):
+    calls = []
+
+    async def answer(text=None, show_alert=False):
+        await asyncio.sleep(RTT)
+        calls.append((text, show_alert))
+        if error:
+            raise error
+
+    return SimpleNamespace(answer=answer), calls
+
+
+@pytest.mark.asyncio
+class TestAnswers:
+    async def test_answer_overlaps_the_handler(self):
+        query, calls = _query()
+        t0 = time.perf_counter()
+        task = answer_soon(query)
+        await asyncio.sleep(RTT)                  # the handler's own round trip (its edit)
+        assert await task is True
+        assert time.perf_counter() - t0 < 1.8 * RTT
+        assert calls == [(None, False)]
+
+    @pytest.mark.parametrize('error', [BadRequest("Query is too old and response timeout expired"), TimedOut()])
+    async def test_errors_are_swallowed(self, error):
+        query, _ = _query(error)
+        assert await safe_answer(query) is False
+        assert await answer_soon(query) is False
+
+    async def test_alert_text_passed_through(self):
+        query, calls = _query()
+        await answer_soon(query, "Saved", show_alert=True)
+        assert calls == [("Saved", True)]
+
+
+def _markup(label: str = 'Menu') -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data='main_menu')]])
+
+
+def _edit_query(message_id: int = 7, error: Exception | None = None):
+    edits = []
+
+    async def edit_message_text(text, reply_markup=None, parse_mode=None):
+        edits.append((text, reply_markup))
+        if error:
+            raise error
+
+    message = SimpleNamespace(chat_id=1, message_id=message_id)
+    return SimpleNamespace(message=message, edit_message_text=edit_message_text), edits
+
+
+@pytest.mark.asyncio
+class TestSkippedEdits:
+    async def test_identical_edit_is_skipped(self):
+        query, edits = _edit_query()
+        skipped = RENDERED.skipped
+        assert await safe_edit_text(query, "Hi", reply_markup=_markup())
+        assert await safe_edit_text(query, "Hi", reply_markup=_markup())     # equal content, new objects
+        assert len(edits) == 1
+        assert RENDERED.skipped == skipped + 1
+
+    async def test_changed_content_is_sent(self):
+        query, edits = _edit_query()
+        await safe_edit_text(query, "Hi", reply_markup=_markup())
+        await safe_edit_text(query, "Hi", reply_markup=_markup('Back'))
+        await safe_edit_text(query, "Bye", reply_markup=_markup('Back'))
+        other, other_edits = _edit_query(message_id=8)
+        await safe_edit_text(other, "Bye", reply_markup=_markup('Back'))
+        assert len(edits) == 3 and len(other_edits) == 1
+
+    async def test_failed_edit_is_not_recorded(self):
+        query, edits = _edit_query(error=TimedOut())
+        assert await safe_edit_text(query, "Hi") is False
+        assert await safe_edit_text(query, "Hi") is False
+        assert len(edits) == 2
+
+    async def test_not_modified_counts_as_current(self):
+        query, edits = _edit_query(error=BadRequest("Message is not modified"))
+        assert await safe_edit_text(query, "Hi")
+        assert await safe_edit_text(query, "Hi")
+        assert len(edits) == 1
+
+
+def test_record_is_bounded():
+    rendered = RenderedMessages(max_size=2)
+    for message_id in (1, 2, 3):
+        rendered.record(1, message_id, ('text', 'x', None, 'HTML'))
+    assert len(rendered) == 2
+    assert not rendered.is_current(1, 1, ('text', 'x', None, 'HTML'))
+    assert rendered.is_current(1, 3, ('text', 'x', None, 'HTML'))
+
+
+def test_static_markups_are_shared():
+    from handlers.cards import _type_picker_markup
+    from handlers.decks_menu import _build_decks_markup
+
+    assert _type_picker_markup('basic') is _type_picker_markup('basic')
+    assert _type_picker_markup('basic') != _type_picker_markup('reverse')
+    decks = [{'deck_id': i, 'deck_name': f"D{i}", 'card_count': 3, 'due_count': i % 2} for i in range(7)]
+    page = _build_decks_markup(decks, 1, 2)[1]
+    assert _build_decks_markup([dict(d) for d in decks], 1, 2)[1] is page
+    decks[5]['due_count'] = 9
+    assert _build_decks_markup(decks, 1, 2)[1] != page
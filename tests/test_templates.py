@@ -0,0 +1,45 @@
+"""
+Tests for utils/templates.py — how notes render as forward, reverse and cloze cards.
+"""
+from utils.templates import (
+    cloze_number, cloze_numbers, edit_sides, is_cloze, note_fields, render, templates_for,
+)
+
+CAPITALS = "The capital of {{c1::France}} is {{c2::Paris::city}}"
+
+
+class TestTemplates:
+    def test_templates_per_note_type(self):
+        assert templates_for('basic') == ('forward',)
+        assert templates_for('Reverse') == ('forward', 'reverse')
+        assert templates_for('cloze', CAPITALS) == ('c1', 'c2')
+        assert templates_for('cloze', 'no blanks') == ()
+
+    def test_forward_and_reverse(self):
+        assert render('forward', 'cat', 'кот') == ('cat', 'кот')
+        assert render('reverse', 'cat', 'кот') == ('кот', 'cat')
+        assert note_fields('reverse', 'кот', 'cat') == ('cat', 'кот')
+
+
+class TestCloze:
+    def test_numbers_are_distinct_and_sorted(self):
+        assert cloze_numbers("{{c3::a}} {{c1::b}} {{c3::c}}") == [1, 3]
+        assert is_cloze(CAPITALS) and not is_cloze("{{c::x}} | plain")
+
+    def test_each_card_blanks_its_own_deletion(self):
+        assert render('c1', CAPITALS, '') == ("The capital of [...] is Paris", "The capital of France is Paris")
+        assert render('c2', CAPITALS, '')[0] == "The capital of France is [city]"
+
+    def test_same_number_blanks_together_and_extra_follows_the_answer(self):
+        front, back = render('c1', "{{c1::a}} and {{c1::b}}\non two lines", 'extra')
+        assert front == "[...] and [...]\non two lines"
+        assert back == "a and b\non two lines\n\nextra"
+
+    def test_template_names(self):
+        assert cloze_number('c12') == 12
+        assert cloze_number('forward') is None and cloze_number('c') is None
+
+    def test_edit_sides_offer_the_note_text(self):
+        card = {'template': 'c2', 'front': 'rendered', 'back': '', 'note_front': CAPITALS, 'note_back': None}
+        assert edit_sides(card) == (CAPITALS, '')
+        assert edit_sides({'template': 'reverse', 'front': 'кот', 'back': 'cat'}) == ('кот', 'cat')
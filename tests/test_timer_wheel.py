@@ -0,0 +1,121 @@
+"""
+Tests for utils/timer_wheel.py — the hierarchical timer wheel behind due notices.
+"""
+import random
+
+import pytest
+
+from utils.timer_wheel import TimerWheel, epoch
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _wheel(clock=None, **kwargs):
+    kwargs.setdefault('tick', 10)
+    kwargs.setdefault('slots', 8)
+    kwargs.setdefault('levels', 3)
+    return TimerWheel(clock=clock or Clock(), **kwargs)
+
+
+def _fire_times(wheel, clock, until, step=10):
+    """{key: the clock time it fired at}, advancing one step at a time."""
+    fired = {}
+    while clock.now < until:
+        clock.now += step
+        for keys in wheel.advance().values():
+            for key in keys:
+                fired[key] = clock.now
+    return fired
+
+
+class TestTimerWheel:
+    def test_fires_at_the_deadline_not_before(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        wheel.add('a', 1, clock.now + 35)
+        assert wheel.advance(clock.now + 30) == {}
+        assert wheel.advance(clock.now + 40) == {1: ['a']}
+        assert len(wheel) == 0
+
+    @pytest.mark.parametrize("delay", [5, 70, 80, 95, 640, 650, 2000, 4400])
+    def test_cascades_through_every_ring(self, delay):
+        """8 slots of 10 s: ring 0 spans 80 s, ring 1 640 s, ring 2 5120 s (less the part of its current bucket already gone)."""
+        clock = Clock()
+        wheel = _wheel(clock)
+        start = clock.now
+        wheel.add('k', 1, start + delay)
+        fired = _fire_times(wheel, clock, start + delay + 20)
+        assert fired['k'] - start == pytest.approx(delay, abs=10)
+        assert fired['k'] >= start + delay
+
+    def test_beyond_the_rings_is_not_tracked(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        assert not wheel.add('far', 1, clock.now + 10 * 8 ** 3 + 10)
+        assert len(wheel) == 0
+
+    def test_past_deadlines_fire_on_the_next_tick(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        wheel.add('late', 1, clock.now - 300)
+        assert wheel.advance(clock.now + 10) == {1: ['late']}
+
+    def test_cancel_and_replace(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        wheel.add('a', 1, clock.now + 30)
+        wheel.add('b', 1, clock.now + 30)
+        assert wheel.cancel('a') and not wheel.cancel('a')
+        wheel.add('b', 1, clock.now + 300)         # rescheduled
+        assert wheel.advance(clock.now + 100) == {}
+        assert wheel.advance(clock.now + 300) == {1: ['b']}
+
+    def test_fired_timers_group_by_owner(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        for key, owner in (('a', 1), ('b', 2), ('c', 1)):
+            wheel.add(key, owner, clock.now + 20)
+        fired = wheel.advance(clock.now + 20)
+        assert sorted(fired) == [1, 2] and sorted(fired[1]) == ['a', 'c']
+
+    def test_coalesce_pulls_in_the_owners_next_timers(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        wheel.add('now', 1, clock.now + 10)
+        wheel.add('soon', 1, clock.now + 60)
+        wheel.add('later', 1, clock.now + 600)
+        wheel.add('other', 2, clock.now + 60)
+        fired = wheel.advance(clock.now + 10, coalesce=60)
+        assert fired == {1: ['now', 'soon']}
+        assert len(wheel) == 2
+
+    def test_idle_wheel_catches_up_with_the_clock(self):
+        clock = Clock()
+        wheel = _wheel(clock)
+        clock.now += 1_000_000                      # far more than the rings span
+        assert wheel.add('a', 1, clock.now + 30)
+        assert wheel.advance(clock.now + 30) == {1: ['a']}
+
+    def test_many_timers_fire_once_each_on_time(self):
+        rng = random.Random(7)
+        clock = Clock()
+        wheel = TimerWheel(clock=clock)
+        start = clock.now
+        due = {i: start + rng.uniform(0, 86_400) for i in range(5_000)}
+        for key, when in due.items():
+            wheel.add(key, key % 50, when)
+        for key in range(0, 5_000, 10):
+            wheel.cancel(key)
+        fired = _fire_times(wheel, clock, start + 86_400 + 60, step=60)
+        assert set(fired) == {k for k in due if k % 10}
+        assert all(due[k] <= fired[k] < due[k] + 70 for k in fired)
+        assert len(wheel) == 0
+
+    def test_epoch_reads_stored_timestamps_as_utc(self):
+        assert epoch('1970-01-01 00:01:00') == 60
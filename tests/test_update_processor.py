@@ -0,0 +1,171 @@
+"""
+Tests for utils/update_processor.py — per-user ordering under concurrent processing.
+
+The stress test runs the real review handlers in a PTB Application fed through
+its update queue, with every API call answered by the in-process Bot API
+stand-in after a small simulated round trip so handlers genuinely interleave.
+"""
+import asyncio
+from collections import Counter
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ConversationHandler, SimpleUpdateProcessor
+
+import database.database as db
+import utils.callbacks as cb
+from benchmarks.fake_api import FAKE_TOKEN, FakeBotRequest, make_callback_update, make_update
+from handlers.review import rate_card, review_entry, show_answer
+from utils.constants import ReviewState
+from utils.router import DIGITS, CallbackRouter, Route
+from utils.srs import GOOD
+from utils.update_processor import PerUserUpdateProcessor, ordering_key
+
+USERS = 20
+ROUNDS = 6
+
+
+def _review_conversation() -> ConversationHandler:
+    """The review flow as registered in bot.py (the states a double-tap can hit)."""
+    return ConversationHandler(
+        entry_points=[CallbackRouter([Route('review', review_entry)])],
+        states={
+            ReviewState.SHOWING_FRONT: [CallbackRouter([Route('show_answer', show_answer)])],
+            ReviewState.RATING: [CallbackRouter([Route(cb.RATE, rate_card, DIGITS)])],
+        },
+        fallbacks=[],
+        per_message=False,
+    )
+
+
+def _seed_cards() -> None:
+    for uid in range(1, USERS + 1):
+        db.create_user(uid, None, f"u{uid}")
+        deck_id = db.create_deck_db(uid, 'D')
+        for i in range(ROUNDS + 3):
+            db.save_card({'front': f"q{i}", 'back': f"a{i}"}, 'basic', deck_id, uid)
+
+
+async def _tap_storm(processor) -> tuple[object, Counter]:
+    """
+    Every user starts a review, then ROUNDS times: Show answer, Good, Good —
+    the second Good is an impatient double-tap that must not rate the next card
+    unseen. Returns (app, number of ratings per card_id).
+    """
+    request = FakeBotRequest(rtt=0.002)
+    app = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .request(request)
+        .get_updates_request(request)
+        .concurrent_updates(processor)
+        .build()
+    )
+    app.add_handler(_review_conversation())
+    _seed_cards()
+
+    taps = ['review'] + ['show_answer', cb.make(cb.RATE, GOOD), cb.make(cb.RATE, GOOD)] * ROUNDS
+
+    rated: Counter = Counter()
+    original = db.update_card_srs
+
+    def record(card_id, *args, **kwargs):
+        rated[card_id] += 1
+        return original(card_id, *args, **kwargs)
+
+    db.update_card_srs = record
+    try:
+        async with app:
+            await app.start()
+            update_id = 0
+            for data in taps:               # interleaved across users: u1, u2, ..., u1, u2, ...
+                for uid in range(1, USERS + 1):
+                    update_id += 1
+                    raw = make_callback_update(update_id, uid, data)
+                    await app.update_queue.put(Update.de_json(raw, app.bot))
+            idle = 0
+            while idle < 3:                 # a task may sit between queue.get() and the processor
+                busy = app.update_queue.qsize() or processor.current_concurrent_updates
+                idle = 0 if busy else idle + 1
+                await asyncio.sleep(0.01)
+            await app.stop()
+    finally:
+        db.update_card_srs = original
+    return app, rated
+
+
+@pytest.mark.asyncio
+class TestTapStorm:
+    async def test_no_lost_or_double_ratings(self, tdb):
+        app, rated = await _tap_storm(PerUserUpdateProcessor(max_concurrent_updates=8))
+
+        assert sum(rated.values()) == USERS * ROUNDS      # no rating lost
+        assert set(rated.values()) == {1}                 # no card rated twice
+        for uid in range(1, USERS + 1):
+            data = app.user_data[uid]
+            assert data['review_index'] == ROUNDS         # double-taps ignored, no skipped cards
+            assert data['review_correct'] == ROUNDS
+
+    async def test_unordered_processing_double_advances(self, tdb):
+        """Control: the same storm without per-user serialization skips cards."""
+        app, rated = await _tap_storm(SimpleUpdateProcessor(8))
+        assert sum(rated.values()) > USERS * ROUNDS
+        assert any(app.user_data[uid]['review_index'] > ROUNDS for uid in range(1, USERS + 1))
+
+
+@pytest.mark.asyncio
+class TestPerUserUpdateProcessor:
+    async def test_same_user_runs_in_order_others_in_parallel(self):
+        processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+        log: list[tuple[str, int, int]] = []
+        running: Counter = Counter()
+        peak = 0
+
+        async def work(uid: int, seq: int) -> None:
+            nonlocal peak
+            running[uid] += 1
+            peak = max(peak, sum(running.values()))
+            assert running[uid] == 1        # never two at once for one user
+            log.append(('start', uid, seq))
+            await asyncio.sleep(0.001)
+            running[uid] -= 1
+
+        tasks = []
+        for seq in range(5):
+            for uid in (1, 2, 3):
+                update = Update.de_json(make_update(seq * 10 + uid, uid), None)
+                tasks.append(asyncio.create_task(processor.process_update(update, work(uid, seq))))
+        await asyncio.gather(*tasks)
+
+        for uid in (1, 2, 3):
+            assert [seq for _, u, seq in log if u == uid] == list(range(5))
+        assert peak > 1
+        assert processor.active_users == 0          # locks released
+
+    async def test_running_ceiling(self):
+        processor = PerUserUpdateProcessor(max_concurrent_updates=3)
+        running = peak = 0
+
+        async def work() -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+
+        await asyncio.gather(*(
+            processor.process_update(Update.de_json(make_update(uid, uid), None), work())
+            for uid in range(1, 30)
+        ))
+        assert peak == 3
+
+
+class TestOrderingKey:
+    def test_ordering_key(self):
+        assert ordering_key(Update.de_json(make_update(1, 42), None)) == 42
+        assert ordering_key(Update.de_json(make_callback_update(2, 7, 'x'), None)) == 7
+        assert ordering_key(object()) is None
+
+    def test_rejects_bad_ceiling(self):
+        with pytest.raises(ValueError):
+            PerUserUpdateProcessor(max_concurrent_updates=0)
@@ -2,7 +2,7 @@
 Tests for utils/utils.py — parse_text and parse_photo (pure Python, no Telegram objects).
 """
 from unittest.mock import MagicMock
-from utils.utils import parse_text, parse_photo
+from utils.utils import parse_text, parse_photo, is_bulk, parse_bulk
 
 
 class TestParseText:
@@ -77,6 +77,10 @@ class TestParseText:
 
     # ── Return keys ───────────────────────────────────────────
 
+    def test_cloze_keeps_all_lines_on_the_front(self):
+        r = parse_text("{{c1::Paris}} is\nthe capital | of France")
+        assert r == {'front': "{{c1::Paris}} is\nthe capital", 'back': 'of France'}
+
     def test_always_returns_front_and_back_keys(self):
         for text in ["a | b", "a\nb", "single"]:
             r = parse_text(text)
@@ -116,3 +120,28 @@ class TestParsePhoto:
     def test_returns_all_keys(self):
         r = parse_photo(self._photo(), caption='c')
         assert 'front' in r and 'back' in r and 'is_photo' in r
+
+
+class TestBulk:
+    def test_is_bulk_needs_pipe_on_every_line(self):
+        assert is_bulk("a | b\nc | d")
+        assert not is_bulk("a | b\nc")
+        assert not is_bulk("a\nb")
+
+    def test_is_bulk_needs_two_lines(self):
+        assert not is_bulk("a | b")
+        assert not is_bulk("a | b\n\n")
+
+    def test_parse_bulk_one_card_per_line(self):
+        cards, skipped = parse_bulk("cat | кот\n\n dog | собака \nbird|птица")
+        assert cards == [
+            {'front': 'cat', 'back': 'кот'},
+            {'front': 'dog', 'back': 'собака'},
+            {'front': 'bird', 'back': 'птица'},
+        ]
+        assert skipped == []
+
+    def test_parse_bulk_reports_incomplete_lines(self):
+        cards, skipped = parse_bulk("a | b\n | no front\nno back |\nc | d")
+        assert [c['front'] for c in cards] == ['a', 'c']
+        assert skipped == [2, 3]
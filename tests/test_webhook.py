@@ -0,0 +1,79 @@
+"""
+Tests for webhook mode — config wiring in bot.py and end-to-end delivery through
+PTB's embedded webhook server, against the in-process Bot API stand-in.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import bot
+from benchmarks.bench_updates import SECRET, build_app, free_port, run_polling, run_webhook
+from benchmarks.fake_api import FakeBotRequest, make_update
+
+
+class TestWebhookKwargs:
+    def test_built_from_config(self, monkeypatch):
+        monkeypatch.setattr(bot, 'WEBHOOK_URL', 'https://bot.example.com/')
+        monkeypatch.setattr(bot, 'WEBHOOK_PATH', '/tg/hook/')
+        monkeypatch.setattr(bot, 'WEBHOOK_LISTEN', '127.0.0.1')
+        monkeypatch.setattr(bot, 'WEBHOOK_PORT', 8080)
+        monkeypatch.setattr(bot, 'WEBHOOK_SECRET', 's3cret')
+        monkeypatch.setattr(bot, 'WEBHOOK_MAX_CONNECTIONS', 80)
+
+        kwargs = bot.webhook_kwargs()
+        assert kwargs['webhook_url'] == 'https://bot.example.com/tg/hook'
+        assert kwargs['url_path'] == 'tg/hook'
+        assert kwargs['listen'] == '127.0.0.1'
+        assert kwargs['port'] == 8080
+        assert kwargs['secret_token'] == 's3cret'
+        assert kwargs['max_connections'] == 80
+
+    def test_never_without_a_secret(self, monkeypatch):
+        monkeypatch.setattr(bot, 'WEBHOOK_SECRET', None)
+        monkeypatch.setattr(bot, '_generated_secret', None)
+        secret = bot.webhook_kwargs()['secret_token']
+        assert len(secret) >= 32 and secret.replace('-', '').replace('_', '').isalnum()
+        assert bot.webhook_kwargs()['secret_token'] == secret      # one secret per run
+
+
+@pytest.mark.asyncio
+class TestDelivery:
+    async def test_webhook_delivers_every_update(self):
+        result = await asyncio.wait_for(run_webhook(200, rate=0, rtt=0, concurrency=8), 30)
+        assert result['updates'] == 200
+
+    async def test_polling_delivers_every_update(self):
+        result = await asyncio.wait_for(run_polling(200, rate=0, rtt=0), 30)
+        assert result['updates'] == 200
+
+    async def test_webhook_rejects_wrong_secret(self):
+        request = FakeBotRequest()
+        app, handled, _ = build_app(request, 1)
+        port = free_port()
+        url = f"http://127.0.0.1:{port}/telegram"
+        async with app:
+            await app.start()
+            await app.updater.start_webhook(
+                listen='127.0.0.1', port=port, url_path='telegram',
+                webhook_url=url, secret_token=SECRET,
+            )
+            async with httpx.AsyncClient() as client:
+                bad = await client.post(url, json=make_update(1, 5),
+                                        headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+                good = await client.post(url, json=make_update(2, 5),
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+            for _ in range(100):
+                if handled:
+                    break
+                await asyncio.sleep(0.01)
+            await app.updater.stop()
+            await app.stop()
+
+        assert bad.status_code == 403
+        assert good.status_code == 200
+        assert list(handled) == [2]
+        assert ('setWebhook', {'url': url, 'secret_token': SECRET, 'max_connections': 40}) in [
+            (m, {k: p[k] for k in ('url', 'secret_token', 'max_connections') if k in p})
+            for m, p in request.calls
+        ]
@@ -1,12 +1,25 @@
 """Centralized callback data building and parsing.
 
 Every parametric callback string has a known prefix defined here.
-Use make() to build callback_data, parse_int()/parse_args() to extract values,
-and pattern() to generate regex patterns for handler routing.
+Use make() to build callback_data. Handlers are routed by these prefixes in
+utils.router, which also parses the args; parse_int()/parse_args() and
+pattern() remain for code outside the router.
 
 Renaming a prefix constant now causes an ImportError instead of a silent runtime break.
+
+Buttons whose handler relies on session state in user_data (the review queue,
+the deck page being managed) use the packed form instead: pack() writes
+'~' + base64url(version, prefix code, 32-bit session nonce, varint ints) —
+a deck id, page and card id plus the nonce still fit Telegram's 64 bytes with
+room to spare. The router (utils.router) unpacks it and, for routes bound to a
+session, drops taps whose nonce is not the session's current one before the
+handler runs. Plain 'prefix_arg' data keeps working, so buttons already
+sitting in chats stay valid.
 """
 
+import base64
+import secrets
+
 # ── Parametric prefixes (carry an ID or value after the prefix) ──
 
 DECK = "deck"                       # deck_<deck_id>
@@ -15,16 +28,58 @@ DECK_PAGE = "deck_page"             # deck_page_<deck_id>_<page>
 DECK_DELETE = "deck_delete"         # deck_delete_<deck_id>
 DECK_DELETE_YES = "deck_delete_yes" # deck_delete_yes_<deck_id>
 DECK_RENAME = "deck_rename"         # deck_rename_<deck_id>
+DECK_EXPORT = "deck_export"         # deck_export_<deck_id>
+DECK_PRESET = "deck_preset"         # deck_preset_<deck_id>
 DECKS_PAGE = "decks_page"           # decks_page_<page>
 PICK_EDIT = "pick_edit"             # pick_edit_<deck_id>
 PICK_DELETE = "pick_delete"         # pick_delete_<deck_id>
+PICK_SUSPEND = "pick_suspend"       # pick_suspend_<deck_id>
 CARD_EDIT = "card_edit"             # card_edit_<card_id>
 CARD_DELETE_YES = "card_delete_yes" # card_delete_yes_<card_id>
 RATE = "rate"                       # rate_<rating>
 REVIEW_DECK = "review_deck"         # review_deck_<deck_id>
 EDIT_REVIEW = "edit_review"         # edit_review_<card_id>
+SUSPEND_REVIEW = "suspend_review"   # suspend_review_<card_id>
+BURY_REVIEW = "bury_review"         # bury_review_<card_id>
 SET_TYPE = "set_type"               # set_type_<basic|reverse>
 
+# ── Plain callbacks that can also be packed (they carry a session nonce) ──
+
+SHOW_ANSWER = "show_answer"
+REVIEW_DECK_ALL = "review_deck_all"
+
+# ── Packed encoding ──
+
+PACKED = "~"                        # never starts a plain prefix
+VERSION = 1
+MAX_DATA_BYTES = 64                 # Telegram's callback_data limit
+
+# Append only — a code must never be reused, or old buttons would reach the wrong handler
+CODES = {
+    DECK: 1,
+    DECK_OPEN: 2,
+    DECK_PAGE: 3,
+    DECK_DELETE: 4,
+    DECK_DELETE_YES: 5,
+    DECK_RENAME: 6,
+    DECK_EXPORT: 7,
+    DECKS_PAGE: 8,
+    PICK_EDIT: 9,
+    PICK_DELETE: 10,
+    CARD_EDIT: 11,
+    CARD_DELETE_YES: 12,
+    RATE: 13,
+    REVIEW_DECK: 14,
+    EDIT_REVIEW: 15,
+    SHOW_ANSWER: 16,
+    REVIEW_DECK_ALL: 17,
+    PICK_SUSPEND: 18,
+    SUSPEND_REVIEW: 19,
+    BURY_REVIEW: 20,
+    DECK_PRESET: 21,
+}
+_PREFIXES = {code: prefix for prefix, code in CODES.items()}
+
 
 def make(prefix: str, *args: object) -> str:
     """Build a callback data string.
@@ -73,3 +128,72 @@ def pattern(prefix: str, *arg_patterns: str) -> str:
     if arg_patterns:
         return f'^{prefix}_{"_".join(arg_patterns)}$'
     return f'^{prefix}$'
+
+
+# ── Packed encoding ──────────────────────────────────────────
+
+def pack(prefix: str, *args: int, nonce: int = 0) -> str:
+    """Build packed callback data: non-negative int args plus a session nonce (0 = none).
+
+    >>> unpack(pack("deck_page", 5, 2, nonce=77))
+    ('deck_page', [5, 2], 77)
+    """
+    if prefix not in CODES:
+        raise ValueError(f"No packed code for prefix {prefix!r}")
+    out = bytearray((VERSION, CODES[prefix]))
+    out += nonce.to_bytes(4, 'big')
+    for arg in args:
+        if arg < 0:
+            raise ValueError(f"Packed args must be non-negative, got {arg}")
+        while arg > 0x7f:                       # unsigned LEB128
+            out.append((arg & 0x7f) | 0x80)
+            arg >>= 7
+        out.append(arg)
+    data = PACKED + base64.urlsafe_b64encode(out).rstrip(b'=').decode()
+    if len(data) > MAX_DATA_BYTES:
+        raise ValueError(f"Packed callback data is {len(data)} bytes (max {MAX_DATA_BYTES})")
+    return data
+
+
+def unpack(data: str) -> tuple[str, list[int], int]:
+    """(prefix, int args, nonce) from pack() output. Raises ValueError for anything else."""
+    if not data.startswith(PACKED):
+        raise ValueError("Not packed callback data")
+    body = data[len(PACKED):]
+    try:
+        raw = base64.b64decode(body + '=' * (-len(body) % 4), altchars=b'-_', validate=True)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Bad packed callback data: {e}") from None
+    if len(raw) < 6 or raw[0] != VERSION or raw[1] not in _PREFIXES:
+        raise ValueError("Unknown packed callback version or code")
+    nonce = int.from_bytes(raw[2:6], 'big')
+    args: list[int] = []
+    value = shift = 0
+    for byte in raw[6:]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            args.append(value)
+            value = shift = 0
+    if shift:
+        raise ValueError("Truncated packed callback data")
+    return _PREFIXES[raw[1]], args, nonce
+
+
+# ── Session nonces ───────────────────────────────────────────
+
+def nonce_key(session: str) -> str:
+    return f"{session}_nonce"
+
+
+def new_nonce(user_data: dict, session: str) -> int:
+    """Start a new session generation: buttons packed with the previous nonce go stale."""
+    nonce = secrets.randbits(32) or 1
+    user_data[nonce_key(session)] = nonce
+    return nonce
+
+
+def current_nonce(user_data: dict, session: str) -> int:
+    """The session's nonce, or 0 when there is no active session."""
+    return user_data.get(nonce_key(session), 0)
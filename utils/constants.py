@@ -1,5 +1,5 @@
 from enum import auto, IntEnum
-from telegram import InlineKeyboardButton
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 DECK_NAME_MAX = 50
 
@@ -25,6 +25,8 @@ class ManageState(IntEnum):
     RENAME_DECK = auto()
     PICK_CARD_TO_EDIT = auto()
     PICK_CARD_TO_DELETE = auto()
+    PICK_CARD_TO_SUSPEND = auto()
+    EDIT_PRESET = auto()
 
 
 PREVIEW_BUTTONS = [
@@ -36,3 +38,6 @@ PREVIEW_BUTTONS = [
     ],
     [InlineKeyboardButton("\u2716 Cancel", callback_data='cancel')],
 ]
+
+# Markups are immutable, so every preview can share this one
+PREVIEW_MARKUP = InlineKeyboardMarkup(PREVIEW_BUTTONS)
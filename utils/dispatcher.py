@@ -0,0 +1,279 @@
+"""
+Central outbound dispatcher for Telegram API calls.
+
+Every send/edit/delete in utils.telegram_helpers is submitted here as a
+zero-argument coroutine factory plus the chat it targets. A fixed pool of
+workers drains a priority queue:
+
+  - a global token bucket caps total throughput (Telegram: ~30 msg/s)
+  - per-chat token buckets cap traffic into one chat (~1 msg/s sustained);
+    a job whose chat is over budget is deferred, not blocking the worker, and
+    hands its global token back, as does a job whose caller has gone
+  - RetryAfter (flood wait) drains the chat's bucket and re-queues the job
+    after the server-given delay; TimedOut/NetworkError retry with
+    exponential backoff; after max_retries the last error reaches the caller.
+    A call submitted as not idempotent (a send) is not retried on TimedOut:
+    Telegram may have delivered it already, and a retry would post it twice
+  - INTERACTIVE jobs (review edits, menus) always sort ahead of BROADCAST
+    jobs (reminders), and broadcast admission is bounded by max_queue
+
+Callers await submit() and get the API call's return value or its final
+exception, so the safe_* wrappers keep their existing error handling.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import warnings
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.warnings import PTBDeprecationWarning
+
+from utils.rate_limit import (
+    ChatBuckets, TokenBucket,
+    GLOBAL_RATE, GLOBAL_BURST, PER_CHAT_RATE, PER_CHAT_BURST,
+)
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 8
+MAX_QUEUE = 5_000          # pending BROADCAST jobs before new ones are dropped
+MAX_RETRY_QUEUE = 1_000    # jobs sleeping before a retry/deferral
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5         # seconds; doubles per attempt
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+
+class Dropped(NetworkError):
+    """The dispatcher gave up on a call (queue full or retry budget exhausted).
+
+    A NetworkError so existing `except (TimedOut, NetworkError)` handlers treat it
+    as a transient delivery failure.
+    """
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: int | None = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+    idempotent: bool = field(default=True, compare=False)
+
+
+@dataclass
+class DispatcherMetrics:
+    submitted: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    deferred: int = 0
+    flood_waits: int = 0
+    dropped: int = 0
+    queued: dict[Priority, int] = field(default_factory=lambda: {p: 0 for p in Priority})
+    waiting: int = 0           # jobs sleeping before a retry/deferral
+
+    def snapshot(self) -> dict[str, int]:
+        data = {k: v for k, v in vars(self).items() if k != 'queued'}
+        for p, depth in self.queued.items():
+            data[f"queue_{p.name.lower()}"] = depth
+        return data
+
+
+def retry_after_seconds(err: RetryAfter) -> float:
+    """RetryAfter.retry_after is an int today and a timedelta in a future PTB."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', PTBDeprecationWarning)
+        value = err.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class OutboundDispatcher:
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        global_rate: float = GLOBAL_RATE,
+        global_burst: float = GLOBAL_BURST,
+        per_chat_rate: float = PER_CHAT_RATE,
+        per_chat_burst: float = PER_CHAT_BURST,
+        max_queue: int = MAX_QUEUE,
+        max_retry_queue: int = MAX_RETRY_QUEUE,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retry_queue = max_retry_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock, sleep)
+        self.chat_buckets = ChatBuckets(per_chat_rate, per_chat_burst, clock=clock, sleep=sleep)
+        self.metrics = DispatcherMetrics()
+        self._sleep = sleep
+        self._seq = itertools.count()
+        self._queue: asyncio.PriorityQueue[_Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._waiting: set[asyncio.Task] = set()
+
+    # ── Lifecycle ────────────────────────────────────────────
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"dispatcher-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel workers; anything still queued fails with Dropped."""
+        for task in [*self._tasks, *self._waiting]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._waiting, return_exceptions=True)
+        self._tasks = []
+        self._waiting.clear()
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._fail(job, Dropped("Dispatcher stopped"))
+
+    # ── Submit ───────────────────────────────────────────────
+
+    async def submit(
+        self,
+        chat_id: int | None,
+        call: Callable[[], Awaitable[Any]],
+        priority: Priority = Priority.INTERACTIVE,
+        idempotent: bool = True,
+    ) -> Any:
+        """Queue an API call and wait for its result (or its final exception).
+
+        idempotent=False (sends) means a timed-out call is not retried.
+        """
+        if not self.running:
+            return await call()
+
+        self.metrics.submitted += 1
+        if priority != Priority.INTERACTIVE and self._queue.qsize() >= self.max_queue:
+            self.metrics.dropped += 1
+            raise Dropped("Outbound queue full")
+
+        job = _Job(
+            priority, next(self._seq), chat_id, call, asyncio.get_running_loop().create_future(),
+            idempotent=idempotent,
+        )
+        self._put(job)
+        return await job.future
+
+    # ── Internals ────────────────────────────────────────────
+
+    def _put(self, job: _Job) -> None:
+        self.metrics.queued[Priority(job.priority)] += 1
+        self._queue.put_nowait(job)
+
+    async def _worker(self) -> None:
+        while True:
+            # Token first, then job: the job pulled is the highest-priority one
+            # available at the moment we're allowed to send.
+            await self.global_bucket.acquire()
+            job = await self._queue.get()
+            self.metrics.queued[Priority(job.priority)] -= 1
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                self._fail(job, Dropped("Dispatcher stopped"))
+                raise
+            except Exception:   # never let one job kill a worker
+                logger.exception("Dispatcher worker error")
+
+    async def _run(self, job: _Job) -> None:
+        # The worker took a global token for this job; one that sends nothing gives it back
+        if job.future.done():   # caller was cancelled
+            self.global_bucket.refund()
+            return
+
+        if job.chat_id is not None:
+            wait = self.chat_buckets.get(job.chat_id).try_acquire()
+            if wait > 0:
+                self.global_bucket.refund()
+                self.metrics.deferred += 1
+                self._later(job, wait)
+                return
+
+        try:
+            result = await job.call()
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            self.metrics.flood_waits += 1
+            logger.warning(f"Flood wait {delay:.0f}s for chat {job.chat_id}")
+            if job.chat_id is not None:
+                self.chat_buckets.get(job.chat_id).drain(delay)
+            self._retry(job, delay, e)
+        except BadRequest as e:     # a NetworkError subclass, but retrying won't help
+            self._fail(job, e)
+        except TimedOut as e:
+            if job.idempotent:
+                self._retry(job, self.backoff_base * 2 ** job.attempts, e)
+            else:                   # it may have been delivered — a retry could post it twice
+                logger.warning(f"Send to chat {job.chat_id} timed out, not retried")
+                self._fail(job, e)
+        except NetworkError as e:
+            self._retry(job, self.backoff_base * 2 ** job.attempts, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self.metrics.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def _retry(self, job: _Job, delay: float, err: Exception) -> None:
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._fail(job, err)
+            return
+        self.metrics.retried += 1
+        self._later(job, delay, err)
+
+    def _later(self, job: _Job, delay: float, err: Exception | None = None) -> None:
+        """Re-queue after a delay, bounded by max_retry_queue."""
+        if len(self._waiting) >= self.max_retry_queue:
+            self.metrics.dropped += 1
+            self._fail(job, err or Dropped("Retry queue full"), count=False)
+            return
+        task = asyncio.create_task(self._requeue_after(job, delay))
+        self._waiting.add(task)
+        self.metrics.waiting = len(self._waiting)
+        task.add_done_callback(self._on_requeued)
+
+    def _on_requeued(self, task: asyncio.Task) -> None:
+        self._waiting.discard(task)
+        self.metrics.waiting = len(self._waiting)
+
+    async def _requeue_after(self, job: _Job, delay: float) -> None:
+        try:
+            await self._sleep(delay)
+        except asyncio.CancelledError:
+            self._fail(job, Dropped("Dispatcher stopped"))
+            raise
+        self._put(job)
+
+    def _fail(self, job: _Job, err: BaseException, count: bool = True) -> None:
+        if count:
+            self.metrics.failed += 1
+        if not job.future.done():
+            job.future.set_exception(err)
@@ -0,0 +1,77 @@
+"""
+Per-user due-card histograms for the interval load balancer.
+
+utils.srs.schedule can nudge a review interval a few days either way to the day
+with the fewest cards already due (see its load argument), so cards learned
+together stop coming due together. That needs each user's future due counts
+per day — one GROUP BY over the (user_id, due_date) index — on every rating.
+
+Rather than re-running it, database.get_due_load runs it once per user and
+keeps the result here, and database.update_card_srs moves one count from the
+card's old day to its new one on every rating (an overdue card only adds to
+its new day: the histogram starts at now). Changes that can't be applied
+as a move (deleting or suspending cards) drop the user's entry, so the next
+rating reloads it. A count can still drift a little (a bury, another process
+writing the same user); that only makes the balance slightly less even, never
+an interval wrong, and the entry is rebuilt whenever it is evicted.
+
+Keys are the 'YYYY-MM-DD' day of due_date. Process-local and bounded: least
+recently used users go first.
+"""
+
+from collections import OrderedDict
+
+MAX_USERS = 10_000
+
+
+class DueHistograms:
+    """LRU map of user_id -> {day: cards due that day}."""
+
+    def __init__(self, max_users: int = MAX_USERS) -> None:
+        self.max_users = max_users
+        self.loads = 0
+        self._users: OrderedDict[int, dict[str, int]] = OrderedDict()
+
+    def get(self, user_id: int) -> dict[str, int] | None:
+        counts = self._users.get(user_id)
+        if counts is not None:
+            self._users.move_to_end(user_id)
+        return counts
+
+    def put(self, user_id: int, counts: dict[str, int]) -> dict[str, int]:
+        self._users[user_id] = counts
+        self._users.move_to_end(user_id)
+        self.loads += 1
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return counts
+
+    def move(self, user_id: int | None, old_due: str | None, new_due: str, now: str) -> None:
+        """One card of user_id's went from old_due to new_due (no-op if the user isn't cached).
+
+        The histogram only counts cards due after `now` (see database.get_due_load),
+        so an overdue card's old day has nothing of it to take away.
+        """
+        counts = self._users.get(user_id)       # type: ignore[arg-type]
+        if counts is None:
+            return
+        if old_due and old_due > now:
+            day = old_due[:10]
+            if counts.get(day, 0) > 1:
+                counts[day] -= 1
+            else:
+                counts.pop(day, None)
+        day = new_due[:10]
+        counts[day] = counts.get(day, 0) + 1
+
+    def invalidate(self, user_id: int | None) -> None:
+        self._users.pop(user_id, None)          # type: ignore[arg-type]
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+DUE_LOAD = DueHistograms()
@@ -0,0 +1,146 @@
+"""
+Streaming card export to CSV / JSON.
+
+Rows come from database.iter_export_rows() (a generator) and are written straight
+into a spooled temporary file — small exports stay in memory, large ones spill to
+disk — so memory usage is flat no matter how many cards the user has.
+
+read_export() parses such a file back into rows for database.import_rows().
+
+Each row is one card: its note's raw fields (front and back as typed, cloze
+deletions intact), the template it renders through and the note_id its
+siblings share, plus every SRS field, so an export can be re-imported without
+losing notes or scheduling progress.
+"""
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+from collections.abc import Iterable
+from datetime import datetime
+from typing import IO, Any
+
+EXPORT_FIELDS = (
+    'deck_name', 'note_id', 'template', 'front', 'back', 'card_type', 'content_type',
+    'state', 'due_date', 'stability', 'difficulty', 'elapsed_days',
+    'scheduled_days', 'reps', 'lapses', 'suspended', 'buried_until', 'leech', 'created_at',
+)
+
+FORMATS = ('csv', 'json')
+
+# How read_export types each field; the rest are text. Empty means unset.
+_INT_FIELDS = ('elapsed_days', 'scheduled_days', 'reps', 'lapses', 'suspended', 'leech')
+_FLOAT_FIELDS = ('stability', 'difficulty')
+_TIME_FIELDS = ('due_date', 'buried_until', 'created_at')
+_STATES = ('new', 'learning', 'relearning', 'review')
+
+# Exports up to this size never touch the disk
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def write_csv(rows: Iterable[dict[str, Any]], out: IO[str]) -> int:
+    """Write rows as CSV with a header line. Returns the number of rows written."""
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_json(rows: Iterable[dict[str, Any]], out: IO[str]) -> int:
+    """Write rows as a JSON array, one object per line. Returns the number of rows written."""
+    out.write('[')
+    count = 0
+    for row in rows:
+        out.write(',\n' if count else '\n')
+        out.write(json.dumps({k: row.get(k) for k in EXPORT_FIELDS}, ensure_ascii=False))
+        count += 1
+    out.write('\n]\n')
+    return count
+
+
+_WRITERS = {'csv': write_csv, 'json': write_json}
+
+
+def export_cards(
+    rows: Iterable[dict[str, Any]],
+    fmt: str = 'csv',
+    compress: bool = False,
+) -> tuple[IO[bytes], int]:
+    """Stream rows into a temporary file. Returns (file rewound to 0, row count).
+
+    The caller owns the returned file and must close it.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    sink: IO[bytes] = gzip.GzipFile(fileobj=buf, mode='wb') if compress else buf
+    text = io.TextIOWrapper(sink, encoding='utf-8', newline='')
+    try:
+        count = _WRITERS[fmt](rows, text)
+        text.flush()
+    except Exception:
+        buf.close()
+        raise
+    text.detach()      # keep sink open — TextIOWrapper would close it
+    if compress:
+        sink.close()   # writes the gzip trailer; leaves buf open
+    buf.seek(0)
+    return buf, count
+
+
+def export_filename(deck_name: str | None, fmt: str, compress: bool) -> str:
+    """retain-export.csv, retain-French.json.gz, ..."""
+    stem = 'export'
+    if deck_name:
+        safe = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in deck_name).strip('_')
+        stem = safe or 'deck'
+    return f"retain-{stem}.{fmt}{'.gz' if compress else ''}"
+
+
+def read_export(data: bytes) -> list[dict[str, Any]]:
+    """The rows of a file export_cards wrote (CSV or JSON, gzipped or not), typed
+    for database.import_rows.
+
+    Raises ValueError (or OSError for a broken gzip stream) if it isn't one.
+    """
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    text = data.decode('utf-8-sig')
+    if text.lstrip().startswith('['):
+        raw = json.loads(text)
+        if not all(isinstance(row, dict) for row in raw):
+            raise ValueError("Not an export: expected an array of objects")
+    else:
+        try:
+            raw = list(csv.DictReader(io.StringIO(text, newline='')))
+        except csv.Error as e:
+            raise ValueError(f"Not an export: {e}") from e
+    return [_typed(row, line) for line, row in enumerate(raw, 1)]
+
+
+def _typed(row: dict[str, Any], line: int) -> dict[str, Any]:
+    if not isinstance(row.get('front'), str) or not isinstance(row.get('back'), str):
+        raise ValueError(f"Row {line}: no front and back")
+    typed = {k: (None if row.get(k) == '' else row.get(k)) for k in EXPORT_FIELDS}
+    typed['front'], typed['back'] = row['front'], row['back']
+    try:
+        for k in _INT_FIELDS:
+            if typed[k] is not None:
+                typed[k] = int(typed[k])
+        for k in _FLOAT_FIELDS:
+            if typed[k] is not None:
+                typed[k] = float(typed[k])
+        for k in _TIME_FIELDS:
+            if typed[k] is not None:
+                datetime.strptime(typed[k], '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Row {line}: {e}") from e
+    if typed['state'] is not None and typed['state'] not in _STATES:
+        raise ValueError(f"Row {line}: unknown state {typed['state']!r}")
+    return typed
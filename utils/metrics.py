@@ -0,0 +1,265 @@
+"""
+In-process latency metrics.
+
+Timed calls feed fixed-bucket histograms (Prometheus layout: cumulative
+buckets, _sum, _count) keyed by family and name:
+
+  handler      — every handler callback (instrument_application, bot.py)
+  db           — every public function in database/database.py
+  persistence  — every DatabasePersistence write
+  telegram     — every API helper in utils/telegram_helpers.py
+
+An exception counter sits next to each histogram. Extra numbers
+(e.g. the outbound dispatcher's counters) are registered as gauge callbacks
+and read at scrape time.
+
+The hot path is two perf_counter() calls, a bisect and three integer/float
+adds on a histogram resolved at decoration time — about a microsecond.
+Nothing is locked: a concurrent thread may very rarely lose an increment,
+which is fine for metrics.
+
+Exposed as Prometheus text by serve_metrics() (a stdlib HTTP server on its own
+thread) and summarised by /admin_stats (handlers/admin.py).
+"""
+
+import functools
+import inspect
+import logging
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'retain'
+
+# Upper bounds in seconds; a final +Inf bucket is implicit
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'errors')
+
+    def __init__(self, bounds: tuple[float, ...] = BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one (like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    return lower                  # +Inf bucket: best we can say
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._gauges: dict[str, Callable[[], dict[str, float]]] = {}
+
+    def histogram(self, family: str, name: str) -> Histogram:
+        key = (family, name)
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = Histogram()
+        return hist
+
+    def timed(self, family: str, name: str | None = None) -> Callable[[Callable], Callable]:
+        """Decorator: time every call of a sync or async function into (family, name)."""
+        def decorate(fn: Callable) -> Callable:
+            hist = self.histogram(family, name or fn.__name__)
+
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    start = perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    except Exception:
+                        hist.errors += 1
+                        raise
+                    finally:
+                        hist.observe(perf_counter() - start)
+                async_wrapper._metrics_timed = True
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    hist.errors += 1
+                    raise
+                finally:
+                    hist.observe(perf_counter() - start)
+            wrapper._metrics_timed = True
+            return wrapper
+
+        return decorate
+
+    def register_gauges(self, name: str, read: Callable[[], dict[str, float]]) -> None:
+        """Expose read()'s numbers as {PREFIX}_{name}_{key} gauges at scrape time."""
+        self._gauges[name] = read
+
+    def reset(self) -> None:
+        for hist in self._histograms.values():
+            hist.__init__(hist.bounds)
+
+    # ── Output ───────────────────────────────────────────────
+
+    def summary(self, family: str | None = None) -> list[dict[str, Any]]:
+        """One row per measured name, busiest (total time) first."""
+        rows = [
+            {
+                'family': fam, 'name': name, 'count': h.count, 'errors': h.errors,
+                'total': h.sum, 'mean': h.sum / h.count,
+                'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99),
+            }
+            for (fam, name), h in self._histograms.items()
+            if h.count and (family is None or fam == family)
+        ]
+        rows.sort(key=lambda r: r['total'], reverse=True)
+        return rows
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines: list[str] = []
+        by_family: dict[str, list[tuple[str, Histogram]]] = {}
+        for (family, name), hist in sorted(self._histograms.items()):
+            by_family.setdefault(family, []).append((name, hist))
+
+        for family, entries in by_family.items():
+            metric = f"{PREFIX}_{family}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for name, h in entries:
+                label = f'name="{name}"'
+                cumulative = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum{{{label}}} {h.sum:.6f}")
+                lines.append(f"{metric}_count{{{label}}} {h.count}")
+            errors = f"{PREFIX}_{family}_errors_total"
+            lines.append(f"# TYPE {errors} counter")
+            for name, h in entries:
+                lines.append(f'{errors}{{name="{name}"}} {h.errors}')
+
+        for gauge, read in sorted(self._gauges.items()):
+            try:
+                values = read()
+            except Exception:
+                logger.exception(f"Gauge {gauge} failed")
+                continue
+            for key, value in sorted(values.items()):
+                metric = f"{PREFIX}_{gauge}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Registry()
+
+
+def timed(family: str, name: str | None = None) -> Callable[[Callable], Callable]:
+    """METRICS.timed — the decorator instrumented modules use."""
+    return METRICS.timed(family, name)
+
+
+def instrument_module(namespace: dict[str, Any], family: str, exclude: set[str] = frozenset()) -> None:
+    """Wrap every public plain function defined in a module (pass its globals())."""
+    module = namespace['__name__']
+    for name, fn in list(namespace.items()):
+        if (
+            name.startswith('_') or name in exclude
+            or not inspect.isfunction(fn) or fn.__module__ != module
+            or inspect.isgeneratorfunction(fn) or getattr(fn, '_metrics_timed', False)
+        ):
+            continue
+        namespace[name] = timed(family, name)(fn)
+
+
+# ── Handlers ─────────────────────────────────────────────────
+
+def _handler_name(callback: Callable) -> str:
+    module = callback.__module__.rsplit('.', 1)[-1]
+    return f"{module}.{callback.__qualname__}"
+
+
+def _instrument_handler(handler: Any, registry: Registry) -> None:
+    # ConversationHandler: recurse into its child handlers
+    if hasattr(handler, 'entry_points') and hasattr(handler, 'states'):
+        children = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            children.extend(state_handlers)
+        for child in children:
+            _instrument_handler(child, registry)
+        return
+    # utils.router.CallbackRouter: time each route, not the router
+    routes = getattr(handler, 'routes', None)
+    if routes is not None:
+        for route in routes:
+            if not getattr(route.callback, '_metrics_timed', False):
+                route.callback = registry.timed('handler', _handler_name(route.callback))(route.callback)
+        return
+    callback = getattr(handler, 'callback', None)
+    if callback is None or getattr(callback, '_metrics_timed', False):
+        return
+    handler.callback = registry.timed('handler', _handler_name(callback))(callback)
+
+
+def instrument_application(application: Any, registry: Registry = METRICS) -> None:
+    """Time every handler callback registered on a PTB Application (call after adding handlers)."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler, registry)
+
+
+# ── HTTP endpoint ────────────────────────────────────────────
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = METRICS
+
+    def do_GET(self) -> None:
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass                                      # no access log per scrape
+
+
+def serve_metrics(port: int, listen: str = '127.0.0.1', registry: Registry = METRICS) -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread. Returns the server (call .shutdown() to stop)."""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((listen, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Metrics on http://{listen}:{server.server_port}/metrics")
+    return server
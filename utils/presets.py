@@ -0,0 +1,165 @@
+"""
+Scheduler presets: per-deck scheduling options, their text form and their cache.
+
+A preset (utils.srs.Preset) is a row of the presets table keyed by
+(user_id, deck_id); deck_id 0 is the user's default, which every deck without
+its own row uses, and DEFAULT_PRESET stands in when neither exists.
+
+Rating a card needs its deck's preset, so database.get_preset keeps resolved
+presets here, keyed by deck (user_id, deck_id — deck ids are only unique per
+database file when the store is sharded): one query the first time a deck is
+reviewed, none after. Saving or resetting a preset invalidates what it affects — the deck,
+or for a user default every cached deck of that user.
+
+Users edit a preset by sending one setting per message (parse_setting):
+
+    steps 1 10         learning steps, minutes
+    relearn 10         relearning steps, minutes
+    graduate 1         interval after the last learning step, days
+    easy 4             interval for Easy on a new card, days
+    max 365            longest interval, days
+    new 20             new cards per deck per session
+    reviews 200        other cards per deck per session
+
+The scheduler (utils.srs) uses two learning steps — Again goes to the first,
+Hard to the second, Good graduates — and one relearning step, so longer lists
+are refused rather than stored and ignored.
+"""
+
+from collections import OrderedDict
+from dataclasses import replace
+
+from utils.srs import Preset
+
+MAX_DECKS = 10_000
+DEFAULT_DECK = 0          # deck_id of a user's default preset
+
+MAX_LEARNING_STEPS = 2
+MAX_RELEARNING_STEPS = 1
+MAX_STEP_MINUTES = 1440
+
+# setting -> (Preset field, most steps)
+_STEP_SETTINGS = {
+    'steps': ('learning_steps', MAX_LEARNING_STEPS),
+    'relearn': ('relearning_steps', MAX_RELEARNING_STEPS),
+}
+# setting -> (Preset field, smallest, largest)
+_NUMBER_SETTINGS = {
+    'graduate': ('graduating_interval', 1, 365),
+    'easy': ('easy_interval', 1, 365),
+    'max': ('max_interval', 1, 36500),
+    'new': ('new_per_day', 0, 9999),
+    'reviews': ('reviews_per_day', 0, 99999),
+}
+
+SETTINGS_USAGE = (
+    "<code>steps 1 10</code> \u2014 one or two learning steps (minutes)\n"
+    "<code>relearn 10</code> \u2014 the relearning step (minutes)\n"
+    "<code>graduate 1</code> \u00b7 <code>easy 4</code> \u2014 first intervals (days)\n"
+    "<code>max 365</code> \u2014 longest interval (days)\n"
+    "<code>new 20</code> \u00b7 <code>reviews 200</code> \u2014 cards per deck per session\n"
+    "<code>reset</code> \u2014 back to the defaults"
+)
+
+
+def format_steps(steps: tuple[int, ...]) -> str:
+    return ' '.join(str(step) for step in steps)
+
+
+def parse_steps(text: str, limit: int = MAX_LEARNING_STEPS) -> tuple[int, ...]:
+    """'1 10' -> (1, 10). Raises ValueError unless 1..limit steps of 1..MAX_STEP_MINUTES minutes."""
+    try:
+        steps = tuple(int(part) for part in text.split())
+    except ValueError:
+        raise ValueError("Steps are whole minutes.") from None
+    if not 1 <= len(steps) <= limit:
+        raise ValueError("Give one step." if limit == 1 else f"Give 1 to {limit} steps.")
+    if not all(1 <= step <= MAX_STEP_MINUTES for step in steps):
+        raise ValueError(f"Steps are 1\u2013{MAX_STEP_MINUTES} minutes.")
+    return steps
+
+
+def parse_setting(text: str, preset: Preset) -> Preset:
+    """preset with the one setting in `text` changed.
+
+    Raises ValueError, with a message for the user, on anything unknown or out of range.
+    """
+    key, _, value = text.strip().lower().partition(' ')
+    if key in _STEP_SETTINGS:
+        field, limit = _STEP_SETTINGS[key]
+        return replace(preset, **{field: parse_steps(value, limit)})
+    if key in _NUMBER_SETTINGS:
+        field, low, high = _NUMBER_SETTINGS[key]
+        try:
+            number = int(value.strip())
+        except ValueError:
+            raise ValueError(f"<code>{key}</code> takes a whole number.") from None
+        if not low <= number <= high:
+            raise ValueError(f"<code>{key}</code> must be {low}\u2013{high}.")
+        return replace(preset, **{field: number})
+    raise ValueError("Didn't get that.")
+
+
+def describe(preset: Preset) -> str:
+    """The preset as the settings screen lists it."""
+    return (
+        f"Learning steps: <b>{format_steps(preset.learning_steps)}</b> min\n"
+        f"Relearning steps: <b>{format_steps(preset.relearning_steps)}</b> min\n"
+        f"Graduating / easy interval: <b>{preset.graduating_interval}d</b> / <b>{preset.easy_interval}d</b>\n"
+        f"Max interval: <b>{preset.max_interval}d</b>\n"
+        f"Per session: <b>{preset.new_per_day}</b> new \u00b7 <b>{preset.reviews_per_day}</b> reviews"
+    )
+
+
+class PresetCache:
+    """LRU map of (user_id, deck_id) -> the preset that deck schedules with, invalidated per deck or per user."""
+
+    def __init__(self, max_decks: int = MAX_DECKS) -> None:
+        self.max_decks = max_decks
+        self.loads = 0
+        self._decks: OrderedDict[tuple[int, int], Preset] = OrderedDict()
+        self._by_user: dict[int, set[int]] = {}
+
+    def get(self, user_id: int, deck_id: int) -> Preset | None:
+        key = (user_id, deck_id)
+        preset = self._decks.get(key)
+        if preset is not None:
+            self._decks.move_to_end(key)
+        return preset
+
+    def put(self, user_id: int, deck_id: int, preset: Preset) -> Preset:
+        key = (user_id, deck_id)
+        self._decks[key] = preset
+        self._decks.move_to_end(key)
+        self._by_user.setdefault(user_id, set()).add(deck_id)
+        self.loads += 1
+        while len(self._decks) > self.max_decks:
+            (old_user, old_deck), _ = self._decks.popitem(last=False)
+            self._forget(old_user, old_deck)
+        return preset
+
+    def invalidate(self, user_id: int, deck_id: int) -> None:
+        """Drop the deck — or, for DEFAULT_DECK, every cached deck of user_id."""
+        if deck_id != DEFAULT_DECK:
+            if self._decks.pop((user_id, deck_id), None) is not None:
+                self._forget(user_id, deck_id)
+            return
+        for cached in self._by_user.pop(user_id, set()):
+            self._decks.pop((user_id, cached), None)
+
+    def _forget(self, user_id: int, deck_id: int) -> None:
+        decks = self._by_user.get(user_id)
+        if decks is not None:
+            decks.discard(deck_id)
+            if not decks:
+                del self._by_user[user_id]
+
+    def clear(self) -> None:
+        self._decks.clear()
+        self._by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._decks)
+
+
+PRESETS = PresetCache()
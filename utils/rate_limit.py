@@ -0,0 +1,117 @@
+"""
+Token-bucket rate limiting for outbound Telegram traffic.
+
+Telegram allows roughly 30 messages per second across all chats and about one
+message per second into a single chat; going over earns a RetryAfter (flood
+wait). utils.dispatcher holds one global bucket and a per-chat bucket for
+every chat it talks to.
+
+Clock and sleep are injectable so tests can run a simulated timeline instantly.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+GLOBAL_RATE = 25.0        # msgs/second — a little under Telegram's ~30 to leave room for interactive traffic
+GLOBAL_BURST = 25
+PER_CHAT_RATE = 1.0       # msgs/second into one chat
+PER_CHAT_BURST = 3
+MAX_CHAT_BUCKETS = 10_000
+
+_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available. Returns 0.0 on success, else seconds until they would be."""
+        self._refill()
+        # Epsilon: refilling for exactly the reported wait can land a hair short
+        if self._tokens >= tokens - _EPSILON:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until tokens are available, then take them. Waiters are served FIFO."""
+        async with self._lock:
+            while (wait := self.try_acquire(tokens)) > 0:
+                await self._sleep(wait)
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """Give back tokens taken for something that didn't happen."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so the next token arrives `seconds` from now (flood wait)."""
+        self._refill()
+        self._tokens = min(self._tokens, 1.0 - seconds * self.rate)
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+class ChatBuckets:
+    """Lazily-created per-chat buckets; full (idle) buckets are evicted past max_size."""
+
+    def __init__(
+        self,
+        rate: float = PER_CHAT_RATE,
+        capacity: float = PER_CHAT_BURST,
+        max_size: int = MAX_CHAT_BUCKETS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+
+    def get(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_size:
+                self._evict()
+            bucket = TokenBucket(self.rate, self.capacity, self._clock, self._sleep)
+            self._buckets[chat_id] = bucket
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    def _evict(self) -> None:
+        # A full bucket carries no state worth keeping — recreating it is equivalent
+        for chat_id in [cid for cid, b in self._buckets.items() if b.is_full]:
+            del self._buckets[chat_id]
+        while len(self._buckets) >= self.max_size:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,196 @@
+"""
+Due-card reminder fan-out.
+
+One scheduled run = one set-based query (database.get_reminder_candidates), an
+in-memory quiet-hours filter using each user's timezone, then a bounded number of
+concurrent BROADCAST-priority sends through the outbound dispatcher (which does
+the rate limiting and retries, and lets interactive traffic jump the queue).
+last_reminded_at is stamped in
+batches as messages go out, so a crash mid-run doesn't re-notify everyone.
+
+Cards in learning come due minutes apart, so they get due notices instead: the
+timer wheel in utils.timer_wheel fires when they come due, and run_due_notices
+sends the users whose timers fired through the same fan-out (without stamping
+last_reminded_at — a notice doesn't replace the daily reminder). It counts only
+the cards whose timers fired, and waits while the user is in a review session.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import database.database as db
+from utils.dispatcher import Priority
+from utils.telegram_helpers import safe_send_text
+from utils.timer_wheel import COALESCE_SECONDS, DUE_TIMERS, HORIZON_SECONDS, epoch
+
+logger = logging.getLogger(__name__)
+
+MIN_GAP_HOURS = 20        # at most one reminder per user per (roughly) day
+SEND_CONCURRENCY = 50     # in-flight API calls; the dispatcher does the real pacing
+MARK_BATCH = 500
+DEFER_SECONDS = 60        # a due notice for a user mid-review is tried again this much later
+
+_REVIEW_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton('\u25b6 Review', callback_data='review')]
+])
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name: str | None) -> ZoneInfo:
+    """ZoneInfo for an IANA name; unknown or empty names fall back to UTC."""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def next_day_start(tz_name: str | None, now: datetime | None = None) -> str:
+    """The user's next local midnight as UTC 'YYYY-MM-DD HH:MM:SS' — when today's buries end."""
+    now = now or datetime.now(timezone.utc)
+    zone = get_zone(tz_name)
+    tomorrow = now.astimezone(zone).date() + timedelta(days=1)
+    midnight = datetime.combine(tomorrow, time(), tzinfo=zone)
+    return midnight.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def in_quiet_hours(hour: int, start: int | None, end: int | None) -> bool:
+    """True if local `hour` falls in [start, end). Windows may wrap midnight; start == end disables."""
+    if start is None or end is None or start == end:
+        return False
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def select_recipients(
+    candidates: Iterable[dict[str, Any]],
+    now: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Drop candidates whose local time is inside their quiet hours."""
+    now = now or datetime.now(timezone.utc)
+    local_hours: dict[str | None, int] = {}   # most users share a handful of zones
+
+    def local_hour(tz_name: str | None) -> int:
+        if tz_name not in local_hours:
+            local_hours[tz_name] = now.astimezone(get_zone(tz_name)).hour
+        return local_hours[tz_name]
+
+    return [
+        c for c in candidates
+        if not in_quiet_hours(local_hour(c['timezone']), c['quiet_start'], c['quiet_end'])
+    ]
+
+
+def reminder_text(due_count: int) -> str:
+    return f"\U0001f514 <b>{due_count} card{'s' if due_count != 1 else ''} due</b> \u2014 a quick review keeps them fresh"
+
+
+def due_notice_text(due_count: int) -> str:
+    return f"\u23f0 <b>{due_count} card{'s' if due_count != 1 else ''} due again</b> \u2014 the next step is up"
+
+
+async def send_reminders(
+    bot: Any,
+    recipients: list[dict[str, Any]],
+    concurrency: int = SEND_CONCURRENCY,
+    text: Callable[[int], str] = reminder_text,
+    mark: bool = True,
+) -> int:
+    """Notify every recipient (mark: stamp last_reminded_at). Returns the number of messages delivered."""
+    queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+    for r in recipients:
+        queue.put_nowait(r)
+
+    delivered: list[int] = []
+    attempted: list[int] = []
+
+    def flush() -> None:
+        if attempted and mark:
+            db.mark_reminded(attempted[:])
+            attempted.clear()
+
+    async def worker() -> None:
+        while True:
+            try:
+                r = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            ok = await safe_send_text(
+                (r['user_id'], bot), text(r['due_count']),
+                reply_markup=_REVIEW_MARKUP, priority=Priority.BROADCAST,
+            )
+            # Stamp failures too (blocked bot, deleted account) — retrying every run helps nobody
+            attempted.append(r['user_id'])
+            if ok:
+                delivered.append(r['user_id'])
+            if len(attempted) >= MARK_BATCH:
+                flush()
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(recipients)))))
+    flush()
+    return len(delivered)
+
+
+async def run_reminders(bot: Any, now: datetime | None = None, shard: tuple[int, int] | None = None) -> int:
+    """One full reminder pass: query, filter, fan out. A shard only reminds its own users."""
+    candidates = db.get_reminder_candidates(MIN_GAP_HOURS, shard)
+    recipients = select_recipients(candidates, now)
+    logger.info(f"Reminders: {len(candidates)} users with due cards, {len(recipients)} outside quiet hours")
+    if not recipients:
+        return 0
+    delivered = await send_reminders(bot, recipients)
+    logger.info(f"Reminders: delivered {delivered}/{len(recipients)}")
+    return delivered
+
+
+def load_due_timers(now: datetime | None = None, shard: tuple[int, int] | None = None) -> int:
+    """Rebuild the due-notice timers from the database (on startup). Returns timers added."""
+    now = now or datetime.now(timezone.utc)
+    start = now.strftime('%Y-%m-%d %H:%M:%S')
+    end = (now + timedelta(seconds=HORIZON_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    rows = db.get_learning_due(start, end, shard)
+    added = sum(DUE_TIMERS.add((r['user_id'], r['card_id']), r['user_id'], epoch(r['due_date'])) for r in rows)
+    logger.info(f"Due notices: tracking {added} cards in learning")
+    return added
+
+
+async def run_due_notices(
+    bot: Any,
+    now: datetime | None = None,
+    busy: Callable[[int], bool] | None = None,
+) -> int:
+    """Advance the timer wheel; one notice per user whose cards came due. Returns messages delivered.
+
+    A user `busy` says is mid-review isn't interrupted: their timers are set again
+    DEFER_SECONDS on, so the notice goes out once the session is over.
+    """
+    now = now or datetime.now(timezone.utc)
+    fired = DUE_TIMERS.advance(now.timestamp(), COALESCE_SECONDS)
+    if busy is not None:
+        later = now.timestamp() + DEFER_SECONDS
+        for user_id in [uid for uid in fired if busy(uid)]:
+            for key in fired.pop(user_id):
+                DUE_TIMERS.add(key, user_id, later)
+    if not fired:
+        return 0
+    until = (now + timedelta(seconds=COALESCE_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    cards = {user_id: [card_id for _, card_id in keys] for user_id, keys in fired.items()}
+    recipients = select_recipients(db.get_due_notice_recipients(cards, until), now)
+    if not recipients:
+        return 0
+    return await send_reminders(bot, recipients, text=due_notice_text, mark=False)
@@ -0,0 +1,71 @@
+"""
+What each bot message currently shows, so identical edits can be skipped.
+
+Telegram answers an edit to identical content with "message is not modified"
+— a full round trip (and a token from the chat's rate-limit bucket) that
+changes nothing. Re-rendering the same screen is common: tapping the current
+page of a list, re-opening a menu, a stats screen with unchanged numbers.
+
+utils.telegram_helpers records the (text, markup, parse_mode) of every
+message it sends or edits here, keyed by (chat_id, message_id), and skips an
+edit whose content equals the recorded one. Markups compare by content
+(InlineKeyboardMarkup is immutable), so an equal markup built afresh matches.
+Any failure or fallback forgets the entry, so a stale record can only cost
+an extra edit, never a missing one.
+
+The record is process-local and bounded (least recently used messages go
+first); after a restart the first edit of every message is simply sent.
+"""
+
+from collections import OrderedDict
+from typing import Any
+
+MAX_MESSAGES = 10_000
+
+Content = tuple[str, str | None, Any, str | None]     # (kind, text, reply_markup, parse_mode)
+
+
+class RenderedMessages:
+    """LRU map of (chat_id, message_id) -> the content last sent to that message."""
+
+    def __init__(self, max_size: int = MAX_MESSAGES) -> None:
+        self.max_size = max_size
+        self.skipped = 0
+        self.recorded = 0
+        self._messages: OrderedDict[tuple[int, int], Content] = OrderedDict()
+
+    def is_current(self, chat_id: int | None, message_id: int | None, content: Content) -> bool:
+        """True if `content` is exactly what the message already shows (counts a skip)."""
+        if chat_id is None or message_id is None:
+            return False
+        key = (chat_id, message_id)
+        if self._messages.get(key) != content:
+            return False
+        self._messages.move_to_end(key)
+        self.skipped += 1
+        return True
+
+    def record(self, chat_id: int | None, message_id: int | None, content: Content) -> None:
+        if chat_id is None or message_id is None:
+            return
+        key = (chat_id, message_id)
+        self._messages[key] = content
+        self._messages.move_to_end(key)
+        self.recorded += 1
+        while len(self._messages) > self.max_size:
+            self._messages.popitem(last=False)
+
+    def forget(self, chat_id: int | None, message_id: int | None) -> None:
+        self._messages.pop((chat_id, message_id), None)  # type: ignore[arg-type]
+
+    def clear(self) -> None:
+        self._messages.clear()
+
+    def snapshot(self) -> dict[str, float]:
+        return {'messages': len(self._messages), 'recorded': self.recorded, 'skipped_edits': self.skipped}
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+RENDERED = RenderedMessages()
@@ -0,0 +1,213 @@
+"""
+Callback query routing by prefix trie.
+
+A CallbackQueryHandler per button means PTB runs one regex after another for
+every tap, and the handler then re-parses the same string with cb.parse_int.
+CallbackRouter is one PTB handler holding many routes, each a utils.callbacks
+prefix plus typed argument parsers:
+
+    CallbackRouter([
+        Route('main_menu', hand_start.main_menu),
+        Route(cb.DECK_OPEN, hand_manage.deck_open, DIGITS),
+        Route(cb.DECK_PAGE, hand_manage.deck_cards_page, DIGITS, DIGITS),
+        Route(cb.SET_TYPE, hand_card.set_card_type, OneOf('basic', 'reverse')),
+    ])
+
+Lookup walks callback_data through a character trie once, collecting every
+route prefix that ends on a '_' boundary, and tries them longest first — so
+deck_delete_yes_5 reaches DECK_DELETE_YES, not DECK or DECK_DELETE — in
+O(len(data)) however many routes there are. The route's callback gets the
+parsed arguments as context.args (ints for DIGITS), like CommandHandler's.
+
+Packed data (utils.callbacks.pack) skips the trie: its prefix code names
+the route directly. A route declared with session='review' (say) rejects a
+packed tap whose nonce is not user_data's current one for that session: the
+user gets a short "expired" notice and the handler never runs — no DB work,
+no conversation state change. Plain data and nonce 0 are always accepted.
+
+Use one router per conversation state (and one for the standalone buttons);
+MessageHandlers sit next to it as before. utils.metrics times each route's
+callback separately.
+"""
+
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+import utils.callbacks as cb
+from utils.telegram_helpers import answer_soon
+
+STALE_TEXT = "\u231b This button has expired"
+
+
+class Digits:
+    """A non-negative decimal integer (ASCII digits only, like the old \\d+ patterns)."""
+
+    regex = r'\d+'
+
+    def __call__(self, raw: str) -> int:
+        if not (raw.isascii() and raw.isdigit()):
+            raise ValueError(raw)
+        return int(raw)
+
+    def __repr__(self) -> str:
+        return 'DIGITS'
+
+
+class OneOf:
+    """One of a fixed set of words, passed through as the string."""
+
+    def __init__(self, *values: str) -> None:
+        self.values = frozenset(values)
+        self.regex = '(' + '|'.join(values) + ')'
+
+    def __call__(self, raw: str) -> str:
+        if raw not in self.values:
+            raise ValueError(raw)
+        return raw
+
+    def __repr__(self) -> str:
+        return f"OneOf{tuple(sorted(self.values))}"
+
+
+DIGITS = Digits()
+
+ArgParser = Digits | OneOf
+
+
+class Route:
+    """prefix[_arg1[_arg2...]] -> callback(update, context) with context.args parsed."""
+
+    __slots__ = ('prefix', 'callback', 'args', 'session')
+
+    def __init__(self, prefix: str, callback: Callable, *args: ArgParser, session: str | None = None) -> None:
+        self.prefix = prefix
+        self.callback = callback
+        self.args = args
+        self.session = session
+
+    def parse(self, suffix: str) -> list[Any] | None:
+        """Typed args from the text after 'prefix_', or None if it doesn't fit."""
+        if not self.args:
+            return None
+        parts = suffix.split('_')
+        if len(parts) != len(self.args):
+            return None
+        try:
+            return [parse(part) for parse, part in zip(self.args, parts)]
+        except ValueError:
+            return None
+
+    def accepts_packed(self, args: list[int]) -> bool:
+        return len(args) == len(self.args) and all(isinstance(parse, Digits) for parse in self.args)
+
+    def pattern(self) -> str:
+        """The equivalent CallbackQueryHandler regex (utils.callbacks.pattern)."""
+        return cb.pattern(self.prefix, *(a.regex for a in self.args))
+
+    def __repr__(self) -> str:
+        return f"Route({self.prefix!r}, {getattr(self.callback, '__qualname__', self.callback)})"
+
+
+class _Node:
+    __slots__ = ('children', 'route')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.route: Route | None = None
+
+
+class CallbackRouter(BaseHandler[Update, Any, Any]):
+    """One PTB handler dispatching callback queries to routes by longest matching prefix."""
+
+    def __init__(self, routes: Iterable[Route] = (), block: bool = True) -> None:
+        super().__init__(self._unrouted, block=block)
+        self._root = _Node()
+        self._by_prefix: dict[str, Route] = {}
+        self.routes: list[Route] = []
+        for route in routes:
+            self.add(route)
+
+    def add(self, route: Route) -> None:
+        node = self._root
+        for ch in route.prefix:
+            node = node.children.setdefault(ch, _Node())
+        if node.route is not None:
+            raise ValueError(f"Duplicate callback route: {route.prefix!r}")
+        node.route = route
+        self._by_prefix[route.prefix] = route
+        self.routes.append(route)
+
+    def match(self, data: str) -> tuple[Route, list[Any], int] | None:
+        """(route, parsed args, nonce) for callback data, or None. Plain data has nonce 0."""
+        if data.startswith(cb.PACKED):
+            return self._match_packed(data)
+        candidates: list[tuple[Route, int]] = []
+        node = self._root
+        for i, ch in enumerate(data):
+            if ch == '_' and node.route is not None:
+                candidates.append((node.route, i + 1))
+            node = node.children.get(ch)  # type: ignore[assignment]
+            if node is None:
+                break
+        else:
+            if node.route is not None and not node.route.args:
+                return node.route, [], 0
+        for route, start in reversed(candidates):
+            args = route.parse(data[start:])
+            if args is not None:
+                return route, args, 0
+        return None
+
+    def _match_packed(self, data: str) -> tuple[Route, list[Any], int] | None:
+        try:
+            prefix, args, nonce = cb.unpack(data)
+        except ValueError:
+            return None
+        route = self._by_prefix.get(prefix)
+        if route is None or not route.accepts_packed(args):
+            return None
+        return route, args, nonce
+
+    # ── PTB handler protocol ─────────────────────────────────
+
+    def check_update(self, update: object) -> tuple[Route, list[Any], int] | None:
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        return self.match(data)
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Any,
+        check_result: tuple[Route, list[Any], int],
+        context: Any,
+    ) -> Any:
+        route, args, nonce = check_result
+        if nonce and route.session and nonce != cb.current_nonce(context.user_data, route.session):
+            answer_soon(update.callback_query, STALE_TEXT)
+            return None
+        context.args = args
+        return await route.callback(update, context)
+
+    @staticmethod
+    async def _unrouted(update: Update, context: Any) -> None:
+        # BaseHandler wants a callback; handle_update always calls the matched route's instead
+        return None
+
+
+def iter_routes(handlers: Sequence[Any]) -> Iterable[Route]:
+    """Every route of the routers in `handlers`, conversations included."""
+    for handler in handlers:
+        if isinstance(handler, CallbackRouter):
+            yield from handler.routes
+        elif hasattr(handler, 'entry_points') and hasattr(handler, 'states'):
+            children = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                children.extend(state_handlers)
+            yield from iter_routes(children)
@@ -0,0 +1,215 @@
+"""
+Multi-process sharded deployment.
+
+One Python process is bound to one core. In sharded mode (SHARDS > 1 in
+config.py) the bot runs as
+
+  front receiver  — a small tornado server on the webhook URL. It checks the
+                    secret token, reads the user id out of the raw update JSON
+                    and forwards the bytes to that user's shard. No PTB objects
+                    are built here, so the front stays cheap.
+  N shard workers — separate processes, each with its own PTB Application
+                    (no Updater), dispatcher and SQLitePersistence partition.
+                    A worker only ever sees its own users, so per-user ordering
+                    (utils.update_processor) still holds. chat_data follows the
+                    chat id, which equals the user id in the private chats this
+                    bot lives in.
+
+All shards share the SQLite database; init_db switches it to WAL so readers
+don't block the (single, short) writer, and sqlite3's busy timeout absorbs
+write contention between processes.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing as mp
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+import tornado.httpserver
+import tornado.web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Update payloads carry the acting user under one of these keys
+_USER_KEYS = ('from', 'user', 'voter_chat')
+
+
+def shard_key(user_id: int) -> int:
+    """The user-id hash shard_for reduces modulo the shard count. Stored as
+    users.shard_key, so a query can pick one shard's users in SQL."""
+    return zlib.crc32(user_id.to_bytes(8, 'little', signed=True))
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Stable shard index for a user (same answer in every process and run)."""
+    if shards <= 1:
+        return 0
+    return shard_key(user_id) % shards
+
+
+def update_user_id(data: dict[str, Any]) -> int | None:
+    """The user (or, failing that, chat) id of a raw update dict, without parsing it."""
+    for key, payload in data.items():
+        if key == 'update_id' or not isinstance(payload, dict):
+            continue
+        for user_key in _USER_KEYS:
+            user = payload.get(user_key)
+            if isinstance(user, dict) and 'id' in user:
+                return user['id']
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat')
+        if isinstance(chat, dict) and 'id' in chat:
+            return chat['id']
+    return None
+
+
+# ── Front receiver ───────────────────────────────────────────
+
+class UpdateRouter:
+    """Routes raw update bytes to per-shard inboxes."""
+
+    def __init__(self, inboxes: list[Any]) -> None:
+        self.inboxes = inboxes
+        self.routed = [0] * len(inboxes)
+
+    def route(self, data: dict[str, Any], raw: bytes) -> int:
+        user_id = update_user_id(data)
+        index = shard_for(user_id, len(self.inboxes)) if user_id is not None else 0
+        self.inboxes[index].put(raw)
+        self.routed[index] += 1
+        return index
+
+
+class _WebhookHandler(tornado.web.RequestHandler):
+    def initialize(self, router: UpdateRouter, secret: str | None) -> None:
+        self.router = router
+        self.secret = secret
+
+    def post(self) -> None:
+        if self.secret:
+            token = self.request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(token, self.secret):
+                raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+        if not isinstance(data, dict):
+            raise tornado.web.HTTPError(400)
+        self.router.route(data, self.request.body)
+
+    def log_exception(self, typ, value, tb) -> None:
+        if not isinstance(value, tornado.web.HTTPError):
+            super().log_exception(typ, value, tb)
+
+
+def make_front_app(router: UpdateRouter, path: str, secret: str | None) -> tornado.web.Application:
+    return tornado.web.Application(
+        [(rf"/{path.strip('/')}/?", _WebhookHandler, {'router': router, 'secret': secret})],
+        log_function=lambda handler: None,   # no access log per update
+    )
+
+
+async def serve_front(
+    inboxes: list[Any],
+    listen: str,
+    port: int,
+    path: str,
+    secret: str | None,
+    stop: asyncio.Event | None = None,
+) -> None:
+    """Run the front receiver until `stop` is set (forever if None)."""
+    router = UpdateRouter(inboxes)
+    server = tornado.httpserver.HTTPServer(make_front_app(router, path, secret))
+    server.listen(port, address=listen)
+    logger.info(f"Front receiver on {listen}:{port}/{path.strip('/')} → {len(inboxes)} shards")
+    try:
+        await (stop or asyncio.Event()).wait()
+    finally:
+        server.stop()
+        logger.info(f"Front receiver stopped, routed per shard: {router.routed}")
+
+
+def front_main(inboxes: list[Any], listen: str, port: int, path: str, secret: str | None) -> None:
+    """Process entry point for running the front receiver on its own."""
+    asyncio.run(serve_front(inboxes, listen, port, path, secret))
+
+
+# ── Shard workers ────────────────────────────────────────────
+
+AppFactory = Callable[[int, int], Application]
+
+
+async def serve_shard(index: int, shards: int, inbox: Any, app_factory: AppFactory) -> None:
+    """Feed updates from `inbox` into this shard's Application until a None arrives."""
+    app = app_factory(index, shards)
+    loop = asyncio.get_running_loop()
+    # Same lifecycle as Application.run_webhook, minus the Updater
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    try:
+        await app.start()
+        logger.info(f"Shard {index}/{shards} ready")
+        while True:
+            raw = await loop.run_in_executor(None, inbox.get)
+            if raw is None:
+                break
+            await app.update_queue.put(Update.de_json(json.loads(raw), app.bot))
+        while app.update_queue.qsize():
+            await asyncio.sleep(0.05)
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def shard_main(index: int, shards: int, inbox: Any, app_factory: AppFactory) -> None:
+    """Process entry point for one shard worker."""
+    logging.basicConfig(
+        format=f'%(asctime)s - shard{index} - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO,
+    )
+    asyncio.run(serve_shard(index, shards, inbox, app_factory))
+
+
+class ShardPool:
+    """N worker processes, each fed from its own inbox queue."""
+
+    def __init__(self, shards: int, app_factory: AppFactory) -> None:
+        self.shards = shards
+        self.app_factory = app_factory
+        self._ctx = mp.get_context('spawn')   # no forked event loops or sqlite handles
+        self.inboxes = [self._ctx.Queue() for _ in range(shards)]
+        self.processes: list[Any] = []
+
+    def start(self) -> None:
+        self.processes = [
+            self._ctx.Process(
+                target=shard_main,
+                args=(i, self.shards, self.inboxes[i], self.app_factory),
+                name=f"shard-{i}",
+                daemon=True,
+            )
+            for i in range(self.shards)
+        ]
+        for p in self.processes:
+            p.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for p in self.processes:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
@@ -7,6 +7,8 @@ Card states: 'new' -> 'learning' -> 'review'
 Ratings: 'again' (1), 'hard' (2), 'good' (3), 'easy' (4)
 """
 
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any
 
@@ -16,7 +18,7 @@ HARD = 2
 GOOD = 3
 EASY = 4
 
-# Learning steps in minutes
+# Learning steps in minutes (the defaults; a deck's Preset may override them)
 LEARNING_STEPS = [1, 10]
 RELEARNING_STEPS = [10]
 
@@ -24,13 +26,57 @@ RELEARNING_STEPS = [10]
 MIN_DIFFICULTY = 1.0
 MAX_DIFFICULTY = 10.0
 
+# Load balancing: review intervals of at least BALANCE_MIN_DAYS may move by up
+# to this fraction (at least one day) towards the least loaded day
+BALANCE_MIN_DAYS = 3
+BALANCE_FUZZ = ((7, 0.15), (20, 0.10), (None, 0.05))   # (interval below, fraction)
 
-def schedule(card: dict[str, Any], rating: int) -> dict[str, Any]:
+
+@dataclass(frozen=True)
+class Preset:
+    """A deck's scheduling options (database presets table). Steps are minutes, intervals days.
+
+    new_per_day / reviews_per_day cap how many new and other cards of the deck
+    one review session takes.
+    """
+    learning_steps: tuple[int, ...] = tuple(LEARNING_STEPS)
+    relearning_steps: tuple[int, ...] = tuple(RELEARNING_STEPS)
+    graduating_interval: int = 1
+    easy_interval: int = 4
+    max_interval: int = 36500
+    new_per_day: int = 20
+    reviews_per_day: int = 200
+
+
+DEFAULT_PRESET = Preset()
+
+
+def schedule(
+    card: dict[str, Any],
+    rating: int,
+    load: Mapping[str, int] | None = None,
+    preset: Preset = DEFAULT_PRESET,
+) -> dict[str, Any]:
     """
     Given a card dict (from DB) and a rating (1-4), returns updated SRS fields.
 
+    load, if given, is the user's cards due per 'YYYY-MM-DD' day
+    (database.get_due_load); a review interval then lands on the least loaded
+    day near it instead of exactly on it. Stability is left as computed.
+    preset is the card's deck's (database.get_preset); no interval exceeds its
+    max_interval.
+
     Returns dict with: due_date, stability, difficulty, reps, lapses, state, scheduled_days
     """
+    result = _schedule(card, rating, preset)
+    if result['scheduled_days'] > preset.max_interval:
+        result = _move(result, preset.max_interval)
+    if load is not None:
+        return _balance(result, load, preset.max_interval)
+    return result
+
+
+def _schedule(card: dict[str, Any], rating: int, preset: Preset) -> dict[str, Any]:
     state = card.get('state', 'new')
     stability = card.get('stability', 0.0)
     difficulty = card.get('difficulty', 5.0)
@@ -38,14 +84,14 @@ def schedule(card: dict[str, Any], rating: int) -> dict[str, Any]:
     lapses = card.get('lapses', 0)
 
     if state in ('new', 'learning'):
-        return _schedule_learning(rating, stability, difficulty, reps, lapses)
+        return _schedule_learning(rating, stability, difficulty, reps, lapses, preset)
     elif state == 'review':
-        return _schedule_review(rating, stability, difficulty, reps, lapses)
+        return _schedule_review(rating, stability, difficulty, reps, lapses, preset)
     elif state == 'relearning':
-        return _schedule_relearning(rating, stability, difficulty, reps, lapses)
+        return _schedule_relearning(rating, stability, difficulty, reps, lapses, preset)
 
     # Fallback: treat as new
-    return _schedule_learning(rating, stability, difficulty, reps, lapses)
+    return _schedule_learning(rating, stability, difficulty, reps, lapses, preset)
 
 
 def _schedule_learning(
@@ -54,33 +100,35 @@ def _schedule_learning(
     difficulty: float,
     reps: int,
     lapses: int,
+    preset: Preset,
 ) -> dict[str, Any]:
     """Handle new and learning cards."""
     now = datetime.now()
 
     if rating == AGAIN:
         # Back to first learning step
-        due = now + timedelta(minutes=LEARNING_STEPS[0])
+        due = now + timedelta(minutes=preset.learning_steps[0])
         return _result(due, 0.0, difficulty, reps, lapses, 'learning', 0)
 
     elif rating == HARD:
         # Second learning step (or repeat first if only one step)
-        step = LEARNING_STEPS[min(1, len(LEARNING_STEPS) - 1)]
+        steps = preset.learning_steps
+        step = steps[min(1, len(steps) - 1)]
         due = now + timedelta(minutes=step)
         return _result(due, 0.0, difficulty, reps, lapses, 'learning', 0)
 
     elif rating == GOOD:
-        # Graduate to review — first real interval: 1 day
-        stability = 1.0
-        due = now + timedelta(days=1)
-        return _result(due, stability, difficulty, reps + 1, lapses, 'review', 1)
+        # Graduate to review — first real interval: the graduating interval (1 day by default)
+        days = preset.graduating_interval
+        due = now + timedelta(days=days)
+        return _result(due, float(days), difficulty, reps + 1, lapses, 'review', days)
 
     elif rating == EASY:
-        # Graduate fast — 4 day interval
-        stability = 4.0
+        # Graduate fast — the easy interval (4 days by default)
+        days = preset.easy_interval
         difficulty = max(MIN_DIFFICULTY, difficulty - 1.0)
-        due = now + timedelta(days=4)
-        return _result(due, stability, difficulty, reps + 1, lapses, 'review', 4)
+        due = now + timedelta(days=days)
+        return _result(due, float(days), difficulty, reps + 1, lapses, 'review', days)
 
     return _result(now, 0.0, difficulty, reps, lapses, 'learning', 0)
 
@@ -91,6 +139,7 @@ def _schedule_review(
     difficulty: float,
     reps: int,
     lapses: int,
+    preset: Preset,
 ) -> dict[str, Any]:
     """Handle cards in review state."""
     now = datetime.now()
@@ -99,7 +148,7 @@ def _schedule_review(
     if rating == AGAIN:
         # Lapse — back to relearning
         new_difficulty = min(MAX_DIFFICULTY, difficulty + 2.0)
-        due = now + timedelta(minutes=RELEARNING_STEPS[0])
+        due = now + timedelta(minutes=preset.relearning_steps[0])
         # Stability drops significantly on lapse
         new_stability = max(0.5, stability * 0.3)
         return _result(due, new_stability, new_difficulty, reps, lapses + 1, 'relearning', 0)
@@ -136,16 +185,17 @@ def _schedule_relearning(
     difficulty: float,
     reps: int,
     lapses: int,
+    preset: Preset,
 ) -> dict[str, Any]:
     """Handle cards that lapsed and are being relearned."""
     now = datetime.now()
 
     if rating == AGAIN:
-        due = now + timedelta(minutes=RELEARNING_STEPS[0])
+        due = now + timedelta(minutes=preset.relearning_steps[0])
         return _result(due, stability, difficulty, reps, lapses, 'relearning', 0)
 
     elif rating == HARD:
-        due = now + timedelta(minutes=RELEARNING_STEPS[0])
+        due = now + timedelta(minutes=preset.relearning_steps[0])
         return _result(due, stability, difficulty, reps, lapses, 'relearning', 0)
 
     elif rating == GOOD:
@@ -164,6 +214,42 @@ def _schedule_relearning(
     return _result(now, stability, difficulty, reps, lapses, 'relearning', 0)
 
 
+def balance_range(days: int) -> tuple[int, int]:
+    """The (shortest, longest) interval a `days`-day review may be moved to."""
+    if days < BALANCE_MIN_DAYS:
+        return days, days
+    fraction = next(f for below, f in BALANCE_FUZZ if below is None or days < below)
+    delta = max(1, round(days * fraction))
+    return max(1, days - delta), days + delta
+
+
+def _balance(result: dict[str, Any], load: Mapping[str, int], max_interval: int) -> dict[str, Any]:
+    """Move a review result to the least loaded day in its balance_range (ties: nearest, then sooner)."""
+    days = result['scheduled_days']
+    low, high = balance_range(days)
+    high = min(high, max_interval)
+    if result['state'] != 'review' or low == high:
+        return result
+    base = datetime.strptime(result['due_date'], '%Y-%m-%d %H:%M:%S') - timedelta(days=days)
+    best = min(
+        range(low, high + 1),
+        key=lambda d: (load.get((base + timedelta(days=d)).strftime('%Y-%m-%d'), 0), abs(d - days), d),
+    )
+    if best == days:
+        return result
+    return _move(result, best)
+
+
+def _move(result: dict[str, Any], days: int) -> dict[str, Any]:
+    """The same result, due `days` days after it was scheduled instead."""
+    base = datetime.strptime(result['due_date'], '%Y-%m-%d %H:%M:%S') - timedelta(days=result['scheduled_days'])
+    return {
+        **result,
+        'due_date': (base + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S'),
+        'scheduled_days': days,
+    }
+
+
 def _ease_from_difficulty(difficulty: float) -> float:
     """Convert difficulty (1-10) to an ease multiplier (1.3-3.0)."""
     # difficulty 1 -> ease 3.0 (easy cards grow fast)
@@ -191,9 +277,19 @@ def _result(
     }
 
 
-def schedule_all_ratings(card: dict[str, Any]) -> dict[int, dict[str, Any]]:
+def is_leech(card: dict[str, Any], result: dict[str, Any], threshold: int) -> bool:
+    """True if this rating was a lapse that took the card to `threshold` lapses or past it (0 = never)."""
+    lapses = result['lapses']
+    return threshold > 0 and lapses > card.get('lapses', 0) and lapses >= threshold
+
+
+def schedule_all_ratings(
+    card: dict[str, Any],
+    load: Mapping[str, int] | None = None,
+    preset: Preset = DEFAULT_PRESET,
+) -> dict[int, dict[str, Any]]:
     """Compute schedule results for all 4 ratings at once. Returns dict {rating: result}."""
-    return {r: schedule(card, r) for r in (AGAIN, HARD, GOOD, EASY)}
+    return {r: schedule(card, r, load, preset) for r in (AGAIN, HARD, GOOD, EASY)}
 
 
 def _format_interval(result: dict[str, Any]) -> str:
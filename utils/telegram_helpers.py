@@ -4,6 +4,13 @@ Safe wrappers for Telegram API calls.
 Every handler uses these instead of raw query.edit_message_text / bot.send_message.
 If the API call fails, these recover gracefully instead of crashing the handler.
 
+When a dispatcher is installed (set_dispatcher, done in bot.py) every call goes
+through utils.dispatcher: rate limits, RetryAfter backoff, retries and
+interactive-over-broadcast priority. Without one, calls go straight to the API.
+
+Sends and edits are recorded in utils.render.RENDERED; an edit to the content
+a message already shows returns True without calling the API.
+
 DISCIPLINE RULE — all callers must:
   - Pass parse_mode='HTML' (the default here)
   - Wrap every piece of user-supplied text in html.escape() before embedding it
@@ -19,77 +26,190 @@ Unsafe (never do this):
     await safe_edit_text(query, f"Deck: <b>{deck_name}</b>")
 """
 
+import asyncio
 import logging
-from typing import Any
+from collections.abc import Awaitable, Callable
+from typing import IO, Any
+
+from telegram import CallbackQuery, InlineKeyboardMarkup, InputFile, Message
+from telegram.error import BadRequest, Forbidden, TimedOut, NetworkError, RetryAfter
 
-from telegram import CallbackQuery, InlineKeyboardMarkup, Message
-from telegram.error import BadRequest, Forbidden, TimedOut, NetworkError
+from utils.dispatcher import OutboundDispatcher, Priority
+from utils.metrics import timed
+from utils.render import RENDERED
 
 logger = logging.getLogger(__name__)
 
+_dispatcher: OutboundDispatcher | None = None
+
+# Strong references to in-flight answer_soon() tasks (the loop only keeps weak ones)
+_pending_answers: set[asyncio.Task] = set()
+
+
+def set_dispatcher(dispatcher: OutboundDispatcher | None) -> None:
+    """Route every helper below through `dispatcher` (None = call the API directly)."""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+async def _call(
+    chat_id: int | None,
+    call: Callable[[], Awaitable[Any]],
+    priority: Priority = Priority.INTERACTIVE,
+    idempotent: bool = True,
+) -> Any:
+    """Run an API call through the dispatcher. Sends pass idempotent=False (see OutboundDispatcher.submit)."""
+    if _dispatcher is None:
+        return await call()
+    return await _dispatcher.submit(chat_id, call, priority, idempotent)
+
+
+def _query_chat_id(query: CallbackQuery) -> int | None:
+    return query.message.chat_id if query.message else None
+
+
+def _query_message_id(query: CallbackQuery) -> int | None:
+    return query.message.message_id if query.message else None
+
+
+def _record_sent(sent: Any, content: tuple) -> None:
+    if isinstance(sent, Message):
+        RENDERED.record(sent.chat_id, sent.message_id, content)
+
+
+@timed('telegram')
+async def safe_answer(query: CallbackQuery, text: str | None = None, show_alert: bool = False) -> bool:
+    """Answer a callback query (stops the button's spinner). Never raises."""
+    try:
+        await query.answer(text=text, show_alert=show_alert)
+        return True
+    except BadRequest as e:
+        # "Query is too old" — the user tapped long ago or the bot was restarting
+        logger.info(f"safe_answer BadRequest: {e}")
+        return False
+    except (Forbidden, TimedOut, NetworkError, RetryAfter) as e:
+        logger.warning(f"safe_answer failed: {e}")
+        return False
+
+
+def answer_soon(query: CallbackQuery, text: str | None = None, show_alert: bool = False) -> asyncio.Task:
+    """Answer a callback query without waiting for it.
 
+    Nothing a handler does depends on the answer, so its round trip can overlap
+    the handler's DB work and its edit instead of running ahead of them. Errors
+    are handled as in safe_answer. Returns the task for callers that need it done.
+    """
+    task = asyncio.create_task(safe_answer(query, text, show_alert))
+    _pending_answers.add(task)
+    task.add_done_callback(_pending_answers.discard)
+    return task
+
+
+@timed('telegram')
 async def safe_edit_text(
     query: CallbackQuery,
     text: str,
     reply_markup: InlineKeyboardMarkup | None = None,
     parse_mode: str = 'HTML',
 ) -> bool:
-    """Edit a callback query's message text. Falls back to reply on failure."""
+    """Edit a callback query's message text. Falls back to reply on failure.
+
+    Skipped (returns True) when the message already shows exactly this.
+    """
+    chat_id, message_id = _query_chat_id(query), _query_message_id(query)
+    content = ('text', text, reply_markup, parse_mode)
+    if RENDERED.is_current(chat_id, message_id, content):
+        return True
     try:
-        await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        await _call(
+            chat_id,
+            lambda: query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode),
+        )
+        RENDERED.record(chat_id, message_id, content)
         return True
     except BadRequest as e:
         msg = str(e).lower()
         if "message is not modified" in msg:
+            RENDERED.record(chat_id, message_id, content)
             return True  # same content — harmless
+        RENDERED.forget(chat_id, message_id)
         if "message to edit not found" in msg:
             return await _fallback_reply(query, text, reply_markup, parse_mode)
         logger.warning(f"safe_edit_text BadRequest: {e}")
         return await _fallback_reply(query, text, reply_markup, parse_mode)
-    except (TimedOut, NetworkError) as e:
+    except (TimedOut, NetworkError, RetryAfter) as e:
+        RENDERED.forget(chat_id, message_id)
         logger.warning(f"safe_edit_text network error: {e}")
         return False
 
 
+@timed('telegram')
 async def safe_edit_caption(
     query: CallbackQuery,
     caption: str,
     reply_markup: InlineKeyboardMarkup | None = None,
     parse_mode: str = 'HTML',
 ) -> bool:
-    """Edit a callback query's message caption. Falls back to reply on failure."""
+    """Edit a callback query's message caption. Falls back to reply on failure.
+
+    Skipped (returns True) when the message already shows exactly this.
+    """
+    chat_id, message_id = _query_chat_id(query), _query_message_id(query)
+    content = ('caption', caption, reply_markup, parse_mode)
+    if RENDERED.is_current(chat_id, message_id, content):
+        return True
     try:
-        await query.edit_message_caption(caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)
+        await _call(
+            chat_id,
+            lambda: query.edit_message_caption(caption=caption, reply_markup=reply_markup, parse_mode=parse_mode),
+        )
+        RENDERED.record(chat_id, message_id, content)
         return True
     except BadRequest as e:
         msg = str(e).lower()
         if "message is not modified" in msg:
+            RENDERED.record(chat_id, message_id, content)
             return True
+        RENDERED.forget(chat_id, message_id)
         logger.warning(f"safe_edit_caption BadRequest: {e}")
         return await _fallback_reply(query, caption, reply_markup, parse_mode)
-    except (TimedOut, NetworkError) as e:
+    except (TimedOut, NetworkError, RetryAfter) as e:
+        RENDERED.forget(chat_id, message_id)
         logger.warning(f"safe_edit_caption network error: {e}")
         return False
 
 
+@timed('telegram')
 async def safe_send_text(
     target: Message | tuple[int, Any],
     text: str,
     reply_markup: InlineKeyboardMarkup | None = None,
     parse_mode: str = 'HTML',
+    priority: Priority = Priority.INTERACTIVE,
 ) -> bool:
     """Send a text message. target can be Message or (chat_id, bot) tuple."""
     try:
         if hasattr(target, 'reply_text'):
-            await target.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)  # type: ignore[union-attr]
+            sent = await _call(
+                target.chat_id,  # type: ignore[union-attr]
+                lambda: target.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode),  # type: ignore[union-attr]
+                priority,
+                idempotent=False,
+            )
         else:
             chat_id, bot = target
-            await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+            sent = await _call(
+                chat_id,
+                lambda: bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode),
+                priority,
+                idempotent=False,
+            )
+        _record_sent(sent, ('text', text, reply_markup, parse_mode))
         return True
     except Forbidden:
         logger.warning("Bot was blocked by user")
         return False
-    except (TimedOut, NetworkError) as e:
+    except (TimedOut, NetworkError, RetryAfter) as e:
         logger.warning(f"safe_send_text network error: {e}")
         return False
     except BadRequest as e:
@@ -97,25 +217,38 @@ async def safe_send_text(
         return False
 
 
+@timed('telegram')
 async def safe_send_photo(
     target: Message | tuple[int, Any],
     photo: str,
     caption: str | None = None,
     reply_markup: InlineKeyboardMarkup | None = None,
     parse_mode: str = 'HTML',
+    priority: Priority = Priority.INTERACTIVE,
 ) -> bool:
     """Send a photo message."""
     try:
         if hasattr(target, 'reply_photo'):
-            await target.reply_photo(photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)  # type: ignore[union-attr]
+            sent = await _call(
+                target.chat_id,  # type: ignore[union-attr]
+                lambda: target.reply_photo(photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode),  # type: ignore[union-attr]
+                priority,
+                idempotent=False,
+            )
         else:
             chat_id, bot = target
-            await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)
+            sent = await _call(
+                chat_id,
+                lambda: bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode),
+                priority,
+                idempotent=False,
+            )
+        _record_sent(sent, ('caption', caption, reply_markup, parse_mode))
         return True
     except Forbidden:
         logger.warning("Bot was blocked by user")
         return False
-    except (TimedOut, NetworkError) as e:
+    except (TimedOut, NetworkError, RetryAfter) as e:
         logger.warning(f"safe_send_photo network error: {e}")
         return False
     except BadRequest as e:
@@ -123,14 +256,50 @@ async def safe_send_photo(
         return False
 
 
+@timed('telegram')
+async def safe_send_document(
+    target: Message | tuple[int, Any],
+    document: IO[bytes],
+    filename: str,
+    caption: str | None = None,
+    parse_mode: str = 'HTML',
+) -> bool:
+    """Send a file. The handle is streamed to Telegram, not read into memory first."""
+    upload = InputFile(document, filename=filename, read_file_handle=False)
+    start = document.tell()
+
+    async def _upload() -> Any:
+        document.seek(start)  # a retried upload must resend from the beginning
+        if hasattr(target, 'reply_document'):
+            return await target.reply_document(document=upload, caption=caption, parse_mode=parse_mode)  # type: ignore[union-attr]
+        chat_id, bot = target
+        return await bot.send_document(chat_id=chat_id, document=upload, caption=caption, parse_mode=parse_mode)
+
+    chat_id = target.chat_id if hasattr(target, 'reply_document') else target[0]  # type: ignore[union-attr, index]
+    try:
+        await _call(chat_id, _upload, idempotent=False)
+        return True
+    except Forbidden:
+        logger.warning("Bot was blocked by user")
+        return False
+    except (TimedOut, NetworkError, RetryAfter) as e:
+        logger.warning(f"safe_send_document network error: {e}")
+        return False
+    except BadRequest as e:
+        logger.warning(f"safe_send_document BadRequest: {e}")
+        return False
+
+
+@timed('telegram')
 async def safe_delete(message: Message) -> bool:
     """Delete a message. Returns True if deleted, False if already gone."""
+    RENDERED.forget(message.chat_id, message.message_id)
     try:
-        await message.delete()
+        await _call(message.chat_id, message.delete)
         return True
     except BadRequest:
         return False
-    except (TimedOut, NetworkError):
+    except (TimedOut, NetworkError, RetryAfter):
         return False
 
 
@@ -142,7 +311,12 @@ async def _fallback_reply(
 ) -> bool:
     """When edit fails, try sending a new message instead."""
     try:
-        await query.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        sent = await _call(
+            _query_chat_id(query),
+            lambda: query.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode),
+            idempotent=False,
+        )
+        _record_sent(sent, ('text', text, reply_markup, parse_mode))
         return True
     except Exception as e:
         logger.warning(f"_fallback_reply also failed: {e}")
@@ -0,0 +1,102 @@
+"""
+Card templates: how a note's content becomes the cards that get reviewed.
+
+A note (database/schema.py) stores front and back once. Each of its cards
+names a template that renders the two sides the review shows; the note's type
+picks which templates a new note gets:
+
+    basic    forward              front -> back
+    reverse  forward, reverse     front -> back, back -> front
+    cloze    c1, c2, ...          one card per deletion number in front
+
+A cloze note's front is text with deletions, 'The capital of {{c1::France}}
+is {{c2::Paris}}' (optionally with a hint: '{{c1::France::country}}'), and its
+back is extra text shown with the answer. Card cN asks the text with deletion
+N blanked out and the others filled in. Nothing rendered is stored: cards are
+rendered from the note whenever they are read.
+
+Editing a card edits its note, so the text a user types for a reverse card is
+mapped back through the template (note_fields) before it is stored.
+"""
+
+import re
+
+FORWARD = 'forward'
+REVERSE = 'reverse'
+CLOZE = 'cloze'
+
+NOTE_TEMPLATES: dict[str, tuple[str, ...]] = {
+    'basic': (FORWARD,),
+    'reverse': (FORWARD, REVERSE),
+}
+
+# {{c<number>::<text>}} or {{c<number>::<text>::<hint>}}; text may span lines
+_DELETION = re.compile(r"\{\{c(\d+)::(.*?)(?:::(.*?))?\}\}", re.DOTALL)
+_CLOZE_TEMPLATE = re.compile(r"c(\d+)")
+
+BLANK = '[...]'
+
+
+def is_cloze(text: str) -> bool:
+    """True if text holds at least one cloze deletion."""
+    return _DELETION.search(text) is not None
+
+
+def cloze_numbers(text: str) -> list[int]:
+    """The distinct deletion numbers in text, ascending."""
+    return sorted({int(m.group(1)) for m in _DELETION.finditer(text)})
+
+
+def cloze_template(number: int) -> str:
+    return f"c{number}"
+
+
+def cloze_number(template: str) -> int | None:
+    """N for a cloze template 'cN', else None."""
+    match = _CLOZE_TEMPLATE.fullmatch(template)
+    return int(match.group(1)) if match else None
+
+
+def templates_for(note_type: str, front: str = '') -> tuple[str, ...]:
+    """The templates a new note of this type gets one card each for."""
+    if note_type.lower() == CLOZE:
+        return tuple(cloze_template(n) for n in cloze_numbers(front))
+    return NOTE_TEMPLATES.get(note_type.lower(), (FORWARD,))
+
+
+def _fill(text: str, blank: int | None) -> str:
+    def replace(match: re.Match) -> str:
+        if blank is not None and int(match.group(1)) == blank:
+            hint = match.group(3)
+            return f"[{hint}]" if hint else BLANK
+        return match.group(2)
+    return _DELETION.sub(replace, text)
+
+
+def render(template: str, front: str, back: str) -> tuple[str, str]:
+    """(front, back) as the card shows them, from the note's fields."""
+    if template == REVERSE:
+        return back, front
+    number = cloze_number(template)
+    if number is not None:
+        answer = _fill(front, None)
+        return _fill(front, number), f"{answer}\n\n{back}" if back else answer
+    return front, back
+
+
+def note_fields(template: str, front: str, back: str) -> tuple[str, str]:
+    """The note's (front, back) for a card edited to show `front` / `back`.
+
+    A cloze card is edited as its note's text (deletions included), so it maps
+    to itself.
+    """
+    if template == REVERSE:
+        return back, front
+    return front, back
+
+
+def edit_sides(card: dict) -> tuple[str, str]:
+    """What an edit prompt offers for a card (database.get_card): its sides, or its note's text if cloze."""
+    if cloze_number(card['template']) is not None:
+        return card['note_front'], card['note_back'] or ''
+    return card['front'], card['back'] or ''
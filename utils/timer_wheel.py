@@ -0,0 +1,160 @@
+"""
+Due notices: a hierarchical timer wheel of cards in learning.
+
+Learning and relearning steps are minutes, not days, so the periodic reminder
+pass (utils.reminders.run_reminders) is far too coarse for them: a card rated
+Again comes due ten minutes later and nothing says so. DUE_TIMERS holds one
+timer per such card, keyed (user_id, card_id) and owned by its user, for the
+moment it comes due; a JobQueue job advances the wheel every few seconds and
+sends each user whose timers fired one coalesced notice.
+
+The wheel is hierarchical: LEVELS rings of SLOTS buckets, a bucket of level l
+spanning SLOTS**l ticks. A timer goes into the finest ring that reaches its
+deadline and moves down a ring each time the clock enters its bucket, so
+adding, replacing and cancelling a timer are dict operations, and a tick
+touches one bucket (plus, once every SLOTS ticks, the timers of one coarser
+bucket moving down) — however many timers are pending.
+
+database.update_card_srs adds, replaces or cancels a card's timer on every
+rating; on startup the wheel is rebuilt from one range query over the partial
+due-date index of learning cards (database.get_learning_due). Timers are hints:
+a card deleted, buried or rescheduled elsewhere may leave one behind, so the
+notice counts only the fired cards still in learning and due.
+
+Process-local: in sharded mode each worker tracks only its own users.
+"""
+
+import math
+import time
+from collections.abc import Callable, Hashable
+from datetime import datetime, timezone
+
+TICK_SECONDS = 10
+SLOTS = 64
+LEVELS = 3                  # rings spanning ~11 minutes, ~11 hours and ~30 days
+HORIZON_SECONDS = 86_400    # the longest step a preset allows (utils.presets.MAX_STEP_MINUTES)
+COALESCE_SECONDS = 120      # a user's timers this close behind a fired one go in the same notice
+
+
+class TimerWheel:
+    """Timers keyed by any hashable key, each with an owner; fired in batches per owner by advance()."""
+
+    def __init__(
+        self,
+        tick: float = TICK_SECONDS,
+        slots: int = SLOTS,
+        levels: int = LEVELS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self._current = int(clock() // tick)   # last tick advanced through
+        self._rings: list[list[dict[Hashable, tuple[int, Hashable]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._timers: dict[Hashable, dict[Hashable, tuple[int, Hashable]]] = {}   # key -> its bucket
+        self._owners: dict[Hashable, set[Hashable]] = {}
+
+    def add(self, key: Hashable, owner: Hashable, when: float) -> bool:
+        """Fire key for owner at `when` (epoch seconds), replacing its timer if it had one.
+
+        Returns False (and tracks nothing) if `when` is beyond what the rings span.
+        """
+        self.cancel(key)
+        if not self._timers:
+            self._current = max(self._current, int(self.clock() // self.tick))   # idle since the last advance
+        deadline = max(math.ceil(when / self.tick), self._current + 1)
+        if not self._place(key, owner, deadline):
+            return False
+        self._owners.setdefault(owner, set()).add(key)
+        return True
+
+    def cancel(self, key: Hashable) -> bool:
+        bucket = self._timers.pop(key, None)
+        if bucket is None:
+            return False
+        _, owner = bucket.pop(key)
+        self._forget(owner, key)
+        return True
+
+    def advance(self, now: float | None = None, coalesce: float = 0) -> dict[Hashable, list[Hashable]]:
+        """Fire every timer due by `now` (default: the clock): {owner: [keys]}.
+
+        An owner's other timers due within `coalesce` seconds of now fire with
+        them, so a burst of cards a minute apart makes one notice, not several.
+        """
+        now = self.clock() if now is None else now
+        target = int(now // self.tick)
+        fired: dict[Hashable, list[Hashable]] = {}
+        while self._current < target:
+            if not self._timers:
+                self._current = target          # idle: nothing to cascade or fire
+                break
+            self._current += 1
+            self._cascade()
+            index = self._current % self.slots
+            bucket, self._rings[0][index] = self._rings[0][index], {}
+            for key, (_, owner) in bucket.items():
+                del self._timers[key]
+                self._forget(owner, key)
+                fired.setdefault(owner, []).append(key)
+
+        if coalesce:
+            until = math.ceil((now + coalesce) / self.tick)
+            for owner, keys in fired.items():
+                for key in list(self._owners.get(owner, ())):
+                    if self._timers[key][key][0] <= until:
+                        self.cancel(key)
+                        keys.append(key)
+        return fired
+
+    def _place(self, key: Hashable, owner: Hashable, deadline: int) -> bool:
+        # The finest ring whose buckets reach the deadline before wrapping round
+        for level in range(self.levels):
+            span = self.slots ** level
+            block = deadline // span
+            if block - self._current // span < self.slots:
+                bucket = self._rings[level][block % self.slots]
+                bucket[key] = (deadline, owner)
+                self._timers[key] = bucket
+                return True
+        return False
+
+    def _cascade(self) -> None:
+        # Entering a coarse bucket: its timers move down to finer rings, coarsest first
+        for level in range(self.levels - 1, 0, -1):
+            span = self.slots ** level
+            if self._current % span:
+                continue
+            index = (self._current // span) % self.slots
+            bucket, self._rings[level][index] = self._rings[level][index], {}
+            for key, (deadline, owner) in bucket.items():
+                self._place(key, owner, deadline)
+
+    def _forget(self, owner: Hashable, key: Hashable) -> None:
+        keys = self._owners.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._owners[owner]
+
+    def clear(self) -> None:
+        for ring in self._rings:
+            for bucket in ring:
+                bucket.clear()
+        self._timers.clear()
+        self._owners.clear()
+        self._current = int(self.clock() // self.tick)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+
+def epoch(timestamp: str) -> float:
+    """A stored UTC 'YYYY-MM-DD HH:MM:SS' timestamp (a card's due_date) as epoch seconds."""
+    return datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+DUE_TIMERS = TimerWheel()
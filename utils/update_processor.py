@@ -0,0 +1,89 @@
+"""
+Concurrent update processing with per-user ordering.
+
+PTB's default processor handles one update at a time. SimpleUpdateProcessor
+would run them in parallel, but then two quick taps from the same user race on
+user_data — rate_card reads review_index, awaits the API, then writes index + 1,
+so both taps can rate the same card and skip the next one.
+
+PerUserUpdateProcessor runs updates from different users in parallel and
+updates from the same user strictly one after another, in arrival order:
+
+  - each update first takes its user's lock (asyncio.Lock is FIFO, and the
+    Application starts processing tasks in the order updates arrive)
+  - only then does it take one of `max_concurrent_updates` running slots, so a
+    user hammering a button queues behind their own lock without occupying
+    slots other users need
+  - the base class semaphore bounds how many updates may be in flight at all
+    (running + waiting), `max_pending`
+
+Per-user ordering is also what ConversationHandler relies on: its state is keyed
+by (chat, user), so it never sees two updates for the same key at once.
+Updates with neither a user nor a chat (e.g. poll updates) are not serialized.
+"""
+
+import asyncio
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+MAX_CONCURRENT_UPDATES = 64
+PENDING_FACTOR = 16           # in-flight updates allowed per running slot
+
+
+def ordering_key(update: object) -> int | None:
+    """The id whose updates must be processed in order: the user, else the chat."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES, max_pending: int | None = None) -> None:
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        pending = max_pending or max_concurrent_updates * PENDING_FACTOR
+        # Never 1: Application only processes concurrently when the base limit is > 1
+        super().__init__(max(pending, max_concurrent_updates, 2))
+        self.max_running = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._holders: dict[int, int] = {}     # key -> updates holding or waiting for its lock
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = ordering_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:   # last one out — don't keep a lock per user forever
+                del self._holders[key]
+                del self._locks[key]
+
+    @property
+    def active_users(self) -> int:
+        """Users with at least one update running or waiting."""
+        return len(self._locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -1,6 +1,7 @@
 from telegram import InlineKeyboardButton, PhotoSize
 
 import utils.callbacks as cb
+from utils.templates import is_cloze
 
 
 def parse_photo(photo_obj: PhotoSize, caption: str | None = None) -> dict[str, str | bool]:
@@ -11,9 +12,14 @@ def parse_photo(photo_obj: PhotoSize, caption: str | None = None) -> dict[str, s
 def parse_text(content: str, card_type: str | None = None) -> dict[str, str]:
     """
     returns: {'front': str, 'back': str}
+    Cloze text ({{c1::...}}) keeps every line on the front; `|` starts the extra back text.
     """
     text = content.strip()
 
+    if is_cloze(text):
+        front, _, back = text.partition('|')
+        return {'front': front.strip(), 'back': back.strip()}
+
     if '|' in text:
         parts = text.split('|', 1)
         return {'front': parts[0].strip(), 'back': parts[1].strip()}
@@ -26,6 +32,28 @@ def parse_text(content: str, card_type: str | None = None) -> dict[str, str]:
     return {'front': text, 'back': ''}
 
 
+def is_bulk(content: str) -> bool:
+    """Two or more non-empty lines, every one of them a `front | back` pair."""
+    lines = [l for l in content.split('\n') if l.strip()]
+    return len(lines) >= 2 and all('|' in l for l in lines)
+
+
+def parse_bulk(content: str) -> tuple[list[dict[str, str]], list[int]]:
+    """
+    One card per `front | back` line.
+    returns: (cards, skipped) — skipped holds 1-based line numbers missing a side
+    """
+    cards: list[dict[str, str]] = []
+    skipped: list[int] = []
+    for n, line in enumerate((l for l in content.split('\n') if l.strip()), start=1):
+        parsed = parse_text(line)
+        if parsed['front'] and parsed['back']:
+            cards.append(parsed)
+        else:
+            skipped.append(n)
+    return cards, skipped
+
+
 def get_buttons(items: list[dict[str, str | int]], prefix: str) -> list[list[InlineKeyboardButton]]:
     buttons: list[list[InlineKeyboardButton]] = []
     for item in items: